@@ -3,15 +3,18 @@ Module 3: Competitive Intelligence Active - GEO Focus
 Analyse pourquoi les compétiteurs sont favoris des moteurs génératifs (ChatGPT, Claude, Perplexity, etc.)
 Reverse-engineering des patterns de contenu qui font performer dans les IA
 """
+import asyncio
 import logging
-import requests
-from bs4 import BeautifulSoup
 from typing import List, Dict, Any, Optional
 import json
-import re
-import time
 import socket
 from urllib.parse import urljoin, urlparse
+import httpx
+
+from services.competitor_profile_store import CompetitorProfileStore, competitor_profile_store
+from services.crawler import CrawlLimits, crawl_limits
+from utils.html_features import PageFeatures, extract_page_features
+from utils.mention_index import MentionIndex
 
 logger = logging.getLogger(__name__)
 
@@ -25,15 +28,53 @@ class CompetitiveIntelligence:
     """
     Analyse détaillée des compétiteurs pour comprendre pourquoi ils dominent dans les moteurs génératifs.
     Extrait les patterns de contenu, structure, données factuelles qui plaisent aux IA.
+    Les compétiteurs et leurs pages internes sont récupérés en parallèle (connexions
+    réutilisées par domaine), dans les limites de concurrence par hôte du crawler.
     """
     
-    def __init__(self):
-        """Initialise le service d'intelligence compétitive"""
+    def __init__(
+        self,
+        profile_store: Optional[CompetitorProfileStore] = None,
+        limits: Optional[CrawlLimits] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Initialise le service d'intelligence compétitive
+        
+        Args:
+            profile_store: Base de profils partagée entre les jobs (défaut: competitor_profile_store)
+            limits: Limites de concurrence par hôte et globale (défaut: crawl_limits partagé)
+            transport: Transport httpx (tests)
+        """
+        self.profile_store = profile_store or competitor_profile_store
+        self.limits = limits or crawl_limits
+        self.transport = transport
         self.timeout = REQUEST_TIMEOUT
         self.max_retries = MAX_RETRIES
         self.retry_delay = RETRY_DELAY
+        self._page_features: Dict[str, Optional[PageFeatures]] = {}
+        self._domains: Dict[str, bool] = {}
+        self._mention_index: Optional[MentionIndex] = None
+        self._mention_index_source: Optional[Dict[str, Any]] = None
     
-    def _check_domain_exists(self, domain: str) -> bool:
+    def _client(self) -> httpx.AsyncClient:
+        """Client HTTP partagé par toutes les requêtes d'une analyse (connexions réutilisées par domaine)"""
+        return httpx.AsyncClient(
+            transport=self.transport,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={
+                'User-Agent': 'Mozilla/5.0 (compatible; GEOBot/1.0)',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
+            },
+            limits=httpx.Limits(
+                max_connections=max(1, self.limits.global_concurrency),
+                max_keepalive_connections=max(1, self.limits.global_concurrency)
+            )
+        )
+    
+    async def _check_domain_exists(self, domain: str) -> bool:
         """
         Vérifie qu'un domaine existe via DNS lookup
         
@@ -43,8 +84,15 @@ class CompetitiveIntelligence:
         Returns:
             True si le domaine existe, False sinon
         """
+        # Une résolution par domaine et par analyse (chaque lien interne est validé)
+        if domain not in self._domains:
+            self._domains[domain] = await self._resolve_domain(domain)
+        return self._domains[domain]
+    
+    async def _resolve_domain(self, domain: str) -> bool:
+        """Résolution DNS non bloquante"""
         try:
-            socket.gethostbyname(domain)
+            await asyncio.get_running_loop().getaddrinfo(domain, None)
             return True
         except socket.gaierror:
             logger.warning(f"❌ Domain does not exist: {domain}")
@@ -53,23 +101,21 @@ class CompetitiveIntelligence:
             logger.warning(f"❌ Failed to check domain {domain}: {e}")
             return False
     
-    def _check_url_responds(self, url: str) -> bool:
+    async def _check_url_responds(self, client: httpx.AsyncClient, url: str) -> bool:
         """
         Vérifie qu'une URL répond via HEAD request rapide
         
         Args:
+            client: Client HTTP partagé
             url: URL à vérifier
             
         Returns:
             True si l'URL répond (status < 400), False sinon
         """
         try:
-            response = requests.head(
-                url, 
-                timeout=HEAD_REQUEST_TIMEOUT,
-                allow_redirects=True,
-                headers={'User-Agent': 'Mozilla/5.0 (compatible; GEOBot/1.0)'}
-            )
+            async with self.limits.host_slot(urlparse(url).netloc):
+                async with self.limits.global_slot():
+                    response = await client.head(url, timeout=HEAD_REQUEST_TIMEOUT)
             
             # Accepter tous les codes < 400
             if response.status_code < 400:
@@ -78,20 +124,20 @@ class CompetitiveIntelligence:
                 logger.warning(f"❌ URL returned {response.status_code}: {url}")
                 return False
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             logger.warning(f"❌ URL timeout (HEAD request): {url}")
             return False
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.warning(f"❌ URL not reachable: {url} - {e}")
             return False
     
-    def _validate_url(self, url: str, check_reachable: bool = False) -> Optional[str]:
+    async def _validate_url(self, url: str, client: Optional[httpx.AsyncClient] = None) -> Optional[str]:
         """
         Valide et normalise une URL avec vérification optionnelle de disponibilité
         
         Args:
             url: URL à valider
-            check_reachable: Si True, vérifie que l'URL est accessible
+            client: Si fourni, vérifie aussi que l'URL est accessible (HEAD)
             
         Returns:
             URL normalisée ou None si invalide
@@ -115,7 +161,7 @@ class CompetitiveIntelligence:
             
             # Vérifier que le domaine existe
             domain = parsed.netloc
-            if not self._check_domain_exists(domain):
+            if not await self._check_domain_exists(domain):
                 return None
             
             # Reconstruire l'URL proprement
@@ -126,8 +172,8 @@ class CompetitiveIntelligence:
             normalized_url = f"{scheme}://{netloc}{path}"
             
             # Vérification optionnelle de disponibilité
-            if check_reachable:
-                if not self._check_url_responds(normalized_url):
+            if client is not None:
+                if not await self._check_url_responds(client, normalized_url):
                     return None
             
             return normalized_url
@@ -136,42 +182,37 @@ class CompetitiveIntelligence:
             logger.error(f"❌ Failed to parse URL {url}: {e}")
             return None
     
-    def _make_request_with_retry(self, url: str) -> Optional[requests.Response]:
+    async def _make_request_with_retry(self, client: httpx.AsyncClient, url: str) -> Optional[httpx.Response]:
         """
-        Fait une requête HTTP avec retry logic
+        Fait une requête HTTP avec retry logic (attente non bloquante entre tentatives,
+        le créneau de l'hôte est libéré pendant l'attente)
         
         Args:
+            client: Client HTTP partagé
             url: URL à requêter
             
         Returns:
             Response object ou None si échec
         """
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; GEOBot/1.0)',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
-        }
+        host = urlparse(url).netloc
         
         for attempt in range(self.max_retries):
             try:
-                response = requests.get(
-                    url, 
-                    timeout=self.timeout, 
-                    headers=headers,
-                    allow_redirects=True
-                )
+                async with self.limits.host_slot(host):
+                    async with self.limits.global_slot():
+                        response = await client.get(url)
                 response.raise_for_status()
                 return response
                 
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 logger.warning(f"Timeout on attempt {attempt + 1}/{self.max_retries} for {url}")
                 if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
+                    await asyncio.sleep(self.retry_delay)
                     
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.warning(f"Request failed on attempt {attempt + 1}/{self.max_retries} for {url}: {e}")
                 if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
+                    await asyncio.sleep(self.retry_delay)
         
         return None
     
@@ -194,45 +235,51 @@ class CompetitiveIntelligence:
             Analyse GEO détaillée avec geo_power_score, confidence_level, pages_analyzed,
             comparative_metrics (NOUS vs AVERAGE_COMPETITORS vs GAP), et insights actionnables
         """
+        # Étape 'competitors' exécutée dans un thread : boucle d'événements propre à l'analyse
+        return asyncio.run(self.analyze_competitors_async(competitors_urls, visibility_data, our_data))
+    
+    async def analyze_competitors_async(
+        self, 
+        competitors_urls: List[str], 
+        visibility_data: Dict[str, Any],
+        our_data: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Version async de analyze_competitors : les compétiteurs sont validés puis
+        analysés en parallèle (résultats dans l'ordre des URLs)
+        """
         analyses = []
         failed_urls = []
         
-        # Valider et filtrer les URLs avec vérification de disponibilité
-        valid_urls = []
-        logger.info(f"🔍 Validating {len(competitors_urls[:5])} competitor URLs...")
-        
-        for url in competitors_urls[:5]:  # Top 5 compétiteurs
-            # Validation complète : structure + DNS + disponibilité
-            validated_url = self._validate_url(url, check_reachable=True)
-            
-            if validated_url:
-                valid_urls.append(validated_url)
-                logger.info(f"✅ Valid and reachable competitor URL: {validated_url}")
-            else:
-                logger.warning(f"❌ Invalid or unreachable competitor URL skipped: {url}")
-                failed_urls.append({
-                    'url': url, 
-                    'reason': 'Invalid URL format, domain does not exist, or site not reachable'
-                })
-        
-        # Analyser chaque compétiteur
-        for comp_url in valid_urls:
-            logger.info(f"🔍 Analyzing competitor: {comp_url}")
+        async with self._client() as client:
+            # Valider et filtrer les URLs avec vérification de disponibilité
+            logger.info(f"🔍 Validating {len(competitors_urls[:5])} competitor URLs...")
+            validated_urls = await asyncio.gather(*(
+                self._validate_competitor_url(client, url) for url in competitors_urls[:5]  # Top 5 compétiteurs
+            ))
             
-            try:
-                analysis = self.analyze_single_competitor(comp_url, visibility_data)
-                
-                # Vérifier si l'analyse a réussi
-                if analysis.get('error'):
-                    logger.warning(f"⚠️  Partial failure for {comp_url}: {analysis['error']}")
-                    failed_urls.append({'url': comp_url, 'reason': analysis['error']})
+            valid_urls = []
+            for url, validated_url in zip(competitors_urls[:5], validated_urls):
+                if validated_url:
+                    valid_urls.append(validated_url)
                 else:
-                    logger.info(f"✅ Successfully analyzed {comp_url}")
-                
-                analyses.append(analysis)
-                
-            except Exception as e:
-                error_msg = str(e)
+                    logger.warning(f"❌ Invalid or unreachable competitor URL skipped: {url}")
+                    failed_urls.append({
+                        'url': url, 
+                        'reason': 'Invalid URL format, domain does not exist, or site not reachable'
+                    })
+            
+            # Index des mentions de tous les compétiteurs : une passe sur les réponses de visibilité
+            self._index_mentions(visibility_data, [self._extract_domain(url) for url in valid_urls])
+            
+            # Analyser les compétiteurs en parallèle
+            results = await asyncio.gather(*(
+                self.analyze_single_competitor_async(client, comp_url, visibility_data) for comp_url in valid_urls
+            ), return_exceptions=True)
+        
+        for comp_url, analysis in zip(valid_urls, results):
+            if isinstance(analysis, Exception):
+                error_msg = str(analysis)
                 logger.error(f"❌ Failed to analyze {comp_url}: {error_msg}")
                 failed_urls.append({'url': comp_url, 'reason': error_msg})
                 
@@ -246,6 +293,16 @@ class CompetitiveIntelligence:
                     "llm_visibility": {},
                     "geo_power_score": 0.0
                 })
+                continue
+            
+            # Vérifier si l'analyse a réussi
+            if analysis.get('error'):
+                logger.warning(f"⚠️  Partial failure for {comp_url}: {analysis['error']}")
+                failed_urls.append({'url': comp_url, 'reason': analysis['error']})
+            else:
+                logger.info(f"✅ Successfully analyzed {comp_url}")
+            
+            analyses.append(analysis)
         
         # Calculer confidence level basé sur échantillon
         competitors_analyzed = len([a for a in analyses if not a.get('error')])
@@ -269,6 +326,20 @@ class CompetitiveIntelligence:
         
         return result
     
+    async def _validate_competitor_url(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """
+        Valide une URL de compétiteur : structure + DNS + disponibilité
+        (domaine déjà profilé : pas de vérification réseau)
+        """
+        if self.profile_store.get(url):
+            logger.info(f"✅ Known competitor (profile store): {url}")
+            return url
+        
+        validated_url = await self._validate_url(url, client)
+        if validated_url:
+            logger.info(f"✅ Valid and reachable competitor URL: {validated_url}")
+        return validated_url
+    
     def _compute_confidence_level(self, competitors_analyzed: int, pages_analyzed: int) -> str:
         """
         Calcule le niveau de confiance GEO basé sur l'échantillon d'analyse compétitive.
@@ -299,13 +370,26 @@ class CompetitiveIntelligence:
         except:
             return url.split('//')[1].split('/')[0] if '//' in url else url.split('/')[0]
     
-    def _analyze_competitor_page(self, url: str) -> Dict[str, Any]:
+    async def _fetch_page_features(self, client: httpx.AsyncClient, url: str) -> Optional[PageFeatures]:
+        """
+        Récupère et parse une page (une seule fois par instance et par URL)
+        
+        Returns:
+            Caractéristiques de la page ou None si la récupération a échoué
+        """
+        if url not in self._page_features:
+            response = await self._make_request_with_retry(client, url)
+            # Parsing hors de la boucle d'événements
+            self._page_features[url] = await asyncio.to_thread(extract_page_features, response.content, response.charset_encoding) if response else None
+        return self._page_features[url]
+    
+    async def _analyze_competitor_page(self, client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
         """
         Analyse une page de compétiteur pour métriques GEO.
         Extrait: word_count, headers, direct answer, TL;DR, lists, tables, FAQ, stats, schemas.
         """
         # Valider l'URL d'abord
-        url = self._validate_url(url)
+        url = await self._validate_url(url)
         if not url:
             return {
                 'url': url,
@@ -319,9 +403,9 @@ class CompetitiveIntelligence:
         
         try:
             # Utiliser la méthode avec retry
-            response = self._make_request_with_retry(url)
+            features = await self._fetch_page_features(client, url)
             
-            if not response:
+            if not features:
                 return {
                     'url': url,
                     'error': 'Failed to fetch page after retries',
@@ -332,11 +416,8 @@ class CompetitiveIntelligence:
                     'schema_count': 0
                 }
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
             # Extraire texte
-            text_content = soup.get_text()
-            words = text_content.split()
+            words = features.text.split()
             
             # Détecter réponse directe (premiers 100 mots contiennent info clé)
             first_100_words = ' '.join(words[:100])
@@ -345,45 +426,20 @@ class CompetitiveIntelligence:
                 'définition', 'c\'est', 'il s\'agit'
             ])
             
-            # Détecter TL;DR / résumé
-            has_tldr = bool(soup.find(string=lambda text: text and any(
-                marker in text.upper() for marker in ['TL;DR', 'EN BREF', 'RÉSUMÉ', 'KEY TAKEAWAYS', 'À RETENIR']
-            )))
-            
-            # Compter éléments structurels
-            h1_count = len(soup.find_all('h1'))
-            h2_count = len(soup.find_all('h2'))
-            h3_count = len(soup.find_all('h3'))
-            lists_count = len(soup.find_all(['ul', 'ol']))
-            tables_count = len(soup.find_all('table'))
-            
-            # Détecter FAQ
-            has_faq = bool(soup.find(string=lambda text: text and 'FAQ' in text.upper()))
-            faq_count = len(soup.find_all(string=lambda text: text and '?' in text))
-            
-            # Compter statistiques (chiffres + indicateurs)
-            stats_count = (
-                text_content.count('%') +
-                text_content.count('$') +
-                len(re.findall(r'\b\d+\s*(millions?|milliards?|k\b|M\b)', text_content, re.IGNORECASE))
-            )
-            
-            # Compter schémas structurés
-            schema_count = len(soup.find_all('script', {'type': 'application/ld+json'}))
-            
+            # TL;DR / résumé, FAQ, statistiques (chiffres + indicateurs) : détectés pendant l'extraction
             return {
                 'url': url,
                 'word_count': len(words),
-                'h1_count': h1_count,
-                'h2_count': h2_count,
-                'h3_count': h3_count,
+                'h1_count': len(features.h1),
+                'h2_count': len(features.h2),
+                'h3_count': len(features.h3),
                 'has_direct_answer': has_direct_answer,
-                'has_tldr': has_tldr,
-                'lists_count': lists_count,
-                'tables_count': tables_count,
-                'faq_count': faq_count,
-                'stats_count': stats_count,
-                'schema_count': schema_count
+                'has_tldr': features.has_tldr,
+                'lists_count': features.lists_count,
+                'tables_count': features.tables_count,
+                'faq_count': features.question_count,
+                'stats_count': features.stats_count,
+                'schema_count': features.json_ld_count
             }
             
         except Exception as e:
@@ -403,9 +459,74 @@ class CompetitiveIntelligence:
         Analyse approfondie GEO d'un compétiteur: page principale + 4-5 pages internes.
         Identifie pourquoi il performe dans les IA (structure, données, FAQ, guides).
         """
+        async def run() -> Dict[str, Any]:
+            async with self._client() as client:
+                return await self.analyze_single_competitor_async(client, comp_url, visibility_data)
+        
+        return asyncio.run(run())
+    
+    async def analyze_single_competitor_async(
+        self,
+        client: httpx.AsyncClient,
+        comp_url: str,
+        visibility_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Version async de analyze_single_competitor (client HTTP partagé).
+        Les métriques de contenu viennent de la base de profils quand le domaine est connu ;
+        seule la visibilité LLM (propre au job) et le GEO Power Score sont recalculés.
+        """
+        profile = self.profile_store.get(comp_url)
+        if profile:
+            fresh = self.profile_store.is_fresh(profile)
+            logger.info(f"📚 {profile['domain']}: profile from store ({'fresh' if fresh else 'stale, refreshing in background'})")
+            if not fresh:
+                main_url = profile['main_url']
+                self.profile_store.refresh_in_background(
+                    profile['domain'],
+                    lambda: CompetitiveIntelligence(
+                        profile_store=self.profile_store, limits=self.limits, transport=self.transport
+                    ).crawl_competitor_profile(main_url)
+                )
+            return self._score_competitor(profile, visibility_data)
+        
+        competitor = await self._crawl_competitor_profile(client, comp_url)
+        if competitor.get('error'):
+            return competitor
+        
+        self.profile_store.set(competitor)
+        return self._score_competitor(competitor, visibility_data)
+    
+    def _score_competitor(self, profile: Dict[str, Any], visibility_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajoute au profil de contenu la visibilité LLM du job et le GEO Power Score"""
+        competitor = {
+            'domain': profile['domain'],
+            'main_url': profile['main_url'],
+            'pages_analyzed': profile['pages_analyzed'],
+            'aggregate': profile['aggregate'],
+            'llm_visibility': self.calculate_competitor_visibility(profile['domain'], visibility_data)
+        }
+        competitor['geo_power_score'] = self.compute_geo_power_score(competitor)
+        return competitor
+    
+    def crawl_competitor_profile(self, comp_url: str) -> Dict[str, Any]:
+        """Version synchrone de _crawl_competitor_profile (rafraîchissement en arrière-plan)"""
+        async def run() -> Dict[str, Any]:
+            async with self._client() as client:
+                return await self._crawl_competitor_profile(client, comp_url)
+        
+        return asyncio.run(run())
+    
+    async def _crawl_competitor_profile(self, client: httpx.AsyncClient, comp_url: str) -> Dict[str, Any]:
+        """
+        Crawle un compétiteur (page principale + pages internes GEO) et calcule ses agrégats
+        
+        Returns:
+            Profil {domain, main_url, pages_analyzed, aggregate} ou dict d'erreur
+        """
         
         # Valider l'URL principale
-        comp_url = self._validate_url(comp_url)
+        comp_url = await self._validate_url(comp_url)
         if not comp_url:
             return {
                 "domain": "unknown",
@@ -419,7 +540,7 @@ class CompetitiveIntelligence:
         
         try:
             # 1. Analyser la page principale
-            main_page = self._analyze_competitor_page(comp_url)
+            main_page = await self._analyze_competitor_page(client, comp_url)
             
             # Si erreur sur la page principale, retourner immédiatement
             if main_page.get('error'):
@@ -434,10 +555,10 @@ class CompetitiveIntelligence:
                     "geo_power_score": 0.0
                 }
             
-            # 2. Extraire URLs internes pertinentes pour GEO
-            response = self._make_request_with_retry(comp_url)
+            # 2. Extraire URLs internes pertinentes pour GEO (page déjà récupérée à l'étape 1)
+            features = await self._fetch_page_features(client, comp_url)
             
-            if not response:
+            if not features:
                 domain = self._extract_domain(comp_url)
                 return {
                     "domain": domain,
@@ -449,8 +570,6 @@ class CompetitiveIntelligence:
                     "geo_power_score": 0.0
                 }
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
             domain = self._extract_domain(comp_url)
             
             # Mots-clés GEO pertinents
@@ -461,9 +580,7 @@ class CompetitiveIntelligence:
             ]
             
             internal_urls = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                
+            for href in features.links:
                 try:
                     # Ignorer les ancres et javascript
                     if href.startswith('#') or href.startswith('javascript:'):
@@ -478,7 +595,7 @@ class CompetitiveIntelligence:
                         absolute_url = urljoin(comp_url, href)
                     
                     # Valider l'URL
-                    absolute_url = self._validate_url(absolute_url)
+                    absolute_url = await self._validate_url(absolute_url)
                     if not absolute_url:
                         continue
                     
@@ -496,11 +613,10 @@ class CompetitiveIntelligence:
             internal_urls = list(set(internal_urls))[:5]
             logger.info(f"📄 Found {len(internal_urls)} relevant internal pages for {domain}")
             
-            # 3. Analyser les pages internes
-            pages_analyzed = [main_page]
-            for internal_url in internal_urls:
-                page_analysis = self._analyze_competitor_page(internal_url)
-                pages_analyzed.append(page_analysis)
+            # 3. Analyser les pages internes (en parallèle, dans la limite de l'hôte)
+            pages_analyzed = [main_page] + list(await asyncio.gather(*(
+                self._analyze_competitor_page(client, internal_url) for internal_url in internal_urls
+            )))
             
             # 4. Calculer agrégats
             total_word_count = sum(p.get('word_count', 0) for p in pages_analyzed)
@@ -524,21 +640,12 @@ class CompetitiveIntelligence:
                 'tldr_rate': pages_with_tldr / num_pages if num_pages > 0 else 0
             }
             
-            # 5. Calculer visibilité LLM
-            llm_visibility = self.calculate_competitor_visibility(domain, visibility_data)
-            
-            # 6. Calculer GEO Power Score
-            competitor = {
+            return {
                 'domain': domain,
                 'main_url': comp_url,
                 'pages_analyzed': pages_analyzed,
-                'aggregate': aggregate,
-                'llm_visibility': llm_visibility
+                'aggregate': aggregate
             }
-            geo_power_score = self.compute_geo_power_score(competitor)
-            competitor['geo_power_score'] = geo_power_score
-            
-            return competitor
             
         except Exception as e:
             logger.error(f"Error analyzing {comp_url}: {str(e)}")
@@ -591,8 +698,27 @@ class CompetitiveIntelligence:
         
         return round(total_score, 1)
     
+    def _index_mentions(self, visibility_data: Dict[str, Any], domains: List[str]) -> MentionIndex:
+        """
+        Index des mentions des domaines dans les réponses de visibilité (une passe pour tous
+        les domaines) ; reconstruit seulement si un nouveau domaine ou d'autres données arrivent
+        """
+        known: List[str] = []
+        if self._mention_index_source is visibility_data:
+            if all(domain.lower() in self._mention_index for domain in domains):
+                return self._mention_index
+            known = list(self._mention_index.aliases)
+        
+        index = MentionIndex({domain.lower(): [domain] for domain in known + domains})
+        for i, detail in enumerate(visibility_data.get('details', [])):
+            index.add(i, detail.get('answer', ''))
+        
+        self._mention_index = index
+        self._mention_index_source = visibility_data
+        return index
+    
     def calculate_competitor_visibility(self, comp_domain: str, visibility_data: Dict[str, Any]) -> Dict[str, float]:
-        """Calcule la visibilité d'un compétiteur dans les LLMs"""
+        """Calcule la visibilité d'un compétiteur dans les LLMs (lue dans l'index des mentions)"""
         visibility = {
             "chatgpt": 0.0,
             "claude": 0.0,
@@ -603,19 +729,18 @@ class CompetitiveIntelligence:
         
         # Analyser les résultats des tests
         details = visibility_data.get('details', [])
-        for detail in details:
-            answer = detail.get('answer', '').lower()
-            platform = detail.get('platform', '').lower()
-            
-            if comp_domain.lower() in answer:
-                if 'chatgpt' in platform:
-                    visibility['chatgpt'] += 1
-                elif 'claude' in platform:
-                    visibility['claude'] += 1
-                elif 'perplexity' in platform:
-                    visibility['perplexity'] += 1
-                elif 'gemini' in platform:
-                    visibility['gemini'] += 1
+        index = self._index_mentions(visibility_data, [comp_domain])
+        for i in index.documents(comp_domain.lower()):
+            platform = details[i].get('platform', '').lower()
+            
+            if 'chatgpt' in platform:
+                visibility['chatgpt'] += 1
+            elif 'claude' in platform:
+                visibility['claude'] += 1
+            elif 'perplexity' in platform:
+                visibility['perplexity'] += 1
+            elif 'gemini' in platform:
+                visibility['gemini'] += 1
         
         # Calculer moyennes
         total_tests = len([d for d in details if d.get('platform') == 'ChatGPT'])
@@ -38,6 +38,9 @@ MAX_PAGES_TO_CRAWL = 10
 CRAWL_DELAY_SECONDS = 0.5
 CRAWL_TIMEOUT_SECONDS = 10
 USER_AGENT = 'Mozilla/5.0 (compatible; GEOBot/1.0)'
+CRAWL_HOST_CONCURRENCY = 5  # Requêtes simultanées max par hôte (délai de politesse par connexion)
+CRAWL_GLOBAL_CONCURRENCY = 20  # Requêtes simultanées max, tous jobs confondus
+CRAWL_MAX_QUEUE = 20  # Liens internes en attente max
 
 # Analyse
 MAX_PAGES_TO_ANALYZE = 8  # Pages envoyées à Claude
@@ -54,12 +57,75 @@ QUERIES_BRANDED_PERCENT = 5
 VISIBILITY_PLATFORMS = ['chatgpt', 'claude', 'perplexity', 'gemini', 'google_ai']
 VISIBILITY_TIMEOUT_SECONDS = 30
 VISIBILITY_MAX_QUERIES = 100
+# Appels simultanés max par fournisseur (réponses + extraction de compétiteurs)
+VISIBILITY_PROVIDER_CONCURRENCY = {
+    'openai': int(os.environ.get('GEO_OPENAI_CONCURRENCY', 5)),
+    'anthropic': int(os.environ.get('GEO_ANTHROPIC_CONCURRENCY', 5)),
+    'google': int(os.environ.get('GEO_GOOGLE_CONCURRENCY', 4)),
+    'perplexity': int(os.environ.get('GEO_PERPLEXITY_CONCURRENCY', 3)),
+}
+# Mode de run : 'sample' (échantillon représentatif) ou 'full' (toutes les requêtes générées)
+VISIBILITY_RUN_MODE = os.environ.get('GEO_VISIBILITY_MODE', 'sample')
+VISIBILITY_SAMPLE_QUERIES = 10
+# Budget par job (appels LLM et tokens estimés, réponses + extraction de compétiteurs)
+VISIBILITY_CALL_BUDGET = int(os.environ.get('GEO_VISIBILITY_CALL_BUDGET', 1000))
+VISIBILITY_TOKEN_BUDGET = int(os.environ.get('GEO_VISIBILITY_TOKEN_BUDGET', 1_500_000))
+VISIBILITY_ESTIMATED_TOKENS_PER_CALL = 1200  # Avant d'avoir des mesures réelles
+# Extraction de compétiteurs : réponses par appel Claude, caractères max par réponse
+VISIBILITY_EXTRACTION_BATCH_SIZE = 8
+VISIBILITY_EXTRACTION_MAX_CHARS = 3000
+# Requêtes testées en parallèle (chacune sur toutes les plateformes)
+VISIBILITY_QUERIES_IN_FLIGHT = 10
+# Limites de débit par fournisseur (requêtes/minute)
+VISIBILITY_PROVIDER_RATE_LIMITS = {
+    'openai': int(os.environ.get('GEO_OPENAI_RPM', 500)),
+    'anthropic': int(os.environ.get('GEO_ANTHROPIC_RPM', 200)),
+    'google': int(os.environ.get('GEO_GOOGLE_RPM', 150)),
+    'perplexity': int(os.environ.get('GEO_PERPLEXITY_RPM', 50)),
+}
 
 # Cache
 CACHE_ENABLED = True
 CACHE_TTL_HOURS = 168  # 7 jours
-CACHE_ANALYSIS_ENABLED = True
+CACHE_ANALYSIS_ENABLED = os.environ.get('GEO_CACHE_ANALYSIS', 'true').lower() == 'true'  # Clé adressée par contenu : actif aussi en prod
 CACHE_VISIBILITY_ENABLED = True
+SEMANTIC_CACHE_TTL_HOURS = int(os.environ.get('GEO_SEMANTIC_CACHE_TTL_HOURS', 720))  # Adressé par contenu : survit aux ré-analyses hebdomadaires
+CACHE_DB_NAME = "cache.sqlite3"  # Base SQLite (WAL) créée dans chaque dossier de cache
+CACHE_MAX_BYTES = int(os.environ.get('GEO_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # Budget valeurs compressées
+
+# Cache des réponses LLM des tests de visibilité (temperature=0)
+LLM_RESPONSE_CACHE_ENABLED = os.environ.get('GEO_LLM_RESPONSE_CACHE', 'true').lower() == 'true'
+LLM_RESPONSE_CACHE_DIR = CACHE_DIR / "llm_responses"
+LLM_RESPONSE_CACHE_TTL_HOURS = int(os.environ.get('GEO_LLM_RESPONSE_CACHE_TTL_HOURS', 72))
+LLM_RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('GEO_LLM_RESPONSE_CACHE_MAX_ENTRIES', 20000))
+LLM_RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('GEO_LLM_RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Base de profils de compétiteurs partagée entre les jobs (métriques de contenu par domaine)
+COMPETITOR_PROFILE_STORE_ENABLED = os.environ.get('GEO_COMPETITOR_PROFILES', 'true').lower() == 'true'
+COMPETITOR_PROFILE_DIR = CACHE_DIR / "competitor_profiles"
+COMPETITOR_PROFILE_TTL_HOURS = int(os.environ.get('GEO_COMPETITOR_PROFILE_TTL_HOURS', 168))  # Au-delà : rafraîchi en arrière-plan
+COMPETITOR_PROFILE_MAX_AGE_HOURS = int(os.environ.get('GEO_COMPETITOR_PROFILE_MAX_AGE_HOURS', 720))  # Au-delà : re-crawlé dans le job
+COMPETITOR_PROFILE_REFRESH_WORKERS = 2
+
+# File de jobs d'analyse (workers indépendants des processus web)
+JOB_LEASE_SECONDS = int(os.environ.get('GEO_JOB_LEASE_SECONDS', 120))  # Sans heartbeat au-delà : job repris par un autre worker
+JOB_HEARTBEAT_SECONDS = 30
+JOB_MAX_ATTEMPTS = int(os.environ.get('GEO_JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY_BASE = 30  # Secondes (backoff exponentiel)
+JOB_POLL_INTERVAL_SECONDS = 2
+JOB_WORKER_CONCURRENCY = int(os.environ.get('GEO_JOB_WORKER_CONCURRENCY', 2))  # Jobs simultanés par processus worker
+JOB_CHECKPOINT_TTL_DAYS = int(os.environ.get('GEO_JOB_CHECKPOINT_TTL_DAYS', 30))  # Résultats d'étapes conservés pour reprise/relance
+JOB_PROGRESS_FLUSH_SECONDS = 2  # Écritures de progression regroupées (au plus une par intervalle)
+# Flux de progression (SSE) : 'auto' = change streams MongoDB si disponibles (replica set), sinon requête groupée
+JOB_EVENTS_SOURCE = os.environ.get('GEO_JOB_EVENTS_SOURCE', 'auto')
+JOB_EVENTS_POLL_SECONDS = 1
+JOB_EVENTS_KEEPALIVE_SECONDS = 15
+JOB_EMBEDDED_WORKER = os.environ.get('GEO_EMBEDDED_WORKER', 'false').lower() == 'true'  # Dev : worker dans le processus web
+
+# Historique des analyses et alertes (SQLite WAL)
+HISTORY_DB_PATH = os.environ.get('GEO_HISTORY_DB_PATH', str(DATA_DIR / "geo_history.db"))
+HISTORY_BULK_BATCH_SIZE = 500  # Analyses par transaction lors des imports en masse
+TRENDS_MAX_SITES = int(os.environ.get('GEO_TRENDS_MAX_SITES', 500))  # Sites par requête de tendances (portefeuille)
 
 # Nettoyage automatique
 CLEANUP_TEMP_FILES_DAYS = 7
@@ -90,11 +156,23 @@ RATE_LIMIT_REPORTS_PER_DAY = 50
 
 # Découverte de compétiteurs
 MAX_COMPETITORS = 5
-COMPETITOR_SEARCH_PROVIDER = os.environ.get('GEO_SEARCH_PROVIDER', 'google_scrape')
-SERPAPI_API_KEY = os.environ.get('SERPAPI_API_KEY')  # Optionnel
+# Fournisseurs mis en course, séparés par des virgules (google_scrape, duckduckgo, serpapi, fixture)
+COMPETITOR_SEARCH_PROVIDER = os.environ.get('GEO_SEARCH_PROVIDER', 'google_scrape,duckduckgo,serpapi')
+SERPAPI_API_KEY = os.environ.get('SERPAPI_API_KEY')  # Optionnel (fournisseur serpapi ignoré sans clé)
+COMPETITOR_SEARCH_FIXTURES = os.environ.get('GEO_SEARCH_FIXTURES')  # Fichier JSON {requête: [urls]} du fournisseur fixture
 COMPETITOR_SEARCH_TIMEOUT = 10  # secondes
-COMPETITOR_SEARCH_DELAY = 2  # secondes entre requêtes
-COMPETITOR_VALIDATION_TIMEOUT = 10  # secondes pour HEAD request (augmenté pour sites lents)
+COMPETITOR_SEARCH_RATE_LIMITS = {  # requêtes/minute par fournisseur
+    'google_scrape': 20,
+    'duckduckgo': 30,
+    'serpapi': 60,
+    'fixture': 6000,
+}
+COMPETITOR_SEARCH_CACHE_TTL_HOURS = int(os.environ.get('GEO_SEARCH_CACHE_TTL_HOURS', 24))
+COMPETITOR_SEARCH_CACHE_ENABLED = os.environ.get('GEO_SEARCH_CACHE', 'true').lower() == 'true'
+COMPETITOR_SEARCH_CACHE_DIR = CACHE_DIR / "web_search"
+COMPETITOR_VALIDATION_TIMEOUT = 10  # secondes par requête HTTP (augmenté pour sites lents)
+COMPETITOR_VALIDATION_DEADLINE = 15  # secondes max par candidat (DNS + page d'accueil)
+COMPETITOR_VALIDATION_CONCURRENCY = int(os.environ.get('GEO_COMPETITOR_VALIDATION_CONCURRENCY', 8))
 COMPETITOR_MAX_RETRIES = 2
 COMPETITOR_RELEVANCE_THRESHOLD_DIRECT = 0.6  # Score min pour "direct"
 COMPETITOR_RELEVANCE_THRESHOLD_INDIRECT = 0.3  # Score min pour "indirect"
@@ -120,3 +198,27 @@ def is_production() -> bool:
 def is_cache_enabled() -> bool:
     """Vérifie si le cache est activé"""
     return CACHE_ENABLED and not is_production()  # Désactiver en prod pour tests
+
+
+def is_analysis_cache_enabled() -> bool:
+    """
+    Vérifie si le cache de l'analyse Claude est activé
+    La clé est dérivée du contenu du prompt : un hit ne peut pas être périmé, y compris en prod
+    """
+    return CACHE_ENABLED and CACHE_ANALYSIS_ENABLED
+
+
+def is_llm_response_cache_enabled() -> bool:
+    """
+    Vérifie si le cache des réponses LLM (sondes à temperature=0) est activé
+    Entrées bornées par LLM_RESPONSE_CACHE_TTL_HOURS : actif aussi en prod
+    """
+    return CACHE_ENABLED and LLM_RESPONSE_CACHE_ENABLED
+
+
+def is_search_cache_enabled() -> bool:
+    """
+    Vérifie si le cache des recherches web (fournisseur, requête) est activé
+    Résultats bornés par COMPETITOR_SEARCH_CACHE_TTL_HOURS : actif aussi en prod
+    """
+    return CACHE_ENABLED and COMPETITOR_SEARCH_CACHE_ENABLED
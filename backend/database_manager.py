@@ -1,141 +1,319 @@
 """
 Gestionnaire de base de données SQLite pour historique et alertes
+Base en mode WAL avec une connexion longue durée par thread (requêtes préparées gardées
+en cache par sqlite3), index (site_url, date) pour retrouver l'analyse précédente et
+rapports compressés (zlib) ; les jobs async passent par les méthodes *_async.
+Les séries de scores (tendances) sont dans MongoDB, partagées entre nœuds
+(services/score_history_store.py) ; cette base fournit leurs points pour la reprise.
 """
-import sqlite3
+import asyncio
 import json
+import sqlite3
+import threading
+import zlib
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Optional
 import logging
 
+from config import HISTORY_BULK_BATCH_SIZE, HISTORY_DB_PATH
+from services.score_trends import analysis_date, extract_metrics
+from utils.compression import pack_json, unpack_json
+
 logger = logging.getLogger(__name__)
 
+# Délai d'attente quand un autre processus tient le verrou d'écriture
+BUSY_TIMEOUT_MS = 5000
+
+# Requêtes préparées conservées par connexion
+STATEMENT_CACHE_SIZE = 64
+
+# Colonnes de scores → clés de report['scores']
+SCORE_COLUMNS = [
+    ('structure_score', 'structure'),
+    ('info_density_score', 'infoDensity'),
+    ('readability_score', 'readability'),
+    ('eeat_score', 'eeat'),
+    ('educational_score', 'educational'),
+    ('thematic_score', 'thematic'),
+    ('ai_optimization_score', 'aiOptimization'),
+    ('visibility_score', 'visibility'),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    site_url TEXT NOT NULL,
+    date TEXT NOT NULL,
+    global_score REAL,
+    structure_score REAL,
+    info_density_score REAL,
+    readability_score REAL,
+    eeat_score REAL,
+    educational_score REAL,
+    thematic_score REAL,
+    ai_optimization_score REAL,
+    visibility_score REAL,
+    overall_visibility REAL,
+    data_json TEXT,  -- Rapport en clair (analyses antérieures à la compression)
+    payload BLOB     -- Rapport JSON compressé
+);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_url TEXT NOT NULL,
+    date TEXT NOT NULL,
+    type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    data_json TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_analyses_site_date ON analyses (site_url, date);
+CREATE INDEX IF NOT EXISTS idx_alerts_site_date ON alerts (site_url, date);
+"""
+
+INSERT_ANALYSIS = f"""
+    INSERT OR REPLACE INTO analyses (
+        id, site_url, date, global_score, {', '.join(column for column, _ in SCORE_COLUMNS)},
+        overall_visibility, data_json, payload
+    ) VALUES ({', '.join('?' * (len(SCORE_COLUMNS) + 7))})
+"""
+
+INSERT_ALERT = """
+    INSERT INTO alerts (site_url, date, type, message, priority, data_json)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+SELECT_SUMMARY = f"""
+    SELECT id, site_url, date, global_score, {', '.join(column for column, _ in SCORE_COLUMNS)}, overall_visibility
+    FROM analyses
+"""
+
+# Analyses parcourues par id (reprise des séries de scores)
+SELECT_IDS = "SELECT id FROM analyses WHERE id > ? ORDER BY id LIMIT ?"
+
+SELECT_SCORE_SOURCE = f"""
+    SELECT id, site_url, date, global_score, {', '.join(column for column, _ in SCORE_COLUMNS)},
+        overall_visibility, payload, data_json
+    FROM analyses
+"""
+
+
 class DatabaseManager:
     """Gère l'historique des analyses et les alertes"""
-    
-    def __init__(self, db_path: str = "/app/data/geo_history.db"):
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        """Initialise la base de données"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Table analyses
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analyses (
-                id TEXT PRIMARY KEY,
-                site_url TEXT NOT NULL,
-                date TEXT NOT NULL,
-                global_score REAL,
-                structure_score REAL,
-                info_density_score REAL,
-                readability_score REAL,
-                eeat_score REAL,
-                educational_score REAL,
-                thematic_score REAL,
-                ai_optimization_score REAL,
-                visibility_score REAL,
-                overall_visibility REAL,
-                data_json TEXT
-            )
-        ''')
-        
-        # Table alertes
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                site_url TEXT NOT NULL,
-                date TEXT NOT NULL,
-                type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                priority TEXT NOT NULL,
-                data_json TEXT
+
+    def __init__(self, db_path: str = HISTORY_DB_PATH, batch_size: int = HISTORY_BULK_BATCH_SIZE):
+        """
+        Args:
+            db_path: Fichier SQLite (créé et migré à la première connexion)
+            batch_size: Analyses par transaction dans save_many
+        """
+        self.db_path = str(db_path)
+        self.batch_size = batch_size
+        # Une connexion par thread (les appels async passent par asyncio.to_thread)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée à la demande)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,  # Transactions explicites
+                check_same_thread=False,  # Fermée par close() depuis un autre thread
+                cached_statements=STATEMENT_CACHE_SIZE
             )
-        ''')
-        
-        conn.commit()
-        conn.close()
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            with self._lock:
+                if not self._initialized:
+                    self.init_database(conn)
+                    self._initialized = True
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def init_database(self, conn: sqlite3.Connection):
+        """Active le mode WAL, crée les tables et index, migre les bases sans colonne payload"""
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(analyses)")}
+        if 'payload' not in columns:
+            conn.execute("ALTER TABLE analyses ADD COLUMN payload BLOB")
+            logger.info(f"🗂️  History database migrated (compressed payloads): {self.db_path}")
+
+        conn.executescript(INDEXES)
         logger.info(f"Database initialized at {self.db_path}")
-    
-    def save_analysis(self, report_data: Dict[str, Any]):
-        """Sauvegarde une analyse"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        scores = report_data.get('scores', {})
-        visibility = report_data.get('visibility_results', {})
-        
-        cursor.execute('''
-            INSERT INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+
+    def close(self):
+        """Ferme les connexions de tous les threads"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._local = threading.local()
+
+    @classmethod
+    def _analysis_row(cls, report_data: Dict[str, Any]) -> tuple:
+        """Ligne de la table analyses (rapport compressé)"""
+        scores = report_data.get('scores') or {}
+        visibility = report_data.get('visibility_results') or {}
+        return (
             report_data['id'],
             report_data['url'],
-            datetime.now().isoformat(),
+            analysis_date(report_data),
             scores.get('global_score', 0),
-            scores.get('structure', 0),
-            scores.get('infoDensity', 0),
-            scores.get('readability', 0),
-            scores.get('eeat', 0),
-            scores.get('educational', 0),
-            scores.get('thematic', 0),
-            scores.get('aiOptimization', 0),
-            scores.get('visibility', 0),
+            *(scores.get(key, 0) for _, key in SCORE_COLUMNS),
             visibility.get('overall_visibility', 0),
-            json.dumps(report_data)
-        ))
-        
-        conn.commit()
-        conn.close()
+            None,
+            pack_json(report_data),
+        )
+
+    def save_analysis(self, report_data: Dict[str, Any]):
+        """Sauvegarde une analyse (remplace celle de même id)"""
+        row = self._analysis_row(report_data)
+        self._connect().execute(INSERT_ANALYSIS, row)
         logger.info(f"Analysis saved for {report_data['url']}")
-    
-    def get_previous_analysis(self, site_url: str) -> Dict[str, Any]:
-        """Récupère l'analyse précédente pour un site"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM analyses 
-            WHERE site_url = ? 
-            ORDER BY date DESC 
-            LIMIT 1 OFFSET 1
-        ''', (site_url,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
+
+    def save_many(self, reports: Iterable[Dict[str, Any]]) -> int:
+        """
+        Import en masse (reprise d'historique) : une transaction par lot de batch_size,
+        compression faite hors transaction
+
+        Returns:
+            Nombre d'analyses enregistrées
+        """
+        conn = self._connect()
+        saved = 0
+        batch: List[tuple] = []
+
+        def flush():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(INSERT_ANALYSIS, batch)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        for report_data in reports:
+            batch.append(self._analysis_row(report_data))
+            if len(batch) >= self.batch_size:
+                flush()
+                saved += len(batch)
+                batch = []
+        if batch:
+            flush()
+            saved += len(batch)
+
+        logger.info(f"📥 {saved} analyses imported into history")
+        return saved
+
+    def list_analysis_ids(self, after_id: str = '', limit: Optional[int] = None) -> List[str]:
+        """Identifiants des analyses par ordre croissant, après after_id (lots de batch_size)"""
+        rows = self._connect().execute(SELECT_IDS, (after_id, limit or self.batch_size))
+        return [row[0] for row in rows]
+
+    def get_score_points(self, analysis_ids: List[str]) -> List[tuple]:
+        """
+        Points de séries de scores des analyses : (id, site_url, date, métriques), métriques lues
+        dans le rapport compressé ou data_json, à défaut dans les colonnes de scores
+        """
+        if not analysis_ids:
+            return []
+        rows = self._connect().execute(
+            f"{SELECT_SCORE_SOURCE} WHERE id IN ({', '.join('?' * len(analysis_ids))})", analysis_ids
+        )
+
+        points = []
+        for row in rows:
+            payload, data_json = row[-2:]
+            try:
+                report = unpack_json(payload) if payload is not None else json.loads(data_json or 'null')
+                metrics = extract_metrics(report or {})
+            except (zlib.error, ValueError):
+                metrics = {}
+            if not metrics:
+                metrics = {
+                    name: value for name, value in zip(
+                        ['global_score'] + [key for _, key in SCORE_COLUMNS] + ['overall_visibility'],
+                        row[3:-2]
+                    )
+                    if value is not None
+                }
+            points.append((row[0], row[1], row[2], metrics))
+        return points
+
+    def has_analysis(self, analysis_id: str) -> bool:
+        """L'analyse est-elle déjà dans l'historique"""
+        row = self._connect().execute("SELECT 1 FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return row is not None
+
+    def get_previous_analysis(self, site_url: str, exclude_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Récupère l'analyse précédente pour un site (index site_url, date)
+
+        Args:
+            site_url: URL du site
+            exclude_id: Analyse courante ; sans elle, l'avant-dernière analyse est retournée
+        """
+        conn = self._connect()
+        if exclude_id is None:
+            row = conn.execute(
+                SELECT_SUMMARY + " WHERE site_url = ? ORDER BY date DESC LIMIT 1 OFFSET 1",
+                (site_url,)
+            ).fetchone()
+        else:
+            row = conn.execute(
+                SELECT_SUMMARY + " WHERE site_url = ? AND id != ? ORDER BY date DESC LIMIT 1",
+                (site_url, exclude_id)
+            ).fetchone()
+
         if row:
             return {
                 'id': row[0],
                 'site_url': row[1],
                 'date': row[2],
                 'global_score': row[3],
-                'scores': {
-                    'structure': row[4],
-                    'infoDensity': row[5],
-                    'readability': row[6],
-                    'eeat': row[7],
-                    'educational': row[8],
-                    'thematic': row[9],
-                    'aiOptimization': row[10],
-                    'visibility': row[11]
-                },
-                'overall_visibility': row[12]
+                'scores': {key: row[4 + i] for i, (_, key) in enumerate(SCORE_COLUMNS)},
+                'overall_visibility': row[4 + len(SCORE_COLUMNS)]
             }
-        
+
         return None
-    
+
+    def get_analysis_data(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Rapport complet d'une analyse (compressé ou data_json des anciennes analyses)"""
+        row = self._connect().execute(
+            "SELECT payload, data_json FROM analyses WHERE id = ?", (analysis_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        payload, data_json = row
+        try:
+            return unpack_json(payload) if payload is not None else json.loads(data_json or 'null')
+        except (zlib.error, ValueError) as e:
+            logger.error(f"Unreadable history analysis {analysis_id}: {e}")
+            return None
+
     def generate_alerts(self, current_report: Dict[str, Any], previous_report: Dict[str, Any]) -> List[Dict[str, str]]:
         """Génère des alertes basées sur les changements"""
         alerts = []
-        
+
         if not previous_report:
             return alerts
-        
+
         current_score = current_report['scores']['global_score']
         previous_score = previous_report['global_score']
         diff = current_score - previous_score
-        
+
         # Alerte critique
         if diff <= -1.0:
             alerts.append({
@@ -143,7 +321,7 @@ class DatabaseManager:
                 'priority': 'high',
                 'message': f"🔴 Score global en baisse significative: {diff:.1f} points (de {previous_score:.1f} à {current_score:.1f})"
             })
-        
+
         # Warning
         elif diff <= -0.5:
             alerts.append({
@@ -151,7 +329,7 @@ class DatabaseManager:
                 'priority': 'medium',
                 'message': f"🟡 Score global en baisse: {diff:.1f} points (de {previous_score:.1f} à {current_score:.1f})"
             })
-        
+
         # Opportunité
         elif diff >= 1.0:
             alerts.append({
@@ -159,30 +337,54 @@ class DatabaseManager:
                 'priority': 'low',
                 'message': f"🟢 Amélioration significative: +{diff:.1f} points (de {previous_score:.1f} à {current_score:.1f})"
             })
-        
+
         return alerts
-    
+
     def save_alerts(self, site_url: str, alerts: List[Dict[str, str]]):
-        """Sauvegarde les alertes"""
+        """Sauvegarde les alertes (une seule transaction)"""
         if not alerts:
             return
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for alert in alerts:
-            cursor.execute('''
-                INSERT INTO alerts (site_url, date, type, message, priority, data_json)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                site_url,
-                datetime.now().isoformat(),
-                alert['type'],
-                alert['message'],
-                alert['priority'],
-                json.dumps(alert)
-            ))
-        
-        conn.commit()
-        conn.close()
+
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(INSERT_ALERT, [
+                (site_url, now, alert['type'], alert['message'], alert['priority'], json.dumps(alert))
+                for alert in alerts
+            ])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
         logger.info(f"{len(alerts)} alerts saved for {site_url}")
+
+    def record_analysis(self, report_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Enregistre l'analyse, la compare à la précédente du site et sauvegarde les alertes.
+        Une analyse déjà enregistrée (relance d'une étape du job) est remplacée ; ses alertes
+        sont recalculées mais pas sauvegardées une seconde fois.
+
+        Returns:
+            Alertes générées
+        """
+        already_recorded = self.has_analysis(report_data['id'])
+        self.save_analysis(report_data)
+        previous = self.get_previous_analysis(report_data['url'], exclude_id=report_data['id'])
+        alerts = self.generate_alerts(report_data, previous)
+        if not already_recorded:
+            self.save_alerts(report_data['url'], alerts)
+        return alerts
+
+    async def record_analysis_async(self, report_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """record_analysis hors de la boucle d'événements"""
+        return await asyncio.to_thread(self.record_analysis, report_data)
+
+    async def save_many_async(self, reports: Iterable[Dict[str, Any]]) -> int:
+        """save_many hors de la boucle d'événements"""
+        return await asyncio.to_thread(self.save_many, list(reports))
+
+
+# Instance globale (connexion ouverte au premier appel)
+history_db = DatabaseManager()
@@ -165,9 +165,22 @@ class SchemaGenerator:
         for page in pages:
             # Chercher des patterns FAQ dans le contenu
             questions = []
-            paragraphs = page.get('paragraphs', [])
             
-            # Méthode simple: chercher les paragraphes qui commencent par des mots-questions
+            # Paires question/réponse détectées par l'extracteur HTML au crawl (titres + paragraphes)
+            if page.get('faq'):
+                for pair in page['faq']:
+                    questions.append({
+                        "@type": "Question",
+                        "name": pair['question'],
+                        "acceptedAnswer": {
+                            "@type": "Answer",
+                            "text": pair['answer']
+                        }
+                    })
+            
+            paragraphs = [] if questions else page.get('paragraphs', [])
+            
+            # Méthode simple (pages sans paires extraites): chercher les paragraphes qui commencent par des mots-questions
             question_words = ['comment', 'pourquoi', 'quand', 'où', 'qui', 'quoi', 'quel', 'quelle']
             
             for i, para in enumerate(paragraphs):
@@ -4,18 +4,21 @@ Détecte automatiquement l'industrie et extrait les entités sémantiques
 100% GÉNÉRIQUE - Fonctionne pour toute industrie
 Utilise Anthropic Claude pour une analyse profonde
 """
+import asyncio
 import logging
 import re
 import os
 import json
-from typing import Dict, Any, List
+import hashlib
+from typing import Dict, Any, List, Callable, Awaitable, Optional
 from collections import Counter
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+
+from config import SEMANTIC_CACHE_TTL_HOURS
 
 logger = logging.getLogger(__name__)
 
-# Initialiser Anthropic
-anthropic_client = Anthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
+CLAUDE_MODEL = "claude-sonnet-4-5-20250929"
 
 def clean_json_response(text: str) -> str:
     """Nettoyer la réponse JSON de Claude (enlever markdown code blocks)"""
@@ -32,6 +35,11 @@ def clean_json_response(text: str) -> str:
     
     return text.strip()
 
+
+def parse_json_response(text: str) -> Any:
+    """Parser la réponse JSON de Claude"""
+    return json.loads(clean_json_response(text))
+
 # Dictionnaire de patterns par industrie
 INDUSTRY_PATTERNS = {
     'financial_services': {
@@ -92,10 +100,60 @@ class SemanticAnalyzer:
     def __init__(self):
         self.industry_classification = {}
         self.entities = {}
+        self.anthropic_client = AsyncAnthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
+    
+    async def _call_claude(
+        self,
+        step: str,
+        prompt: str,
+        max_tokens: int,
+        parse: Callable[[str], Any] = str
+    ) -> Any:
+        """
+        Appel Claude déterministe (temperature=0) mémoïsé par hash du prompt.
+        Le prompt contient la tranche de texte exacte consommée par l'étape :
+        un site inchangé ne refait aucun appel.
+        
+        Args:
+            step: Nom de la sous-analyse (journalisation et clé)
+            prompt: Prompt complet
+            max_tokens: Limite de tokens de la réponse
+            parse: Conversion de la réponse ; la réponse n'est cachée que si elle réussit
+        """
+        from services.cache_service import analysis_cache_service
+        
+        payload = json.dumps({'model': CLAUDE_MODEL, 'max_tokens': max_tokens, 'prompt': prompt}, ensure_ascii=False)
+        cache_key = f"semantic:{step}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+        
+        cached = analysis_cache_service.get(cache_key, max_age_hours=SEMANTIC_CACHE_TTL_HOURS)
+        if cached is not None:
+            logger.info(f"✅ Semantic {step}: unchanged input, Claude call skipped")
+            return parse(cached)
+        
+        message = await self.anthropic_client.messages.create(
+            model=CLAUDE_MODEL,
+            max_tokens=max_tokens,
+            temperature=0,  # ✅ DÉTERMINISTE
+            messages=[{"role": "user", "content": prompt}]
+        )
+        
+        response_text = message.content[0].text.strip()
+        result = parse(response_text)
+        analysis_cache_service.set(cache_key, response_text)
+        return result
     
     def analyze_site(self, crawl_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Version synchrone (étape 'queries' exécutée dans un thread) :
+        exécute l'analyse async dans sa propre boucle
+        """
+        return asyncio.run(self.analyze_site_async(crawl_data))
+    
+    async def analyze_site_async(self, crawl_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyse complète du site
+        Les sous-analyses indépendantes (industrie, problèmes, topics) démarrent ensemble ;
+        les offerings attendent l'industrie (libellé services/produits)
         
         Returns:
             {
@@ -105,17 +163,22 @@ class SemanticAnalyzer:
                 'semantic_clusters': [...]
             }
         """
+        tasks = []
         try:
+            problems_task = asyncio.create_task(self._extract_problems_solved(self._combine_paragraphs(crawl_data)))
+            topics_task = asyncio.create_task(self._identify_topics(crawl_data))
+            tasks = [problems_task, topics_task]
+            
             # 1. Détecter l'industrie
-            self.industry_classification = self._detect_industry(crawl_data)
+            self.industry_classification = await self._detect_industry(crawl_data)
             logger.info(f"Industry detected: {self.industry_classification.get('primary_industry')}")
             
             # 2. Extraire les entités sémantiques
-            self.entities = self._extract_semantic_entities(crawl_data, self.industry_classification)
+            self.entities = await self._extract_semantic_entities(crawl_data, self.industry_classification, problems_task)
             logger.info(f"Extracted {len(self.entities.get('offerings', []))} offerings")
             
             # 3. Identifier les topics
-            topics = self._identify_topics(crawl_data)
+            topics = await topics_task
             
             return {
                 'industry_classification': self.industry_classification,
@@ -125,13 +188,23 @@ class SemanticAnalyzer:
             
         except Exception as e:
             logger.error(f"Semantic analysis failed: {str(e)}")
+            for task in tasks:
+                task.cancel()
             return {
                 'industry_classification': {'primary_industry': 'generic', 'confidence': 0.0},
                 'entities': {},
                 'topics': []
             }
     
-    def _detect_industry(self, crawl_data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _combine_paragraphs(crawl_data: Dict[str, Any]) -> str:
+        """Texte combiné des paragraphes de toutes les pages"""
+        all_text = ""
+        for page in crawl_data.get('pages', []):
+            all_text += " " + " ".join(page.get('paragraphs', []))
+        return all_text
+    
+    async def _detect_industry(self, crawl_data: Dict[str, Any]) -> Dict[str, Any]:
         """Détecter automatiquement l'industrie avec Anthropic - ANALYSE PROFONDE"""
         
         # Combiner TOUTES les pages (minimum 20 pages ou tout le site)
@@ -183,19 +256,9 @@ Réponds UNIQUEMENT avec un JSON valide:
   "reasoning": "Justification de l'analyse en 2-3 phrases"
 }}"""
 
-            message = anthropic_client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=1000,
-                temperature=0,  # ✅ DÉTERMINISTE
-                messages=[{"role": "user", "content": prompt}]
-            )
+            result = await self._call_claude('industry', prompt, max_tokens=1000, parse=parse_json_response)
             
-            response_text = message.content[0].text.strip()
-            logger.info(f"Claude industry detection response: {response_text[:200]}...")
-            
-            # Nettoyer et parser le JSON
-            clean_text = clean_json_response(response_text)
-            result = json.loads(clean_text)
+            logger.info(f"Claude industry detection: {result.get('primary_industry')} ({result.get('sub_industry', '')})")
             
             return result
             
@@ -289,8 +352,18 @@ Réponds UNIQUEMENT avec un JSON valide:
         else:
             return 'B2B2C'
     
-    def _extract_semantic_entities(self, crawl_data: Dict[str, Any], industry_classification: Dict[str, Any]) -> Dict[str, Any]:
-        """Extraire les entités sémantiques"""
+    async def _extract_semantic_entities(
+        self,
+        crawl_data: Dict[str, Any],
+        industry_classification: Dict[str, Any],
+        problems_solved: Optional[Awaitable[List[Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Extraire les entités sémantiques
+        
+        Args:
+            problems_solved: Extraction des problèmes déjà lancée (sinon lancée ici)
+        """
         
         entities = {
             'company_info': {},
@@ -302,9 +375,7 @@ Réponds UNIQUEMENT avec un JSON valide:
         }
         
         # Combiner le texte
-        all_text = ""
-        for page in crawl_data.get('pages', []):
-            all_text += " " + " ".join(page.get('paragraphs', []))
+        all_text = self._combine_paragraphs(crawl_data)
         
         # Informations de base
         pages = crawl_data.get('pages', [])
@@ -317,8 +388,13 @@ Réponds UNIQUEMENT avec un JSON valide:
                 'business_model': industry_classification['business_model']
             }
         
-        # Extraire offerings
-        entities['offerings'] = self._extract_offerings(all_text, industry_classification['primary_industry'])
+        # Extraire offerings et problèmes résolus (appels Claude concurrents)
+        if problems_solved is None:
+            problems_solved = self._extract_problems_solved(all_text)
+        entities['offerings'], entities['problems_solved'] = await asyncio.gather(
+            self._extract_offerings(all_text, industry_classification['primary_industry']),
+            problems_solved
+        )
         
         # Extraire segments clients
         entities['customer_segments'] = self._extract_customer_segments(all_text, industry_classification['business_model'])
@@ -326,9 +402,6 @@ Réponds UNIQUEMENT avec un JSON valide:
         # Extraire localisations
         entities['locations'] = self._extract_locations(all_text)
         
-        # Extraire problèmes résolus
-        entities['problems_solved'] = self._extract_problems_solved(all_text)
-        
         return entities
     
     def _extract_company_name(self, title: str) -> str:
@@ -342,7 +415,7 @@ Réponds UNIQUEMENT avec un JSON valide:
             words = title.split()
             return words[0] if words else ''
     
-    def _extract_offerings(self, text: str, industry: str) -> List[Dict[str, Any]]:
+    async def _extract_offerings(self, text: str, industry: str) -> List[Dict[str, Any]]:
         """Extraire services/produits avec Anthropic - ANALYSE PROFONDE"""
         
         # Prendre beaucoup plus de texte pour le contexte
@@ -385,16 +458,7 @@ Réponds UNIQUEMENT avec un JSON valide:
   ]
 }}"""
 
-            message = anthropic_client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=1500,
-                temperature=0,  # ✅ DÉTERMINISTE
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = message.content[0].text.strip()
-            clean_text = clean_json_response(response_text)
-            result = json.loads(clean_text)
+            result = await self._call_claude('offerings', prompt, max_tokens=1500, parse=parse_json_response)
             
             return result.get('offerings', [])[:12]
             
@@ -489,7 +553,7 @@ Réponds UNIQUEMENT avec un JSON valide:
         
         return locations[:3]
     
-    def _extract_problems_solved(self, text: str) -> List[Dict[str, Any]]:
+    async def _extract_problems_solved(self, text: str) -> List[Dict[str, Any]]:
         """Extraire problèmes résolus avec Anthropic - ANALYSE PROFONDE DES PAIN POINTS"""
         
         text_sample = text[:12000]  # Plus de contexte
@@ -529,16 +593,7 @@ Réponds UNIQUEMENT avec un JSON valide:
   ]
 }}"""
 
-            message = anthropic_client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=2000,
-                temperature=0,  # ✅ DÉTERMINISTE
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = message.content[0].text.strip()
-            clean_text = clean_json_response(response_text)
-            result = json.loads(clean_text)
+            result = await self._call_claude('problems', prompt, max_tokens=2000, parse=parse_json_response)
             
             problems = result.get('problems_solved', [])
             
@@ -637,75 +692,20 @@ Réponds UNIQUEMENT avec un JSON valide:
         
         return problems_structured
     
-    def _identify_topics(self, crawl_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def _identify_topics(self, crawl_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Identifier les topics principaux avec VRAI Topic Modeling LDA"""
         
         try:
-            from sklearn.feature_extraction.text import TfidfVectorizer
-            from sklearn.decomposition import LatentDirichletAllocation
-            
-            # Extraire TOUS les paragraphes de TOUTES les pages
-            documents = []
-            for page in crawl_data.get('pages', [])[:20]:  # 20 pages
-                for paragraph in page.get('paragraphs', []):
-                    if len(paragraph) > 50:  # Au moins 50 caractères
-                        documents.append(paragraph)
-            
-            if len(documents) < 5:
-                logger.warning("Not enough documents for LDA, using fallback")
+            # LDA (CPU) dans un thread pour ne pas bloquer les appels Claude concurrents
+            topics = await asyncio.to_thread(self._fit_lda_topics, crawl_data)
+            if topics is None:
                 return self._identify_topics_fallback(crawl_data)
             
-            # Stop words français élargis
-            stop_words_fr = {
-                'dans', 'pour', 'avec', 'vous', 'nous', 'votre', 'notre', 'plus', 'tout', 'tous', 
-                'toute', 'cette', 'sont', 'être', 'avoir', 'faire', 'leur', 'leurs', 'elle', 'elles',
-                'celui', 'celle', 'ceux', 'celles', 'peut', 'peuvent', 'aussi', 'très', 'même',
-                'chez', 'sans', 'sous', 'alors', 'donc', 'mais', 'aussi', 'encore', 'jamais',
-                'toujours', 'souvent', 'parfois', 'ainsi', 'après', 'avant', 'depuis', 'pendant'
-            }
-            
-            # TF-IDF Vectorization
-            vectorizer = TfidfVectorizer(
-                max_features=200,
-                ngram_range=(1, 2),  # Unigrams et bigrams
-                min_df=2,  # Minimum 2 documents
-                max_df=0.8,  # Maximum 80% des documents
-                stop_words=list(stop_words_fr)
-            )
-            
-            doc_term_matrix = vectorizer.fit_transform(documents)
-            
-            # LDA Topic Modeling
-            n_topics = min(8, len(documents) // 3)  # Adaptatif
-            lda = LatentDirichletAllocation(
-                n_components=n_topics,
-                max_iter=20,
-                learning_method='online',
-                random_state=42,
-                n_jobs=-1
-            )
-            
-            lda.fit(doc_term_matrix)
-            
-            # Extraire topics avec contexte Claude
-            feature_names = vectorizer.get_feature_names_out()
-            topics = []
-            
-            for topic_idx, topic in enumerate(lda.components_):
-                # Top 10 mots par topic
-                top_indices = topic.argsort()[-10:][::-1]
-                top_words = [feature_names[i] for i in top_indices]
-                
-                # Demander à Claude de labéliser intelligemment
-                topic_label = self._label_topic_with_claude(top_words)
-                
-                topics.append({
-                    'topic_id': topic_idx,
-                    'label': topic_label,
-                    'keywords': top_words[:8],
-                    'weight': float(topic.sum()),
-                    'top_words_scores': [float(topic[i]) for i in top_indices[:5]]
-                })
+            # Demander à Claude de labéliser intelligemment (un seul appel pour tous les topics)
+            labels = await self._label_topics_with_claude([topic['top_words'] for topic in topics])
+            for topic, label in zip(topics, labels):
+                topic['label'] = label
+                del topic['top_words']
             
             # Trier par poids
             topics = sorted(topics, key=lambda x: x['weight'], reverse=True)
@@ -717,30 +717,108 @@ Réponds UNIQUEMENT avec un JSON valide:
             logger.error(f"LDA topic modeling failed: {str(e)}, using fallback")
             return self._identify_topics_fallback(crawl_data)
     
-    def _label_topic_with_claude(self, keywords: List[str]) -> str:
-        """Utiliser Claude pour labéliser intelligemment un topic"""
+    def _fit_lda_topics(self, crawl_data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Topic Modeling LDA sur les paragraphes du site
+        
+        Returns:
+            Topics non labélisés (avec 'top_words'), ou None si pas assez de documents
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.decomposition import LatentDirichletAllocation
+        
+        # Extraire TOUS les paragraphes de TOUTES les pages
+        documents = []
+        for page in crawl_data.get('pages', [])[:20]:  # 20 pages
+            for paragraph in page.get('paragraphs', []):
+                if len(paragraph) > 50:  # Au moins 50 caractères
+                    documents.append(paragraph)
+        
+        if len(documents) < 5:
+            logger.warning("Not enough documents for LDA, using fallback")
+            return None
+        
+        # Stop words français élargis
+        stop_words_fr = {
+            'dans', 'pour', 'avec', 'vous', 'nous', 'votre', 'notre', 'plus', 'tout', 'tous', 
+            'toute', 'cette', 'sont', 'être', 'avoir', 'faire', 'leur', 'leurs', 'elle', 'elles',
+            'celui', 'celle', 'ceux', 'celles', 'peut', 'peuvent', 'aussi', 'très', 'même',
+            'chez', 'sans', 'sous', 'alors', 'donc', 'mais', 'aussi', 'encore', 'jamais',
+            'toujours', 'souvent', 'parfois', 'ainsi', 'après', 'avant', 'depuis', 'pendant'
+        }
+        
+        # TF-IDF Vectorization
+        vectorizer = TfidfVectorizer(
+            max_features=200,
+            ngram_range=(1, 2),  # Unigrams et bigrams
+            min_df=2,  # Minimum 2 documents
+            max_df=0.8,  # Maximum 80% des documents
+            stop_words=list(stop_words_fr)
+        )
+        
+        doc_term_matrix = vectorizer.fit_transform(documents)
+        
+        # LDA Topic Modeling
+        n_topics = min(8, len(documents) // 3)  # Adaptatif
+        lda = LatentDirichletAllocation(
+            n_components=n_topics,
+            max_iter=20,
+            learning_method='online',
+            random_state=42,
+            n_jobs=-1
+        )
+        
+        lda.fit(doc_term_matrix)
+        
+        # Top 10 mots par topic
+        feature_names = vectorizer.get_feature_names_out()
+        topics = []
+        
+        for topic_idx, topic in enumerate(lda.components_):
+            top_indices = topic.argsort()[-10:][::-1]
+            top_words = [feature_names[i] for i in top_indices]
+            
+            topics.append({
+                'topic_id': topic_idx,
+                'label': top_words[0] if top_words else "Topic",
+                'keywords': top_words[:8],
+                'weight': float(topic.sum()),
+                'top_words_scores': [float(topic[i]) for i in top_indices[:5]],
+                'top_words': top_words
+            })
+        
+        return topics
+    
+    async def _label_topics_with_claude(self, keywords_per_topic: List[List[str]]) -> List[str]:
+        """Utiliser Claude pour labéliser intelligemment tous les topics en un seul appel"""
+        if not keywords_per_topic:
+            return []
+        
+        def parse_labels(text: str) -> List[str]:
+            labels = parse_json_response(text).get('labels', [])
+            if len(labels) != len(keywords_per_topic) or not all(isinstance(label, str) and label.strip() for label in labels):
+                raise ValueError(f"Expected {len(keywords_per_topic)} labels, got {labels!r}")
+            return [label.strip() for label in labels]
+        
         try:
-            prompt = f"""Ces mots-clés représentent un thème principal d'un site web:
-{', '.join(keywords)}
+            topics_text = "\n".join(
+                f"{i}. {', '.join(keywords)}" for i, keywords in enumerate(keywords_per_topic, 1)
+            )
+            prompt = f"""Ces listes de mots-clés représentent chacune un thème principal d'un site web:
+{topics_text}
 
-Donne un label CONCIS (2-4 mots) qui capture l'essence de ce thème.
+Pour CHAQUE thème, donne un label CONCIS (2-4 mots) qui capture l'essence du thème.
 Exemples: "Services financiers", "Gestion de projet", "E-commerce mode"
 
-Réponds UNIQUEMENT avec le label (pas de JSON, pas d'explication):"""
+Réponds UNIQUEMENT avec un JSON valide, un label par thème dans le même ordre:
+{{"labels": ["label du thème 1", "label du thème 2"]}}"""
 
-            message = anthropic_client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=20,
-                temperature=0,  # ✅ DÉTERMINISTE
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            label = message.content[0].text.strip()
-            return label
+            return await self._call_claude('topic_labels', prompt, max_tokens=40 * len(keywords_per_topic), parse=parse_labels)
             
-        except Exception:
+        except Exception as e:
+            logger.warning(f"Claude topic labeling failed: {str(e)}, using first keywords")
             # Fallback: utiliser le premier mot-clé
-            return keywords[0] if keywords else "Topic"
+            return [keywords[0] if keywords else "Topic" for keywords in keywords_per_topic]
     
     def _identify_topics_fallback(self, crawl_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Fallback simple si LDA échoue"""
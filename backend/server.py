@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -10,10 +11,8 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
 import asyncio
-from bs4 import BeautifulSoup
-import requests
-from urllib.parse import urljoin, urlparse
 import json
+from contextlib import aclosing
 from anthropic import AsyncAnthropic
 from visibility_tester import VisibilityTester
 from competitive_intelligence import CompetitiveIntelligence
@@ -25,6 +24,17 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from scoring_grids import SCORING_GRIDS, get_scoring_prompt
+from services.crawler import web_crawler
+from services.pipeline import ArtifactStore, Stage, StagePipeline
+from services.job_queue import JobQueue
+from services.checkpoint_store import CheckpointStore
+from services.job_events import JobEventHub, JobProgressWriter
+from services.db_indexes import ensure_indexes
+from services.leads_query import LEADS_PAGE_SIZE, build_leads_pipeline, paginate
+from services.report_store import ReportStore, parse_field_list
+from services.score_history_store import ScoreHistoryStore
+from database_manager import history_db
+from config import JOB_EMBEDDED_WORKER, TRENDS_MAX_SITES
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -33,6 +43,13 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
+job_queue = JobQueue(db.analysis_jobs)
+checkpoint_store = CheckpointStore(db.job_checkpoints)
+job_events = JobEventHub(db.analysis_jobs)
+report_store = ReportStore(db.reports, db.report_sections)
+
+# Séries de scores partagées entre workers, lues par /api/trends
+score_history = ScoreHistoryStore(db.score_points, db.score_rollups)
 
 # Create the main app
 app = FastAPI()
@@ -72,8 +89,11 @@ class AnalysisJob(BaseModel):
     url: str
     status: str = "pending"  # pending, processing, completed, failed
     progress: int = 0
+    attempts: int = 0
     error: Optional[str] = None
     reportId: Optional[str] = None
+    completedStages: List[str] = []
+    stage_timings: Dict[str, float] = {}
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updatedAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -189,102 +209,6 @@ class ReportCreate(BaseModel):
     type: str = "executive"
 
 # Crawling & Analysis Functions
-async def crawl_website(url: str, max_pages: int = 10) -> Dict[str, Any]:
-    """Crawl website and extract content"""
-    try:
-        logger.info(f"Starting crawl for {url}")
-        
-        # Normalize URL
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        parsed_url = urlparse(url)
-        base_domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        
-        visited = set()
-        to_visit = [url]
-        pages_data = []
-        
-        while to_visit and len(visited) < max_pages:
-            current_url = to_visit.pop(0)
-            
-            if current_url in visited:
-                continue
-                
-            visited.add(current_url)
-            
-            try:
-                response = requests.get(current_url, timeout=10, headers={
-                    'User-Agent': 'Mozilla/5.0 (compatible; GEOBot/1.0)'
-                })
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.content, 'lxml')
-                
-                # Extract content
-                title = soup.find('title')
-                title_text = title.get_text().strip() if title else ""
-                
-                meta_desc = soup.find('meta', {'name': 'description'})
-                meta_description = meta_desc.get('content', '') if meta_desc else ""
-                
-                # Extract headings
-                h1_tags = [h.get_text().strip() for h in soup.find_all('h1')]
-                h2_tags = [h.get_text().strip() for h in soup.find_all('h2')]
-                h3_tags = [h.get_text().strip() for h in soup.find_all('h3')]
-                
-                # Extract paragraphs
-                paragraphs = [p.get_text().strip() for p in soup.find_all('p') if len(p.get_text().strip()) > 50]
-                
-                # Extract JSON-LD
-                json_ld = []
-                for script in soup.find_all('script', {'type': 'application/ld+json'}):
-                    try:
-                        json_ld.append(json.loads(script.string))
-                    except Exception:
-                        pass
-                
-                # Extract internal links
-                links = soup.find_all('a', href=True)
-                for link in links:
-                    href = link['href']
-                    absolute_url = urljoin(current_url, href)
-                    
-                    if absolute_url.startswith(base_domain) and absolute_url not in visited and len(to_visit) < 20:
-                        # Avoid common non-content pages
-                        if not any(x in absolute_url.lower() for x in ['#', 'javascript:', 'mailto:', '.pdf', '.jpg', '.png']):
-                            to_visit.append(absolute_url)
-                
-                page_data = {
-                    'url': current_url,
-                    'title': title_text,
-                    'meta_description': meta_description,
-                    'h1': h1_tags,
-                    'h2': h2_tags,
-                    'h3': h3_tags,
-                    'paragraphs': paragraphs[:10],  # First 10 paragraphs
-                    'json_ld': json_ld,
-                    'word_count': sum(len(p.split()) for p in paragraphs)
-                }
-                
-                pages_data.append(page_data)
-                logger.info(f"Crawled: {current_url}")
-                
-                await asyncio.sleep(0.5)  # Be polite
-                
-            except Exception as e:
-                logger.warning(f"Failed to crawl {current_url}: {str(e)}")
-                continue
-        
-        return {
-            'base_url': url,
-            'pages_crawled': len(pages_data),
-            'pages': pages_data
-        }
-        
-    except Exception as e:
-        logger.error(f"Crawl error: {str(e)}")
-        raise
 
 async def analyze_with_claude(crawl_data: Dict[str, Any], visibility_data: Dict[str, Any] = None, retry_count: int = 3) -> Dict[str, Any]:
     """
@@ -381,193 +305,144 @@ async def generate_pdf_report(report: Report) -> bytes:
         logger.error(f"PDF generation error: {str(e)}")
         raise
 
-async def process_analysis_job(job_id: str):
-    """Background task to process analysis"""
+# Analysis pipeline stages
+# Chaque étape reçoit le contexte du pipeline (job_doc + résultats des étapes précédentes)
+def _extract_company_name(crawl_data: Dict[str, Any]) -> str:
+    """Extrait le nom de l'entreprise depuis le title de la première page"""
+    company_name = ''
+    if crawl_data.get('pages'):
+        title = crawl_data['pages'][0].get('title', '')
+        if '|' in title:
+            company_name = title.split('|')[0].strip()
+        elif '-' in title:
+            company_name = title.split('-')[0].strip()
+        else:
+            company_name = title.split()[0] if title else ''
+    return company_name
+
+def _build_visibility_compat(visibility_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convertit les résultats V2 au format attendu par le reste du code"""
+    visibility_data_compat = {
+        'overall_visibility': visibility_data.get('summary', {}).get('global_visibility', 0.0),
+        'platform_scores': visibility_data.get('summary', {}).get('by_platform', {}),
+        'queries_tested': len(visibility_data.get('queries', [])),
+        'total_tests': len(visibility_data.get('queries', [])) * 5,
+        'details': []
+    }
+    
+    # Ajouter les détails au format attendu
+    for query_data in visibility_data.get('queries', []):
+        for platform, platform_data in query_data.get('platforms', {}).items():
+            visibility_data_compat['details'].append({
+                'query': query_data['query'],
+                'platform': platform.upper(),
+                'mentioned': platform_data.get('mentioned', False),
+                'answer': platform_data.get('full_response', '')[:500]  # Tronquer pour la DB
+            })
+    
+    return visibility_data_compat
+
+def _clean_for_json(obj):
+    """Nettoie les ObjectId et autres objets non-sérialisables"""
+    if isinstance(obj, dict):
+        return {k: _clean_for_json(v) for k, v in obj.items() if k != '_id'}
+    elif isinstance(obj, list):
+        return [_clean_for_json(item) for item in obj]
+    elif hasattr(obj, '__dict__'):
+        return str(obj)
+    else:
+        return obj
+
+async def _stage_crawl(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Étape 1: Crawl du site"""
+    return await web_crawler.crawl_website(ctx['job_doc']['url'], max_pages=int(os.environ.get('CRAWL_MAX_PAGES', 10)))
+
+def _stage_queries(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Étape 2: Génération des requêtes de test (V2 - Analyse sémantique + 100 requêtes)"""
+    from query_generator_v2 import generate_queries_with_analysis
+    
+    job_doc = ctx['job_doc']
+    query_results = generate_queries_with_analysis(ctx['crawl'], num_queries=100)
+    test_queries = query_results.get('queries', [])
+    semantic_analysis = query_results.get('semantic_analysis', {})
+    query_breakdown = query_results.get('breakdown', {})
+    
+    logger.info(f"Generated {len(test_queries)} queries (Non-branded: {query_breakdown.get('non_branded', 0)}, Semi-branded: {query_breakdown.get('semi_branded', 0)}, Branded: {query_breakdown.get('branded', 0)})")
+    logger.info(f"Industry detected: {semantic_analysis.get('industry_classification', {}).get('primary_industry', 'unknown')}")
+    
+    # Sauvegarder queries_config.json pour personnalisation
+    queries_config = {
+        'site_url': job_doc['url'],
+        'auto_generated_queries': test_queries,
+        'manual_queries': [],
+        'excluded_queries': [],
+        'query_metadata': {q: {'generated_at': datetime.now(timezone.utc).isoformat()} for q in test_queries},
+        'semantic_analysis': semantic_analysis,
+        'query_breakdown': query_breakdown
+    }
+    queries_config_path = f"/app/backend/queries_config_{ctx['job_id']}.json"
+    with open(queries_config_path, 'w', encoding='utf-8') as f:
+        json.dump(queries_config, f, indent=2, ensure_ascii=False)
+    
+    return {
+        'queries': test_queries,
+        'semantic_analysis': semantic_analysis,
+        'breakdown': query_breakdown
+    }
+
+def _stage_data_gaps(ctx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Quick Win 1: Data Gap Detector (a besoin de l'industrie détectée)"""
     try:
-        # Get job
-        job_doc = await db.analysis_jobs.find_one({"id": job_id}, {"_id": 0})
-        if not job_doc:
-            return
-        
-        # Update status
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"status": "processing", "progress": 10}}
-        )
+        from data_gap_detector import DataGapDetector
+        data_gap_detector = DataGapDetector()
+        semantic_analysis = ctx['queries']['semantic_analysis']
+        industry = semantic_analysis.get('industry_classification', {}).get('primary_industry', 'default')
+        data_gaps = data_gap_detector.analyze_data_gaps(ctx['crawl'], industry)
+        logger.info(f"Data Gaps: {data_gaps['global_stats']['total_stats_found']}/{data_gaps['global_stats']['expected_minimum']} stats - Severity: {data_gaps['global_stats']['gap_severity']}")
+        return data_gaps
+    except Exception as e:
+        logger.error(f"Data gap analysis failed: {str(e)}")
+        return None
+
+def _stage_token_analysis(ctx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Quick Win 2: Token Budget Simulator"""
+    try:
+        from token_analyzer import TokenAnalyzer
+        token_analyzer = TokenAnalyzer()
+        token_analysis = token_analyzer.analyze_token_budget(ctx['crawl'], 8000)
+        logger.info(f"Tokens: {token_analysis['global_analysis']['avg_tokens_per_page']:.0f} avg/page, {token_analysis['global_analysis']['pages_will_truncate']} will truncate - Density: {token_analysis['global_analysis']['density_rating']}")
+        return token_analysis
+    except Exception as e:
+        logger.error(f"Token analysis failed: {str(e)}")
+        return None
+
+async def _stage_visibility(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Étape 3: Test de visibilité dans les plateformes IA avec diagnostic détaillé (V2, async)"""
+    job_doc = ctx['job_doc']
+    try:
+        from visibility_tester_v2 import test_visibility_with_details_async
         
-        # Step 1: Crawl website
-        crawl_data = await crawl_website(job_doc['url'], max_pages=int(os.environ.get('CRAWL_MAX_PAGES', 10)))
+        company_name = _extract_company_name(ctx['crawl'])
         
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 40}}
+        # Test avec diagnostic détaillé (requêtes × plateformes en parallèle)
+        visibility_data = await test_visibility_with_details_async(
+            ctx['queries']['queries'],
+            job_doc['url'],
+            company_name,
+            breakdown=ctx['queries']['breakdown']
         )
+        logger.info(f"Visibility test completed with diagnosis: {visibility_data.get('summary', {}).get('global_visibility', 0):.1%}")
         
-        # Step 2: Generate test queries (V2 - Semantic Analysis + 100 queries)
-        from query_generator_v2 import generate_queries_with_analysis
-        query_results = generate_queries_with_analysis(crawl_data, num_queries=100)
-        test_queries = query_results.get('queries', [])
-        semantic_analysis = query_results.get('semantic_analysis', {})
-        query_breakdown = query_results.get('breakdown', {})
-        
-        logger.info(f"Generated {len(test_queries)} queries (Non-branded: {query_breakdown.get('non_branded', 0)}, Semi-branded: {query_breakdown.get('semi_branded', 0)}, Branded: {query_breakdown.get('branded', 0)})")
-        logger.info(f"Industry detected: {semantic_analysis.get('industry_classification', {}).get('primary_industry', 'unknown')}")
-        
-        # Quick Win 1: Data Gap Detector
-        data_gaps = None
-        try:
-            from data_gap_detector import DataGapDetector
-            data_gap_detector = DataGapDetector()
-            industry = semantic_analysis.get('industry_classification', {}).get('primary_industry', 'default')
-            data_gaps = data_gap_detector.analyze_data_gaps(crawl_data, industry)
-            logger.info(f"Data Gaps: {data_gaps['global_stats']['total_stats_found']}/{data_gaps['global_stats']['expected_minimum']} stats - Severity: {data_gaps['global_stats']['gap_severity']}")
-        except Exception as e:
-            logger.error(f"Data gap analysis failed: {str(e)}")
-        
-        # Quick Win 2: Token Budget Simulator
-        token_analysis = None
-        try:
-            from token_analyzer import TokenAnalyzer
-            token_analyzer = TokenAnalyzer()
-            token_analysis = token_analyzer.analyze_token_budget(crawl_data, 8000)
-            logger.info(f"Tokens: {token_analysis['global_analysis']['avg_tokens_per_page']:.0f} avg/page, {token_analysis['global_analysis']['pages_will_truncate']} will truncate - Density: {token_analysis['global_analysis']['density_rating']}")
-        except Exception as e:
-            logger.error(f"Token analysis failed: {str(e)}")
-        
-        # Sauvegarder queries_config.json pour personnalisation
-        queries_config = {
-            'site_url': job_doc['url'],
-            'auto_generated_queries': test_queries,
-            'manual_queries': [],
-            'excluded_queries': [],
-            'query_metadata': {q: {'generated_at': datetime.now(timezone.utc).isoformat()} for q in test_queries},
-            'semantic_analysis': semantic_analysis,
-            'query_breakdown': query_breakdown
+        return {
+            'data': visibility_data,
+            'compat': _build_visibility_compat(visibility_data),
+            'succeeded': True
         }
-        queries_config_path = f"/app/backend/queries_config_{job_id}.json"
-        with open(queries_config_path, 'w', encoding='utf-8') as f:
-            json.dump(queries_config, f, indent=2, ensure_ascii=False)
-        
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 50}}
-        )
         
-        # Step 3: Test visibility in AI platforms with detailed diagnosis (V2)
-        try:
-            from visibility_tester_v2 import test_visibility_with_details
-            
-            # Extraire le nom de l'entreprise
-            company_name = ''
-            if crawl_data.get('pages'):
-                title = crawl_data['pages'][0].get('title', '')
-                if '|' in title:
-                    company_name = title.split('|')[0].strip()
-                elif '-' in title:
-                    company_name = title.split('-')[0].strip()
-                else:
-                    company_name = title.split()[0] if title else ''
-            
-            # Test avec diagnostic détaillé
-            visibility_data = test_visibility_with_details(test_queries, job_doc['url'], company_name)
-            logger.info(f"Visibility test completed with diagnosis: {visibility_data.get('summary', {}).get('global_visibility', 0):.1%}")
-            
-            logger.info("🏆 Running competitive intelligence...")
-            try:
-                from utils.competitor_extractor import CompetitorExtractor
-                from services.competitor_discovery import competitor_discovery
-                
-                # Étape 1: Extraire depuis les résultats de visibilité
-                competitor_urls = CompetitorExtractor.extract_from_visibility_results(
-                    visibility_data, 
-                    max_competitors=5
-                )
-                
-                # Filtrer notre propre domaine
-                competitor_urls = CompetitorExtractor.filter_self_domain(
-                    competitor_urls, 
-                    job_doc['url']
-                )
-                
-                logger.info(f"📊 Found {len(competitor_urls)} competitor URLs from visibility results")
-                
-                # Étape 2: Découverte intelligente complète (nouveau pipeline 3 étages)
-                logger.info("🚀 Running full competitor discovery pipeline...")
-                
-                try:
-                    # Le nouveau discover_real_competitors retourne une liste de dicts avec score/type/reason
-                    discovered_competitors = competitor_discovery.discover_real_competitors(
-                        semantic_analysis=semantic_analysis,
-                        our_url=job_doc['url'],
-                        visibility_urls=competitor_urls,  # URLs déjà trouvées depuis visibilité
-                        max_competitors=5
-                    )
-                    
-                    # Extraire les URLs pour compatibilité avec competitive_intelligence
-                    competitor_urls = [c['homepage_url'] for c in discovered_competitors]
-                    
-                    logger.info(f"✅ Competitor discovery complete: {len(competitor_urls)} competitors")
-                    for i, comp in enumerate(discovered_competitors, 1):
-                        logger.info(f"  {i}. {comp['domain']} (score: {comp['score']}, type: {comp['type']}, source: {comp['source']})")
-                    
-                except Exception as e:
-                    logger.error(f"Competitor discovery failed: {e}")
-                    import traceback
-                    traceback.print_exc()
-                
-                logger.info(f"📊 Final competitor count: {len(competitor_urls)}")
-                
-                if competitor_urls:
-                    ci = CompetitiveIntelligence()
-                    
-                    # Préparer nos données pour comparaison
-                    our_data = {
-                        'crawl_data': crawl_data,
-                        'semantic_analysis': semantic_analysis,
-                        'data_gap_analysis': data_gaps,
-                        'visibility_data': visibility_data
-                    }
-                    
-                    competitive_analysis = ci.analyze_competitors(
-                        competitors_urls=competitor_urls[:5],
-                        visibility_data=visibility_data,
-                        our_data=our_data
-                    )
-                    visibility_data['competitive_intelligence'] = competitive_analysis
-                    logger.info(f"✅ CI: {competitive_analysis.get('competitors_analyzed', 0)} analyzed, GEO comparatif calculé")
-                else:
-                    visibility_data['competitive_intelligence'] = {'competitors_analyzed': 0}
-            except Exception as e:
-                logger.error(f"❌ CI failed: {str(e)}")
-                visibility_data['competitive_intelligence'] = {'error': str(e), 'competitors_analyzed': 0}
-            
-            # Sauvegarder visibility_results.json
-            visibility_results_path = f"/app/backend/visibility_results_{job_id}.json"
-            with open(visibility_results_path, 'w', encoding='utf-8') as f:
-                json.dump(visibility_data, f, indent=2, ensure_ascii=False)
-            
-            # Convertir au format attendu par le reste du code
-            visibility_data_compat = {
-                'overall_visibility': visibility_data.get('summary', {}).get('global_visibility', 0.0),
-                'platform_scores': visibility_data.get('summary', {}).get('by_platform', {}),
-                'queries_tested': len(visibility_data.get('queries', [])),
-                'total_tests': len(visibility_data.get('queries', [])) * 5,
-                'details': []
-            }
-            
-            # Ajouter les détails au format attendu
-            for query_data in visibility_data.get('queries', []):
-                for platform, platform_data in query_data.get('platforms', {}).items():
-                    visibility_data_compat['details'].append({
-                        'query': query_data['query'],
-                        'platform': platform.upper(),
-                        'mentioned': platform_data.get('mentioned', False),
-                        'answer': platform_data.get('full_response', '')[:500]  # Tronquer pour la DB
-                    })
-            
-        except Exception as e:
-            logger.error(f"Visibility test failed: {str(e)}")
-            visibility_data = {
+    except Exception as e:
+        logger.error(f"Visibility test failed: {str(e)}")
+        return {
+            'data': {
                 'site_url': job_doc['url'],
                 'company_name': '',
                 'queries': [],
@@ -576,355 +451,510 @@ async def process_analysis_job(job_id: str):
                     'global_visibility': 0.0,
                     'by_platform': {}
                 }
-            }
-            visibility_data_compat = {
+            },
+            'compat': {
                 'overall_visibility': 0.0,
                 'platform_scores': {},
                 'queries_tested': 0,
                 'total_tests': 0,
                 'error': str(e)
-            }
-        
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 60}}
+            },
+            'succeeded': False
+        }
+
+def _competitor_candidate_urls(ctx: Dict[str, Any]) -> List[str]:
+    """Stage 1: URLs candidates extraites des résultats de visibilité (hors notre domaine)"""
+    from utils.competitor_extractor import CompetitorExtractor
+    
+    # Format complet (queries + competitors_mentioned), sur-ensemble du format compat
+    competitor_urls = CompetitorExtractor.extract_from_visibility_results(
+        ctx['visibility']['data'], 
+        max_competitors=5
+    )
+    
+    # Filtrer notre propre domaine
+    return CompetitorExtractor.filter_self_domain(
+        competitor_urls, 
+        ctx['job_doc']['url']
+    )
+
+def _discover_competitors(ctx: Dict[str, Any], visibility_urls: List[str]) -> List[Dict[str, Any]]:
+    """Découverte des compétiteurs (pipeline 3 étages), mémoïsée pour le job"""
+    from services.competitor_discovery import competitor_discovery
+    
+    our_url = ctx['job_doc']['url']
+    semantic_analysis = ctx['queries']['semantic_analysis']
+    
+    return ctx['artifacts'].get_or_compute(
+        'competitor_discovery',
+        {
+            'our_url': our_url,
+            'visibility_urls': sorted(visibility_urls),
+            'semantic_analysis': semantic_analysis
+        },
+        lambda: competitor_discovery.discover_real_competitors(
+            semantic_analysis=semantic_analysis,
+            our_url=our_url,
+            visibility_urls=visibility_urls,
+            max_competitors=5
         )
-        
-        # Step 4: Analyze with Claude
-        analysis_result = await analyze_with_claude(crawl_data, visibility_data_compat)
-        
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 70}}
+    )
+
+def _analyze_competitors(ctx: Dict[str, Any], competitor_urls: List[str]) -> Dict[str, Any]:
+    """Analyse CompetitiveIntelligence des compétiteurs, mémoïsée pour le job"""
+    visibility_data = ctx['visibility']['data']
+    
+    # Préparer nos données pour comparaison
+    our_data = {
+        'crawl_data': ctx['crawl'],
+        'semantic_analysis': ctx['queries']['semantic_analysis'],
+        'data_gap_analysis': ctx['data_gaps'],
+        'visibility_data': visibility_data
+    }
+    
+    return ctx['artifacts'].get_or_compute(
+        'competitive_intelligence',
+        {'competitors_urls': competitor_urls[:5]},
+        lambda: CompetitiveIntelligence().analyze_competitors(
+            competitors_urls=competitor_urls[:5],
+            visibility_data=visibility_data,
+            our_data=our_data
         )
+    )
+
+def _stage_competitors(ctx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Étape 3 (suite): Intelligence compétitive sur les résultats de visibilité"""
+    visibility = ctx['visibility']
+    if not visibility['succeeded']:
+        return None
+    
+    visibility_data = visibility['data']
+    
+    logger.info("🏆 Running competitive intelligence...")
+    try:
+        # Étape 1: Extraire depuis les résultats de visibilité
+        competitor_urls = _competitor_candidate_urls(ctx)
         
-        # Step 4.5: Competitive Intelligence Analysis
-        competitive_data = {}
-        try:
-            from competitive_intelligence import CompetitiveIntelligence
-            from utils.competitor_extractor import CompetitorExtractor
-            
-            # Extraire les compétiteurs des résultats de visibilité
-            competitors_urls = CompetitorExtractor.extract_from_visibility_results(
-                visibility_data_compat, 
-                max_competitors=5
-            )
-            
-            # Filtrer notre propre domaine
-            competitors_urls = CompetitorExtractor.filter_self_domain(
-                competitors_urls, 
-                job_doc['url']
-            )
-            
-            # Découverte intelligente complète (pipeline 3 étages)
-            if semantic_analysis:
-                logger.info("🚀 Running full competitor discovery pipeline...")
-                
-                try:
-                    from services.competitor_discovery import competitor_discovery
-                    
-                    # Nouveau pipeline: retourne liste de dicts avec score/type/reason
-                    discovered_competitors = competitor_discovery.discover_real_competitors(
-                        semantic_analysis=semantic_analysis,
-                        our_url=job_doc['url'],
-                        visibility_urls=competitors_urls,  # URLs déjà trouvées
-                        max_competitors=5
-                    )
-                    
-                    if discovered_competitors:
-                        # Extraire URLs pour competitive_intelligence
-                        competitors_urls = [c['homepage_url'] for c in discovered_competitors]
-                        
-                        logger.info(f"✅ Competitor discovery complete: {len(competitors_urls)} competitors")
-                        for comp in discovered_competitors:
-                            logger.info(f"  • {comp['domain']}: {comp['score']} ({comp['type']}) - {comp['reason']}")
-                    
-                except Exception as e:
-                    logger.error(f"Competitor discovery failed: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    
-                    # Fallback sur Claude si la découverte échoue
-                    logger.info("Fallback: Using Claude for competitor suggestions")
-                    try:
-                        from anthropic import Anthropic
-                        anthropic_client = Anthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
-                        
-                        industry = semantic_analysis.get('industry_classification', {}).get('primary_industry', '')
-                        company_type = semantic_analysis.get('industry_classification', {}).get('company_type', '')
-                        
-                        if industry and company_type:
-                            competitors_urls = await CompetitorExtractor.suggest_competitors_with_claude(
-                                industry=industry,
-                                company_type=company_type,
-                                anthropic_client=anthropic_client,
-                                max_competitors=5
-                            )
-                            
-                            if competitors_urls:
-                                logger.info(f"✅ Found {len(competitors_urls)} competitors from Claude fallback")
-                    except Exception as e2:
-                        logger.error(f"Claude fallback also failed: {str(e2)}")
-            
-            if competitors_urls:
-                logger.info(f"Analyzing {len(competitors_urls)} competitors")
-                comp_intel = CompetitiveIntelligence()
-                competitive_data = comp_intel.analyze_competitors(competitors_urls, visibility_data)
-                logger.info(f"Competitive analysis completed: {competitive_data.get('competitors_analyzed', 0)} analyzed")
-            else:
-                logger.info("No competitors found")
-                competitive_data = {
-                    'competitors_analyzed': 0,
-                    'analyses': [],
-                    'comparative_metrics': {},
-                    'actionable_insights': []
-                }
-        except Exception as e:
-            logger.error(f"Competitive intelligence failed: {str(e)}")
-            competitive_data = {'error': str(e)}
+        logger.info(f"📊 Found {len(competitor_urls)} competitor URLs from visibility results")
         
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 75}}
-        )
+        # Étape 2: Découverte intelligente complète (nouveau pipeline 3 étages)
+        logger.info("🚀 Running full competitor discovery pipeline...")
         
-        # Step 5: Generate Schema Markup
-        schemas_data = {}
         try:
-            from schema_generator import SchemaGenerator
+            # Le nouveau discover_real_competitors retourne une liste de dicts avec score/type/reason
+            discovered_competitors = _discover_competitors(ctx, competitor_urls)
             
-            schema_gen = SchemaGenerator()
-            site_data = {
-                'url': job_doc['url'],
-                'name': crawl_data.get('pages', [{}])[0].get('title', '').split('|')[0].strip() if crawl_data.get('pages') else '',
-                'services': [],
-                'business_type': 'ProfessionalService'
-            }
-            
-            schemas_data = schema_gen.generate_all_schemas(site_data, crawl_data)
+            # Extraire les URLs pour compatibilité avec competitive_intelligence
+            competitor_urls = [c['homepage_url'] for c in discovered_competitors]
             
-            # Générer le guide d'implémentation
-            implementation_guide = schema_gen.generate_implementation_guide(schemas_data, job_doc['url'])
-            schemas_data['implementation_guide'] = implementation_guide
+            logger.info(f"✅ Competitor discovery complete: {len(competitor_urls)} competitors")
+            for i, comp in enumerate(discovered_competitors, 1):
+                logger.info(f"  {i}. {comp['domain']} (score: {comp['score']}, type: {comp['type']}, source: {comp['source']})")
             
-            logger.info(f"Schema generation completed: {len(schemas_data)} schema types")
         except Exception as e:
-            logger.error(f"Schema generation failed: {str(e)}")
-            schemas_data = {'error': str(e)}
+            logger.error(f"Competitor discovery failed: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        logger.info(f"📊 Final competitor count: {len(competitor_urls)}")
+        
+        if competitor_urls:
+            competitive_analysis = _analyze_competitors(ctx, competitor_urls)
+            visibility_data['competitive_intelligence'] = competitive_analysis
+            logger.info(f"✅ CI: {competitive_analysis.get('competitors_analyzed', 0)} analyzed, GEO comparatif calculé")
+        else:
+            visibility_data['competitive_intelligence'] = {'competitors_analyzed': 0}
+    except Exception as e:
+        logger.error(f"❌ CI failed: {str(e)}")
+        visibility_data['competitive_intelligence'] = {'error': str(e), 'competitors_analyzed': 0}
+    
+    # Sauvegarder visibility_results.json
+    visibility_results_path = f"/app/backend/visibility_results_{ctx['job_id']}.json"
+    with open(visibility_results_path, 'w', encoding='utf-8') as f:
+        json.dump(visibility_data, f, indent=2, ensure_ascii=False)
+    
+    return visibility_data['competitive_intelligence']
+
+def _restore_competitors(ctx: Dict[str, Any], competitive_intelligence: Optional[Dict[str, Any]]):
+    """Reprise d'un checkpoint: l'étape 'competitors' enrichit les données de visibilité"""
+    if competitive_intelligence is not None:
+        ctx['visibility']['data']['competitive_intelligence'] = competitive_intelligence
+
+async def _stage_claude_analysis(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Étape 4: Analyse des 8 critères GEO avec Claude"""
+    return await analyze_with_claude(ctx['crawl'], ctx['visibility']['compat'])
+
+async def _stage_competitive_analysis(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Étape 4.5: Competitive Intelligence Analysis
+    Réutilise les artefacts de l'étape 'competitors' (mêmes entrées => pas de nouveau fetch)
+    """
+    semantic_analysis = ctx['queries']['semantic_analysis']
+    
+    competitive_data = {}
+    try:
+        from utils.competitor_extractor import CompetitorExtractor
         
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 80}}
-        )
+        # Extraire les compétiteurs des résultats de visibilité
+        competitors_urls = _competitor_candidate_urls(ctx)
         
-        # Step 5.5: Generate GEO-optimized content (Module 2)
-        generated_articles = []
-        try:
-            logger.info("📝 Module 2: Generating GEO-optimized content...")
-            from content_generator import ContentGenerator
-            
-            content_gen = ContentGenerator()
+        # Découverte intelligente complète (pipeline 3 étages)
+        if semantic_analysis:
+            logger.info("🚀 Running full competitor discovery pipeline...")
             
-            # Extraire les top opportunités (requêtes à faible visibilité)
-            opportunities = []
-            if analysis_result.get('recommendations'):
-                for rec in analysis_result.get('recommendations', [])[:5]:  # Limiter à 5 pour les coûts
-                    opportunities.append({
-                        'query': rec.get('action', ''),
-                        'competitors_content': ''
-                    })
-            
-            # Préparer le contexte du site
-            site_context = {
-                'industry': semantic_analysis.get('industry_classification', {}).get('primary_industry', 'services'),
-                'site_name': job_doc.get('url', '').replace('https://', '').replace('http://', '').split('/')[0],
-                'url': job_doc['url'],
-                'expertise': semantic_analysis.get('company_description', {}).get('value_proposition', '')
-            }
-            
-            # Générer les articles
-            if opportunities:
-                generated_articles = await content_gen.generate_articles(
-                    opportunities,
-                    site_context
-                )
-                logger.info(f"✅ Generated {len(generated_articles)} GEO-optimized articles")
-            else:
-                logger.warning("No opportunities found for content generation")
+            try:
+                # Nouveau pipeline: retourne liste de dicts avec score/type/reason
+                discovered_competitors = await asyncio.to_thread(_discover_competitors, ctx, competitors_urls)
                 
-        except Exception as e:
-            logger.error(f"Content generation failed: {str(e)}")
-            generated_articles = []
-        
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 82}}
-        )
-        
-        # Step 6: Create report with enriched data and weighted scoring
-        scores_dict = analysis_result['scores']
-        
-        # Appliquer le scoring pondéré
-        weighted_global_score = Score.calculate_weighted_score(scores_dict)
-        scores_dict['global_score'] = weighted_global_score
-        
-        report = Report(
-            leadId=job_doc['leadId'],
-            url=job_doc['url'],
-            type="executive",
-            scores=Score(**scores_dict),
-            recommendations=[Recommendation(**rec) for rec in analysis_result.get('recommendations', [])[:20]],
-            quick_wins=[QuickWin(**qw) for qw in analysis_result.get('quick_wins', [])[:10]],
-            analysis=analysis_result.get('analysis'),
-            detailed_observations=analysis_result.get('detailed_observations'),
-            executive_summary=analysis_result.get('executive_summary'),
-            roi_estimation=analysis_result.get('roi_estimation'),
-            visibility_results=visibility_data,
-            test_queries=test_queries
-        )
-        
-        # Save report
-        report_dict = report.model_dump()
-        report_dict['createdAt'] = report_dict['createdAt'].isoformat()
-        report_dict['scores'] = report.scores.model_dump()
-        report_dict['recommendations'] = [rec.model_dump() for rec in report.recommendations]
-        report_dict['quick_wins'] = [qw.model_dump() for qw in report.quick_wins]
-        report_dict['test_queries'] = test_queries
-        report_dict['visibility_results'] = visibility_data_compat
-        
-        # Ajouter les données des modules avancés
-        report_dict['competitive_intelligence'] = competitive_data
-        report_dict['schemas'] = schemas_data
-        report_dict['semantic_analysis'] = semantic_analysis
-        report_dict['query_breakdown'] = query_breakdown
-        
-        # Ajouter Quick Wins (Phase 1)
-        if data_gaps:
-            report_dict['data_gap_analysis'] = data_gaps
-        if token_analysis:
-            report_dict['token_analysis'] = token_analysis
-        
-        # Ajouter Module 2 (Generated Articles)
-        if generated_articles:
-            report_dict['generated_articles'] = generated_articles
-            logger.info(f"Added {len(generated_articles)} generated articles to report")
-        
-        await db.reports.insert_one(report_dict)
-        
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 85}}
-        )
-        
-        # Step 6: Generate Word Report (50-70 pages)
-        try:
-            from word_report_generator import WordReportGenerator
-            word_generator = WordReportGenerator()
-            word_file_path = f"/app/backend/reports/{report.id}_report.docx"
-            word_generator.generate_report(report_dict, word_file_path)
-            report_dict['docxUrl'] = f"/reports/{report.id}_report.docx"
-            logger.info(f"Word report generated: {word_file_path}")
-        except Exception as e:
-            logger.error(f"Word report generation failed: {str(e)}")
+                if discovered_competitors:
+                    # Extraire URLs pour competitive_intelligence
+                    competitors_urls = [c['homepage_url'] for c in discovered_competitors]
+                    
+                    logger.info(f"✅ Competitor discovery complete: {len(competitors_urls)} competitors")
+                    for comp in discovered_competitors:
+                        logger.info(f"  • {comp['domain']}: {comp['score']} ({comp['type']}) - {comp['reason']}")
+                
+            except Exception as e:
+                logger.error(f"Competitor discovery failed: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                
+                # Fallback sur Claude si la découverte échoue
+                logger.info("Fallback: Using Claude for competitor suggestions")
+                try:
+                    from anthropic import Anthropic
+                    anthropic_client = Anthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
+                    
+                    industry = semantic_analysis.get('industry_classification', {}).get('primary_industry', '')
+                    company_type = semantic_analysis.get('industry_classification', {}).get('company_type', '')
+                    
+                    if industry and company_type:
+                        competitors_urls = await CompetitorExtractor.suggest_competitors_with_claude(
+                            industry=industry,
+                            company_type=company_type,
+                            anthropic_client=anthropic_client,
+                            max_competitors=5
+                        )
+                        
+                        if competitors_urls:
+                            logger.info(f"✅ Found {len(competitors_urls)} competitors from Claude fallback")
+                except Exception as e2:
+                    logger.error(f"Claude fallback also failed: {str(e2)}")
+        
+        if competitors_urls:
+            logger.info(f"Analyzing {len(competitors_urls)} competitors")
+            competitive_data = await asyncio.to_thread(_analyze_competitors, ctx, competitors_urls)
+            logger.info(f"Competitive analysis completed: {competitive_data.get('competitors_analyzed', 0)} analyzed")
+        else:
+            logger.info("No competitors found")
+            competitive_data = {
+                'competitors_analyzed': 0,
+                'analyses': [],
+                'comparative_metrics': {},
+                'actionable_insights': []
+            }
+    except Exception as e:
+        logger.error(f"Competitive intelligence failed: {str(e)}")
+        competitive_data = {'error': str(e)}
+    
+    return competitive_data
+
+def _stage_schemas(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Étape 5: Génération des Schema Markup"""
+    job_doc = ctx['job_doc']
+    crawl_data = ctx['crawl']
+    
+    schemas_data = {}
+    try:
+        from schema_generator import SchemaGenerator
+        
+        schema_gen = SchemaGenerator()
+        site_data = {
+            'url': job_doc['url'],
+            'name': crawl_data.get('pages', [{}])[0].get('title', '').split('|')[0].strip() if crawl_data.get('pages') else '',
+            'services': [],
+            'business_type': 'ProfessionalService'
+        }
         
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 90}}
-        )
+        schemas_data = schema_gen.generate_all_schemas(site_data, crawl_data)
         
-        # Step 7: Generate HTML Dashboard
-        try:
-            from dashboard_generator import generate_dashboard_html
-            dashboard_path = f"/app/backend/dashboards/{report.id}_dashboard.html"
-            generate_dashboard_html(report_dict, dashboard_path)
-            report_dict['dashboardUrl'] = f"/dashboards/{report.id}_dashboard.html"
-            logger.info(f"Dashboard generated: {dashboard_path}")
-        except Exception as e:
-            logger.error(f"Dashboard generation failed: {str(e)}")
+        # Générer le guide d'implémentation
+        implementation_guide = schema_gen.generate_implementation_guide(schemas_data, job_doc['url'])
+        schemas_data['implementation_guide'] = implementation_guide
         
-        # Step 7.5: Generate Interactive Visibility Dashboard (NEW V2)
-        try:
-            from dashboard_visibility_generator import generate_interactive_dashboard
-            visibility_dashboard_path = f"/app/backend/dashboards/{report.id}_visibility_dashboard.html"
-            generate_interactive_dashboard(visibility_data, visibility_dashboard_path)
-            report_dict['visibilityDashboardUrl'] = f"/dashboards/{report.id}_visibility_dashboard.html"
-            logger.info(f"Interactive visibility dashboard generated: {visibility_dashboard_path}")
-        except Exception as e:
-            logger.error(f"Visibility dashboard generation failed: {str(e)}")
+        logger.info(f"Schema generation completed: {len(schemas_data)} schema types")
+    except Exception as e:
+        logger.error(f"Schema generation failed: {str(e)}")
+        schemas_data = {'error': str(e)}
+    
+    return schemas_data
+
+async def _stage_content(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Étape 5.5: Génération de contenu GEO-optimisé (Module 2)"""
+    job_doc = ctx['job_doc']
+    analysis_result = ctx['claude_analysis']
+    semantic_analysis = ctx['queries']['semantic_analysis']
+    
+    generated_articles = []
+    try:
+        logger.info("📝 Module 2: Generating GEO-optimized content...")
+        from content_generator import ContentGenerator
+        
+        content_gen = ContentGenerator()
+        
+        # Extraire les top opportunités (requêtes à faible visibilité)
+        opportunities = []
+        if analysis_result.get('recommendations'):
+            for rec in analysis_result.get('recommendations', [])[:5]:  # Limiter à 5 pour les coûts
+                opportunities.append({
+                    'query': rec.get('action', ''),
+                    'competitors_content': ''
+                })
         
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": 95}}
-        )
+        # Préparer le contexte du site
+        site_context = {
+            'industry': semantic_analysis.get('industry_classification', {}).get('primary_industry', 'services'),
+            'site_name': job_doc.get('url', '').replace('https://', '').replace('http://', '').split('/')[0],
+            'url': job_doc['url'],
+            'expertise': semantic_analysis.get('company_description', {}).get('value_proposition', '')
+        }
         
-        # Step 8: Save to history and generate alerts
-        try:
-            from database_manager import DatabaseManager
-            
-            # Nettoyer report_dict pour enlever les ObjectId non-serializable
-            def clean_for_json(obj):
-                """Nettoie les ObjectId et autres objets non-sérialisables"""
-                if isinstance(obj, dict):
-                    return {k: clean_for_json(v) for k, v in obj.items() if k != '_id'}
-                elif isinstance(obj, list):
-                    return [clean_for_json(item) for item in obj]
-                elif hasattr(obj, '__dict__'):
-                    return str(obj)
-                else:
-                    return obj
-            
-            clean_report_dict = clean_for_json(report_dict)
-            
-            db_manager = DatabaseManager()
-            db_manager.save_analysis(clean_report_dict)
+        # Générer les articles
+        if opportunities:
+            generated_articles = await content_gen.generate_articles(
+                opportunities,
+                site_context
+            )
+            logger.info(f"✅ Generated {len(generated_articles)} GEO-optimized articles")
+        else:
+            logger.warning("No opportunities found for content generation")
             
-            # Comparer avec analyse précédente
-            previous = db_manager.get_previous_analysis(job_doc['url'])
-            if previous:
-                alerts = db_manager.generate_alerts(clean_report_dict, previous)
-                if alerts:
-                    db_manager.save_alerts(job_doc['url'], alerts)
-                    report_dict['alerts'] = alerts
-                    logger.info(f"Generated {len(alerts)} alerts")
-        except Exception as e:
-            logger.error(f"History/alerts failed: {str(e)}")
-        
-        # Update report with all URLs
-        await db.reports.update_one(
-            {"id": report.id},
-            {"$set": {
-                "docxUrl": report_dict.get('docxUrl'),
-                "dashboardUrl": report_dict.get('dashboardUrl'),
-                "alerts": report_dict.get('alerts', [])
-            }}
-        )
-        
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {
-                "status": "completed",
-                "progress": 100,
-                "reportId": report.id,
-                "updatedAt": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
-        logger.info(f"Analysis completed for job {job_id}")
-        
     except Exception as e:
-        logger.error(f"Analysis job error: {str(e)}")
-        await db.analysis_jobs.update_one(
-            {"id": job_id},
-            {"$set": {
-                "status": "failed",
-                "error": str(e),
-                "updatedAt": datetime.now(timezone.utc).isoformat()
-            }}
+        logger.error(f"Content generation failed: {str(e)}")
+        generated_articles = []
+    
+    return generated_articles
+
+async def _stage_report(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Étape 6: Création du rapport avec données enrichies et scoring pondéré"""
+    job_doc = ctx['job_doc']
+    analysis_result = ctx['claude_analysis']
+    test_queries = ctx['queries']['queries']
+    data_gaps = ctx['data_gaps']
+    token_analysis = ctx['token_analysis']
+    generated_articles = ctx['content']
+    
+    scores_dict = analysis_result['scores']
+    
+    # Appliquer le scoring pondéré
+    weighted_global_score = Score.calculate_weighted_score(scores_dict)
+    scores_dict['global_score'] = weighted_global_score
+    
+    report = Report(
+        # Une relance d'étape réutilise l'id du rapport déjà produit par le job (remplacé, pas dupliqué)
+        id=job_doc.get('reportId') or str(uuid.uuid4()),
+        leadId=job_doc['leadId'],
+        url=job_doc['url'],
+        type="executive",
+        scores=Score(**scores_dict),
+        recommendations=[Recommendation(**rec) for rec in analysis_result.get('recommendations', [])[:20]],
+        quick_wins=[QuickWin(**qw) for qw in analysis_result.get('quick_wins', [])[:10]],
+        analysis=analysis_result.get('analysis'),
+        detailed_observations=analysis_result.get('detailed_observations'),
+        executive_summary=analysis_result.get('executive_summary'),
+        roi_estimation=analysis_result.get('roi_estimation'),
+        visibility_results=ctx['visibility']['data'],
+        test_queries=test_queries
+    )
+    
+    # Save report
+    report_dict = report.model_dump()
+    report_dict['createdAt'] = report_dict['createdAt'].isoformat()
+    report_dict['scores'] = report.scores.model_dump()
+    report_dict['recommendations'] = [rec.model_dump() for rec in report.recommendations]
+    report_dict['quick_wins'] = [qw.model_dump() for qw in report.quick_wins]
+    report_dict['test_queries'] = test_queries
+    report_dict['visibility_results'] = ctx['visibility']['compat']
+    
+    # Ajouter les données des modules avancés
+    report_dict['competitive_intelligence'] = ctx['competitive_analysis']
+    report_dict['schemas'] = ctx['schemas']
+    report_dict['semantic_analysis'] = ctx['queries']['semantic_analysis']
+    report_dict['query_breakdown'] = ctx['queries']['breakdown']
+    
+    # Ajouter Quick Wins (Phase 1)
+    if data_gaps:
+        report_dict['data_gap_analysis'] = data_gaps
+    if token_analysis:
+        report_dict['token_analysis'] = token_analysis
+    
+    # Ajouter Module 2 (Generated Articles)
+    if generated_articles:
+        report_dict['generated_articles'] = generated_articles
+        logger.info(f"Added {len(generated_articles)} generated articles to report")
+    
+    # Résumé dans reports, sections volumineuses compressées dans report_sections
+    await report_store.insert(report_dict)
+    
+    return report_dict
+
+def _stage_word_report(ctx: Dict[str, Any]) -> Optional[str]:
+    """Étape 6 (suite): Génération du rapport Word (50-70 pages)"""
+    report_dict = ctx['report']
+    try:
+        from word_report_generator import WordReportGenerator
+        word_generator = WordReportGenerator()
+        word_file_path = f"/app/backend/reports/{report_dict['id']}_report.docx"
+        word_generator.generate_report(report_dict, word_file_path)
+        logger.info(f"Word report generated: {word_file_path}")
+        return f"/reports/{report_dict['id']}_report.docx"
+    except Exception as e:
+        logger.error(f"Word report generation failed: {str(e)}")
+        return None
+
+def _stage_dashboard(ctx: Dict[str, Any]) -> Optional[str]:
+    """Étape 7: Génération du dashboard HTML"""
+    report_dict = ctx['report']
+    try:
+        from dashboard_generator import generate_dashboard_html
+        dashboard_path = f"/app/backend/dashboards/{report_dict['id']}_dashboard.html"
+        generate_dashboard_html(report_dict, dashboard_path)
+        logger.info(f"Dashboard generated: {dashboard_path}")
+        return f"/dashboards/{report_dict['id']}_dashboard.html"
+    except Exception as e:
+        logger.error(f"Dashboard generation failed: {str(e)}")
+        return None
+
+def _stage_visibility_dashboard(ctx: Dict[str, Any]) -> Optional[str]:
+    """Étape 7.5: Génération du dashboard interactif de visibilité (NEW V2)"""
+    report_id = ctx['report']['id']
+    try:
+        from dashboard_visibility_generator import generate_interactive_dashboard
+        visibility_dashboard_path = f"/app/backend/dashboards/{report_id}_visibility_dashboard.html"
+        generate_interactive_dashboard(ctx['visibility']['data'], visibility_dashboard_path)
+        logger.info(f"Interactive visibility dashboard generated: {visibility_dashboard_path}")
+        return f"/dashboards/{report_id}_visibility_dashboard.html"
+    except Exception as e:
+        logger.error(f"Visibility dashboard generation failed: {str(e)}")
+        return None
+
+async def _stage_history(ctx: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Étape 8: Sauvegarde dans l'historique et génération des alertes"""
+    report_dict = dict(ctx['report'])
+    report_dict['docxUrl'] = ctx['word_report']
+    report_dict['dashboardUrl'] = ctx['dashboard']
+    report_dict['visibilityDashboardUrl'] = ctx['visibility_dashboard']
+    
+    # Nettoyer report_dict pour enlever les ObjectId non-serializable
+    clean_report_dict = _clean_for_json(report_dict)
+    
+    # Séries de scores (MongoDB) : indépendantes de l'historique local du nœud
+    try:
+        await score_history.record_report(clean_report_dict)
+    except Exception as e:
+        logger.error(f"Score history failed: {str(e)}")
+    
+    try:
+        # Sauvegarde + comparaison avec l'analyse précédente (hors boucle d'événements)
+        alerts = await history_db.record_analysis_async(clean_report_dict)
+        if alerts:
+            logger.info(f"Generated {len(alerts)} alerts")
+        return alerts
+    except Exception as e:
+        logger.error(f"History/alerts failed: {str(e)}")
+    
+    return []
+
+def build_analysis_pipeline() -> StagePipeline:
+    """
+    Construit le graphe d'étapes du job d'analyse.
+    Les étapes ne dépendant que du crawl (tokens, schemas, requêtes) tournent en parallèle,
+    tout comme l'analyse Claude et l'intelligence compétitive après la visibilité.
+    """
+    return StagePipeline([
+        Stage('crawl', _stage_crawl, weight=3),
+        Stage('queries', _stage_queries, depends_on=['crawl'], weight=2),
+        Stage('token_analysis', _stage_token_analysis, depends_on=['crawl']),
+        Stage('schemas', _stage_schemas, depends_on=['crawl']),
+        Stage('data_gaps', _stage_data_gaps, depends_on=['crawl', 'queries']),
+        Stage('visibility', _stage_visibility, depends_on=['crawl', 'queries'], weight=3),
+        Stage('competitors', _stage_competitors, depends_on=['visibility', 'data_gaps'], weight=2,
+              on_restore=_restore_competitors),
+        Stage('claude_analysis', _stage_claude_analysis, depends_on=['crawl', 'visibility'], weight=2),
+        Stage('competitive_analysis', _stage_competitive_analysis, depends_on=['visibility', 'queries', 'data_gaps'], weight=2),
+        Stage('content', _stage_content, depends_on=['claude_analysis', 'queries'], weight=2),
+        Stage('report', _stage_report, depends_on=[
+            'claude_analysis', 'competitive_analysis', 'competitors', 'schemas',
+            'data_gaps', 'token_analysis', 'content'
+        ]),
+        Stage('word_report', _stage_word_report, depends_on=['report']),
+        Stage('dashboard', _stage_dashboard, depends_on=['report']),
+        Stage('visibility_dashboard', _stage_visibility_dashboard, depends_on=['report']),
+        Stage('history', _stage_history, depends_on=['word_report', 'dashboard', 'visibility_dashboard']),
+    ], progress_start=10, progress_end=95)
+
+async def process_analysis_job(job_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Exécute le pipeline d'analyse d'un job réclamé par un worker (voir worker.py).
+    Les étapes déjà terminées (checkpoints) ne sont pas ré-exécutées.
+    Les erreurs remontent à la file de jobs (reprise avec backoff ou échec définitif).
+
+    Returns:
+        Champs à enregistrer sur le job terminé
+    """
+    job_id = job_doc['id']
+
+    await db.analysis_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"progress": 10, "completedStages": [], "stage_timings": {}}}
+    )
+
+    # Progress ticks are pushed to local subscribers at once, written to Mongo in batches
+    progress_writer = JobProgressWriter(db.analysis_jobs, job_id, hub=job_events)
+
+    async def report_progress(stage_name: str, progress: int, timings: Dict[str, float]):
+        progress_writer.update({"progress": progress, "stage_timings": timings}, completed_stage=stage_name)
+
+    async def save_checkpoint(stage_name: str, result: Any):
+        try:
+            await checkpoint_store.save(job_id, stage_name, result)
+        except Exception as e:
+            logger.warning(f"Checkpoint save failed for {job_id}/{stage_name}: {str(e)}")
+
+    checkpoints = await checkpoint_store.load(job_id)
+
+    pipeline = build_analysis_pipeline()
+    try:
+        results = await pipeline.run(
+            context={'job_id': job_id, 'job_doc': job_doc, 'artifacts': ArtifactStore()},
+            on_progress=report_progress,
+            checkpoints=checkpoints,
+            on_result=save_checkpoint
         )
+    finally:
+        await progress_writer.close()
+    if pipeline.restored:
+        logger.info(f"Job {job_id} resumed: {len(pipeline.restored)} stages restored from checkpoints")
+
+    report_id = results['report']['id']
+
+    # Update report with all URLs
+    await db.reports.update_one(
+        {"id": report_id},
+        {"$set": {
+            "docxUrl": results['word_report'],
+            "dashboardUrl": results['dashboard'],
+            "alerts": results['history']
+        }}
+    )
+
+    logger.info(f"Analysis completed for job {job_id} - stage timings: {pipeline.timings} - artifacts: {results['artifacts'].stats()}")
+
+    return {"reportId": report_id, "stage_timings": pipeline.timings}
 
 # API Routes
 @api_router.post("/leads", response_model=Lead)
-async def create_lead(lead_input: LeadCreate, background_tasks: BackgroundTasks):
+async def create_lead(lead_input: LeadCreate):
     """Submit lead form and start analysis"""
     try:
         # Create lead
@@ -944,10 +974,8 @@ async def create_lead(lead_input: LeadCreate, background_tasks: BackgroundTasks)
         job_dict['createdAt'] = job_dict['createdAt'].isoformat()
         job_dict['updatedAt'] = job_dict['updatedAt'].isoformat()
         
-        await db.analysis_jobs.insert_one(job_dict)
-        
-        # Start background analysis
-        background_tasks.add_task(process_analysis_job, job.id)
+        # Enqueue analysis (processed by the workers, see worker.py)
+        await job_queue.enqueue(job_dict)
         
         return lead
         
@@ -969,11 +997,68 @@ async def get_job_status(job_id: str):
         logger.error(f"Job status error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Stream job progress as server-sent events (replaces polling GET /jobs/{job_id})"""
+    async def event_source():
+        found = False
+        async with aclosing(job_events.stream(job_id)) as states:
+            async for state in states:
+                if await request.is_disconnected():
+                    break
+                if state is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                found = True
+                yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+        if not found:
+            yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/jobs/{job_id}/stages/{stage}/rerun")
+async def rerun_job_stage(job_id: str, stage: str):
+    """
+    Operator: force re-running a stage (and the stages depending on it).
+    The other stages are restored from their checkpoints, e.g. re-render the
+    Word report after a template fix without recomputing the analysis.
+    """
+    try:
+        pipeline = build_analysis_pipeline()
+        if stage not in pipeline.stages:
+            raise HTTPException(status_code=400, detail=f"Unknown stage: {stage}")
+
+        job = await db.analysis_jobs.find_one({"id": job_id}, {"_id": 0, "status": 1})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        if job['status'] not in ('completed', 'failed'):
+            raise HTTPException(status_code=409, detail=f"Job is {job['status']}, wait for it to finish")
+
+        await checkpoint_store.delete(job_id, [stage])
+        if not await job_queue.requeue(job_id):
+            raise HTTPException(status_code=409, detail="Job was picked up meanwhile")
+
+        return {"jobId": job_id, "status": "pending", "rerun": stage}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Stage rerun error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/reports/{report_id}")
-async def get_report(report_id: str):
-    """Get report by ID"""
+async def get_report(report_id: str, fields: Optional[str] = None, include: Optional[str] = None):
+    """
+    Get report by ID: light summary by default.
+    fields: comma-separated summary fields to return; include: comma-separated
+    sections to attach (visibility_results, competitive_intelligence, schemas... or 'all')
+    """
     try:
-        report = await db.reports.find_one({"id": report_id}, {"_id": 0})
+        report = await report_store.get(report_id, fields=parse_field_list(fields), include=parse_field_list(include))
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
         return report
@@ -989,7 +1074,7 @@ async def download_report_pdf(report_id: str):
     from fastapi.responses import Response
     
     try:
-        report_doc = await db.reports.find_one({"id": report_id}, {"_id": 0})
+        report_doc = await report_store.get(report_id)
         if not report_doc:
             raise HTTPException(status_code=404, detail="Report not found")
         
@@ -1064,25 +1149,64 @@ async def view_dashboard(report_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/leads")
-async def get_all_leads():
-    """Get all leads with their reports"""
+async def get_all_leads(
+    limit: int = LEADS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    email: Optional[str] = None,
+    url: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None
+):
+    """Get leads (newest first) with their report summaries and latest job, one page at a time"""
     try:
-        leads = await db.leads.find({}, {"_id": 0}).sort("createdAt", -1).to_list(100)
-        
-        # Get reports for each lead
-        for lead in leads:
-            reports = await db.reports.find({"leadId": lead['id']}, {"_id": 0}).to_list(10)
-            lead['reports'] = reports
-            
-            # Get job status
-            jobs = await db.analysis_jobs.find({"leadId": lead['id']}, {"_id": 0}).sort("createdAt", -1).to_list(1)
-            lead['latestJob'] = jobs[0] if jobs else None
-        
-        return leads
+        try:
+            pipeline = build_leads_pipeline(
+                limit=limit, cursor=cursor, status=status, email=email, url=url,
+                created_from=created_from, created_to=created_to
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        leads = await db.leads.aggregate(pipeline).to_list(None)
+        return paginate(leads, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get leads error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/trends")
+async def get_score_trends(
+    sites: Optional[str] = None,
+    granularity: str = 'week',
+    metrics: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """
+    Score trends from the analysis history, read from pre-aggregated rollups.
+    sites: comma-separated site URLs (one site or a portfolio, default: all);
+    granularity: day, week or month; metrics: comma-separated (global_score, eeat,
+    overall_visibility, platform:chatgpt...); start/end: ISO 8601 bounds
+    """
+    try:
+        site_urls = parse_field_list(sites)
+        if site_urls and len(site_urls) > TRENDS_MAX_SITES:
+            raise HTTPException(status_code=400, detail=f"Too many sites (max {TRENDS_MAX_SITES})")
+
+        try:
+            return await score_history.get_trends(
+                site_urls, granularity=granularity, metrics=parse_field_list(metrics), start=start, end=end
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get trends error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/")
 async def root():
     return {"message": "GEO SaaS API", "version": "1.0"}
@@ -1098,6 +1222,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def bootstrap_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_embedded_worker():
+    # Dev only: in production, analyses run in separate worker processes (python worker.py)
+    if JOB_EMBEDDED_WORKER:
+        try:
+            await score_history.import_history(history_db)
+        except Exception as e:
+            logger.warning(f"Score history import failed: {str(e)}")
+        app.state.worker_task = asyncio.create_task(job_queue.run_worker(process_analysis_job))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if JOB_EMBEDDED_WORKER:
+        # In-flight jobs are resumed by the next worker once their lease expires
+        job_queue.stop()
+        app.state.worker_task.cancel()
     client.close()
@@ -7,11 +7,38 @@ import json
 import logging
 import asyncio
 import re
+import hashlib
 from typing import Dict, Any, Optional
 from anthropic import AsyncAnthropic
 
+from config import CACHE_TTL_HOURS
+
 logger = logging.getLogger(__name__)
 
+# Version de la grille de scoring et du format de réponse : à incrémenter à chaque
+# modification du prompt ou du parsing pour invalider les analyses cachées
+SCORING_GRID_VERSION = '4'
+
+# Précision des flottants (taux de visibilité 0-1) dans le prompt et la clé de cache
+VISIBILITY_FLOAT_DIGITS = 3
+
+
+def _canonicalize(value: Any) -> Any:
+    """Arrondit récursivement les flottants (les écarts de précision ne changent ni le prompt ni la clé)"""
+    if isinstance(value, float):
+        return round(value, VISIBILITY_FLOAT_DIGITS)
+    if isinstance(value, dict):
+        return {key: _canonicalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(item) for item in value]
+    return value
+
+
+def _stable_hash(value: Any) -> str:
+    """Hash SHA-256 d'une sérialisation JSON canonique"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 
 class AnalyzerService:
     """Service pour l'analyse sémantique avec Claude"""
@@ -47,24 +74,26 @@ class AnalyzerService:
             Dict contenant scores, observations, recommendations, quick_wins
         """
         
+        # Préparer les données pour Claude
+        pages_summary = self._prepare_pages_summary(crawl_data)
+        visibility_summary = _canonicalize(visibility_data) if visibility_data else None
+        
         # ============ CACHE CHECK ============
-        cached_result = None
         cache_key = None
+        fingerprints = None
         
         if use_cache:
             try:
-                cached_result, cache_key = await self._check_cache(crawl_data, visibility_data)
+                fingerprints = self._cache_fingerprints(crawl_data, pages_summary, visibility_summary)
+                cache_key = self._cache_key(fingerprints)
+                cached_result = await self._check_cache(cache_key, fingerprints, crawl_data.get('base_url', ''))
                 if cached_result:
-                    logger.info("✅ CACHE HIT - saved ~$0.50 API cost")
                     return cached_result
-                logger.info("💰 CACHE MISS - calling Claude...")
             except Exception as e:
                 logger.debug(f"Cache check failed: {e}")
         # =====================================
         
-        # Préparer les données pour Claude
-        pages_summary = self._prepare_pages_summary(crawl_data)
-        analysis_prompt = self._build_analysis_prompt(crawl_data, pages_summary, visibility_data)
+        analysis_prompt = self._build_analysis_prompt(crawl_data, pages_summary, visibility_summary)
         
         # Appeler Claude avec retry
         response_text = await self._call_claude_with_retry(analysis_prompt, retry_count)
@@ -75,37 +104,92 @@ class AnalyzerService:
         # Sauvegarder en cache si activé
         if use_cache and cache_key:
             try:
-                from services.cache_service import cache_service
-                cache_service.set(cache_key, analysis_result)
-                logger.info("💾 Résultat sauvegardé en cache")
+                from services.cache_service import analysis_cache_service
+                if analysis_cache_service.set(cache_key, analysis_result):
+                    # Empreintes de la dernière analyse du site, pour expliquer les prochains MISS
+                    analysis_cache_service.set(
+                        self._site_index_key(crawl_data.get('base_url', '')),
+                        {'cache_key': cache_key, 'fingerprints': fingerprints}
+                    )
+                    logger.info("💾 Résultat sauvegardé en cache")
             except Exception as e:
                 logger.debug(f"Cache save failed: {e}")
         
         return analysis_result
     
+    def _cache_fingerprints(
+        self,
+        crawl_data: Dict[str, Any],
+        pages_summary: list,
+        visibility_summary: Optional[Dict[str, Any]]
+    ) -> Dict[str, str]:
+        """
+        Empreintes des entrées du prompt : contenu des pages, visibilité,
+        version de la grille de scoring et paramètres du modèle
+        """
+        return {
+            'content': _stable_hash({
+                'base_url': crawl_data.get('base_url', ''),
+                'pages_crawled': crawl_data.get('pages_crawled'),
+                'pages': pages_summary
+            }),
+            'visibility': _stable_hash(visibility_summary),
+            'grid': SCORING_GRID_VERSION,
+            'model': _stable_hash({
+                'model': self.model,
+                'max_tokens': self.max_tokens,
+                'temperature': self.temperature
+            })
+        }
+    
+    @staticmethod
+    def _cache_key(fingerprints: Dict[str, str]) -> str:
+        """Clé de cache adressée par contenu (hash canonique des empreintes)"""
+        return f"claude_analysis:{_stable_hash(fingerprints)}"
+    
+    @staticmethod
+    def _site_index_key(base_url: str) -> str:
+        """Clé de l'index des dernières empreintes analysées pour un site"""
+        return f"claude_analysis_site:{base_url}"
+    
     async def _check_cache(
         self, 
-        crawl_data: Dict[str, Any], 
-        visibility_data: Optional[Dict[str, Any]]
-    ) -> tuple[Optional[Dict], Optional[str]]:
-        """Vérifie si le résultat est en cache"""
+        cache_key: str,
+        fingerprints: Dict[str, str],
+        base_url: str
+    ) -> Optional[Dict]:
+        """Vérifie si le résultat est en cache et journalise la raison du HIT/MISS"""
         try:
-            from services.cache_service import cache_service
-            import hashlib
+            from services.cache_service import analysis_cache_service
             
-            cache_key_data = {
-                'base_url': crawl_data.get('base_url', ''),
-                'pages_count': len(crawl_data.get('pages', [])),
-                'vis_score': visibility_data.get('overall_visibility', 0) if visibility_data else 0,
-                'v': '3'
-            }
-            cache_key = f"claude_v3_{hashlib.md5(json.dumps(cache_key_data, sort_keys=True).encode()).hexdigest()}"
+            if not analysis_cache_service.enabled or not analysis_cache_service.enabled_check():
+                logger.info("💰 CACHE MISS (analysis cache disabled) - calling Claude...")
+                return None
+            
+            cached = analysis_cache_service.get(cache_key, max_age_hours=CACHE_TTL_HOURS)
+            if cached:
+                logger.info(f"✅ CACHE HIT for {base_url} (same content, visibility, grid v{SCORING_GRID_VERSION} and model) - saved ~$0.50 API cost")
+                return cached
             
-            cached = cache_service.get(cache_key, max_age_hours=168)  # 7 jours
-            return cached, cache_key
+            logger.info(f"💰 CACHE MISS for {base_url} ({self._miss_reason(cache_key, fingerprints, base_url)}) - calling Claude...")
+            return None
         except Exception as e:
             logger.debug(f"Cache check error: {e}")
-            return None, None
+            return None
+    
+    def _miss_reason(self, cache_key: str, fingerprints: Dict[str, str], base_url: str) -> str:
+        """Compare avec la dernière analyse du site pour expliquer un MISS"""
+        from services.cache_service import analysis_cache_service
+        
+        previous = analysis_cache_service.get(self._site_index_key(base_url), max_age_hours=CACHE_TTL_HOURS)
+        if not previous:
+            return "no previous analysis for this site"
+        if previous.get('cache_key') == cache_key:
+            return "previous result expired or evicted"
+        
+        previous_fingerprints = previous.get('fingerprints', {})
+        changed = [name for name, value in fingerprints.items() if previous_fingerprints.get(name) != value]
+        return f"changed: {', '.join(changed)}" if changed else "unknown"
     
     def _prepare_pages_summary(self, crawl_data: Dict[str, Any]) -> list:
         """Prépare un résumé des pages pour Claude"""
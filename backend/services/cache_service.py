@@ -1,213 +1,387 @@
 """
-Service de cache local avec fichiers JSON
+Service de cache local indexé (SQLite en mode WAL)
 Évite les appels API coûteux pour les analyses récentes
+Valeurs JSON compressées, TTL vérifié sur l'index, budget en octets avec éviction LRU,
+accès concurrent sûr entre threads et processus workers
 """
 import json
 import hashlib
 import logging
+import sqlite3
+import threading
+import time
+import zlib
 from pathlib import Path
-from datetime import datetime, timedelta
 from typing import Optional, Any, Callable
 from functools import wraps
 
 from config import (
     CACHE_DIR,
+    CACHE_DB_NAME,
+    CACHE_MAX_BYTES,
     CACHE_TTL_HOURS,
     CACHE_ENABLED,
+    is_analysis_cache_enabled,
     is_cache_enabled
 )
 
 logger = logging.getLogger(__name__)
 
+# Délai d'attente quand un autre processus tient le verrou d'écriture
+BUSY_TIMEOUT_MS = 5000
+
+# Intervalle minimal entre deux mises à jour de last_access d'une entrée (évite une écriture par lecture)
+ACCESS_TOUCH_INTERVAL_SECONDS = 60
+
+# Après dépassement d'une limite, on élague à 90% pour ne pas évincer à chaque écriture
+EVICTION_TARGET_RATIO = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key_hash TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_created_at ON cache_entries (created_at);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries (last_access);
+
+-- Totaux maintenus par triggers : les limites se vérifient sans parcourir la table
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totals (id, entries, bytes) VALUES (1, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS cache_entries_insert AFTER INSERT ON cache_entries BEGIN
+    UPDATE cache_totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_delete AFTER DELETE ON cache_entries BEGIN
+    UPDATE cache_totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_update AFTER UPDATE OF size ON cache_entries BEGIN
+    UPDATE cache_totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 1;
+END;
+"""
+
 
 class CacheService:
-    """Service de cache simple basé sur des fichiers JSON"""
-    
-    def __init__(self, cache_dir: Path = CACHE_DIR):
-        self.cache_dir = cache_dir
-        self.cache_dir.mkdir(exist_ok=True)
+    """Service de cache basé sur une base SQLite indexée (un fichier par dossier de cache)"""
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = CACHE_MAX_BYTES,
+        enabled_check: Callable[[], bool] = is_cache_enabled
+    ):
+        """
+        Args:
+            cache_dir: Dossier contenant la base de cache
+            max_entries: Nombre max d'entrées (les moins récemment utilisées sont évincées au-delà)
+            max_bytes: Taille max des valeurs compressées en octets (éviction LRU au-delà, None = illimité)
+            enabled_check: Condition d'activation évaluée à chaque appel (défaut: désactivé en prod)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / CACHE_DB_NAME
         self.enabled = CACHE_ENABLED
-    
+        self.enabled_check = enabled_check
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Une connexion par thread (les appels async passent par asyncio.to_thread)
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée à la demande)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(self.db_path),
+                timeout=BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None  # Transactions explicites
+            )
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        """Active le mode WAL et crée la table, les index et les triggers de totaux"""
+        try:
+            conn = self._connect()
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to initialize cache database {self.db_path}: {e}")
+
     def _get_cache_key_hash(self, key: str) -> str:
         """Génère un hash MD5 pour la clé de cache"""
         return hashlib.md5(key.encode()).hexdigest()
-    
-    def _get_cache_file_path(self, key: str) -> Path:
-        """Retourne le chemin du fichier de cache"""
-        key_hash = self._get_cache_key_hash(key)
-        return self.cache_dir / f"{key_hash}.json"
-    
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        """Sérialise une valeur en JSON compact compressé"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        return zlib.compress(payload.encode('utf-8'), 6)
+
+    @staticmethod
+    def _decode(blob: bytes) -> Any:
+        """Décompresse et désérialise une valeur"""
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
     def get(self, key: str, max_age_hours: Optional[int] = None) -> Optional[Any]:
         """
         Récupère une valeur depuis le cache
-        
+
         Args:
             key: Clé de cache
             max_age_hours: Âge maximum en heures (défaut: CACHE_TTL_HOURS)
-            
+
         Returns:
             Valeur cachée ou None si pas trouvée/expirée
         """
-        if not self.enabled or not is_cache_enabled():
+        if not self.enabled or not self.enabled_check():
             return None
-        
+
         max_age = max_age_hours if max_age_hours is not None else CACHE_TTL_HOURS
-        cache_file = self._get_cache_file_path(key)
-        
-        if not cache_file.exists():
-            return None
-        
+        key_hash = self._get_cache_key_hash(key)
+        now = time.time()
+
         try:
-            # Vérifier l'âge du fichier
-            file_time = datetime.fromtimestamp(cache_file.stat().st_mtime)
-            age = datetime.now() - file_time
-            
-            if age > timedelta(hours=max_age):
-                # Cache expiré, supprimer
-                cache_file.unlink()
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at, last_access FROM cache_entries WHERE key_hash = ?",
+                (key_hash,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            blob, created_at, last_access = row
+
+            # Vérifier l'âge depuis l'index (sans décompresser la valeur)
+            if now - created_at > max_age * 3600:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE key_hash = ? AND created_at = ?",
+                    (key_hash, created_at)
+                )
                 logger.debug(f"Cache expired for key: {key[:50]}...")
                 return None
-            
-            # Lire le cache
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                logger.info(f"✅ Cache HIT for key: {key[:50]}...")
-                return data.get('value')
-                
-        except Exception as e:
+
+            value = self._decode(blob)
+
+            if now - last_access > ACCESS_TOUCH_INTERVAL_SECONDS:
+                conn.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE key_hash = ?",
+                    (now, key_hash)
+                )
+
+            logger.info(f"✅ Cache HIT for key: {key[:50]}...")
+            return value
+
+        except (sqlite3.Error, zlib.error, ValueError) as e:
             logger.warning(f"Failed to read cache for {key[:50]}...: {e}")
-            # En cas d'erreur, supprimer le fichier corrompu
+            # En cas d'entrée corrompue, la supprimer
             try:
-                cache_file.unlink()
-            except Exception:
+                self._connect().execute("DELETE FROM cache_entries WHERE key_hash = ?", (key_hash,))
+            except sqlite3.Error:
                 pass
             return None
-    
+
     def set(self, key: str, value: Any) -> bool:
         """
         Sauvegarde une valeur dans le cache
-        
+
         Args:
             key: Clé de cache
             value: Valeur à cacher (doit être JSON serializable)
-            
+
         Returns:
             True si succès, False sinon
         """
-        if not self.enabled or not is_cache_enabled():
+        if not self.enabled or not self.enabled_check():
             return False
-        
-        cache_file = self._get_cache_file_path(key)
-        
+
         try:
-            data = {
-                'key': key,
-                'value': value,
-                'cached_at': datetime.now().isoformat()
-            }
-            
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
+            blob = self._encode(value)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Failed to serialize cache value for {key[:50]}...: {e}")
+            return False
+
+        now = time.time()
+
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    """
+                    INSERT INTO cache_entries (key_hash, key, value, size, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (key_hash) DO UPDATE SET
+                        value = excluded.value,
+                        size = excluded.size,
+                        created_at = excluded.created_at,
+                        last_access = excluded.last_access
+                    """,
+                    (self._get_cache_key_hash(key), key, blob, len(blob), now, now)
+                )
+                self._enforce_limits(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
             logger.info(f"💾 Cache SET for key: {key[:50]}...")
             return True
-            
-        except Exception as e:
+
+        except sqlite3.Error as e:
             logger.error(f"Failed to write cache for {key[:50]}...: {e}")
             return False
-    
+
+    def _enforce_limits(self, conn: sqlite3.Connection) -> int:
+        """
+        Évince les entrées les moins récemment utilisées quand max_entries ou max_bytes
+        est dépassé (appelé dans la transaction d'écriture)
+
+        Returns:
+            Nombre d'entrées évincées
+        """
+        entries, total_bytes = conn.execute(
+            "SELECT entries, bytes FROM cache_totals WHERE id = 1"
+        ).fetchone()
+
+        over_entries = self.max_entries is not None and entries > self.max_entries
+        over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+        if not over_entries and not over_bytes:
+            return 0
+
+        target_entries = max(1, int(self.max_entries * EVICTION_TARGET_RATIO)) if self.max_entries else entries
+        target_bytes = int(self.max_bytes * EVICTION_TARGET_RATIO) if self.max_bytes is not None else total_bytes
+
+        evicted = []
+        cursor = conn.execute("SELECT key_hash, size FROM cache_entries ORDER BY last_access ASC")
+        for key_hash, size in cursor:
+            if entries <= target_entries and total_bytes <= target_bytes:
+                break
+            # Toujours garder au moins l'entrée qui vient d'être écrite
+            if entries <= 1:
+                break
+            evicted.append((key_hash,))
+            entries -= 1
+            total_bytes -= size
+        cursor.close()
+
+        conn.executemany("DELETE FROM cache_entries WHERE key_hash = ?", evicted)
+        logger.debug(
+            f"🗑️  Evicted {len(evicted)} cache entries "
+            f"(max_entries={self.max_entries}, max_bytes={self.max_bytes})"
+        )
+        return len(evicted)
+
     def delete(self, key: str) -> bool:
         """
         Supprime une entrée du cache
-        
+
         Args:
             key: Clé à supprimer
-            
+
         Returns:
             True si supprimé, False si pas trouvé
         """
-        cache_file = self._get_cache_file_path(key)
-        
-        if cache_file.exists():
-            try:
-                cache_file.unlink()
-                logger.info(f"🗑️  Cache DELETE for key: {key[:50]}...")
-                return True
-            except Exception as e:
-                logger.error(f"Failed to delete cache for {key[:50]}...: {e}")
-                return False
-        
+        try:
+            cursor = self._connect().execute(
+                "DELETE FROM cache_entries WHERE key_hash = ?",
+                (self._get_cache_key_hash(key),)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to delete cache for {key[:50]}...: {e}")
+            return False
+
+        if cursor.rowcount > 0:
+            logger.info(f"🗑️  Cache DELETE for key: {key[:50]}...")
+            return True
+
         return False
-    
+
     def clear_all(self) -> int:
         """
         Vide tout le cache
-        
+
         Returns:
-            Nombre de fichiers supprimés
+            Nombre d'entrées supprimées
         """
-        count = 0
-        
-        for cache_file in self.cache_dir.glob("*.json"):
-            try:
-                cache_file.unlink()
-                count += 1
-            except Exception as e:
-                logger.error(f"Failed to delete {cache_file}: {e}")
-        
-        logger.info(f"🗑️  Cleared {count} cache files")
+        try:
+            count = self._connect().execute("DELETE FROM cache_entries").rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Failed to clear cache {self.db_path}: {e}")
+            return 0
+
+        logger.info(f"🗑️  Cleared {count} cache entries")
         return count
-    
+
     def cleanup_expired(self, max_age_hours: Optional[int] = None) -> int:
         """
-        Supprime les fichiers de cache expirés
-        
+        Supprime les entrées de cache expirées (parcours de l'index created_at)
+
         Args:
             max_age_hours: Âge maximum (défaut: CACHE_TTL_HOURS)
-            
+
         Returns:
-            Nombre de fichiers supprimés
+            Nombre d'entrées supprimées
         """
         max_age = max_age_hours if max_age_hours is not None else CACHE_TTL_HOURS
-        cutoff_time = datetime.now() - timedelta(hours=max_age)
-        count = 0
-        
-        for cache_file in self.cache_dir.glob("*.json"):
-            try:
-                file_time = datetime.fromtimestamp(cache_file.stat().st_mtime)
-                if file_time < cutoff_time:
-                    cache_file.unlink()
-                    count += 1
-            except Exception as e:
-                logger.error(f"Failed to cleanup {cache_file}: {e}")
-        
+        cutoff_time = time.time() - max_age * 3600
+
+        try:
+            count = self._connect().execute(
+                "DELETE FROM cache_entries WHERE created_at < ?",
+                (cutoff_time,)
+            ).rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Failed to cleanup cache {self.db_path}: {e}")
+            return 0
+
         if count > 0:
-            logger.info(f"🗑️  Cleaned up {count} expired cache files")
-        
+            logger.info(f"🗑️  Cleaned up {count} expired cache entries")
+
         return count
-    
+
     def get_cache_stats(self) -> dict:
         """
         Retourne des statistiques sur le cache
-        
+
         Returns:
             Dictionnaire avec les stats
         """
-        cache_files = list(self.cache_dir.glob("*.json"))
-        total_size = sum(f.stat().st_size for f in cache_files)
-        
+        try:
+            entries, total_bytes = self._connect().execute(
+                "SELECT entries, bytes FROM cache_totals WHERE id = 1"
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read cache stats {self.db_path}: {e}")
+            entries, total_bytes = 0, 0
+
         return {
             'enabled': self.enabled,
-            'total_files': len(cache_files),
-            'total_size_mb': round(total_size / (1024 * 1024), 2),
-            'cache_dir': str(self.cache_dir)
+            'total_entries': entries,
+            'total_size_mb': round(total_bytes / (1024 * 1024), 2),
+            'max_entries': self.max_entries,
+            'max_size_mb': round(self.max_bytes / (1024 * 1024), 2) if self.max_bytes is not None else None,
+            'cache_dir': str(self.cache_dir),
+            'db_path': str(self.db_path)
         }
 
 
 def cache_result(key_prefix: str, max_age_hours: Optional[int] = None):
     """
     Décorateur pour cacher automatiquement le résultat d'une fonction
-    
+
     Usage:
         @cache_result("analysis", max_age_hours=168)
         async def analyze_site(url: str):
@@ -216,27 +390,31 @@ def cache_result(key_prefix: str, max_age_hours: Optional[int] = None):
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            cache = CacheService()
-            
+            cache = cache_service
+
             # Générer une clé unique basée sur les arguments
             cache_key = f"{key_prefix}:{str(args)}:{str(kwargs)}"
-            
+
             # Vérifier le cache
             cached_value = cache.get(cache_key, max_age_hours)
             if cached_value is not None:
                 return cached_value
-            
+
             # Exécuter la fonction
             result = await func(*args, **kwargs)
-            
+
             # Cacher le résultat
             cache.set(cache_key, result)
-            
+
             return result
-        
+
         return wrapper
     return decorator
 
 
 # Instance globale du cache
 cache_service = CacheService()
+
+# Cache des analyses Claude (rapport 8 critères, analyse sémantique) : clés adressées
+# par contenu, donc actif en production
+analysis_cache_service = CacheService(enabled_check=is_analysis_cache_enabled)
@@ -0,0 +1,52 @@
+"""
+Checkpoints des étapes du pipeline d'analyse
+Le résultat de chaque étape terminée est conservé (JSON compressé) pour le job :
+un job relancé (reprise après échec, relance forcée d'une étape) repart de la première
+étape incomplète au lieu de refaire crawl, analyse sémantique, tests LLM et CI.
+"""
+import asyncio
+import logging
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable
+
+from utils.compression import pack_json, unpack_json
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStore:
+    """Résultats d'étapes par (job, étape), dans une collection dédiée (hors document du job)"""
+
+    def __init__(self, collection):
+        """
+        Args:
+            collection: Collection Motor des checkpoints (db.job_checkpoints) ;
+                        index TTL sur createdAt créé au démarrage (services/db_indexes.py)
+        """
+        self.collection = collection
+
+    async def save(self, job_id: str, stage: str, result: Any):
+        """Enregistre (ou remplace) le résultat d'une étape"""
+        data = await asyncio.to_thread(pack_json, result)
+        await self.collection.update_one(
+            {'jobId': job_id, 'stage': stage},
+            {'$set': {'data': data, 'size': len(data), 'createdAt': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        logger.debug(f"💾 Checkpoint saved: {job_id}/{stage} ({len(data)} bytes)")
+
+    async def load(self, job_id: str) -> Dict[str, Any]:
+        """Résultats des étapes terminées du job {étape: résultat}"""
+        checkpoints = {}
+        async for doc in self.collection.find({'jobId': job_id}, {'_id': 0, 'stage': 1, 'data': 1}):
+            try:
+                checkpoints[doc['stage']] = await asyncio.to_thread(unpack_json, doc['data'])
+            except (zlib.error, ValueError) as e:
+                logger.warning(f"⚠️  Unreadable checkpoint {job_id}/{doc['stage']}, stage will re-run: {e}")
+        return checkpoints
+
+    async def delete(self, job_id: str, stages: Iterable[str]) -> int:
+        """Supprime les checkpoints des étapes (elles et leurs dépendantes seront ré-exécutées)"""
+        result = await self.collection.delete_many({'jobId': job_id, 'stage': {'$in': list(stages)}})
+        return result.deleted_count
@@ -65,18 +65,23 @@ class CleanupService:
     
     def cleanup_cache(self, days: int = CLEANUP_CACHE_DAYS) -> int:
         """
-        Supprime les fichiers de cache > X jours
+        Supprime les entrées de cache > X jours
+        (base SQLite du cache, plus les anciens fichiers JSON du cache fichier)
+        Les profils de compétiteurs suivent leur propre âge maximal
         
         Args:
             days: Nombre de jours après lesquels supprimer
             
         Returns:
-            Nombre de fichiers supprimés
+            Nombre d'entrées et de fichiers supprimés
         """
         if not self.cache_dir.exists():
             return 0
         
-        deleted_count = 0
+        from services.cache_service import cache_service
+        from services.competitor_profile_store import competitor_profile_store
+        deleted_count = cache_service.cleanup_expired(max_age_hours=days * 24)
+        deleted_count += competitor_profile_store.cleanup_expired()
         cutoff_time = time.time() - (days * 86400)
         
         for cache_file in self.cache_dir.glob("*.json"):
@@ -89,7 +94,7 @@ class CleanupService:
                 logger.error(f"Failed to delete cache {cache_file.name}: {e}")
         
         if deleted_count > 0:
-            logger.info(f"🗑️  Deleted {deleted_count} cache files (>{days} days)")
+            logger.info(f"🗑️  Deleted {deleted_count} cache entries (>{days} days)")
         
         return deleted_count
     
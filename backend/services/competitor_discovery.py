@@ -3,16 +3,18 @@ Service de découverte intelligente de compétiteurs RÉELS
 Pipeline complet en 3 étages sans code incomplet
 Version 2 - Production ready
 """
+import asyncio
 import logging
-import requests
 import socket
-import time
 import re
 import hashlib
 from typing import List, Dict, Any, Optional, Tuple, Set
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, quote_plus
+from urllib.parse import urlparse
 from collections import Counter
+import httpx
+
+from services.search_providers import WebSearchService, web_search_service
+from utils.html_features import extract_page_features
 
 logger = logging.getLogger(__name__)
 
@@ -21,24 +23,35 @@ class CompetitorDiscovery:
     """
     Découvre de vrais compétiteurs via pipeline 3 étages:
     1. Extraction depuis visibilité/LLM (via CompetitorExtractor)
-    2. Recherche web structurée (Google + fallback Claude)
+    2. Recherche web structurée (fournisseurs de recherche mis en course)
     3. Validation, scoring et sélection finale
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        search_service: Optional[WebSearchService] = None
+    ):
+        """
+        Args:
+            transport: Transport httpx de la validation (tests)
+            search_service: Recherche web multi-fournisseurs (défaut: web_search_service)
+        """
         from config import (
-            COMPETITOR_SEARCH_TIMEOUT,
-            COMPETITOR_SEARCH_DELAY,
             COMPETITOR_VALIDATION_TIMEOUT,
+            COMPETITOR_VALIDATION_DEADLINE,
+            COMPETITOR_VALIDATION_CONCURRENCY,
             COMPETITOR_MAX_RETRIES,
             COMPETITOR_RELEVANCE_THRESHOLD_DIRECT,
             COMPETITOR_RELEVANCE_THRESHOLD_INDIRECT,
             MAX_COMPETITORS
         )
         
-        self.search_timeout = COMPETITOR_SEARCH_TIMEOUT
-        self.search_delay = COMPETITOR_SEARCH_DELAY
+        self.search_service = search_service or web_search_service
         self.validation_timeout = COMPETITOR_VALIDATION_TIMEOUT
+        self.validation_deadline = COMPETITOR_VALIDATION_DEADLINE
+        self.validation_concurrency = COMPETITOR_VALIDATION_CONCURRENCY
+        self.transport = transport
         self.max_retries = COMPETITOR_MAX_RETRIES
         self.threshold_direct = COMPETITOR_RELEVANCE_THRESHOLD_DIRECT
         self.threshold_indirect = COMPETITOR_RELEVANCE_THRESHOLD_INDIRECT
@@ -136,7 +149,8 @@ class CompetitorDiscovery:
             our_url=our_url,
             primary_industry=primary_industry,
             offerings=top_offerings,
-            url_sources=url_sources
+            url_sources=url_sources,
+            max_competitors=max_competitors
         )
         
         # Trier par score décroissant et limiter
@@ -191,22 +205,14 @@ class CompetitorDiscovery:
             brand_name=brand_name
         )
         
-        all_urls = set()
+        # Max 4 requêtes, lancées en parallèle (étape 'competitors' exécutée dans un thread)
+        results = asyncio.run(self.search_service.search_many(search_queries[:4], max_results=10))
         
-        for query in search_queries[:4]:  # Max 4 requêtes pour limiter
-            logger.info(f"  🔍 Query: {query}")
-            
-            try:
-                urls = self._search_google(query, max_results=10)
-                all_urls.update(urls)
-                logger.info(f"    → Found {len(urls)} URLs")
-                
-                # Délai entre requêtes
-                time.sleep(self.search_delay)
-                
-            except Exception as e:
-                logger.warning(f"    ⚠️  Search failed: {e}")
-                continue
+        all_urls: Dict[str, None] = {}
+        for query, urls in results.items():
+            valid_urls = [url for url in urls if self._is_valid_competitor_url(url)]
+            logger.info(f"  🔍 Query: {query} → Found {len(valid_urls)} URLs")
+            all_urls.update(dict.fromkeys(valid_urls))
         
         urls_list = list(all_urls)
         logger.info(f"📦 Stage 2 total: {len(urls_list)} unique URLs from web search")
@@ -279,149 +285,6 @@ class CompetitorDiscovery:
         
         return industry
     
-    def _search_google(self, query: str, max_results: int = 10) -> List[str]:
-        """
-        Effectue une recherche web et extrait les URLs des résultats organiques
-        Essaie Google d'abord, puis DuckDuckGo en fallback
-        
-        Args:
-            query: Requête de recherche
-            max_results: Nombre max de résultats à extraire
-            
-        Returns:
-            Liste d'URLs extraites
-        """
-        # Essayer Google d'abord
-        urls = self._try_google_search(query, max_results)
-        
-        # Si Google échoue, essayer DuckDuckGo
-        if not urls:
-            logger.debug(f"Google failed, trying DuckDuckGo for: {query}")
-            urls = self._try_duckduckgo_search(query, max_results)
-        
-        return urls
-    
-    def _try_google_search(self, query: str, max_results: int = 10) -> List[str]:
-        """Essaie une recherche Google"""
-        try:
-            encoded_query = quote_plus(query)
-            search_url = f"https://www.google.com/search?q={encoded_query}&num={max_results}"
-            
-            headers = {
-                'User-Agent': self.user_agent,
-                'Accept': 'text/html,application/xhtml+xml',
-                'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive'
-            }
-            
-            response = requests.get(search_url, headers=headers, timeout=self.search_timeout)
-            response.raise_for_status()
-            
-            # Vérifier si Google a bloqué (CAPTCHA)
-            if 'captcha' in response.text.lower() or response.status_code == 429:
-                logger.debug("Google CAPTCHA detected")
-                return []
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            urls = self._parse_google_results(soup)
-            
-            return urls
-            
-        except Exception as e:
-            logger.debug(f"Google search error: {e}")
-            return []
-    
-    def _try_duckduckgo_search(self, query: str, max_results: int = 10) -> List[str]:
-        """Essaie une recherche DuckDuckGo (fallback)"""
-        try:
-            encoded_query = quote_plus(query)
-            search_url = f"https://duckduckgo.com/html/?q={encoded_query}"
-            
-            headers = {
-                'User-Agent': self.user_agent,
-                'Accept': 'text/html,application/xhtml+xml',
-                'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
-            }
-            
-            response = requests.get(search_url, headers=headers, timeout=self.search_timeout)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            urls = self._parse_duckduckgo_results(soup)
-            
-            return urls[:max_results]
-            
-        except Exception as e:
-            logger.debug(f"DuckDuckGo search error: {e}")
-            return []
-    
-    def _parse_google_results(self, soup: BeautifulSoup) -> List[str]:
-        """
-        Parse la page Google et extrait les URLs des résultats organiques
-        """
-        urls = []
-        
-        # Méthode 1: Chercher tous les liens <a>
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            
-            # Format Google: /url?q=https://example.com&sa=...
-            if '/url?q=' in href:
-                try:
-                    # Extraire l'URL réelle
-                    url = href.split('/url?q=')[1].split('&')[0]
-                    
-                    # Valider que c'est une vraie URL
-                    if url.startswith('http') and self._is_valid_competitor_url(url):
-                        urls.append(url)
-                except Exception:
-                    continue
-            
-            # Format direct
-            elif href.startswith('http') and self._is_valid_competitor_url(href):
-                urls.append(href)
-        
-        # Dédupliquer
-        unique_urls = list(dict.fromkeys(urls))  # Garde l'ordre
-        
-        return unique_urls
-    
-    def _parse_duckduckgo_results(self, soup: BeautifulSoup) -> List[str]:
-        """
-        Parse la page DuckDuckGo et extrait les URLs des résultats organiques
-        """
-        urls = []
-        
-        # DuckDuckGo utilise des balises avec class="result__url"
-        for result in soup.find_all('a', class_='result__url'):
-            href = result.get('href', '')
-            
-            if href.startswith('http') and self._is_valid_competitor_url(href):
-                urls.append(href)
-        
-        # Fallback: chercher dans les liens directs
-        if not urls:
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                
-                # Format DuckDuckGo: //duckduckgo.com/l/?uddg=https://example.com
-                if 'uddg=' in href:
-                    try:
-                        url = href.split('uddg=')[1].split('&')[0]
-                        from urllib.parse import unquote
-                        url = unquote(url)
-                        
-                        if url.startswith('http') and self._is_valid_competitor_url(url):
-                            urls.append(url)
-                    except Exception:
-                        continue
-        
-        # Dédupliquer
-        unique_urls = list(dict.fromkeys(urls))
-        
-        return unique_urls
-    
     def _is_valid_competitor_url(self, url: str) -> bool:
         """
         Filtre les URLs non pertinentes (social media, directories, etc.)
@@ -444,160 +307,205 @@ class CompetitorDiscovery:
         our_url: str,
         primary_industry: str,
         offerings: List[str],
-        url_sources: Dict[str, str]
+        url_sources: Dict[str, str],
+        max_competitors: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Version synchrone (étape 'competitors' exécutée dans un thread) :
+        exécute la validation async dans sa propre boucle
+        """
+        return asyncio.run(self._validate_and_score_competitors_async(
+            urls, our_url, primary_industry, offerings, url_sources, max_competitors
+        ))
+    
+    async def _validate_and_score_competitors_async(
+        self,
+        urls: List[str],
+        our_url: str,
+        primary_industry: str,
+        offerings: List[str],
+        url_sources: Dict[str, str],
+        max_competitors: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         STAGE 3: Valide existence, analyse contenu, calcule score de pertinence
         
+        Les candidats sont validés en parallèle (pool de workers borné, connexions
+        HTTP partagées), chacun avec une échéance globale. Dès que max_competitors
+        compétiteurs directs sont confirmés, les validations restantes sont annulées.
+        
         Args:
             urls: Liste d'URLs candidates
             our_url: Notre URL
             primary_industry: Industrie
             offerings: Liste d'offerings
             url_sources: Dict {url: 'llm'|'web_search'|'both'}
+            max_competitors: Arrêt anticipé après ce nombre de compétiteurs directs (None = tout valider)
             
         Returns:
-            Liste de dicts avec score, type, reason
+            Liste de dicts avec score, type, reason (dans l'ordre des candidats)
         """
         logger.info(f"🎯 Stage 3: Validating and scoring {len(urls)} candidates...")
         
-        scored = []
+        if not urls:
+            return []
         
         # Extraire mots-clés de notre industrie/offerings pour comparaison
         our_keywords = self._extract_keywords(primary_industry, offerings)
         
-        for url in urls:
+        workers = asyncio.Semaphore(max(1, self.validation_concurrency))
+        validated: Dict[str, Dict[str, Any]] = {}
+        direct_count = 0
+        
+        async with httpx.AsyncClient(
+            transport=self.transport,
+            timeout=self.validation_timeout,
+            follow_redirects=True,
+            headers={'User-Agent': self.user_agent},
+            limits=httpx.Limits(max_connections=max(1, self.validation_concurrency))
+        ) as client:
+            
+            async def validate(url: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+                async with workers:
+                    try:
+                        # L'échéance démarre quand le candidat obtient un worker
+                        return url, await asyncio.wait_for(
+                            self._validate_candidate(client, url, our_keywords, primary_industry, offerings, url_sources),
+                            timeout=self.validation_deadline
+                        )
+                    except asyncio.TimeoutError:
+                        logger.info(f"  ⏱️  {url}: deadline exceeded (>{self.validation_deadline}s)")
+                    except Exception as e:
+                        logger.debug(f"  ⚠️  {url}: Validation error - {e}")
+                    return url, None
+            
+            tasks = [asyncio.create_task(validate(url)) for url in urls]
             try:
-                logger.info(f"  🔍 Validating: {url}")
-                
-                # 1. Valider existence (DNS + HTTP)
-                if not self._check_url_exists(url):
-                    logger.info(f"  ❌ {url}: URL does not exist or not reachable")
-                    continue
-                
-                # 2. Analyser le contenu de la page d'accueil
-                competitor_data = self._analyze_competitor_homepage(url)
-                if not competitor_data:
-                    logger.info(f"  ⚠️  {url}: Could not analyze homepage")
-                    continue
-                
-                logger.info(f"  ✅ {url}: Homepage analyzed successfully")
-                
-                # 3. Calculer score de pertinence
-                score = self._calculate_relevance_score(
-                    competitor_data=competitor_data,
-                    our_keywords=our_keywords,
-                    primary_industry=primary_industry,
-                    offerings=offerings,
-                    source=url_sources.get(url, 'web_search')
-                )
-                
-                # 4. Classifier direct/indirect
-                comp_type = 'direct' if score >= self.threshold_direct else 'indirect'
-                
-                logger.info(f"  📊 {url}: Relevance score = {score:.2f}")
-                
-                # Filtrer si score trop faible
-                if score < self.threshold_indirect:
-                    logger.info(f"  🔻 {url}: score {score:.2f} < threshold {self.threshold_indirect} - REJECTED")
-                    continue
-                
-                logger.info(f"  ✅ {url}: VALIDATED as {comp_type} competitor (score: {score:.2f})")
-                
-                # 5. Générer justification
-                reason = self._generate_reason(
-                    competitor_data=competitor_data,
-                    score=score,
-                    comp_type=comp_type,
-                    primary_industry=primary_industry
-                )
-                
-                from utils.competitor_extractor import CompetitorExtractor
-                domain = CompetitorExtractor._extract_domain(url)
-                
-                scored.append({
-                    'domain': domain,
-                    'homepage_url': url,
-                    'score': round(score, 2),
-                    'type': comp_type,
-                    'reason': reason,
-                    'source': url_sources.get(url, 'web_search')
-                })
-                
-                logger.info(f"  ✅ {domain}: {score:.2f} ({comp_type}) - {reason[:50]}...")
-                
-            except Exception as e:
-                logger.debug(f"  ⚠️  {url}: Validation error - {e}")
-                continue
-        
+                for next_done in asyncio.as_completed(tasks):
+                    url, competitor = await next_done
+                    if not competitor:
+                        continue
+                    
+                    validated[url] = competitor
+                    if competitor['type'] == 'direct':
+                        direct_count += 1
+                    
+                    if max_competitors and direct_count >= max_competitors:
+                        pending = sum(1 for task in tasks if not task.done())
+                        logger.info(f"  🏁 {direct_count} direct competitors confirmed - cancelling {pending} pending validations")
+                        break
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        
+        scored = [validated[url] for url in urls if url in validated]
         logger.info(f"📊 Stage 3 complete: {len(scored)} validated competitors")
         return scored
     
-    def _check_url_exists(self, url: str) -> bool:
+    async def _validate_candidate(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        our_keywords: Set[str],
+        primary_industry: str,
+        offerings: List[str],
+        url_sources: Dict[str, str]
+    ) -> Optional[Dict[str, Any]]:
         """
-        Vérifie qu'une URL existe et est accessible
-        1. DNS lookup
-        2. HEAD request rapide
+        Valide un candidat : DNS, page d'accueil, score et classification
+        
+        Returns:
+            Dict du compétiteur validé, ou None si rejeté
         """
+        logger.info(f"  🔍 Validating: {url}")
+        
+        # 1. Valider existence (DNS)
+        if not await self._resolve_host(url):
+            logger.info(f"  ❌ {url}: URL does not exist or not reachable")
+            return None
+        
+        # 2. Analyser le contenu de la page d'accueil (le GET sert aussi de vérification HTTP)
+        competitor_data = await self._analyze_competitor_homepage(client, url)
+        if not competitor_data:
+            logger.info(f"  ⚠️  {url}: Could not analyze homepage")
+            return None
+        
+        logger.info(f"  ✅ {url}: Homepage analyzed successfully")
+        
+        # 3. Calculer score de pertinence
+        score = self._calculate_relevance_score(
+            competitor_data=competitor_data,
+            our_keywords=our_keywords,
+            primary_industry=primary_industry,
+            offerings=offerings,
+            source=url_sources.get(url, 'web_search')
+        )
+        
+        # 4. Classifier direct/indirect
+        comp_type = 'direct' if score >= self.threshold_direct else 'indirect'
+        
+        logger.info(f"  📊 {url}: Relevance score = {score:.2f}")
+        
+        # Filtrer si score trop faible
+        if score < self.threshold_indirect:
+            logger.info(f"  🔻 {url}: score {score:.2f} < threshold {self.threshold_indirect} - REJECTED")
+            return None
+        
+        # 5. Générer justification
+        reason = self._generate_reason(
+            competitor_data=competitor_data,
+            score=score,
+            comp_type=comp_type,
+            primary_industry=primary_industry
+        )
+        
+        from utils.competitor_extractor import CompetitorExtractor
+        domain = CompetitorExtractor._extract_domain(url)
+        
+        logger.info(f"  ✅ {domain}: {score:.2f} ({comp_type}) - {reason[:50]}...")
+        
+        return {
+            'domain': domain,
+            'homepage_url': url,
+            'score': round(score, 2),
+            'type': comp_type,
+            'reason': reason,
+            'source': url_sources.get(url, 'web_search')
+        }
+    
+    async def _resolve_host(self, url: str) -> bool:
+        """Vérifie que le domaine existe (résolution DNS non bloquante)"""
         try:
-            # 1. Vérifier DNS
-            parsed = urlparse(url)
-            domain = parsed.netloc
-            socket.gethostbyname(domain)
-            
-            # 2. HEAD request
-            response = requests.head(
-                url,
-                timeout=self.validation_timeout,
-                allow_redirects=True,
-                headers={'User-Agent': self.user_agent}
-            )
-            
-            # Accepter 200-399
-            is_valid = response.status_code < 400
-            if not is_valid:
-                logger.info(f"    ❌ URL check failed: HTTP {response.status_code}")
-            else:
-                logger.info(f"    ✅ URL exists: HTTP {response.status_code}")
-            return is_valid
-            
+            domain = urlparse(url).hostname
+            if not domain:
+                return False
+            await asyncio.get_running_loop().getaddrinfo(domain, None)
+            return True
         except socket.gaierror as e:
             logger.info(f"    ❌ DNS lookup failed: {str(e)[:50]}")
             return False
-        except requests.exceptions.Timeout:
-            logger.info(f"    ⏱️  Timeout (>{self.validation_timeout}s)")
-            return False
-        except requests.exceptions.RequestException as e:
-            logger.info(f"    ❌ HTTP error: {str(e)[:50]}")
-            return False
         except Exception as e:
             logger.info(f"    ❌ Validation error: {str(e)[:50]}")
             return False
     
-    def _analyze_competitor_homepage(self, url: str) -> Optional[Dict[str, Any]]:
+    async def _analyze_competitor_homepage(self, client: httpx.AsyncClient, url: str) -> Optional[Dict[str, Any]]:
         """
         Analyse la page d'accueil d'un compétiteur
         Extrait: title, meta description, h1, h2, keywords
         """
         try:
-            response = requests.get(
-                url,
-                timeout=self.validation_timeout,
-                headers={'User-Agent': self.user_agent}
-            )
+            response = await client.get(url)
             response.raise_for_status()
+            logger.info(f"    ✅ URL exists: HTTP {response.status_code}")
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            features = await asyncio.to_thread(extract_page_features, response.content, response.charset_encoding)
             
             # Extraire éléments clés
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else ''
-            
-            meta_desc = soup.find('meta', {'name': 'description'})
-            description = meta_desc.get('content', '').strip() if meta_desc else ''
-            
-            h1_tags = [h.get_text().strip() for h in soup.find_all('h1')]
-            h2_tags = [h.get_text().strip() for h in soup.find_all('h2')][:5]
+            title_text = features.title
+            description = features.meta_description
+            h1_tags = features.h1
+            h2_tags = features.h2[:5]
             
             # Combiner tout le texte pour extraction de mots-clés
             all_text = ' '.join([title_text, description] + h1_tags + h2_tags)
@@ -613,6 +521,12 @@ class CompetitorDiscovery:
                 'keywords': keywords
             }
             
+        except httpx.TimeoutException:
+            logger.info(f"    ⏱️  Timeout (>{self.validation_timeout}s)")
+            return None
+        except httpx.HTTPStatusError as e:
+            logger.info(f"    ❌ URL check failed: HTTP {e.response.status_code}")
+            return None
         except Exception as e:
             logger.debug(f"Homepage analysis failed for {url}: {e}")
             return None
@@ -0,0 +1,139 @@
+"""
+Base de profils de compétiteurs partagée entre les jobs
+Les mêmes compétiteurs reviennent d'un client à l'autre dans un même secteur :
+les métriques de contenu (pages analysées, agrégats) sont conservées par domaine normalisé.
+Un profil frais est servi tel quel, un profil périmé est servi puis rafraîchi en arrière-plan.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from config import (
+    COMPETITOR_PROFILE_DIR,
+    COMPETITOR_PROFILE_MAX_AGE_HOURS,
+    COMPETITOR_PROFILE_REFRESH_WORKERS,
+    COMPETITOR_PROFILE_STORE_ENABLED,
+    COMPETITOR_PROFILE_TTL_HOURS
+)
+from services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_domain(url_or_domain: str) -> str:
+    """
+    Normalise une URL ou un domaine pour la clé du profil
+    (minuscules, sans schéma, port, chemin ni préfixe www.)
+    """
+    value = str(url_or_domain or '').strip().lower()
+    if '//' not in value:
+        value = f"//{value}"
+    host = urlparse(value).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+class CompetitorProfileStore:
+    """Profils de compétiteurs par domaine normalisé, avec fraîcheur et rafraîchissement en arrière-plan"""
+
+    def __init__(
+        self,
+        cache: Optional[CacheService] = None,
+        ttl_hours: float = COMPETITOR_PROFILE_TTL_HOURS,
+        max_age_hours: float = COMPETITOR_PROFILE_MAX_AGE_HOURS,
+        enabled: bool = COMPETITOR_PROFILE_STORE_ENABLED,
+        refresh_workers: int = COMPETITOR_PROFILE_REFRESH_WORKERS
+    ):
+        """
+        Args:
+            cache: Stockage des profils (défaut: base dédiée dans COMPETITOR_PROFILE_DIR)
+            ttl_hours: Au-delà, le profil est périmé (servi, puis rafraîchi en arrière-plan)
+            max_age_hours: Au-delà, le profil est ignoré (re-crawl dans le job)
+            enabled: Active la base de profils
+            refresh_workers: Nombre de rafraîchissements simultanés en arrière-plan
+        """
+        self.cache = cache or CacheService(COMPETITOR_PROFILE_DIR, enabled_check=lambda: True)
+        self.ttl_hours = ttl_hours
+        self.max_age_hours = max(max_age_hours, ttl_hours)
+        self.enabled = enabled
+        self.refresh_workers = refresh_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url_or_domain: str) -> str:
+        return f"competitor_profile:{normalize_domain(url_or_domain)}"
+
+    def get(self, url_or_domain: str) -> Optional[Dict[str, Any]]:
+        """Retourne le profil du domaine (frais ou périmé) ou None si inconnu ou trop ancien"""
+        if not self.enabled or not normalize_domain(url_or_domain):
+            return None
+        return self.cache.get(self.make_key(url_or_domain), max_age_hours=self.max_age_hours)
+
+    def set(self, profile: Dict[str, Any]) -> bool:
+        """Enregistre un profil (horodaté) ; les analyses en erreur ne sont pas conservées"""
+        if not self.enabled or profile.get('error') or not profile.get('domain'):
+            return False
+        return self.cache.set(self.make_key(profile['domain']), dict(profile, fetched_at=time.time()))
+
+    def is_fresh(self, profile: Dict[str, Any]) -> bool:
+        """Le profil a-t-il moins de ttl_hours"""
+        return time.time() - profile.get('fetched_at', 0) < self.ttl_hours * 3600
+
+    def cleanup_expired(self) -> int:
+        """Supprime les profils plus vieux que max_age_hours"""
+        return self.cache.cleanup_expired(max_age_hours=self.max_age_hours)
+
+    def refresh_in_background(self, url_or_domain: str, fetch: Callable[[], Optional[Dict[str, Any]]]) -> bool:
+        """
+        Planifie le rafraîchissement d'un profil périmé (un seul à la fois par domaine)
+
+        Args:
+            url_or_domain: Domaine du profil
+            fetch: Re-crawl du compétiteur, retourne le nouveau profil
+
+        Returns:
+            True si un rafraîchissement a été planifié
+        """
+        domain = normalize_domain(url_or_domain)
+        with self._lock:
+            if domain in self._refreshing:
+                return False
+            self._refreshing.add(domain)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.refresh_workers),
+                    thread_name_prefix='competitor-profile-refresh'
+                )
+            executor = self._executor
+
+        executor.submit(self._refresh, domain, fetch)
+        logger.info(f"🔄 Competitor profile refresh scheduled: {domain}")
+        return True
+
+    def _refresh(self, domain: str, fetch: Callable[[], Optional[Dict[str, Any]]]):
+        try:
+            profile = fetch()
+            if profile and self.set(profile):
+                logger.info(f"✅ Competitor profile refreshed: {domain}")
+            else:
+                logger.warning(f"⚠️  Competitor profile refresh failed, keeping previous profile: {domain}")
+        except Exception as e:
+            logger.warning(f"⚠️  Competitor profile refresh error for {domain}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(domain)
+
+    def wait_for_refreshes(self):
+        """Attend la fin des rafraîchissements en cours (arrêt propre, tests)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+# Instance globale de la base de profils
+competitor_profile_store = CompetitorProfileStore()
@@ -4,37 +4,140 @@ Extrait le contenu structuré pour l'analyse GEO
 """
 import asyncio
 import logging
-from typing import Dict, Any, List
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
-import requests
-from bs4 import BeautifulSoup
-import json
+import httpx
 
 from config import (
     MAX_PAGES_TO_CRAWL,
     CRAWL_DELAY_SECONDS,
     CRAWL_TIMEOUT_SECONDS,
+    CRAWL_HOST_CONCURRENCY,
+    CRAWL_GLOBAL_CONCURRENCY,
+    CRAWL_MAX_QUEUE,
     USER_AGENT
 )
+from utils.html_features import PageFeatures, extract_page_features
 
 logger = logging.getLogger(__name__)
 
 
+class SharedSemaphore:
+    """
+    Sémaphore utilisable depuis plusieurs threads et boucles d'événements
+    (les jobs et l'intelligence compétitive tournent chacun dans leur propre boucle) :
+    le compteur est protégé par un verrou de thread, chaque attente est réveillée
+    dans sa propre boucle et reçoit directement la place libérée.
+    """
+    
+    def __init__(self, value: int):
+        self._value = max(1, value)
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+    
+    async def acquire(self) -> bool:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return True
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter not in self._waiters
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                # La place a été transmise pendant l'annulation : la rendre
+                self.release()
+            raise
+        return True
+    
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(_resolve_waiter, future)
+                    return
+                except RuntimeError:
+                    continue  # Boucle fermée : attente abandonnée
+            self._value += 1
+    
+    async def __aenter__(self):
+        await self.acquire()
+    
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+def _resolve_waiter(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class CrawlLimits:
+    """
+    Limites de concurrence partagées par tous les crawls du processus :
+    un plafond global et un plafond par hôte (avec délai de politesse par connexion),
+    appliqués quelle que soit la boucle d'événements ou le thread appelant
+    """
+    
+    def __init__(self, global_concurrency: int = CRAWL_GLOBAL_CONCURRENCY,
+                 host_concurrency: int = CRAWL_HOST_CONCURRENCY):
+        self.global_concurrency = global_concurrency
+        self.host_concurrency = host_concurrency
+        self._global = SharedSemaphore(global_concurrency)
+        self._hosts: Dict[str, SharedSemaphore] = {}
+        self._lock = threading.Lock()
+    
+    def global_slot(self) -> SharedSemaphore:
+        """Sémaphore global"""
+        return self._global
+    
+    def host_slot(self, host: str) -> SharedSemaphore:
+        """Sémaphore de l'hôte"""
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = SharedSemaphore(self.host_concurrency)
+            return self._hosts[host]
+
+
 class WebCrawler:
-    """Crawle un site web et extrait le contenu structuré"""
+    """
+    Crawle un site web et extrait le contenu structuré.
+    Les pages découvertes sont récupérées en parallèle (connexions réutilisées),
+    dans la limite de la concurrence par hôte et globale.
+    """
     
-    def __init__(self):
+    def __init__(self, limits: Optional['CrawlLimits'] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            limits: Limites de concurrence (défaut: crawl_limits partagé entre les jobs)
+            transport: Transport httpx (tests)
+        """
         self.max_pages = MAX_PAGES_TO_CRAWL
         self.delay = CRAWL_DELAY_SECONDS
         self.timeout = CRAWL_TIMEOUT_SECONDS
         self.user_agent = USER_AGENT
+        self.max_queue = CRAWL_MAX_QUEUE
+        self.limits = limits or crawl_limits
+        self.transport = transport
     
-    async def crawl_website(self, url: str) -> Dict[str, Any]:
+    async def crawl_website(self, url: str, max_pages: Optional[int] = None) -> Dict[str, Any]:
         """
         Crawle un site web et retourne le contenu structuré
         
         Args:
             url: URL du site à crawler
+            max_pages: Nombre max de pages (défaut: MAX_PAGES_TO_CRAWL)
             
         Returns:
             Dictionnaire contenant les données crawlées
@@ -44,36 +147,61 @@ class WebCrawler:
             
             # Normaliser l'URL
             url = self._normalize_url(url)
+            max_pages = max_pages or self.max_pages
             
             parsed_url = urlparse(url)
             base_domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
             
             visited = set()
             to_visit = [url]
-            pages_data = []
+            pages_by_order: Dict[int, Dict[str, Any]] = {}
+            in_flight: Dict[asyncio.Task, Tuple[int, str]] = {}
             
-            while to_visit and len(visited) < self.max_pages:
-                current_url = to_visit.pop(0)
-                
-                if current_url in visited:
-                    continue
-                    
-                visited.add(current_url)
-                
+            async with httpx.AsyncClient(
+                headers={'User-Agent': self.user_agent},
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_keepalive_connections=self.limits.host_concurrency),
+                transport=self.transport
+            ) as client:
                 try:
-                    # Crawler la page
-                    page_data = await self._crawl_page(current_url, base_domain, to_visit, visited)
-                    
-                    if page_data:
-                        pages_data.append(page_data)
-                        logger.info(f"Crawled: {current_url}")
-                    
-                    # Être poli avec le serveur
-                    await asyncio.sleep(self.delay)
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to crawl {current_url}: {str(e)}")
-                    continue
+                    while to_visit or in_flight:
+                        # Lancer les pages en attente tant que le budget de pages le permet
+                        while to_visit and len(visited) < max_pages:
+                            current_url = to_visit.pop(0)
+                            if current_url in visited:
+                                continue
+                            visited.add(current_url)
+                            task = asyncio.create_task(self._crawl_page(client, current_url, base_domain))
+                            in_flight[task] = (len(visited), current_url)
+                        
+                        if not in_flight:
+                            break
+                        
+                        done, _ = await asyncio.wait(in_flight.keys(), return_when=asyncio.FIRST_COMPLETED)
+                        
+                        for task in done:
+                            order, current_url = in_flight.pop(task)
+                            try:
+                                page_data, links = task.result()
+                            except Exception as e:
+                                logger.warning(f"Failed to crawl {current_url}: {str(e)}")
+                                continue
+                            
+                            pages_by_order[order] = page_data
+                            logger.info(f"Crawled: {current_url}")
+                            
+                            for link in links:
+                                if (link not in visited and
+                                        link not in to_visit and
+                                        len(to_visit) < self.max_queue):
+                                    to_visit.append(link)
+                finally:
+                    for task in in_flight:
+                        task.cancel()
+            
+            # Ordre de découverte (la page d'accueil reste la première)
+            pages_data = [pages_by_order[order] for order in sorted(pages_by_order)]
             
             return {
                 'base_url': url,
@@ -85,87 +213,65 @@ class WebCrawler:
             logger.error(f"Crawl error: {str(e)}")
             raise
     
-    async def _crawl_page(self, url: str, base_domain: str, 
-                         to_visit: List[str], visited: set) -> Dict[str, Any]:
-        """Crawle une page individuelle"""
-        response = requests.get(
-            url, 
-            timeout=self.timeout, 
-            headers={'User-Agent': self.user_agent}
-        )
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'lxml')
+    async def _crawl_page(self, client: httpx.AsyncClient, url: str,
+                          base_domain: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Crawle une page individuelle (contenu + liens internes)"""
+        host = urlparse(url).netloc
         
-        # Extraire le contenu
-        page_data = self._extract_page_content(soup, url)
-        
-        # Extraire les liens internes
-        self._extract_internal_links(soup, url, base_domain, to_visit, visited)
+        async with self.limits.host_slot(host):
+            async with self.limits.global_slot():
+                response = await client.get(url)
+            try:
+                response.raise_for_status()
+            finally:
+                # Être poli avec le serveur : la connexion de l'hôte reste réservée pendant le délai
+                await asyncio.sleep(self.delay)
         
-        return page_data
+        # Parsing hors de la boucle d'événements
+        return await asyncio.to_thread(
+            self._parse_page, response.content, url, base_domain, response.charset_encoding
+        )
     
-    def _extract_page_content(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
-        """Extrait le contenu structuré d'une page"""
-        # Title
-        title = soup.find('title')
-        title_text = title.get_text().strip() if title else ""
+    def _parse_page(self, content: bytes, url: str, base_domain: str,
+                    encoding: Optional[str] = None) -> Tuple[Dict[str, Any], List[str]]:
+        """Parse le HTML en une passe : contenu structuré et liens internes"""
+        features = extract_page_features(content, encoding)
         
-        # Meta description
-        meta_desc = soup.find('meta', {'name': 'description'})
-        meta_description = meta_desc.get('content', '') if meta_desc else ""
-        
-        # Headings
-        h1_tags = [h.get_text().strip() for h in soup.find_all('h1')]
-        h2_tags = [h.get_text().strip() for h in soup.find_all('h2')]
-        h3_tags = [h.get_text().strip() for h in soup.find_all('h3')]
-        
-        # Paragraphs (filtrer les courts)
-        paragraphs = [
-            p.get_text().strip() 
-            for p in soup.find_all('p') 
-            if len(p.get_text().strip()) > 50
-        ]
-        
-        # JSON-LD
-        json_ld = []
-        for script in soup.find_all('script', {'type': 'application/ld+json'}):
-            try:
-                json_ld.append(json.loads(script.string))
-            except Exception:
-                pass
-        
-        # Word count
-        word_count = sum(len(p.split()) for p in paragraphs)
+        page_data = self._extract_page_content(features, url)
+        links = self._extract_internal_links(features, url, base_domain)
         
+        return page_data, links
+    
+    def _extract_page_content(self, features: PageFeatures, url: str) -> Dict[str, Any]:
+        """Construit le contenu structuré d'une page à partir de ses caractéristiques"""
         return {
             'url': url,
-            'title': title_text,
-            'meta_description': meta_description,
-            'h1': h1_tags,
-            'h2': h2_tags,
-            'h3': h3_tags,
-            'paragraphs': paragraphs[:10],  # Garder les 10 premiers
-            'json_ld': json_ld,
-            'word_count': word_count
+            'title': features.title,
+            'meta_description': features.meta_description,
+            'h1': features.h1,
+            'h2': features.h2,
+            'h3': features.h3,
+            'paragraphs': features.content_paragraphs()[:10],  # Garder les 10 premiers
+            'json_ld': features.json_ld,
+            'faq': features.faq_pairs[:10],
+            'word_count': features.content_word_count()
         }
     
-    def _extract_internal_links(self, soup: BeautifulSoup, current_url: str,
-                                base_domain: str, to_visit: List[str], 
-                                visited: set):
+    def _extract_internal_links(self, features: PageFeatures, current_url: str,
+                                base_domain: str) -> List[str]:
         """Extrait les liens internes pour continuer le crawl"""
-        links = soup.find_all('a', href=True)
+        links: List[str] = []
         
-        for link in links:
-            href = link['href']
+        for href in features.links:
             absolute_url = urljoin(current_url, href)
             
             # Vérifier que c'est un lien interne valide
             if (absolute_url.startswith(base_domain) and 
-                absolute_url not in visited and 
-                len(to_visit) < 20 and
+                absolute_url not in links and
                 self._is_valid_link(absolute_url)):
-                to_visit.append(absolute_url)
+                links.append(absolute_url)
+        
+        return links
     
     def _is_valid_link(self, url: str) -> bool:
         """Vérifie si un lien est valide pour le crawl"""
@@ -184,3 +290,10 @@ class WebCrawler:
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         return url
+
+
+# Limites partagées entre tous les crawls du processus
+crawl_limits = CrawlLimits()
+
+# Instance globale du crawler
+web_crawler = WebCrawler()
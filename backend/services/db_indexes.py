@@ -0,0 +1,63 @@
+"""
+Création des index MongoDB au démarrage
+Chaque requête fréquente (listing des leads, rapports et jobs par lead, file de jobs,
+checkpoints, tendances de scores) a son index ; create_index est idempotent.
+"""
+import logging
+from typing import Any, Dict, List, Tuple
+
+from config import JOB_CHECKPOINT_TTL_DAYS
+
+logger = logging.getLogger(__name__)
+
+# collection → [(clés, options)]
+INDEXES: Dict[str, List[Tuple[List[Tuple[str, int]], Dict[str, Any]]]] = {
+    'leads': [
+        ([('id', 1)], {'unique': True}),
+        ([('createdAt', -1), ('id', -1)], {}),  # Listing paginé par curseur
+        ([('email', 1), ('createdAt', -1)], {}),
+    ],
+    'reports': [
+        ([('id', 1)], {'unique': True}),
+        ([('leadId', 1), ('createdAt', -1)], {}),
+    ],
+    'report_sections': [
+        ([('reportId', 1), ('section', 1)], {'unique': True}),
+    ],
+    'analysis_jobs': [
+        ([('id', 1)], {'unique': True}),
+        ([('leadId', 1), ('createdAt', -1)], {}),
+        ([('status', 1), ('createdAt', 1)], {}),  # Réclamation par les workers
+    ],
+    'job_checkpoints': [
+        ([('jobId', 1), ('stage', 1)], {'unique': True}),
+        ([('createdAt', 1)], {'expireAfterSeconds': JOB_CHECKPOINT_TTL_DAYS * 86400}),
+    ],
+    'score_points': [
+        ([('analysisId', 1)], {'unique': True}),  # Une analyse n'est comptée qu'une fois
+        ([('siteUrl', 1), ('date', 1)], {}),  # Recalcul d'une période
+    ],
+    'score_rollups': [
+        ([('granularity', 1), ('siteUrl', 1), ('period', 1), ('metric', 1)], {'unique': True}),
+    ],
+}
+
+
+async def ensure_indexes(db) -> int:
+    """
+    Crée les index manquants (un échec est journalisé sans bloquer le démarrage)
+
+    Returns:
+        Nombre d'index vérifiés ou créés
+    """
+    created = 0
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+                created += 1
+            except Exception as e:
+                logger.warning(f"⚠️  Index creation failed on {collection} {keys}: {e}")
+
+    logger.info(f"🗂️  MongoDB indexes ready: {created}/{sum(len(i) for i in INDEXES.values())}")
+    return created
@@ -0,0 +1,239 @@
+"""
+Diffusion de la progression des jobs d'analyse (flux SSE au lieu du polling)
+Un seul flux par processus web alimente tous les abonnés : change stream MongoDB
+(workers dans d'autres processus), ou à défaut (Mongo sans replica set) une requête
+groupée pour tous les jobs suivis. Les workers du même processus publient directement.
+Côté worker, les écritures de progression sont regroupées (une écriture par intervalle).
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from pymongo.errors import OperationFailure
+
+from config import (
+    JOB_EVENTS_KEEPALIVE_SECONDS,
+    JOB_EVENTS_POLL_SECONDS,
+    JOB_EVENTS_SOURCE,
+    JOB_PROGRESS_FLUSH_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Champs du job diffusés aux abonnés
+JOB_EVENT_FIELDS = ['id', 'status', 'progress', 'completedStages', 'attempts', 'error', 'reportId']
+TERMINAL_STATUSES = {'completed', 'failed'}
+
+
+def apply_job_update(state: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Applique des champs modifiés (document partiel ou updatedFields d'un change stream,
+    ex: 'completedStages.3') à l'état diffusé
+
+    Returns:
+        Le nouvel état (l'état d'origine n'est pas modifié)
+    """
+    state = dict(state)
+    for key, value in fields.items():
+        base, _, index = key.partition('.')
+        if base not in JOB_EVENT_FIELDS:
+            continue
+        if not index:
+            state[key] = value
+        elif index.isdigit():
+            items = list(state.get(base) or [])
+            position = int(index)
+            items.extend([None] * (position + 1 - len(items)))
+            items[position] = value
+            state[base] = items
+    return state
+
+
+class JobEventHub:
+    """Abonnements à la progression des jobs, alimentés par un flux unique par processus"""
+
+    def __init__(
+        self,
+        collection,
+        source: str = JOB_EVENTS_SOURCE,
+        poll_interval: float = JOB_EVENTS_POLL_SECONDS,
+        keepalive: float = JOB_EVENTS_KEEPALIVE_SECONDS
+    ):
+        """
+        Args:
+            collection: Collection Motor des jobs (db.analysis_jobs)
+            source: 'auto' (change stream, sinon requête groupée), 'change_stream' ou 'poll'
+            poll_interval: Intervalle de la requête groupée (mode poll)
+            keepalive: Intervalle max sans événement (commentaire SSE pour garder la connexion)
+        """
+        self.collection = collection
+        self.source = source
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._object_ids: Dict[Any, str] = {}
+        self._feed_task: Optional[asyncio.Task] = None
+
+    def publish(self, job_id: str, fields: Dict[str, Any]):
+        """Transmet des champs modifiés aux abonnés du job (sans effet s'il n'y en a pas)"""
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(fields)
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def stream(self, job_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        État du job puis chaque changement, jusqu'à un statut terminal
+
+        Yields:
+            L'état diffusé (JOB_EVENT_FIELDS), ou None après `keepalive` secondes sans changement
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)  # Avant l'état initial : aucun changement perdu
+        self._ensure_feed()
+        try:
+            doc = await self.collection.find_one({'id': job_id}, {field: 1 for field in JOB_EVENT_FIELDS})
+            if doc is None:
+                return
+            self._object_ids[doc.pop('_id')] = job_id
+
+            state = apply_job_update({}, doc)
+            yield state
+            while state.get('status') not in TERMINAL_STATUSES:
+                try:
+                    fields = await asyncio.wait_for(queue.get(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                updated = apply_job_update(state, fields)
+                if updated != state:  # Même changement reçu du worker local et du flux Mongo
+                    state = updated
+                    yield state
+        finally:
+            self._unsubscribe(job_id, queue)
+
+    def _unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(job_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[job_id]
+                self._object_ids = {oid: jid for oid, jid in self._object_ids.items() if jid != job_id}
+
+        if not self._subscribers and self._feed_task:
+            self._feed_task.cancel()
+            self._feed_task = None
+
+    def _ensure_feed(self):
+        if self._feed_task is None or self._feed_task.done():
+            self._feed_task = asyncio.create_task(self._feed())
+
+    async def _feed(self):
+        """Flux unique de changements pour tous les abonnés du processus"""
+        while True:
+            try:
+                if self.source != 'poll':
+                    try:
+                        await self._watch_changes()
+                    except OperationFailure as e:
+                        if self.source == 'change_stream':
+                            raise
+                        logger.info(f"ℹ️  Change streams unavailable ({e.code}), job events use batched polling")
+                        self.source = 'poll'
+                        continue
+                else:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️  Job event feed error, restarting: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _watch_changes(self):
+        pipeline = [
+            {'$match': {'operationType': 'update'}},
+            {'$project': {'documentKey': 1, 'updateDescription.updatedFields': 1}}
+        ]
+        async with self.collection.watch(pipeline) as changes:
+            async for change in changes:
+                job_id = self._object_ids.get(change['documentKey']['_id'])
+                if job_id:
+                    self.publish(job_id, change['updateDescription']['updatedFields'])
+
+    async def _poll(self):
+        """Une requête pour tous les jobs suivis par intervalle (au lieu d'une par client)"""
+        while True:
+            job_ids = list(self._subscribers)
+            if job_ids:
+                projection = {field: 1 for field in JOB_EVENT_FIELDS}
+                projection['_id'] = 0
+                async for doc in self.collection.find({'id': {'$in': job_ids}}, projection):
+                    self.publish(doc['id'], doc)
+            await asyncio.sleep(self.poll_interval)
+
+
+class JobProgressWriter:
+    """
+    Regroupe les écritures de progression d'un job : au plus une écriture Mongo par
+    intervalle, les abonnés locaux étant notifiés immédiatement
+    """
+
+    def __init__(
+        self,
+        collection,
+        job_id: str,
+        hub: Optional[JobEventHub] = None,
+        interval: float = JOB_PROGRESS_FLUSH_SECONDS,
+        completed_stages: Iterable[str] = ()
+    ):
+        self.collection = collection
+        self.job_id = job_id
+        self.hub = hub
+        self.interval = interval
+        self.completed_stages: List[str] = list(completed_stages)
+        self.writes = 0
+        self._fields: Dict[str, Any] = {}
+        self._stages: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def update(self, fields: Dict[str, Any], completed_stage: Optional[str] = None):
+        """Enregistre une progression (écrite au prochain flush)"""
+        self._fields.update(fields)
+        if completed_stage and completed_stage not in self.completed_stages:
+            self.completed_stages.append(completed_stage)
+            self._stages.append(completed_stage)
+
+        if self.hub:
+            self.hub.publish(self.job_id, dict(fields, completedStages=list(self.completed_stages)))
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Écrit immédiatement les changements en attente"""
+        if not self._fields and not self._stages:
+            return
+
+        update: Dict[str, Any] = {}
+        if self._fields:
+            update['$set'] = self._fields
+        if self._stages:
+            update['$addToSet'] = {'completedStages': {'$each': self._stages}}
+        self._fields, self._stages = {}, []
+
+        await self.collection.update_one({'id': self.job_id}, update)
+        self.writes += 1
+
+    async def close(self):
+        """Annule le flush planifié et écrit les changements restants"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,241 @@
+"""
+File d'attente durable des jobs d'analyse (collection `analysis_jobs`)
+Les processus web ne font qu'enfiler ; des workers indépendants (N processus sur M nœuds)
+réclament les jobs de façon atomique avec un bail prolongé par heartbeat.
+Un job dont le worker disparaît (bail expiré) est repris par un autre worker ;
+un job en erreur est retenté avec backoff exponentiel jusqu'à max_attempts.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from config import (
+    JOB_HEARTBEAT_SECONDS,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_INTERVAL_SECONDS,
+    JOB_RETRY_DELAY_BASE,
+    JOB_WORKER_CONCURRENCY
+)
+
+logger = logging.getLogger(__name__)
+
+# Traitement d'un job réclamé : reçoit le document, retourne les champs à enregistrer à la fin
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """File de jobs adossée à une collection MongoDB (Motor)"""
+
+    def __init__(
+        self,
+        collection,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        heartbeat_seconds: float = JOB_HEARTBEAT_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_delay_base: float = JOB_RETRY_DELAY_BASE,
+        poll_interval: float = JOB_POLL_INTERVAL_SECONDS
+    ):
+        """
+        Args:
+            collection: Collection Motor des jobs (db.analysis_jobs)
+            worker_id: Identifiant unique du worker (défaut: hôte:pid:aléa)
+            lease_seconds: Durée du bail ; sans heartbeat au-delà, le job est repris
+            heartbeat_seconds: Intervalle de prolongation du bail
+            max_attempts: Tentatives max avant l'échec définitif
+            retry_delay_base: Délai avant la 1re reprise (doublé à chaque tentative)
+            poll_interval: Attente entre deux réclamations quand la file est vide
+        """
+        self.collection = collection
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = min(heartbeat_seconds, lease_seconds / 2)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay_base = retry_delay_base
+        self.poll_interval = poll_interval
+        self._stopping = asyncio.Event()
+
+    async def enqueue(self, job_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajoute un job en attente (disponible immédiatement)"""
+        job_doc = dict(job_doc, status='pending', attempts=0, availableAt=_utcnow(),
+                       workerId=None, leaseExpiresAt=None)
+        await self.collection.insert_one(dict(job_doc))
+        logger.info(f"📥 Job enqueued: {job_doc['id']}")
+        return job_doc
+
+    async def requeue(self, job_id: str) -> bool:
+        """
+        Remet en file un job terminé ou en échec (relance par un opérateur)
+
+        Returns:
+            False si le job est introuvable ou en cours d'exécution
+        """
+        result = await self.collection.update_one(
+            {'id': job_id, 'status': {'$in': ['completed', 'failed']}},
+            {'$set': {
+                'status': 'pending',
+                'attempts': 0,
+                'error': None,
+                'availableAt': _utcnow(),
+                'updatedAt': _utcnow().isoformat()
+            }}
+        )
+        if result.matched_count:
+            logger.info(f"🔁 Job requeued: {job_id}")
+        return result.matched_count > 0
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Réclame atomiquement le plus ancien job disponible :
+        en attente et échu, ou en cours avec un bail expiré (worker disparu)
+
+        Returns:
+            Le document du job (attempts incrémenté) ou None si la file est vide
+        """
+        while True:
+            now = _utcnow()
+            job = await self.collection.find_one_and_update(
+                {'$or': [
+                    {'status': 'pending', 'availableAt': {'$lte': now}},
+                    {'status': 'pending', 'availableAt': None},  # Jobs créés avant la file durable
+                    {'status': 'processing', 'leaseExpiresAt': {'$lt': now}},
+                ]},
+                {
+                    '$set': {
+                        'status': 'processing',
+                        'workerId': self.worker_id,
+                        'leaseExpiresAt': now + timedelta(seconds=self.lease_seconds),
+                        'updatedAt': now.isoformat()
+                    },
+                    '$inc': {'attempts': 1}
+                },
+                projection={'_id': 0},
+                sort=[('createdAt', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return None
+
+            # Bail expiré trop souvent (worker tué pendant ce job) : échec définitif
+            if job['attempts'] > self.max_attempts:
+                await self._finish(job['id'], {
+                    'status': 'failed',
+                    'error': job.get('error') or 'Worker lease expired too many times'
+                })
+                logger.error(f"❌ Job {job['id']} abandoned after {job['attempts'] - 1} attempts")
+                continue
+
+            logger.info(f"🔒 Job claimed: {job['id']} (attempt {job['attempts']}/{self.max_attempts}) by {self.worker_id}")
+            return job
+
+    async def heartbeat(self, job_id: str) -> bool:
+        """Prolonge le bail ; False si le job n'appartient plus à ce worker"""
+        result = await self.collection.update_one(
+            {'id': job_id, 'status': 'processing', 'workerId': self.worker_id},
+            {'$set': {'leaseExpiresAt': _utcnow() + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.matched_count > 0
+
+    async def complete(self, job_id: str, fields: Optional[Dict[str, Any]] = None) -> bool:
+        """Marque le job terminé avec les champs fournis (reportId, timings...)"""
+        return await self._finish(job_id, dict(fields or {}, status='completed', progress=100, error=None))
+
+    async def fail(self, job: Dict[str, Any], error: str) -> bool:
+        """
+        Enregistre l'échec d'une tentative : remise en file avec backoff exponentiel,
+        ou échec définitif après max_attempts
+        """
+        attempts = job.get('attempts', 1)
+        if attempts >= self.max_attempts:
+            logger.error(f"❌ Job {job['id']} failed after {attempts} attempts: {error}")
+            return await self._finish(job['id'], {'status': 'failed', 'error': error})
+
+        delay = self.retry_delay_base * (2 ** (attempts - 1))
+        logger.warning(f"⚠️  Job {job['id']} attempt {attempts} failed, retry in {delay:.0f}s: {error}")
+        return await self._finish(job['id'], {
+            'status': 'pending',
+            'error': error,
+            'availableAt': _utcnow() + timedelta(seconds=delay)
+        })
+
+    async def _finish(self, job_id: str, fields: Dict[str, Any]) -> bool:
+        """Libère le bail (uniquement si ce worker le détient encore)"""
+        result = await self.collection.update_one(
+            {'id': job_id, 'workerId': self.worker_id},
+            {'$set': dict(fields, workerId=None, leaseExpiresAt=None, updatedAt=_utcnow().isoformat())}
+        )
+        return result.matched_count > 0
+
+    async def process(self, job: Dict[str, Any], handler: JobHandler):
+        """Exécute un job réclamé en prolongeant son bail, puis le termine ou le remet en file"""
+        task = asyncio.create_task(handler(job))
+        lease_lost = False
+
+        while not task.done():
+            await asyncio.wait({task}, timeout=self.heartbeat_seconds)
+            if not task.done() and not await self.heartbeat(job['id']):
+                lease_lost = True
+                task.cancel()
+
+        try:
+            fields = await task
+        except asyncio.CancelledError:
+            if not lease_lost:
+                raise
+            logger.warning(f"⚠️  Job {job['id']}: lease lost, abandoning attempt")
+            return
+        except Exception as e:
+            await self.fail(job, str(e))
+            return
+
+        await self.complete(job['id'], fields)
+
+    async def run_worker(self, handler: JobHandler, concurrency: int = JOB_WORKER_CONCURRENCY):
+        """
+        Boucle du worker : réclame et exécute jusqu'à `concurrency` jobs simultanés
+        jusqu'à l'appel de stop() (les jobs en cours sont terminés avant de rendre la main)
+        """
+        slots = asyncio.Semaphore(max(1, concurrency))
+        running = set()
+        logger.info(f"👷 Worker {self.worker_id} started (concurrency {concurrency})")
+
+        while not self._stopping.is_set():
+            await slots.acquire()
+            try:
+                job = await self.claim()
+            except Exception as e:
+                logger.error(f"Job claim error: {e}")
+                job = None
+
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self.process(job, handler))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        if running:
+            logger.info(f"⏳ Worker {self.worker_id} waiting for {len(running)} job(s)")
+            await asyncio.gather(*running, return_exceptions=True)
+        logger.info(f"👋 Worker {self.worker_id} stopped")
+
+    def stop(self):
+        """Arrêt propre : plus de nouvelle réclamation"""
+        self._stopping.set()
@@ -0,0 +1,160 @@
+"""
+Listing des leads pour le dashboard admin
+Une seule agrégation ($lookup des rapports et du dernier job, avec projections)
+au lieu de deux requêtes par lead ; pagination par curseur (createdAt, id) et filtres côté serveur.
+"""
+import base64
+import json
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+LEADS_PAGE_SIZE = 50
+LEADS_MAX_PAGE_SIZE = 200
+REPORTS_PER_LEAD = 10
+
+# Champs renvoyés par le listing (les rapports complets restent sur GET /reports/{id})
+REPORT_SUMMARY_FIELDS = {
+    '_id': 0, 'id': 1, 'url': 1, 'type': 1, 'createdAt': 1,
+    'scores.global_score': 1, 'docxUrl': 1, 'dashboardUrl': 1
+}
+JOB_SUMMARY_FIELDS = {
+    '_id': 0, 'id': 1, 'status': 1, 'progress': 1, 'error': 1,
+    'reportId': 1, 'createdAt': 1, 'updatedAt': 1
+}
+
+
+def encode_cursor(lead: Dict[str, Any]) -> str:
+    """Curseur opaque positionné après ce lead"""
+    payload = json.dumps([lead['createdAt'], lead['id']])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Raises:
+        ValueError: curseur invalide
+    """
+    try:
+        created_at, lead_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return str(created_at), str(lead_id)
+
+
+def created_at_range(created_from: Optional[str] = None, created_to: Optional[str] = None) -> Dict[str, str]:
+    """
+    Filtre sur createdAt (dates ISO 8601 complètes, comparées comme chaînes) ; une date seule
+    (YYYY-MM-DD) en created_to couvre toute la journée : borne exclusive au lendemain
+
+    Raises:
+        ValueError: date invalide
+    """
+    bounds = {}
+    for operator, value in (('$gte', created_from), ('$lte', created_to)):
+        if not value:
+            continue
+        value = value.strip()
+        try:
+            if len(value) == 10:
+                day = date.fromisoformat(value)
+                if operator == '$lte':
+                    operator, value = '$lt', (day + timedelta(days=1)).isoformat()
+            else:
+                datetime.fromisoformat(value)
+        except ValueError as e:
+            raise ValueError(f"Invalid date: {value} (expected ISO 8601, e.g. 2026-10-01)") from e
+        bounds[operator] = value
+    return bounds
+
+
+def build_leads_pipeline(
+    limit: int = LEADS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    email: Optional[str] = None,
+    url: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Construit l'agrégation du listing (du plus récent au plus ancien)
+
+    Args:
+        limit: Taille de page (un lead de plus est demandé pour savoir s'il reste une page)
+        cursor: Curseur retourné par la page précédente
+        status: Statut du dernier job (pending, processing, completed, failed)
+        email: Email exact du lead
+        url: Fragment de l'URL analysée (insensible à la casse)
+        created_from / created_to: Bornes ISO 8601 incluses sur la date de création
+            (created_to=YYYY-MM-DD inclut toute la journée)
+
+    Raises:
+        ValueError: curseur ou date invalide
+    """
+    match: Dict[str, Any] = {}
+    if email:
+        match['email'] = email.strip()
+    if url:
+        match['url'] = {'$regex': re.escape(url.strip()), '$options': 'i'}
+    if created_from or created_to:
+        match['createdAt'] = created_at_range(created_from, created_to)
+    if cursor:
+        created_at, lead_id = decode_cursor(cursor)
+        match['$or'] = [
+            {'createdAt': {'$lt': created_at}},
+            {'createdAt': created_at, 'id': {'$lt': lead_id}},
+        ]
+
+    pipeline: List[Dict[str, Any]] = [
+        {'$match': match},
+        {'$sort': {'createdAt': -1, 'id': -1}},
+    ]
+    page = max(1, min(limit, LEADS_MAX_PAGE_SIZE)) + 1
+
+    # Sans filtre sur le job, la page est coupée avant les $lookup (index leads.createdAt)
+    if not status:
+        pipeline.append({'$limit': page})
+
+    pipeline += [
+        {'$project': {'_id': 0}},
+        {'$lookup': {
+            'from': 'analysis_jobs',
+            'localField': 'id',
+            'foreignField': 'leadId',
+            'pipeline': [
+                {'$sort': {'createdAt': -1}},
+                {'$limit': 1},
+                {'$project': JOB_SUMMARY_FIELDS},
+            ],
+            'as': 'latestJob'
+        }},
+        {'$set': {'latestJob': {'$first': '$latestJob'}}},
+    ]
+
+    if status:
+        pipeline += [{'$match': {'latestJob.status': status}}, {'$limit': page}]
+
+    pipeline.append({'$lookup': {
+        'from': 'reports',
+        'localField': 'id',
+        'foreignField': 'leadId',
+        'pipeline': [
+            {'$sort': {'createdAt': -1}},
+            {'$limit': REPORTS_PER_LEAD},
+            {'$project': REPORT_SUMMARY_FIELDS},
+        ],
+        'as': 'reports'
+    }})
+    return pipeline
+
+
+def paginate(leads: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """Découpe le résultat (limit + 1 leads) en page + curseur suivant"""
+    limit = max(1, min(limit, LEADS_MAX_PAGE_SIZE))
+    items = leads[:limit]
+    has_more = len(leads) > limit
+    return {
+        'items': items,
+        'nextCursor': encode_cursor(items[-1]) if has_more and items else None
+    }
@@ -0,0 +1,79 @@
+"""
+Cache des réponses LLM déterministes (tests de visibilité)
+Seules les sondes déterministes (temperature=0, sans recherche web en direct : voir
+VisibilityTesterV2.CACHEABLE_PLATFORMS) l'utilisent : une même requête sur la même
+plateforme, le même modèle et les mêmes paramètres peut être réutilisée d'un job à l'autre
+"""
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+
+from config import (
+    LLM_RESPONSE_CACHE_DIR,
+    LLM_RESPONSE_CACHE_ENABLED,
+    LLM_RESPONSE_CACHE_MAX_BYTES,
+    LLM_RESPONSE_CACHE_MAX_ENTRIES,
+    LLM_RESPONSE_CACHE_TTL_HOURS,
+    is_llm_response_cache_enabled
+)
+from services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalise une requête pour la clé de cache
+    (Unicode NFC, minuscules, espaces compactés, ponctuation finale retirée)
+    """
+    normalized = unicodedata.normalize('NFC', str(query)).lower()
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    return normalized.rstrip(' ?!.')
+
+
+class LLMResponseCache:
+    """Cache des réponses par (plateforme, modèle, requête normalisée, paramètres de génération)"""
+
+    def __init__(
+        self,
+        cache: Optional[CacheService] = None,
+        ttl_hours: int = LLM_RESPONSE_CACHE_TTL_HOURS,
+        enabled: bool = LLM_RESPONSE_CACHE_ENABLED
+    ):
+        self.cache = cache or CacheService(
+            LLM_RESPONSE_CACHE_DIR,
+            max_entries=LLM_RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=LLM_RESPONSE_CACHE_MAX_BYTES,
+            enabled_check=is_llm_response_cache_enabled  # Indépendant du cache de dev : actif en prod
+        )
+        self.ttl_hours = ttl_hours
+        self.enabled = enabled
+
+    @staticmethod
+    def make_key(platform: str, model: str, query: str, params: Dict[str, Any]) -> str:
+        """Génère la clé de cache (paramètres sérialisés de façon canonique)"""
+        payload = json.dumps(
+            {'platform': platform, 'model': model, 'query': normalize_query(query), 'params': params},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return f"llm_response:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get(self, platform: str, model: str, query: str, params: Dict[str, Any]) -> Optional[str]:
+        """Retourne la réponse cachée ou None"""
+        if not self.enabled:
+            return None
+        return self.cache.get(self.make_key(platform, model, query, params), max_age_hours=self.ttl_hours)
+
+    def set(self, platform: str, model: str, query: str, params: Dict[str, Any], response: str) -> bool:
+        """Cache une réponse (les réponses vides, souvent des erreurs, ne sont pas cachées)"""
+        if not self.enabled or not response:
+            return False
+        return self.cache.set(self.make_key(platform, model, query, params), response)
+
+
+# Instance globale du cache de réponses
+llm_response_cache = LLMResponseCache()
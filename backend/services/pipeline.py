@@ -0,0 +1,268 @@
+"""
+Exécuteur de pipeline par graphe de dépendances
+Chaque étape déclare ses dépendances : les étapes indépendantes tournent en parallèle,
+la progression et les temps d'exécution sont calculés à partir du graphe
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Callback de progression: (nom de l'étape terminée, progression 0-100, timings)
+ProgressCallback = Callable[[str, int, Dict[str, float]], Awaitable[None]]
+# Callback de résultat: (nom de l'étape terminée, résultat) - ex: checkpoint
+ResultCallback = Callable[[str, Any], Awaitable[None]]
+
+
+class Stage:
+    """Étape nommée du pipeline d'analyse"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        depends_on: Optional[List[str]] = None,
+        weight: int = 1,
+        on_restore: Optional[Callable[[Dict[str, Any], Any], None]] = None
+    ):
+        """
+        Args:
+            name: Nom unique de l'étape (clé du résultat dans le contexte)
+            func: Fonction (sync ou async) recevant le contexte et retournant le résultat
+            depends_on: Noms des étapes dont le résultat est requis
+            weight: Poids relatif de l'étape dans le calcul de progression
+            on_restore: Réapplique au contexte les effets de bord de l'étape
+                        quand son résultat est restauré d'un checkpoint
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+        self.weight = weight
+        self.on_restore = on_restore
+
+    async def execute(self, context: Dict[str, Any]) -> Any:
+        """Exécute l'étape (les fonctions synchrones passent par un thread)"""
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(context)
+        return await asyncio.to_thread(self.func, context)
+
+
+class StagePipeline:
+    """
+    Exécute un ensemble d'étapes selon leurs dépendances déclarées.
+    Une étape démarre dès que toutes ses dépendances sont terminées.
+    """
+
+    def __init__(self, stages: List[Stage], progress_start: int = 0, progress_end: int = 100):
+        self.stages = {stage.name: stage for stage in stages}
+        self.progress_start = progress_start
+        self.progress_end = progress_end
+        self.timings: Dict[str, float] = {}
+        self.restored: List[str] = []
+
+        if len(self.stages) != len(stages):
+            raise ValueError("Noms d'étapes dupliqués dans le pipeline")
+
+        self._validate()
+
+    def _validate(self):
+        """Vérifie que les dépendances existent et que le graphe est acyclique"""
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Étape '{stage.name}' dépend d'une étape inconnue: '{dep}'")
+
+        # Tri topologique pour détecter les cycles
+        self.execution_order()
+
+    def execution_order(self) -> List[str]:
+        """
+        Retourne un ordre topologique des étapes
+
+        Raises:
+            ValueError: si le graphe contient un cycle
+        """
+        remaining = {name: set(stage.depends_on) for name, stage in self.stages.items()}
+        order = []
+
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError(f"Cycle détecté entre les étapes: {sorted(remaining)}")
+
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+        return order
+
+    def restorable(self, checkpoints: Dict[str, Any]) -> List[str]:
+        """
+        Étapes reprises d'un checkpoint : checkpoint présent et toutes les dépendances reprises
+        (une étape relancée invalide les checkpoints des étapes qui en dépendent)
+        """
+        restored = []
+        for name in self.execution_order():
+            if name in checkpoints and all(dep in restored for dep in self.stages[name].depends_on):
+                restored.append(name)
+        return restored
+
+    def _progress(self, completed: List[str]) -> int:
+        """Calcule la progression à partir du poids des étapes terminées"""
+        total_weight = sum(stage.weight for stage in self.stages.values()) or 1
+        done_weight = sum(self.stages[name].weight for name in completed)
+        span = self.progress_end - self.progress_start
+        return self.progress_start + int(span * done_weight / total_weight)
+
+    async def run(
+        self,
+        context: Optional[Dict[str, Any]] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        checkpoints: Optional[Dict[str, Any]] = None,
+        on_result: Optional[ResultCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Exécute le pipeline complet
+
+        Args:
+            context: Valeurs initiales (ex: job_doc), enrichi avec le résultat de chaque étape
+            on_progress: Callback async appelé après chaque étape terminée
+            checkpoints: Résultats d'une exécution précédente {étape: résultat} ;
+                         les étapes restaurables ne sont pas ré-exécutées
+            on_result: Callback async appelé avec le résultat de chaque étape exécutée
+
+        Returns:
+            Le contexte contenant le résultat de chaque étape sous son nom
+
+        Raises:
+            L'exception de la première étape en échec (les étapes en cours sont annulées)
+        """
+        context = dict(context or {})
+        completed: List[str] = []
+        running: Dict[asyncio.Task, str] = {}
+        pending = dict(self.stages)
+
+        self.restored = self.restorable(checkpoints or {})
+        for name in self.restored:
+            stage = pending.pop(name)
+            context[name] = checkpoints[name]
+            if stage.on_restore:
+                stage.on_restore(context, context[name])
+            completed.append(name)
+            logger.info(f"⏩ Stage restored from checkpoint: {name}")
+
+            if on_progress:
+                await on_progress(name, self._progress(completed), dict(self.timings))
+
+        async def timed(stage: Stage) -> Any:
+            start = time.perf_counter()
+            try:
+                return await stage.execute(context)
+            finally:
+                self.timings[stage.name] = round(time.perf_counter() - start, 3)
+
+        try:
+            while pending or running:
+                # Démarrer toutes les étapes dont les dépendances sont satisfaites
+                for name, stage in list(pending.items()):
+                    if all(dep in completed for dep in stage.depends_on):
+                        logger.info(f"▶️  Stage started: {name}")
+                        running[asyncio.create_task(timed(stage))] = name
+                        del pending[name]
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    name = running.pop(task)
+                    context[name] = task.result()  # Propage l'exception éventuelle
+                    completed.append(name)
+                    logger.info(f"✅ Stage completed: {name} ({self.timings.get(name, 0):.2f}s)")
+
+                    if on_result:
+                        await on_result(name, context[name])
+                    if on_progress:
+                        await on_progress(name, self._progress(completed), dict(self.timings))
+
+        except BaseException:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running.keys(), return_exceptions=True)
+            raise
+
+        return context
+
+
+class ArtifactStore:
+    """
+    Mémoïsation des artefacts d'un job, clé = nom de l'étape + empreinte des entrées.
+    Un calcul déjà effectué (ou en cours dans un autre thread) est réutilisé
+    au lieu d'être relancé par une étape ultérieure.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(name: str, inputs: Any) -> str:
+        """Génère la clé canonique (nom + hash SHA-256 des entrées JSON triées)"""
+        payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+        return f"{name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get_or_compute(self, name: str, inputs: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Retourne l'artefact mémoïsé ou le calcule
+
+        Args:
+            name: Nom de l'artefact (ex: 'competitor_discovery')
+            inputs: Entrées qui déterminent le résultat (sérialisables JSON)
+            compute: Fonction sans argument qui produit l'artefact
+
+        Returns:
+            Le résultat du calcul (partagé entre tous les appelants de même clé)
+
+        Raises:
+            L'exception du calcul ; un échec n'est pas mémoïsé
+        """
+        key = self.make_key(name, inputs)
+
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._entries[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not owner:
+            logger.info(f"♻️  Artifact reused: {name}")
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._entries.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        future.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Statistiques de réutilisation"""
+        return {'hits': self.hits, 'misses': self.misses, 'artifacts': len(self._entries)}
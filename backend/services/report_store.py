@@ -0,0 +1,126 @@
+"""
+Stockage des rapports : résumé léger dans `reports`, sections volumineuses à part
+Les sections (résultats de visibilité, intelligence compétitive, schemas, articles...)
+sont compressées dans `report_sections`, une entrée par (rapport, section) : le document
+principal reste loin de la limite BSON de 16 Mo et se charge vite ; les sections sont
+jointes à la demande (paramètre include des endpoints).
+"""
+import asyncio
+import logging
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.compression import pack_json, unpack_json
+
+logger = logging.getLogger(__name__)
+
+# Sections stockées hors du document principal
+DETACHED_SECTIONS = [
+    'visibility_results',
+    'test_queries',
+    'competitive_intelligence',
+    'schemas',
+    'generated_articles',
+    'semantic_analysis',
+    'data_gap_analysis',
+    'token_analysis',
+]
+
+
+def parse_field_list(value: Optional[str]) -> Optional[List[str]]:
+    """'a, b' → ['a', 'b'] ; None ou vide → None"""
+    if not value:
+        return None
+    return [field.strip() for field in value.split(',') if field.strip()]
+
+
+class ReportStore:
+    """Rapports découpés en résumé + sections compressées"""
+
+    def __init__(self, reports, sections):
+        """
+        Args:
+            reports: Collection Motor des résumés (db.reports)
+            sections: Collection Motor des sections (db.report_sections)
+        """
+        self.reports = reports
+        self.sections = sections
+
+    async def insert(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Enregistre un rapport complet (le dict fourni n'est pas modifié) ; un rapport de même id
+        (relance d'une étape du job) est remplacé avec ses sections
+
+        Returns:
+            Le résumé enregistré dans `reports`
+        """
+        summary = {k: v for k, v in report.items() if k not in DETACHED_SECTIONS and k != '_id'}
+        detached = {k: report[k] for k in DETACHED_SECTIONS if report.get(k) is not None}
+        summary['sections'] = list(detached)
+
+        blobs = await asyncio.to_thread(lambda: {name: pack_json(value) for name, value in detached.items()})
+        await self.sections.delete_many({'reportId': report['id']})
+        if blobs:
+            await self.sections.insert_many([
+                {'reportId': report['id'], 'section': name, 'data': blob, 'size': len(blob)}
+                for name, blob in blobs.items()
+            ])
+        await self.reports.replace_one({'id': report['id']}, dict(summary), upsert=True)
+
+        logger.info(f"💾 Report {report['id']} stored: {len(blobs)} sections "
+                    f"({sum(len(blob) for blob in blobs.values())} bytes compressed)")
+        return summary
+
+    async def get(
+        self,
+        report_id: str,
+        fields: Optional[Iterable[str]] = None,
+        include: Optional[Iterable[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Charge un rapport
+
+        Args:
+            report_id: Identifiant du rapport
+            fields: Champs du résumé à retourner (défaut: tout le résumé)
+            include: Sections à joindre ('all' pour toutes) ; une section listée dans fields est jointe
+
+        Returns:
+            Le rapport ou None s'il n'existe pas
+        """
+        fields = list(fields or [])
+        include = list(include or [])
+        if 'all' in include:
+            include = list(DETACHED_SECTIONS)
+        include += [f for f in fields if f in DETACHED_SECTIONS and f not in include]
+        include = [name for name in include if name in DETACHED_SECTIONS]
+        summary_fields = [f for f in fields if f not in DETACHED_SECTIONS]
+
+        # Les rapports antérieurs au découpage portent leurs sections dans le document principal
+        if summary_fields:
+            projection = {f: 1 for f in summary_fields + include + ['id', 'sections']}
+        else:
+            projection = {name: 0 for name in DETACHED_SECTIONS if name not in include}
+        projection['_id'] = 0
+
+        report = await self.reports.find_one({'id': report_id}, projection)
+        if report is None:
+            return None
+
+        wanted = [name for name in include if name in report.get('sections', [])]
+        if wanted:
+            report.update(await self.load_sections(report_id, wanted))
+        return report
+
+    async def load_sections(self, report_id: str, names: Iterable[str]) -> Dict[str, Any]:
+        """Sections décompressées {nom: valeur}"""
+        loaded = {}
+        async for doc in self.sections.find(
+            {'reportId': report_id, 'section': {'$in': list(names)}},
+            {'_id': 0, 'section': 1, 'data': 1}
+        ):
+            try:
+                loaded[doc['section']] = await asyncio.to_thread(unpack_json, doc['data'])
+            except (zlib.error, ValueError) as e:
+                logger.error(f"Unreadable report section {report_id}/{doc['section']}: {e}")
+        return loaded
@@ -0,0 +1,194 @@
+"""
+Séries de scores et agrégats de tendances dans MongoDB
+Les analyses sont enregistrées par les workers (un ou plusieurs nœuds) et les tendances
+lues par le serveur web : points et agrégats vivent donc dans MongoDB et non dans la base
+SQLite locale de chaque nœud.
+- score_points : un document par analyse {analysisId, siteUrl, date, metrics}
+- score_rollups : un document par (granularité, site, période, métrique), incrémenté
+  à l'insertion ($inc / $min / $max)
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from services.score_trends import (
+    GRANULARITIES, aggregate_points, analysis_date, build_trends, extract_metrics, period_bounds
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreHistoryStore:
+    """Points de scores par analyse et agrégats jour / semaine / mois"""
+
+    def __init__(self, points, rollups):
+        """
+        Args:
+            points: Collection Motor des points (db.score_points, index unique sur analysisId)
+            rollups: Collection Motor des agrégats (db.score_rollups)
+        """
+        self.points = points
+        self.rollups = rollups
+
+    async def record_report(self, report: Dict[str, Any]) -> bool:
+        """Enregistre les scores d'un rapport (voir record)"""
+        return await self.record(report['id'], report['url'], analysis_date(report), extract_metrics(report))
+
+    async def record(self, analysis_id: str, site_url: str, date: str, metrics: Dict[str, float]) -> bool:
+        """
+        Enregistre les scores d'une analyse et met à jour les agrégats de ses périodes.
+        Une analyse déjà enregistrée (relance d'étape) remplace ses points ; ses périodes
+        sont recalculées à partir des points pour ne pas la compter deux fois.
+
+        Returns:
+            True si l'analyse était nouvelle
+        """
+        previous = await self.points.find_one_and_replace(
+            {'analysisId': analysis_id},
+            {'analysisId': analysis_id, 'siteUrl': site_url, 'date': date, 'metrics': metrics},
+            projection={'_id': 0, 'siteUrl': 1, 'date': 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous is None:
+            await self._increment(site_url, date, metrics)
+            return True
+
+        stale = set()
+        for granularity in GRANULARITIES:
+            stale.add((granularity, previous['siteUrl'], period_bounds(previous['date'], granularity)[0]))
+            stale.add((granularity, site_url, period_bounds(date, granularity)[0]))
+        for granularity, stale_site, period in stale:
+            await self._rebuild_rollup(granularity, stale_site, period)
+        return False
+
+    async def import_history(self, history) -> int:
+        """
+        Reprend les analyses de l'historique SQLite local absentes des séries (analyses
+        antérieures aux séries, nœud ajouté) ; sans effet quand tout est déjà importé.
+        Plusieurs workers peuvent l'exécuter en même temps : l'index unique sur analysisId
+        garantit qu'une analyse n'est comptée qu'une fois.
+
+        Args:
+            history: DatabaseManager du nœud
+
+        Returns:
+            Nombre d'analyses importées
+        """
+        imported = 0
+        after_id = ''
+        while True:
+            ids = await asyncio.to_thread(history.list_analysis_ids, after_id)
+            if not ids:
+                break
+            after_id = ids[-1]
+
+            known = {
+                doc['analysisId']
+                async for doc in self.points.find({'analysisId': {'$in': ids}}, {'_id': 0, 'analysisId': 1})
+            }
+            missing = [analysis_id for analysis_id in ids if analysis_id not in known]
+            for analysis_id, site_url, date, metrics in await asyncio.to_thread(history.get_score_points, missing):
+                try:
+                    await self.points.insert_one(
+                        {'analysisId': analysis_id, 'siteUrl': site_url, 'date': date, 'metrics': metrics}
+                    )
+                except DuplicateKeyError:
+                    continue  # Importée entre-temps par un autre worker
+                await self._increment(site_url, date, metrics)
+                imported += 1
+
+        if imported:
+            logger.info(f"📈 Score history imported for {imported} analyses")
+        return imported
+
+    async def _increment(self, site_url: str, date: str, metrics: Dict[str, float]):
+        """Ajoute un point aux agrégats de ses périodes (une requête groupée)"""
+        if not metrics:
+            return
+        # last : $max compare les sous-documents champ par champ, donc d'abord par date
+        await self.rollups.bulk_write([
+            UpdateOne(
+                {'granularity': granularity, 'siteUrl': site_url,
+                 'period': period_bounds(date, granularity)[0], 'metric': metric},
+                {
+                    '$inc': {'count': 1, 'total': value},
+                    '$min': {'min': value},
+                    '$max': {'max': value, 'last': {'date': date, 'value': value}},
+                },
+                upsert=True
+            )
+            for granularity in GRANULARITIES
+            for metric, value in metrics.items()
+        ], ordered=False)
+
+    async def _rebuild_rollup(self, granularity: str, site_url: str, period: str):
+        """Recalcule les agrégats d'une période d'un site à partir des points"""
+        start, end = period_bounds(period, granularity)
+        series: Dict[str, List[tuple]] = {}
+        async for doc in self.points.find(
+            {'siteUrl': site_url, 'date': {'$gte': start, '$lt': end}},
+            {'_id': 0, 'date': 1, 'metrics': 1}
+        ):
+            for metric, value in doc['metrics'].items():
+                series.setdefault(metric, []).append((doc['date'], value))
+
+        await self.rollups.delete_many({'granularity': granularity, 'siteUrl': site_url, 'period': start})
+        if series:
+            rollups = []
+            for metric, points in series.items():
+                count, total, min_value, max_value, last_value, last_date = aggregate_points(points)
+                rollups.append({
+                    'granularity': granularity, 'siteUrl': site_url, 'period': start, 'metric': metric,
+                    'count': count, 'total': total, 'min': min_value, 'max': max_value,
+                    'last': {'date': last_date, 'value': last_value},
+                })
+            await self.rollups.insert_many(rollups)
+
+    async def get_trends(
+        self,
+        site_urls: Optional[List[str]] = None,
+        granularity: str = 'week',
+        metrics: Optional[List[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Tendances des scores d'un site ou d'un portefeuille (une lecture sur la clé des agrégats)
+
+        Args:
+            site_urls: Sites du portefeuille (défaut: tous)
+            granularity: day, week ou month
+            metrics: Métriques retournées (défaut: toutes)
+            start / end: Bornes ISO 8601 (les périodes qui les contiennent sont incluses)
+
+        Raises:
+            ValueError: granularité ou date invalide
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        query: Dict[str, Any] = {'granularity': granularity}
+        if site_urls:
+            query['siteUrl'] = {'$in': list(site_urls)}
+        periods = {}
+        if start:
+            periods['$gte'] = period_bounds(start, granularity)[0]
+        if end:
+            periods['$lte'] = period_bounds(end, granularity)[0]
+        if periods:
+            query['period'] = periods
+        if metrics:
+            query['metric'] = {'$in': list(metrics)}
+
+        rows = [
+            (doc['siteUrl'], doc['period'], doc['metric'], doc['count'], doc['total'],
+             doc['min'], doc['max'], doc['last']['value'])
+            async for doc in self.rollups.find(query, {'_id': 0})
+        ]
+        trends = build_trends(rows)
+        trends['granularity'] = granularity
+        return trends
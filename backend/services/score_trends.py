@@ -0,0 +1,131 @@
+"""
+Séries temporelles des scores de l'historique des analyses
+Chaque analyse produit un point par métrique (score global, critères, visibilité globale
+et par plateforme) ; des agrégats jour / semaine / mois sont maintenus à l'insertion
+(services/score_history_store.py) pour servir les courbes de tendance d'un site ou d'un
+portefeuille en une seule lecture indexée.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Métriques de visibilité par plateforme : 'platform:chatgpt', 'platform:claude'...
+PLATFORM_METRIC_PREFIX = 'platform:'
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def analysis_date(report: Dict[str, Any]) -> str:
+    """Date de l'analyse : createdAt du rapport (imports d'historique), sinon maintenant"""
+    created_at = report.get('createdAt')
+    if isinstance(created_at, datetime):
+        return created_at.isoformat()
+    if isinstance(created_at, str) and created_at:
+        return created_at
+    return datetime.now().isoformat()
+
+
+def extract_metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Métriques d'un rapport {nom: valeur} : scores numériques (global_score et critères),
+    overall_visibility et platform:<plateforme>
+    """
+    metrics = {}
+    for name, value in (report.get('scores') or {}).items():
+        if _number(value) is not None:
+            metrics[name] = _number(value)
+
+    visibility = report.get('visibility_results') or {}
+    if _number(visibility.get('overall_visibility')) is not None:
+        metrics['overall_visibility'] = _number(visibility['overall_visibility'])
+    for platform, value in (visibility.get('platform_scores') or {}).items():
+        if _number(value) is not None:
+            metrics[f"{PLATFORM_METRIC_PREFIX}{platform.lower()}"] = _number(value)
+    return metrics
+
+
+def period_bounds(iso_date: str, granularity: str) -> Tuple[str, str]:
+    """
+    Période contenant la date : (début inclus, fin exclue) au format YYYY-MM-DD
+    (semaines ISO commençant le lundi)
+
+    Raises:
+        ValueError: granularité ou date invalide
+    """
+    day = date.fromisoformat(iso_date[:10])
+    if granularity == 'day':
+        start, end = day, day + timedelta(days=1)
+    elif granularity == 'week':
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+    elif granularity == 'month':
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError(f"Unknown granularity: {granularity} (expected one of {', '.join(GRANULARITIES)})")
+    return start.isoformat(), end.isoformat()
+
+
+def aggregate_points(points: Iterable[Tuple[str, float]]) -> Tuple[int, float, float, float, float, str]:
+    """Agrégat (count, total, min, max, dernière valeur, dernière date) de points (date, valeur)"""
+    points = sorted(points)
+    values = [value for _, value in points]
+    return len(values), sum(values), min(values), max(values), values[-1], points[-1][0]
+
+
+def build_trends(rows: Iterable[Tuple[str, str, str, int, float, float, float, float]]) -> Dict[str, Any]:
+    """
+    Met en forme les agrégats (site, période, métrique, count, total, min, max, dernière valeur)
+
+    Returns:
+        {'sites': {site: {métrique: [points]}}, 'portfolio': {métrique: [points]}} ;
+        le portefeuille pondère chaque site par son nombre d'analyses sur la période
+    """
+    sites: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    portfolio: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    for site_url, period, metric, count, total, min_value, max_value, last_value in rows:
+        sites.setdefault(site_url, {}).setdefault(metric, []).append({
+            'period': period,
+            'avg': total / count,
+            'min': min_value,
+            'max': max_value,
+            'last': last_value,
+            'count': count,
+        })
+
+        bucket = portfolio.setdefault(metric, {}).setdefault(period, {
+            'period': period, 'total': 0.0, 'count': 0, 'min': min_value, 'max': max_value, 'sites': 0
+        })
+        bucket['total'] += total
+        bucket['count'] += count
+        bucket['min'] = min(bucket['min'], min_value)
+        bucket['max'] = max(bucket['max'], max_value)
+        bucket['sites'] += 1
+
+    for series in sites.values():
+        for points in series.values():
+            points.sort(key=lambda point: point['period'])
+
+    return {
+        'sites': sites,
+        'portfolio': {
+            metric: [
+                {
+                    'period': bucket['period'],
+                    'avg': bucket['total'] / bucket['count'],
+                    'min': bucket['min'],
+                    'max': bucket['max'],
+                    'count': bucket['count'],
+                    'sites': bucket['sites'],
+                }
+                for _, bucket in sorted(periods.items())
+            ]
+            for metric, periods in portfolio.items()
+        },
+    }
@@ -0,0 +1,311 @@
+"""
+Fournisseurs de recherche web pour la découverte de compétiteurs
+Google (scraping), DuckDuckGo HTML, SerpAPI et fixtures locales (tests).
+Les requêtes partent en parallèle, les fournisseurs sont mis en course
+(le premier résultat non vide gagne) et les résultats sont cachés par (fournisseur, requête).
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote_plus, unquote
+
+import httpx
+from bs4 import BeautifulSoup
+
+from config import (
+    COMPETITOR_SEARCH_CACHE_DIR,
+    COMPETITOR_SEARCH_CACHE_TTL_HOURS,
+    COMPETITOR_SEARCH_FIXTURES,
+    COMPETITOR_SEARCH_PROVIDER,
+    COMPETITOR_SEARCH_RATE_LIMITS,
+    COMPETITOR_SEARCH_TIMEOUT,
+    SERPAPI_API_KEY,
+    is_search_cache_enabled
+)
+from services.cache_service import CacheService
+from services.llm_response_cache import normalize_query
+from services.visibility_scheduler import AsyncRateLimiter
+
+logger = logging.getLogger(__name__)
+
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+
+class SearchProvider(ABC):
+    """Fournisseur de recherche : retourne les URLs des résultats organiques (non filtrées)"""
+
+    name = ''
+
+    def is_available(self) -> bool:
+        """Le fournisseur est-il configuré (clé API, fixtures...)"""
+        return True
+
+    @abstractmethod
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int = 10) -> List[str]:
+        """URLs des résultats organiques de la requête (au plus max_results)"""
+
+
+class GoogleScrapeProvider(SearchProvider):
+    """Scraping de la page de résultats Google"""
+
+    name = 'google_scrape'
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int = 10) -> List[str]:
+        search_url = f"https://www.google.com/search?q={quote_plus(query)}&num={max_results}"
+        response = await client.get(search_url, headers={
+            'Accept': 'text/html,application/xhtml+xml',
+            'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
+        })
+        response.raise_for_status()
+
+        # Vérifier si Google a bloqué (CAPTCHA)
+        if 'captcha' in response.text.lower():
+            logger.debug("Google CAPTCHA detected")
+            return []
+
+        return self.parse_results(response.content)[:max_results]
+
+    @staticmethod
+    def parse_results(content: bytes) -> List[str]:
+        """Extrait les URLs des résultats organiques de la page Google"""
+        soup = BeautifulSoup(content, 'html.parser')
+        urls = []
+
+        for link in soup.find_all('a', href=True):
+            href = link['href']
+
+            # Format Google: /url?q=https://example.com&sa=...
+            if '/url?q=' in href:
+                url = href.split('/url?q=')[1].split('&')[0]
+                if url.startswith('http'):
+                    urls.append(url)
+
+            # Format direct
+            elif href.startswith('http'):
+                urls.append(href)
+
+        return list(dict.fromkeys(urls))
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """Version HTML de DuckDuckGo"""
+
+    name = 'duckduckgo'
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int = 10) -> List[str]:
+        response = await client.get(f"https://duckduckgo.com/html/?q={quote_plus(query)}", headers={
+            'Accept': 'text/html,application/xhtml+xml',
+            'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
+        })
+        response.raise_for_status()
+        return self.parse_results(response.content)[:max_results]
+
+    @staticmethod
+    def parse_results(content: bytes) -> List[str]:
+        """Extrait les URLs des résultats organiques de la page DuckDuckGo"""
+        soup = BeautifulSoup(content, 'html.parser')
+
+        # DuckDuckGo utilise des balises avec class="result__url"
+        urls = [
+            result.get('href', '') for result in soup.find_all('a', class_='result__url')
+            if result.get('href', '').startswith('http')
+        ]
+
+        # Fallback: liens de redirection //duckduckgo.com/l/?uddg=https://example.com
+        if not urls:
+            for link in soup.find_all('a', href=True):
+                href = link['href']
+                if 'uddg=' in href:
+                    url = unquote(href.split('uddg=')[1].split('&')[0])
+                    if url.startswith('http'):
+                        urls.append(url)
+
+        return list(dict.fromkeys(urls))
+
+
+class SerpApiProvider(SearchProvider):
+    """API SerpAPI (résultats Google structurés, nécessite SERPAPI_API_KEY)"""
+
+    name = 'serpapi'
+
+    def __init__(self, api_key: Optional[str] = SERPAPI_API_KEY):
+        self.api_key = api_key
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int = 10) -> List[str]:
+        response = await client.get('https://serpapi.com/search.json', params={
+            'engine': 'google',
+            'q': query,
+            'num': max_results,
+            'hl': 'fr',
+            'api_key': self.api_key
+        })
+        response.raise_for_status()
+        results = response.json().get('organic_results', [])
+        return [result['link'] for result in results if result.get('link', '').startswith('http')][:max_results]
+
+
+class FixtureSearchProvider(SearchProvider):
+    """Résultats fixes par requête (tests et développement hors ligne)"""
+
+    name = 'fixture'
+
+    def __init__(self, results: Optional[Dict[str, List[str]]] = None, latency: float = 0.0, name: str = 'fixture'):
+        self.results = {normalize_query(query): urls for query, urls in (results or {}).items()}
+        self.latency = latency
+        self.name = name
+
+    @classmethod
+    def from_file(cls, path: str) -> 'FixtureSearchProvider':
+        """Charge un fichier JSON {requête: [urls]}"""
+        with open(Path(path), 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def is_available(self) -> bool:
+        return bool(self.results)
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int = 10) -> List[str]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return list(self.results.get(normalize_query(query), []))[:max_results]
+
+
+def build_search_providers(names: str = COMPETITOR_SEARCH_PROVIDER) -> List[SearchProvider]:
+    """
+    Construit les fournisseurs configurés (liste séparée par des virgules)
+    Les fournisseurs non configurés (sans clé API, sans fixtures) sont ignorés
+    """
+    factories = {
+        'google_scrape': GoogleScrapeProvider,
+        'duckduckgo': DuckDuckGoProvider,
+        'serpapi': SerpApiProvider,
+        'fixture': lambda: FixtureSearchProvider.from_file(COMPETITOR_SEARCH_FIXTURES) if COMPETITOR_SEARCH_FIXTURES else FixtureSearchProvider()
+    }
+
+    providers = []
+    for name in (n.strip() for n in names.split(',')):
+        if name not in factories:
+            if name:
+                logger.warning(f"Unknown search provider: {name}")
+            continue
+        provider = factories[name]()
+        if provider.is_available():
+            providers.append(provider)
+    return providers
+
+
+class WebSearchService:
+    """
+    Recherche web multi-fournisseurs : requêtes concurrentes, limite de débit par
+    fournisseur, course entre fournisseurs (premier résultat non vide gagnant)
+    """
+
+    def __init__(
+        self,
+        providers: Optional[List[SearchProvider]] = None,
+        rate_limits: Optional[Dict[str, int]] = None,
+        cache: Optional[CacheService] = None,
+        cache_ttl_hours: int = COMPETITOR_SEARCH_CACHE_TTL_HOURS,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            providers: Fournisseurs mis en course (défaut: COMPETITOR_SEARCH_PROVIDER)
+            rate_limits: Requêtes/minute par fournisseur (défaut: COMPETITOR_SEARCH_RATE_LIMITS)
+            cache: Cache des résultats (défaut: base dédiée dans COMPETITOR_SEARCH_CACHE_DIR,
+                   active aussi en production)
+            cache_ttl_hours: Durée de validité des résultats cachés
+            transport: Transport httpx (tests)
+        """
+        self.providers = providers if providers is not None else build_search_providers()
+        self.rate_limits = rate_limits or COMPETITOR_SEARCH_RATE_LIMITS
+        self.cache = cache or CacheService(COMPETITOR_SEARCH_CACHE_DIR, enabled_check=is_search_cache_enabled)
+        self.cache_ttl_hours = cache_ttl_hours
+        self.transport = transport
+        self.timeout = COMPETITOR_SEARCH_TIMEOUT
+        self.user_agent = BROWSER_USER_AGENT
+        self._limiters: Dict[str, AsyncRateLimiter] = {}
+        self._limiters_lock = threading.Lock()
+
+    def _limiter(self, provider_name: str) -> AsyncRateLimiter:
+        """
+        Limiteur de débit du fournisseur, partagé par tous les jobs
+        (chacun tourne dans sa propre boucle d'événements, parfois dans son propre thread)
+        """
+        with self._limiters_lock:
+            if provider_name not in self._limiters:
+                self._limiters[provider_name] = AsyncRateLimiter(self.rate_limits.get(provider_name, 30))
+            return self._limiters[provider_name]
+
+    @staticmethod
+    def _cache_key(provider_name: str, query: str, max_results: int) -> str:
+        return f"web_search:{provider_name}:{max_results}:{normalize_query(query)}"
+
+    async def search_many(self, queries: List[str], max_results: int = 10) -> Dict[str, List[str]]:
+        """
+        Lance toutes les requêtes en parallèle (connexions HTTP partagées)
+
+        Returns:
+            Dict {requête: URLs du fournisseur gagnant} ([] si aucun résultat)
+        """
+        async with httpx.AsyncClient(
+            transport=self.transport,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={'User-Agent': self.user_agent}
+        ) as client:
+            results = await asyncio.gather(*(self.search(client, query, max_results) for query in queries))
+        return dict(zip(queries, results))
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int = 10) -> List[str]:
+        """Met les fournisseurs en course sur une requête : le premier résultat non vide gagne"""
+        for provider in self.providers:
+            cached = self.cache.get(self._cache_key(provider.name, query, max_results), max_age_hours=self.cache_ttl_hours)
+            if cached:
+                logger.info(f"    ✅ Search cache hit ({provider.name}): {query}")
+                return cached
+
+        if not self.providers:
+            logger.warning("No search provider configured")
+            return []
+
+        tasks = [asyncio.create_task(self._search_provider(client, provider, query, max_results)) for provider in self.providers]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                provider_name, urls = await next_done
+                if urls:
+                    logger.info(f"    → {provider_name} won for '{query}': {len(urls)} URLs")
+                    self.cache.set(self._cache_key(provider_name, query, max_results), urls)
+                    return urls
+            return []
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _search_provider(
+        self,
+        client: httpx.AsyncClient,
+        provider: SearchProvider,
+        query: str,
+        max_results: int
+    ) -> Tuple[str, List[str]]:
+        """Requête sur un fournisseur, dans sa limite de débit (erreurs => résultat vide)"""
+        try:
+            await self._limiter(provider.name).acquire()
+            return provider.name, await provider.search(client, query, max_results)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"{provider.name} search error for '{query}': {e}")
+            return provider.name, []
+
+
+# Instance globale
+web_search_service = WebSearchService()
@@ -0,0 +1,173 @@
+"""
+Ordonnancement des tests de visibilité
+Ordre représentatif du mix de requêtes, budget d'appels/tokens par job
+et limites de débit par fournisseur
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Catégories produites par query_generator_v2 (dans l'ordre d'assemblage)
+QUERY_CATEGORIES = ['non_branded', 'semi_branded', 'branded']
+
+
+def categorize_queries(queries: List[str], breakdown: Optional[Dict[str, Any]] = None) -> List[Tuple[str, str]]:
+    """
+    Associe chaque requête à sa catégorie à partir du breakdown du générateur
+    (les requêtes sont assemblées non-branded, puis semi-branded, puis branded)
+
+    Returns:
+        Liste de (requête, catégorie) dans l'ordre d'origine
+    """
+    if not breakdown:
+        return [(query, 'uncategorized') for query in queries]
+
+    categorized = []
+    offset = 0
+    for category in QUERY_CATEGORIES:
+        count = int(breakdown.get(category, 0) or 0)
+        categorized.extend((query, category) for query in queries[offset:offset + count])
+        offset += count
+
+    # Requêtes ajoutées hors breakdown (ex: requêtes manuelles)
+    categorized.extend((query, 'uncategorized') for query in queries[offset:])
+    return categorized
+
+
+def interleave_by_category(categorized: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Réordonne les requêtes pour que tout préfixe respecte les proportions du mix.
+    Chaque requête reçoit la position relative (i + 0.5) / n dans sa catégorie ;
+    le tri sur cette position entrelace les catégories proportionnellement
+    (80/15/5 → un branded toutes les ~20 requêtes dès le début).
+    """
+    groups: Dict[str, List[Tuple[str, str]]] = {}
+    for item in categorized:
+        groups.setdefault(item[1], []).append(item)
+
+    category_rank = {category: rank for rank, category in enumerate(groups)}
+    positioned = [
+        ((i + 0.5) / len(items), category_rank[category], item)
+        for category, items in groups.items()
+        for i, item in enumerate(items)
+    ]
+    positioned.sort(key=lambda entry: (entry[0], entry[1]))
+    return [item for _, _, item in positioned]
+
+
+class VisibilityBudget:
+    """
+    Budget d'appels LLM et de tokens pour un job.
+    Une requête réserve son coût estimé avant de démarrer ; la consommation
+    réelle est enregistrée appel par appel.
+    """
+
+    def __init__(self, max_calls: int, max_tokens: int, estimated_tokens_per_call: int = 1200):
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.estimated_tokens_per_call = estimated_tokens_per_call
+        self.calls_used = 0
+        self.tokens_used = 0
+        self._reserved_calls = 0
+        self._reserved_tokens = 0
+
+    def tokens_per_call(self) -> int:
+        """Moyenne mesurée des tokens par appel (estimation tant qu'aucune mesure)"""
+        if self.calls_used:
+            return max(1, self.tokens_used // self.calls_used)
+        return self.estimated_tokens_per_call
+
+    def try_reserve(self, calls: int) -> Optional[Tuple[int, int]]:
+        """
+        Réserve le coût estimé de `calls` appels
+
+        Returns:
+            La réservation (calls, tokens) à libérer après exécution, ou None si le budget est épuisé
+        """
+        tokens = calls * self.tokens_per_call()
+        if self.calls_used + self._reserved_calls + calls > self.max_calls:
+            return None
+        if self.tokens_used + self._reserved_tokens + tokens > self.max_tokens:
+            return None
+
+        self._reserved_calls += calls
+        self._reserved_tokens += tokens
+        return calls, tokens
+
+    def exceeds(self, calls: int) -> bool:
+        """
+        Le coût estimé de `calls` appels dépasse-t-il le budget restant, réservations
+        en cours exclues (elles seront réglées à la consommation réelle, souvent moindre)
+        """
+        tokens = calls * self.tokens_per_call()
+        return self.calls_used + calls > self.max_calls or self.tokens_used + tokens > self.max_tokens
+
+    def has_reservations(self) -> bool:
+        """Des réservations sont-elles en cours"""
+        return self._reserved_calls > 0 or self._reserved_tokens > 0
+
+    def release(self, reservation: Tuple[int, int]):
+        """Libère une réservation (la consommation réelle a été enregistrée via record)"""
+        calls, tokens = reservation
+        self._reserved_calls -= calls
+        self._reserved_tokens -= tokens
+
+    def record(self, tokens: int):
+        """Enregistre un appel effectué et ses tokens"""
+        self.calls_used += 1
+        self.tokens_used += tokens
+
+    def stats(self) -> Dict[str, int]:
+        """Consommation du budget"""
+        return {
+            'max_calls': self.max_calls,
+            'max_tokens': self.max_tokens,
+            'calls_used': self.calls_used,
+            'tokens_used': self.tokens_used
+        }
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket async : `rate_per_minute` requêtes/minute avec rafale jusqu'à `burst`.
+    Partageable entre threads et boucles d'événements : le jeton est réservé sous un
+    verrou de thread (le seau peut passer en négatif), l'attente se fait hors du verrou.
+    """
+
+    def __init__(self, rate_per_minute: int, burst: Optional[int] = None):
+        self.rate = max(1, rate_per_minute) / 60.0
+        self.capacity = float(burst or max(1, rate_per_minute // 6))  # ~10s de rafale
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Réserve un jeton ; retourne le délai avant de pouvoir l'utiliser"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        """Attend qu'un jeton soit disponible"""
+        delay = self._reserve()
+        if delay <= 0:
+            return
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Jeton non utilisé (ex: fournisseur perdant d'une course) : rendu au seau
+            with self._lock:
+                self._tokens = min(self.capacity, self._tokens + 1)
+            raise
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Estimation grossière du nombre de tokens (~4 caractères par token)"""
+    return sum(len(text or '') for text in texts) // 4 + 1
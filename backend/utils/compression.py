@@ -0,0 +1,23 @@
+"""
+Sérialisation JSON compacte et compressée des documents volumineux stockés dans MongoDB
+(checkpoints d'étapes, sections de rapports)
+"""
+import json
+import zlib
+from typing import Any
+
+
+def pack_json(value: Any) -> bytes:
+    """Sérialise en JSON compact compressé (ObjectId, dates → str ; _id de premier niveau ignoré)"""
+    if isinstance(value, dict):
+        value = {k: v for k, v in value.items() if k != '_id'}
+    payload = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+    return zlib.compress(payload.encode('utf-8'), 6)
+
+
+def unpack_json(blob: bytes) -> Any:
+    """
+    Raises:
+        zlib.error, ValueError: données illisibles
+    """
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
@@ -0,0 +1,215 @@
+"""
+Extraction des caractéristiques HTML en une seule passe (lxml)
+Partagée par le crawler, l'intelligence compétitive, la découverte de compétiteurs
+et le générateur de schémas
+"""
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from bs4 import UnicodeDammit
+from lxml import etree, html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+# Éléments dont le texte n'est pas du contenu visible
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template'}
+
+# Éléments dont on capture le texte complet
+CAPTURED_TAGS = {'title', 'h1', 'h2', 'h3', 'h4', 'p', 'dt', 'dd', 'summary'}
+
+# Éléments pouvant porter une question de FAQ, et éléments pouvant porter sa réponse
+QUESTION_TAGS = {'h2', 'h3', 'h4', 'p', 'dt', 'summary'}
+ANSWER_TAGS = {'p', 'dd'}
+
+QUESTION_WORDS = ['comment', 'pourquoi', 'quand', 'où', 'qui', 'quoi', 'quel', 'quelle']
+TLDR_MARKERS = ['TL;DR', 'EN BREF', 'RÉSUMÉ', 'KEY TAKEAWAYS', 'À RETENIR']
+
+STATS_PATTERN = re.compile(r'\b\d+\s*(millions?|milliards?|k\b|M\b)', re.IGNORECASE)
+
+# lxml refuse une chaîne Unicode portant une déclaration d'encodage XML
+XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+class PageFeatures:
+    """Caractéristiques extraites d'une page HTML"""
+
+    def __init__(self):
+        self.title: str = ''
+        self.meta_description: str = ''
+        self.h1: List[str] = []
+        self.h2: List[str] = []
+        self.h3: List[str] = []
+        self.paragraphs: List[str] = []
+        self.json_ld: List[Any] = []
+        self.json_ld_count: int = 0  # Balises JSON-LD, y compris invalides
+        self.links: List[str] = []  # href bruts, dans l'ordre du document
+        self.lists_count: int = 0
+        self.tables_count: int = 0
+        self.faq_pairs: List[Dict[str, str]] = []
+        self.has_faq: bool = False
+        self.has_tldr: bool = False
+        self.question_count: int = 0  # Fragments de texte contenant '?'
+        self.text: str = ''
+        self.word_count: int = 0
+        self.stats_count: int = 0
+
+    def content_paragraphs(self, min_length: int = 50) -> List[str]:
+        """Paragraphes de contenu (les courts sont ignorés)"""
+        return [p for p in self.paragraphs if len(p) > min_length]
+
+    def content_word_count(self, min_length: int = 50) -> int:
+        """Nombre de mots des paragraphes de contenu"""
+        return sum(len(p.split()) for p in self.content_paragraphs(min_length))
+
+
+def _is_question(tag: str, text: str) -> bool:
+    """Un titre qui pose une question, ou un paragraphe qui commence par un mot-question"""
+    if '?' not in text:
+        return False
+    if tag == 'p':
+        text_lower = text.lower()
+        return any(text_lower.startswith(word) for word in QUESTION_WORDS)
+    return True
+
+
+def decode_html(content: Union[bytes, str], encoding: Optional[str] = None) -> str:
+    """
+    Décode le HTML brut : charset HTTP s'il est fourni, puis UTF-8 strict, sinon BOM,
+    <meta charset> et détection (UnicodeDammit) ; libxml2 seul lirait en Latin-1
+    une page UTF-8 sans <meta charset>
+    """
+    if isinstance(content, str):
+        text = content
+    else:
+        text = None
+        for candidate in ([encoding] if encoding else []) + ['utf-8-sig']:
+            try:
+                text = content.decode(candidate)
+                break
+            except (LookupError, UnicodeDecodeError):
+                continue
+        if text is None:
+            dammit = UnicodeDammit(content, is_html=True)
+            text = dammit.unicode_markup if dammit.unicode_markup is not None else content.decode('utf-8', 'replace')
+    return XML_DECLARATION.sub('', text, count=1)
+
+
+def extract_page_features(content: Union[bytes, str], encoding: Optional[str] = None) -> PageFeatures:
+    """
+    Parse le HTML et extrait toutes les caractéristiques en un seul parcours de l'arbre
+
+    Args:
+        content: HTML brut (bytes de la réponse HTTP ou texte)
+        encoding: Charset annoncé par l'en-tête Content-Type (prioritaire)
+
+    Returns:
+        PageFeatures (vide si le document n'est pas parsable)
+    """
+    features = PageFeatures()
+
+    if not content:
+        return features
+
+    try:
+        root = lxml_html.document_fromstring(decode_html(content, encoding))
+    except (etree.ParserError, ValueError) as e:
+        logger.debug(f"Unparsable HTML: {e}")
+        return features
+
+    text_chunks: List[str] = []
+    captures: List[List[str]] = []  # Texte des éléments capturés ouverts (imbrication possible)
+    skip_depth = 0
+    pending_question: Optional[str] = None
+
+    def add_text(text: Optional[str]):
+        if not text or skip_depth:
+            return
+        text_chunks.append(text)
+        for buffer in captures:
+            buffer.append(text)
+        if '?' in text:
+            features.question_count += 1
+        upper = text.upper()
+        if not features.has_faq and 'FAQ' in upper:
+            features.has_faq = True
+        if not features.has_tldr and any(marker in upper for marker in TLDR_MARKERS):
+            features.has_tldr = True
+
+    for event, element in etree.iterwalk(root, events=('start', 'end', 'comment', 'pi')):
+        tag = element.tag
+
+        # Commentaires et instructions : seul le texte qui suit compte
+        if event in ('comment', 'pi') or not isinstance(tag, str):
+            add_text(element.tail)
+            continue
+
+        tag = tag.lower()
+
+        if event == 'start':
+            if tag in SKIPPED_TAGS:
+                if tag == 'script' and (element.get('type') or '').lower() == 'application/ld+json':
+                    features.json_ld_count += 1
+                    try:
+                        features.json_ld.append(json.loads(element.text or ''))
+                    except Exception:
+                        pass
+                skip_depth += 1
+                continue
+
+            if tag == 'meta' and (element.get('name') or '').lower() == 'description' and not features.meta_description:
+                features.meta_description = (element.get('content') or '').strip()
+            elif tag == 'a' and element.get('href') is not None:
+                features.links.append(element.get('href'))
+            elif tag in ('ul', 'ol'):
+                features.lists_count += 1
+            elif tag == 'table':
+                features.tables_count += 1
+
+            if tag in CAPTURED_TAGS and not skip_depth:
+                captures.append([])
+
+            add_text(element.text)
+            continue
+
+        # event == 'end'
+        if tag in SKIPPED_TAGS:
+            skip_depth -= 1
+            add_text(element.tail)
+            continue
+
+        if tag in CAPTURED_TAGS and not skip_depth and captures:
+            captured = ''.join(captures.pop()).strip()
+
+            if tag == 'title':
+                if not features.title:
+                    features.title = captured
+            elif tag == 'h1':
+                features.h1.append(captured)
+            elif tag == 'h2':
+                features.h2.append(captured)
+            elif tag == 'h3':
+                features.h3.append(captured)
+
+            if tag == 'p':
+                features.paragraphs.append(captured)
+
+            # Paires question/réponse (titre ou paragraphe-question suivi d'un paragraphe)
+            if tag in QUESTION_TAGS and _is_question(tag, captured):
+                pending_question = captured.split('?')[0].strip() + '?'
+            elif tag in ANSWER_TAGS and pending_question and captured:
+                features.faq_pairs.append({'question': pending_question, 'answer': captured})
+                pending_question = None
+
+        add_text(element.tail)
+
+    features.text = ''.join(text_chunks)
+    features.word_count = len(features.text.split())
+    features.stats_count = (
+        features.text.count('%') +
+        features.text.count('$') +
+        len(STATS_PATTERN.findall(features.text))
+    )
+
+    return features
@@ -0,0 +1,157 @@
+"""
+Index inversé des mentions de marques et domaines dans les réponses des LLMs
+Un automate multi-motifs (Aho-Corasick) parcourt chaque réponse une seule fois pour
+toutes les entités suivies ; visibilité, Share of Voice, position et contexte sont
+ensuite lus dans l'index au lieu de re-scanner les réponses par compétiteur.
+Correspondance par sous-chaîne insensible à la casse (même sémantique que `in` / `str.count`).
+"""
+import re
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# Séparateurs de phrases (position d'une mention dans la réponse)
+SENTENCE_BOUNDARY = re.compile(r'[.!?]\s+')
+
+
+class PatternAutomaton:
+    """Automate d'Aho-Corasick : toutes les occurrences de tous les motifs en une passe"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = list(dict.fromkeys(p for p in patterns if p))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = child
+            self._output[node].append(pattern_id)
+
+        # Liens d'échec en largeur : plus long suffixe propre qui est aussi un préfixe
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Occurrences (chevauchantes comprises) : (position de début, motif)"""
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern_id in self._output[node]:
+                pattern = self.patterns[pattern_id]
+                yield i - len(pattern) + 1, pattern
+
+
+class MentionIndex:
+    """
+    Index entité → document → occurrences, construit une fois par run de visibilité
+
+    Args:
+        entities: {clé d'entité: alias (nom de marque, domaine...)} ; les alias vides sont ignorés
+    """
+
+    def __init__(self, entities: Dict[Hashable, Iterable[str]]):
+        self.aliases: Dict[Hashable, List[str]] = {}
+        self._owners: Dict[str, List[Hashable]] = {}
+        for entity, aliases in entities.items():
+            self.aliases[entity] = list(dict.fromkeys(a.lower() for a in aliases if a))
+            for alias in self.aliases[entity]:
+                self._owners.setdefault(alias, []).append(entity)
+
+        self._automaton = PatternAutomaton(self._owners)
+        self._texts: Dict[Hashable, str] = {}
+        self._boundaries: Dict[Hashable, Tuple[List[int], List[int]]] = {}
+        # entité → document → alias → débuts d'occurrences (croissants)
+        self._postings: Dict[Hashable, Dict[Hashable, Dict[str, List[int]]]] = {entity: {} for entity in self.aliases}
+
+    def __contains__(self, entity: Hashable) -> bool:
+        return entity in self.aliases
+
+    def add(self, doc_id: Hashable, text: str):
+        """Indexe un document (une réponse) en une passe"""
+        text_lower = (text or '').lower()
+        self._texts[doc_id] = text
+        for start, alias in self._automaton.iter_matches(text_lower):
+            for entity in self._owners[alias]:
+                self._postings[entity].setdefault(doc_id, {}).setdefault(alias, []).append(start)
+
+    def documents(self, entity: Hashable) -> List[Hashable]:
+        """Documents mentionnant l'entité (ordre d'indexation)"""
+        return list(self._postings.get(entity, {}))
+
+    def mentioned(self, doc_id: Hashable, entity: Hashable) -> bool:
+        return doc_id in self._postings.get(entity, {})
+
+    def count(self, doc_id: Hashable, entity: Hashable) -> int:
+        """Nombre de mentions (sans chevauchement par alias, comme str.count)"""
+        total = 0
+        for alias, starts in self._postings.get(entity, {}).get(doc_id, {}).items():
+            next_free = 0
+            for start in starts:
+                if start >= next_free:
+                    total += 1
+                    next_free = start + len(alias)
+        return total
+
+    def spans(self, doc_id: Hashable, entity: Hashable) -> List[Tuple[int, int]]:
+        """Occurrences (début, fin) de l'entité dans le document, triées"""
+        by_alias = self._postings.get(entity, {}).get(doc_id, {})
+        return sorted((start, start + len(alias)) for alias, starts in by_alias.items() for start in starts)
+
+    def first(self, doc_id: Hashable, entity: Hashable) -> Optional[Tuple[int, int]]:
+        spans = self.spans(doc_id, entity)
+        return spans[0] if spans else None
+
+    def sentence_position(self, doc_id: Hashable, entity: Hashable) -> int:
+        """Numéro (1-based) de la première phrase contenant l'entité, -1 si aucune"""
+        spans = self.spans(doc_id, entity)
+        if not spans:
+            return -1
+
+        if doc_id not in self._boundaries:
+            matches = list(SENTENCE_BOUNDARY.finditer(self._texts[doc_id].lower()))
+            self._boundaries[doc_id] = ([m.start() for m in matches], [m.end() for m in matches])
+        boundary_starts, boundary_ends = self._boundaries[doc_id]
+
+        for start, end in spans:
+            sentence = bisect_right(boundary_ends, start)
+            sentence_end = boundary_starts[sentence] if sentence < len(boundary_starts) else len(self._texts[doc_id])
+            # Une mention coupée par un séparateur n'appartient à aucune phrase
+            if end <= sentence_end:
+                return sentence + 1
+        return -1
+
+    def context(self, doc_id: Hashable, entity: Hashable, chars: int = 200) -> str:
+        """Extrait autour de la première mention (avec ... si tronqué)"""
+        span = self.first(doc_id, entity)
+        if span is None:
+            return ""
+
+        text = self._texts[doc_id]
+        start = max(0, span[0] - chars // 2)
+        end = min(len(text), span[1] + chars // 2)
+
+        context = text[start:end]
+        if start > 0:
+            context = "..." + context
+        if end < len(text):
+            context = context + "..."
+        return context
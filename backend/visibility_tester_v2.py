@@ -2,46 +2,173 @@
 MODULE DE TESTS DE VISIBILITÉ V2 AVEC DIAGNOSTIC DÉTAILLÉ
 Teste les requêtes sur 5 plateformes IA et diagnostique pourquoi le site est invisible
 """
+import asyncio
+import hashlib
 import logging
 import os
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import anthropic
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
 import google.generativeai as genai
 import json
 from collections import Counter
 
+from config import (
+    VISIBILITY_CALL_BUDGET,
+    VISIBILITY_ESTIMATED_TOKENS_PER_CALL,
+    VISIBILITY_EXTRACTION_BATCH_SIZE,
+    VISIBILITY_EXTRACTION_MAX_CHARS,
+    VISIBILITY_MAX_QUERIES,
+    VISIBILITY_PROVIDER_CONCURRENCY,
+    VISIBILITY_PROVIDER_RATE_LIMITS,
+    VISIBILITY_QUERIES_IN_FLIGHT,
+    VISIBILITY_RUN_MODE,
+    VISIBILITY_SAMPLE_QUERIES,
+    VISIBILITY_TIMEOUT_SECONDS,
+    VISIBILITY_TOKEN_BUDGET
+)
+from services.visibility_scheduler import (
+    AsyncRateLimiter,
+    VisibilityBudget,
+    categorize_queries,
+    estimate_tokens,
+    interleave_by_category
+)
+from services.llm_response_cache import LLMResponseCache, llm_response_cache
+from utils.mention_index import MentionIndex
+
 logger = logging.getLogger(__name__)
 
+# Clés d'entités de l'index des mentions (les compétiteurs sont indexés par nom en minuscules)
+BRAND_ENTITY = ('brand',)
+SITE_ENTITY = ('site',)
+
+
+def competitor_entity(name: str) -> tuple:
+    return ('competitor', name.lower())
+
+
 class VisibilityTesterV2:
     """
     Teste la visibilité réelle dans les moteurs génératifs (ChatGPT, Claude, Perplexity, Gemini, Google AI).
     Mesure si le site est mentionné, cité, recommandé par les LLMs sur des requêtes ciblées.
     Extrait dynamiquement les compétiteurs mentionnés pour comprendre pourquoi ils dominent.
+    Les tests requête×plateforme tournent en parallèle, limités par fournisseur.
+    En mode 'full', toutes les requêtes générées sont testées dans la limite du budget du job,
+    dans un ordre qui garde le mix branded/semi-branded/non-branded représentatif.
     """
     
-    def __init__(self):
+    # Fournisseur d'API derrière chaque plateforme (sert aux limites de concurrence)
+    PLATFORM_PROVIDERS = {
+        'chatgpt': 'openai',
+        'claude': 'anthropic',
+        'perplexity': 'perplexity',
+        'gemini': 'google',
+        'google_ai': 'google'
+    }
+    
+    # Modèle et paramètres de génération de chaque sonde (font partie de la clé de cache)
+    PLATFORM_MODELS = {
+        'chatgpt': 'gpt-4o',
+        'claude': 'claude-sonnet-4-5-20250929',
+        'perplexity': 'llama-3.1-sonar-small-128k-online',
+        'gemini': 'gemini-1.5-pro',
+        'google_ai': 'gemini-1.5-pro'
+    }
+    PLATFORM_PARAMS = {
+        'chatgpt': {'max_tokens': 500, 'temperature': 0, 'seed': 42},  # ✅ DÉTERMINISTE + REPRODUCTIBLE
+        'claude': {'max_tokens': 500, 'temperature': 0},
+        'perplexity': {'max_tokens': 500},
+        'gemini': {'temperature': 0},
+        'google_ai': {'temperature': 0}
+    }
+    
+    # Réponses réutilisables d'un job à l'autre (cache) : génération déterministe (temperature=0)
+    # et sans recherche web en direct ; perplexity (sonar online) varie d'un appel à l'autre
+    CACHEABLE_PLATFORMS = {'chatgpt', 'claude', 'gemini', 'google_ai'}
+    
+    @classmethod
+    def backend_platform(cls, platform: str) -> str:
+        """
+        Plateforme qui exécute réellement la requête : deux plateformes logiques dont
+        la requête backend est identique (fournisseur, modèle, paramètres) partagent
+        un seul appel (ex: google_ai simule AI Overviews avec le même Gemini que gemini)
+        """
+        signature = (cls.PLATFORM_PROVIDERS.get(platform), cls.PLATFORM_MODELS.get(platform), cls.PLATFORM_PARAMS.get(platform))
+        for candidate in cls.PLATFORM_PROVIDERS:
+            if (cls.PLATFORM_PROVIDERS[candidate], cls.PLATFORM_MODELS[candidate], cls.PLATFORM_PARAMS[candidate]) == signature:
+                return candidate
+        return platform
+    
+    def __init__(
+        self,
+        concurrency: Optional[Dict[str, int]] = None,
+        rate_limits: Optional[Dict[str, int]] = None,
+        response_cache: Optional[LLMResponseCache] = None
+    ):
+        """
+        Args:
+            concurrency: Appels simultanés max par fournisseur (défaut: VISIBILITY_PROVIDER_CONCURRENCY)
+            rate_limits: Requêtes/minute max par fournisseur (défaut: VISIBILITY_PROVIDER_RATE_LIMITS)
+            response_cache: Cache des réponses des sondes (défaut: llm_response_cache global)
+        """
         # Initialize API clients
-        self.anthropic_client = anthropic.Anthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
-        self.openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+        self.anthropic_client = anthropic.AsyncAnthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
+        self.openai_client = AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
         genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+        self._genai_models: Dict[str, Any] = {}
         self.perplexity_key = os.environ.get('PERPLEXITY_API_KEY')
+        self.concurrency = {**VISIBILITY_PROVIDER_CONCURRENCY, **(concurrency or {})}
+        self.rate_limits = {**VISIBILITY_PROVIDER_RATE_LIMITS, **(rate_limits or {})}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._rate_limiters: Dict[str, AsyncRateLimiter] = {}
+        self._budget: Optional[VisibilityBudget] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self.response_cache = response_cache or llm_response_cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Extractions de compétiteurs du run, par empreinte du texte de la réponse
+        self._extractions: Dict[str, asyncio.Future] = {}
+        # Sondes du run, par (plateforme backend, requête) : un appel sert toutes les plateformes identiques
+        self._probes: Dict[tuple, asyncio.Future] = {}
     
-    def test_all_queries_detailed(self, queries: List[str], site_url: str, company_name: str) -> Dict[str, Any]:
+    def test_all_queries_detailed(
+        self,
+        queries: List[str],
+        site_url: str,
+        company_name: str,
+        mode: Optional[str] = None,
+        breakdown: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Version synchrone (routes Flask) : exécute le moteur async dans sa propre boucle
+        """
+        return asyncio.run(self.test_all_queries_detailed_async(queries, site_url, company_name, mode, breakdown))
+    
+    async def test_all_queries_detailed_async(
+        self,
+        queries: List[str],
+        site_url: str,
+        company_name: str,
+        mode: Optional[str] = None,
+        breakdown: Optional[Dict[str, Any]] = None,
+        budget: Optional[VisibilityBudget] = None
+    ) -> Dict[str, Any]:
         """
         Teste toutes les requêtes sur 5 plateformes IA avec diagnostic complet GEO.
         Identifie les compétiteurs mentionnés, calcule Share of Voice, analyse sentiment,
         et classe les requêtes par type (branded, informational, comparison, etc.)
-        """
-        """
-        Test toutes les requêtes avec diagnostic complet
         
         Args:
             queries: Liste des requêtes à tester
             site_url: URL du site
             company_name: Nom de l'entreprise
+            mode: 'sample' (VISIBILITY_SAMPLE_QUERIES requêtes) ou 'full' (jusqu'à VISIBILITY_MAX_QUERIES)
+            breakdown: Répartition non_branded/semi_branded/branded du générateur de requêtes
+            budget: Budget d'appels/tokens du job (défaut: VISIBILITY_CALL_BUDGET / VISIBILITY_TOKEN_BUDGET)
         
         Returns:
             Résultats détaillés avec diagnostic d'invisibilité
@@ -59,35 +186,112 @@ class VisibilityTesterV2:
         }
         
         platforms = ['chatgpt', 'claude', 'perplexity', 'gemini', 'google_ai']
-        platform_scores = {p: 0 for p in platforms}
+        mode = mode or VISIBILITY_RUN_MODE
+        max_queries = VISIBILITY_MAX_QUERIES if mode == 'full' else VISIBILITY_SAMPLE_QUERIES
         
-        # Tester chaque requête
-        for i, query in enumerate(queries[:10], 1):  # Limiter à 10 pour éviter coûts
-            logger.info(f"Testing query {i}/{len(queries)}: {query}")
-            
-            query_result = {
+        # Ordre entrelacé : si le budget s'épuise, les requêtes testées gardent le mix 80/15/5
+        scheduled = interleave_by_category(categorize_queries(queries, breakdown))[:max_queries]
+        
+        budget = budget or VisibilityBudget(
+            VISIBILITY_CALL_BUDGET, VISIBILITY_TOKEN_BUDGET, VISIBILITY_ESTIMATED_TOKENS_PER_CALL
+        )
+        
+        logger.info(f"Testing up to {len(scheduled)} queries × {len(platforms)} platforms (mode: {mode}, concurrency: {self.concurrency})")
+        
+        self._budget = budget
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._extractions = {}
+        self._probes = {}
+        self._semaphores = {
+            provider: asyncio.Semaphore(max(1, limit))
+            for provider, limit in self.concurrency.items()
+        }
+        self._rate_limiters = {
+            provider: AsyncRateLimiter(limit)
+            for provider, limit in self.rate_limits.items()
+        }
+        
+        tested: List[Optional[Dict[str, Dict[str, Any]]]] = [None] * len(scheduled)
+        indices = iter(range(len(scheduled)))
+        budget_exhausted = False
+        settled = asyncio.Condition()  # Notifiée à chaque réservation libérée
+        
+        # Coût max d'une requête : une réponse par plateforme backend + les extractions groupées
+        probe_calls = len({self.backend_platform(platform) for platform in platforms})
+        query_cost = probe_calls + -(-probe_calls // VISIBILITY_EXTRACTION_BATCH_SIZE)
+        
+        async def worker():
+            nonlocal budget_exhausted
+            while not budget_exhausted:
+                reservation = budget.try_reserve(query_cost)
+                while reservation is None:
+                    # Refus dû aux seules réservations en cours (pessimistes) : attendre qu'elles
+                    # soient réglées puis réessayer ; épuisé seulement si le consommé ne laisse plus la place
+                    if budget_exhausted or budget.exceeds(query_cost):
+                        budget_exhausted = True
+                        return
+                    async with settled:
+                        await settled.wait_for(lambda: not budget.has_reservations() or budget_exhausted)
+                    reservation = budget.try_reserve(query_cost)
+                
+                # Requête suivante prise une fois la réservation obtenue : les requêtes testées
+                # restent un préfixe de l'ordre entrelacé, sans trou
+                i = next(indices, None)
+                try:
+                    if i is None:
+                        return
+                    tested[i] = await self._test_query_all_platforms(scheduled[i][0], platforms, site_url, company_name)
+                finally:
+                    budget.release(reservation)
+                    async with settled:
+                        settled.notify_all()
+        
+        async with httpx.AsyncClient(timeout=VISIBILITY_TIMEOUT_SECONDS) as http_client:
+            self._http_client = http_client
+            try:
+                await asyncio.gather(*[worker() for _ in range(max(1, VISIBILITY_QUERIES_IN_FLIGHT))])
+            finally:
+                self._http_client = None
+                self._budget = None
+        
+        category_counts: Dict[str, int] = {}
+        for (query, category), platform_results in zip(scheduled, tested):
+            if platform_results is None:
+                continue
+            category_counts[category] = category_counts.get(category, 0) + 1
+            results['queries'].append({
                 'query': query,
+                'category': category,
                 'timestamp': datetime.now().isoformat(),
-                'platforms': {}
-            }
-            
-            # Tester sur chaque plateforme
+                'platforms': platform_results
+            })
+        
+        # Mentions, position, contexte, sentiment et Share of Voice : une passe sur toutes les réponses
+        self._apply_mentions(results['queries'], site_url, company_name)
+        
+        queries_tested = len(results['queries'])
+        if budget_exhausted:
+            logger.warning(f"⚠️ Visibility budget exhausted after {queries_tested}/{len(scheduled)} queries")
+        
+        results['summary'].update({
+            'run_mode': mode,
+            'queries_tested': queries_tested,
+            'queries_skipped': len(queries) - queries_tested,
+            'tested_by_category': category_counts,
+            'budget': budget.stats(),
+            'response_cache': {'hits': self.cache_hits, 'misses': self.cache_misses}
+        })
+        
+        return self._aggregate_results(results, platforms, company_name)
+    
+    def _aggregate_results(self, results: Dict[str, Any], platforms: List[str], company_name: str) -> Dict[str, Any]:
+        """Calcule scores, sentiment, Share of Voice et analyses par type de requête"""
+        platform_scores = {p: 0 for p in platforms}
+        for query_result in results['queries']:
             for platform in platforms:
-                try:
-                    platform_result = self._test_single_query(query, platform, site_url, company_name)
-                    query_result['platforms'][platform] = platform_result
-                    
-                    if platform_result.get('mentioned'):
-                        platform_scores[platform] += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error testing {query} on {platform}: {str(e)}")
-                    query_result['platforms'][platform] = {
-                        'mentioned': False,
-                        'error': str(e)
-                    }
-            
-            results['queries'].append(query_result)
+                if query_result['platforms'].get(platform, {}).get('mentioned'):
+                    platform_scores[platform] += 1
         
         # Calculer les scores
         queries_tested = len(results['queries'])
@@ -172,12 +376,57 @@ class VisibilityTesterV2:
         
         return results
     
-    def _test_single_query(self, query: str, platform: str, site_url: str, company_name: str) -> Dict[str, Any]:
+    async def _test_query_all_platforms(
+        self,
+        query: str,
+        platforms: List[str],
+        site_url: str,
+        company_name: str
+    ) -> Dict[str, Dict[str, Any]]:
         """
-        Test une seule requête sur une plateforme avec diagnostic complet
+        Teste une requête sur toutes les plateformes, puis extrait les compétiteurs
+        de toutes les réponses en un appel groupé
+        """
+        row = await asyncio.gather(*[
+            self._test_query_safe(query, platform, site_url, company_name)
+            for platform in platforms
+        ])
+        platform_results = dict(zip(platforms, row))
+        
+        answers = {
+            platform: result['full_response']
+            for platform, result in platform_results.items()
+            if 'error' not in result
+        }
+        
+        # Extraire compétiteurs mentionnés
+        industry = "generic"
+        competitors_by_platform = await self._extract_competitors_batch(answers, industry)
+        
+        for platform, competitors in competitors_by_platform.items():
+            platform_results[platform]['competitors_mentioned'] = competitors
+        
+        return platform_results
+    
+    async def _test_query_safe(self, query: str, platform: str, site_url: str, company_name: str) -> Dict[str, Any]:
+        """Test requête×plateforme : une erreur n'interrompt pas les autres tests"""
+        try:
+            return await self._test_single_query(query, platform, site_url, company_name)
+        except Exception as e:
+            logger.error(f"Error testing {query} on {platform}: {str(e)}")
+            return {
+                'mentioned': False,
+                'error': str(e)
+            }
+    
+    async def _test_single_query(self, query: str, platform: str, site_url: str, company_name: str) -> Dict[str, Any]:
+        """
+        Test une seule requête sur une plateforme.
+        Les compétiteurs sont ajoutés par _test_query_all_platforms ; mention, position,
+        sentiment, Share of Voice et diagnostic par _apply_mentions une fois le run terminé.
         
         Returns:
-            Résultat détaillé avec diagnostic si invisible
+            Résultat détaillé de la sonde
         """
         result = {
             'mentioned': False,
@@ -192,156 +441,199 @@ class VisibilityTesterV2:
         
         # Exécuter la requête
         try:
-            response = self._query_llm(platform, query)
+            response = await self._query_llm(platform, query)
             result['full_response'] = response
             result['response_length'] = len(response)
             
-            # Analyser la réponse
-            mentioned = site_url.lower() in response.lower() or company_name.lower() in response.lower()
+        except Exception as e:
+            logger.error(f"Error querying {platform}: {str(e)}")
+            result['error'] = str(e)
+        
+        return result
+    
+    def _apply_mentions(self, query_results: List[Dict[str, Any]], site_url: str, company_name: str):
+        """
+        Construit l'index des mentions du run (marque, site et tous les compétiteurs extraits),
+        puis en déduit pour chaque sonde : mention, position, contexte, sentiment,
+        Share of Voice et diagnostic d'invisibilité
+        """
+        entities = {BRAND_ENTITY: [company_name], SITE_ENTITY: [site_url]}
+        for query_result in query_results:
+            for result in query_result['platforms'].values():
+                for comp in result.get('competitors_mentioned', []):
+                    comp_name = comp.get('name', '') if isinstance(comp, dict) else comp
+                    if comp_name:
+                        entities[competitor_entity(comp_name)] = [comp_name]
+        
+        index = MentionIndex(entities)
+        probes = [
+            ((i, platform), query_result['query'], result)
+            for i, query_result in enumerate(query_results)
+            for platform, result in query_result['platforms'].items()
+            if 'error' not in result  # Sondes en erreur : pas d'analyse (comme avant)
+        ]
+        for doc_id, _, result in probes:
+            index.add(doc_id, result['full_response'])
+        
+        for doc_id, query, result in probes:
+            mentioned = index.mentioned(doc_id, SITE_ENTITY) or index.mentioned(doc_id, BRAND_ENTITY)
             result['mentioned'] = mentioned
             
             if mentioned:
                 # Extraire position et contexte
-                result['position'] = self._find_position(response, company_name)
-                result['context_snippet'] = self._extract_context(response, company_name, chars=200)
-                result['sentiment'] = self._analyze_sentiment(response, company_name)
+                result['position'] = index.sentence_position(doc_id, BRAND_ENTITY)
+                result['context_snippet'] = index.context(doc_id, BRAND_ENTITY, chars=200)
+                result['sentiment'] = self._analyze_sentiment(index.context(doc_id, BRAND_ENTITY, chars=300))
             
-            # Extraire compétiteurs mentionnés
-            industry = "generic"
-            competitors = self._extract_competitors(response, industry)
-            result['competitors_mentioned'] = competitors
+            competitors = result['competitors_mentioned']
             
             # Calculer Share of Voice si mentionné et compétiteurs présents
             if mentioned and competitors:
-                result['share_of_voice'] = self._calculate_share_of_voice(response, company_name, competitors)
+                result['share_of_voice'] = self._calculate_share_of_voice(index, doc_id, competitors)
             else:
                 result['share_of_voice'] = 0.0
             
             # Si pas mentionné, diagnostiquer pourquoi
             if not mentioned:
                 result['invisibility_reasons'] = self._diagnose_invisibility(
-                    query, response, site_url, company_name
+                    query, competitors, site_url, company_name
                 )
-            
-        except Exception as e:
-            logger.error(f"Error querying {platform}: {str(e)}")
-            result['error'] = str(e)
+    
+    async def _query_llm(self, platform: str, query: str) -> str:
+        """
+        Exécuter une requête sur un LLM (cache des réponses, limité par fournisseur, avec timeout).
+        Les plateformes qui partagent la même requête backend reçoivent la réponse d'un seul appel.
+        """
+        if platform not in self.PLATFORM_PROVIDERS:
+            return ""
         
-        return result
+        probe_key = (self.backend_platform(platform), query)
+        probe = self._probes.get(probe_key)
+        if probe is None:
+            probe = asyncio.ensure_future(self._query_backend(probe_key[0], query))
+            self._probes[probe_key] = probe
+        elif platform != probe_key[0]:
+            logger.debug(f"♻️  {platform} reuses the {probe_key[0]} probe for: {query}")
+        
+        return await asyncio.shield(probe)
     
-    def _query_llm(self, platform: str, query: str) -> str:
-        """Exécuter une requête sur un LLM"""
+    async def _query_backend(self, platform: str, query: str) -> str:
+        """Sonde une plateforme backend (cache des réponses puis appel réel)"""
+        provider = self.PLATFORM_PROVIDERS[platform]
+        model = self.PLATFORM_MODELS[platform]
+        params = self.PLATFORM_PARAMS[platform]
+        
+        if platform not in self.CACHEABLE_PLATFORMS:
+            return await self._query_llm_uncached(platform, provider, query)
         
+        cached = await asyncio.to_thread(self.response_cache.get, platform, model, query, params)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+        
+        response = await self._query_llm_uncached(platform, provider, query)
+        if response:
+            await asyncio.to_thread(self.response_cache.set, platform, model, query, params, response)
+        return response
+    
+    async def _query_llm_uncached(self, platform: str, provider: str, query: str) -> str:
+        """Appel réel à la plateforme, imputé au budget du run"""
+        response = ""
         try:
-            if platform == 'chatgpt':
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": str(query)}],
-                    max_tokens=500,
-                    temperature=0,  # ✅ DÉTERMINISTE
-                    seed=42         # ✅ REPRODUCTIBLE
-                )
-                content = response.choices[0].message.content
-                return str(content) if content else ""
-            
-            elif platform == 'claude':
-                response = self.anthropic_client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=500,
-                    temperature=0,  # ✅ DÉTERMINISTE
-                    messages=[{"role": "user", "content": str(query)}]
-                )
-                text = response.content[0].text
-                return str(text) if text else ""
-            
-            elif platform == 'gemini':
-                model = genai.GenerativeModel('gemini-1.5-pro')
-                response = model.generate_content(
-                    query,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0,  # ✅ DÉTERMINISTE
-                    )
-                )
-                return response.text
-            
-            elif platform == 'perplexity':
-                # Perplexity via OpenAI-compatible API
-                import requests
-                response = requests.post(
-                    'https://api.perplexity.ai/chat/completions',
-                    headers={
-                        'Authorization': f'Bearer {self.perplexity_key}',
-                        'Content-Type': 'application/json'
-                    },
-                    json={
-                        'model': 'llama-3.1-sonar-small-128k-online',
-                        'messages': [{'role': 'user', 'content': query}],
-                        'max_tokens': 500
-                    },
-                    timeout=30
+            async with self._semaphore(provider):
+                await self._rate_limiter(provider).acquire()
+                response = await asyncio.wait_for(
+                    self._call_platform(platform, query),
+                    timeout=VISIBILITY_TIMEOUT_SECONDS
                 )
-                if response.status_code == 200:
-                    return response.json()['choices'][0]['message']['content']
-                else:
-                    return ""
-            
-            elif platform == 'google_ai':
-                # Google AI Overviews simulation (utilise Gemini)
-                model = genai.GenerativeModel('gemini-1.5-pro')
-                response = model.generate_content(
-                    query,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0,  # ✅ DÉTERMINISTE
-                    )
-                )
-                return response.text
-            
+                return response
         except Exception as e:
-            logger.error(f"Error querying {platform}: {str(e)}")
+            logger.error(f"Error querying {platform}: {str(e) or type(e).__name__}")
             return ""
-        
-        return ""
+        finally:
+            self._record_usage(query, response)
     
-    def _find_position(self, response: str, company_name: str) -> int:
-        """Trouver la position de la mention dans la réponse"""
-        
-        # Diviser en phrases
-        sentences = re.split(r'[.!?]\s+', response)
-        
-        for i, sentence in enumerate(sentences, 1):
-            if company_name.lower() in sentence.lower():
-                return i
-        
-        return -1
+    def _genai_model(self, model_name: str):
+        """Modèle Gemini construit une seule fois par tester"""
+        if model_name not in self._genai_models:
+            self._genai_models[model_name] = genai.GenerativeModel(model_name)
+        return self._genai_models[model_name]
     
-    def _extract_context(self, response: str, company_name: str, chars: int = 200) -> str:
-        """Extraire le contexte autour de la mention"""
-        
-        response_lower = response.lower()
-        company_lower = company_name.lower()
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Sémaphore du fournisseur (créé à la demande hors d'un run complet)"""
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(max(1, self.concurrency.get(provider, 1)))
+        return self._semaphores[provider]
+    
+    def _rate_limiter(self, provider: str) -> AsyncRateLimiter:
+        """Limiteur de débit du fournisseur (créé à la demande hors d'un run complet)"""
+        if provider not in self._rate_limiters:
+            self._rate_limiters[provider] = AsyncRateLimiter(self.rate_limits.get(provider, 60))
+        return self._rate_limiters[provider]
+    
+    def _record_usage(self, prompt: str, response: str):
+        """Impute un appel LLM au budget du run en cours"""
+        if self._budget is not None:
+            self._budget.record(estimate_tokens(prompt, response))
+    
+    async def _call_platform(self, platform: str, query: str) -> str:
+        """Appel brut à l'API de la plateforme"""
+        model_name = self.PLATFORM_MODELS[platform]
+        params = self.PLATFORM_PARAMS[platform]
         
-        # Trouver la position de la mention
-        pos = response_lower.find(company_lower)
-        if pos == -1:
-            return ""
+        if platform == 'chatgpt':
+            response = await self.openai_client.chat.completions.create(
+                model=model_name,
+                messages=[{"role": "user", "content": str(query)}],
+                **params
+            )
+            content = response.choices[0].message.content
+            return str(content) if content else ""
         
-        # Extraire contexte
-        start = max(0, pos - chars // 2)
-        end = min(len(response), pos + len(company_name) + chars // 2)
+        elif platform == 'claude':
+            response = await self.anthropic_client.messages.create(
+                model=model_name,
+                messages=[{"role": "user", "content": str(query)}],
+                **params
+            )
+            text = response.content[0].text
+            return str(text) if text else ""
         
-        context = response[start:end]
+        elif platform in ('gemini', 'google_ai'):
+            # google_ai = simulation Google AI Overviews (utilise Gemini)
+            response = await self._genai_model(model_name).generate_content_async(
+                query,
+                generation_config=genai.types.GenerationConfig(**params)
+            )
+            return response.text
         
-        # Ajouter ... si tronqué
-        if start > 0:
-            context = "..." + context
-        if end < len(response):
-            context = context + "..."
+        elif platform == 'perplexity':
+            # Perplexity via OpenAI-compatible API
+            request_kwargs = dict(
+                headers={
+                    'Authorization': f'Bearer {self.perplexity_key}',
+                    'Content-Type': 'application/json'
+                },
+                json={
+                    'model': model_name,
+                    'messages': [{'role': 'user', 'content': query}],
+                    **params
+                }
+            )
+            if self._http_client is not None:
+                response = await self._http_client.post('https://api.perplexity.ai/chat/completions', **request_kwargs)
+            else:
+                async with httpx.AsyncClient(timeout=VISIBILITY_TIMEOUT_SECONDS) as client:
+                    response = await client.post('https://api.perplexity.ai/chat/completions', **request_kwargs)
+            if response.status_code == 200:
+                return response.json()['choices'][0]['message']['content']
+            return ""
         
-        return context
+        return ""
     
-    def _analyze_sentiment(self, response: str, company_name: str) -> str:
-        """Analyse le sentiment de la mention (amélioré)"""
-        context = self._extract_context(response, company_name, chars=300)
+    def _analyze_sentiment(self, context: str) -> str:
+        """Analyse le sentiment de la mention à partir de son contexte (amélioré)"""
         context_lower = context.lower()
         
         positive_keywords = [
@@ -366,10 +658,9 @@ class VisibilityTesterV2:
             return 'negative'
         return 'neutral'
     
-    def _calculate_share_of_voice(self, response: str, company_name: str, competitors: List) -> float:
-        """Calcule le Share of Voice vs compétiteurs"""
-        response_lower = response.lower()
-        company_mentions = response_lower.count(company_name.lower())
+    def _calculate_share_of_voice(self, index: MentionIndex, doc_id: tuple, competitors: List) -> float:
+        """Calcule le Share of Voice vs compétiteurs (comptes lus dans l'index des mentions)"""
+        company_mentions = index.count(doc_id, BRAND_ENTITY)
         
         # Gérer les deux formats: liste de strings ou liste de dicts
         competitor_mentions = 0
@@ -378,25 +669,77 @@ class VisibilityTesterV2:
                 comp_name = c.get('name', '')
             else:
                 comp_name = c
-            competitor_mentions += response_lower.count(comp_name.lower())
+            if comp_name:
+                competitor_mentions += index.count(doc_id, competitor_entity(comp_name))
         
         total = company_mentions + competitor_mentions
         return company_mentions / total if total > 0 else 0.0
     
-    def _extract_competitors(self, response: str, industry: str = "generic") -> List[Dict[str, Any]]:
-        """Extraire TOUS les compétiteurs avec Claude (extraction structurée)"""
-        # S'assurer que response est un string
-        if not response or not isinstance(response, str) or len(response) < 50:
-            return []
+    async def _extract_competitors(self, response: str, industry: str = "generic") -> List[Dict[str, Any]]:
+        """Extraire TOUS les compétiteurs d'une réponse avec Claude (extraction structurée)"""
+        extracted = await self._extract_competitors_batch({'answer': response}, industry)
+        return extracted['answer']
+    
+    async def _extract_competitors_batch(self, answers: Dict[str, str], industry: str = "generic") -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Extraire les compétiteurs de plusieurs réponses en un minimum d'appels Claude.
+        Les textes identiques (ex: gemini et google_ai) ne sont extraits qu'une fois par run.
+        
+        Args:
+            answers: Réponses des LLMs par identifiant (ex: plateforme)
+        
+        Returns:
+            Compétiteurs extraits par identifiant
+        """
+        by_hash: Dict[str, str] = {}
+        to_extract: Dict[str, str] = {}
+        
+        for answer_id, response in answers.items():
+            # S'assurer que response est un string
+            if not response or not isinstance(response, str) or len(response) < 50:
+                continue
+            
+            text_hash = hashlib.sha256(response.encode('utf-8')).hexdigest()
+            by_hash[answer_id] = text_hash
+            if text_hash not in self._extractions and text_hash not in to_extract:
+                to_extract[text_hash] = response
+        
+        if to_extract:
+            loop = asyncio.get_running_loop()
+            for text_hash in to_extract:
+                self._extractions[text_hash] = loop.create_future()
+            
+            hashes = list(to_extract)
+            batches = [
+                hashes[i:i + VISIBILITY_EXTRACTION_BATCH_SIZE]
+                for i in range(0, len(hashes), VISIBILITY_EXTRACTION_BATCH_SIZE)
+            ]
+            await asyncio.gather(*[
+                self._run_extraction_batch({text_hash: to_extract[text_hash] for text_hash in batch}, industry)
+                for batch in batches
+            ])
+        
+        extracted = {}
+        for answer_id in answers:
+            text_hash = by_hash.get(answer_id)
+            extracted[answer_id] = list(await self._extractions[text_hash]) if text_hash else []
+        return extracted
+    
+    async def _run_extraction_batch(self, batch: Dict[str, str], industry: str):
+        """Un appel Claude pour un lot de réponses ; résout les futures d'extraction du lot"""
+        ids = {f"r{i}": text_hash for i, text_hash in enumerate(batch, 1)}
         
-        response_sample = str(response[:3000]) if len(response) > 3000 else str(response)
+        answers_block = "\n\n".join(
+            f'<reponse id="{answer_id}">\n{batch[text_hash][:VISIBILITY_EXTRACTION_MAX_CHARS]}\n</reponse>'
+            for answer_id, text_hash in ids.items()
+        )
         
-        prompt = f"""Analyse cette réponse d'un LLM et identifie TOUS les compétiteurs/entreprises mentionnés.
+        prompt = f"""Analyse ces réponses de LLMs et identifie, pour CHAQUE réponse, TOUS les compétiteurs/entreprises mentionnés.
 
 INDUSTRIE : {industry}
 
-RÉPONSE DU LLM :
-{response_sample}
+RÉPONSES DES LLMs :
+{answers_block}
 
 Pour CHAQUE compétiteur trouvé, extrait :
 1. Nom exact de l'entreprise
@@ -405,33 +748,48 @@ Pour CHAQUE compétiteur trouvé, extrait :
 4. Type de mention : "recommendation", "comparison", "neutral", ou "negative"
 5. Force perçue : 1 phrase décrivant ce qui est dit de positif
 
-Réponds UNIQUEMENT avec un JSON valide (array). Si AUCUN compétiteur, retourne []
+Réponds UNIQUEMENT avec un objet JSON valide : une clé par id de réponse ({", ".join(ids)}), valeur = array des compétiteurs de cette réponse. Si AUCUN compétiteur dans une réponse, sa valeur est []
 
 Format:
-[{{"name": "Nom", "urls": ["domain.com"], "context": "Raison", "mention_type": "recommendation", "perceived_strength": "Force"}}]
+{{"r1": [{{"name": "Nom", "urls": ["domain.com"], "context": "Raison", "mention_type": "recommendation", "perceived_strength": "Force"}}], "r2": []}}
 
 IMPORTANT: Ne retourne QUE les vraies entreprises compétitrices."""
-
+        
+        parsed: Dict[str, Any] = {}
         try:
-            message = self.anthropic_client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=1000,
-                temperature=0,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = message.content[0].text.strip().replace('```json', '').replace('```', '').strip()
-            competitors = json.loads(response_text)
+            response_text = ""
+            try:
+                async with self._semaphore('anthropic'):
+                    await self._rate_limiter('anthropic').acquire()
+                    message = await asyncio.wait_for(
+                        self.anthropic_client.messages.create(
+                            model="claude-sonnet-4-5-20250929",
+                            max_tokens=min(8000, 1000 * len(ids)),
+                            temperature=0,
+                            messages=[{"role": "user", "content": prompt}]
+                        ),
+                        timeout=VISIBILITY_TIMEOUT_SECONDS * 2
+                    )
+                    response_text = message.content[0].text
+            finally:
+                self._record_usage(prompt, response_text)
             
-            if not isinstance(competitors, list):
-                logger.warning("Extraction returned non-list, using fallback")
-                return self._extract_competitors_fallback(response)
+            response_text = response_text.strip().replace('```json', '').replace('```', '').strip()
+            parsed = json.loads(response_text)
             
-            logger.info(f"✅ Extracted {len(competitors)} competitors dynamically")
-            return competitors[:10]
+            if not isinstance(parsed, dict):
+                logger.warning("Batch extraction returned non-object, using fallback")
+                parsed = {}
+            else:
+                logger.info(f"✅ Extracted competitors dynamically for {len(ids)} answers in one call")
         except Exception as e:
             logger.error(f"LLM extraction failed: {str(e)}, using fallback")
-            return self._extract_competitors_fallback(response)
+        
+        for answer_id, text_hash in ids.items():
+            competitors = parsed.get(answer_id)
+            if not isinstance(competitors, list):
+                competitors = self._extract_competitors_fallback(batch[text_hash])
+            self._extractions[text_hash].set_result(competitors[:10])
     
     def _extract_competitors_fallback(self, response: str) -> List[Dict[str, Any]]:
         """Fallback regex si LLM échoue"""
@@ -576,10 +934,13 @@ IMPORTANT: Ne retourne QUE les vraies entreprises compétitrices."""
         
         return insights
     
-    def _diagnose_invisibility(self, query: str, response: str, site_url: str, company_name: str) -> List[Dict[str, Any]]:
+    def _diagnose_invisibility(self, query: str, competitors_mentioned: List, site_url: str, company_name: str) -> List[Dict[str, Any]]:
         """
         Diagnostiquer POURQUOI le site n'apparaît pas
         
+        Args:
+            competitors_mentioned: Compétiteurs déjà extraits de la réponse du LLM
+        
         Returns:
             Liste de raisons avec actions concrètes
         """
@@ -608,12 +969,12 @@ IMPORTANT: Ne retourne QUE les vraies entreprises compétitrices."""
         })
         
         # Raison 3: Manque de statistiques
-        competitors_mentioned = self._extract_competitors(response)
         if competitors_mentioned:
+            competitor_names = [c.get('name', '') if isinstance(c, dict) else str(c) for c in competitors_mentioned]
             reasons.append({
                 'reason': 'INSUFFICIENT_DATA',
                 'severity': 'HIGH',
-                'explanation': f"Les compétiteurs cités ({', '.join(competitors_mentioned)}) ont probablement plus de données factuelles",
+                'explanation': f"Les compétiteurs cités ({', '.join(competitor_names)}) ont probablement plus de données factuelles",
                 'action': "Ajouter 10-15 statistiques avec sources dans le contenu",
                 'example_stats': [
                     "68% des propriétaires sous-estiment leurs biens de 20%+",
@@ -650,3 +1011,17 @@ def test_visibility_with_details(queries: List[str], site_url: str, company_name
     """
     tester = VisibilityTesterV2()
     return tester.test_all_queries_detailed(queries, site_url, company_name)
+
+
+async def test_visibility_with_details_async(
+    queries: List[str],
+    site_url: str,
+    company_name: str,
+    mode: Optional[str] = None,
+    breakdown: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Version async pour le pipeline d'analyse (ne bloque pas la boucle FastAPI)
+    """
+    tester = VisibilityTesterV2()
+    return await tester.test_all_queries_detailed_async(queries, site_url, company_name, mode, breakdown)
@@ -0,0 +1,45 @@
+"""
+WORKER D'ANALYSE GEO
+Processus indépendant du serveur web : réclame les jobs de la collection `analysis_jobs`
+et exécute le pipeline d'analyse. Lancer autant de processus que nécessaire, sur autant
+de nœuds que nécessaire (la réclamation est atomique, le bail protège contre les doublons).
+Au démarrage, les analyses de l'historique SQLite du nœud absentes des séries de scores
+(MongoDB, lues par /api/trends) y sont importées ; sans effet quand tout est à jour.
+
+Pour lancer: python worker.py [--concurrency N]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from config import JOB_WORKER_CONCURRENCY
+from database_manager import history_db
+from server import client, job_queue, process_analysis_job, score_history
+
+logger = logging.getLogger(__name__)
+
+
+async def main(concurrency: int):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, job_queue.stop)
+
+    try:
+        await score_history.import_history(history_db)
+    except Exception as e:
+        logger.warning(f"Score history import failed: {str(e)}")
+
+    try:
+        await job_queue.run_worker(process_analysis_job, concurrency=concurrency)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Worker d'analyse GEO")
+    parser.add_argument('--concurrency', type=int, default=JOB_WORKER_CONCURRENCY,
+                        help='Jobs simultanés dans ce processus')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.concurrency))
@@ -169,7 +169,7 @@ class CompetitorDiscoveryTester:
             # Récupérer tous les leads pour trouver le job
             leads_response = self.session.get(f"{API_BASE}/leads")
             if leads_response.status_code == 200:
-                leads = leads_response.json()
+                leads = leads_response.json()['items']
                 current_lead = None
                 for lead_data in leads:
                     if lead_data['id'] == lead_id:
@@ -215,7 +215,7 @@ class CompetitorDiscoveryTester:
                             logger.info(f"✅ Analyse terminée! Report ID: {report_id}")
                             
                             # Récupérer le rapport
-                            report_response = self.session.get(f"{API_BASE}/reports/{report_id}")
+                            report_response = self.session.get(f"{API_BASE}/reports/{report_id}", params={'include': 'all'})
                             if report_response.status_code == 200:
                                 report = report_response.json()
                                 self.results['tests_passed'] += 1
@@ -497,7 +497,7 @@ class CompetitorDiscoveryTester:
             report_id = analysis_result['report_id']
             
             # Récupérer le rapport depuis l'API (qui lit MongoDB)
-            report_response = self.session.get(f"{API_BASE}/reports/{report_id}")
+            report_response = self.session.get(f"{API_BASE}/reports/{report_id}", params={'include': 'all'})
             
             if report_response.status_code == 200:
                 report = report_response.json()
@@ -220,7 +220,7 @@ class GEOSaaSBackendTester:
                 self.results['critical_issues'].append(f"Failed to retrieve leads: HTTP {leads_response.status_code}")
                 return False
             
-            leads = leads_response.json()
+            leads = leads_response.json()['items']
             current_lead = None
             
             for lead_data in leads:
@@ -363,7 +363,7 @@ class GEOSaaSBackendTester:
             
             logger.info(f"📊 Récupération du rapport {self.report_id}")
             start_time = time.time()
-            report_response = self.session.get(f"{API_BASE}/reports/{self.report_id}")
+            report_response = self.session.get(f"{API_BASE}/reports/{self.report_id}", params={'include': 'all'})
             response_time = time.time() - start_time
             
             self.results['performance_metrics']['report_retrieval_time'] = response_time
@@ -423,7 +423,7 @@ class GEOSaaSBackendTester:
         
         try:
             # Récupérer le rapport
-            report_response = self.session.get(f"{API_BASE}/reports/{self.report_id}")
+            report_response = self.session.get(f"{API_BASE}/reports/{self.report_id}", params={'include': 'all'})
             
             if report_response.status_code != 200:
                 logger.error(f"❌ Impossible de récupérer le rapport pour validation: HTTP {report_response.status_code}")
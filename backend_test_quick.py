@@ -73,7 +73,7 @@ def find_job_for_lead(lead_id):
             logger.error(f"❌ Impossible de récupérer les leads: HTTP {response.status_code}")
             return None
         
-        leads = response.json()
+        leads = response.json()['items']
         for lead_data in leads:
             if lead_data['id'] == lead_id and lead_data.get('latestJob'):
                 job_id = lead_data['latestJob']['id']
@@ -144,7 +144,7 @@ def check_existing_reports():
     try:
         response = requests.get(f"{API_BASE}/leads", timeout=15)
         if response.status_code == 200:
-            leads = response.json()
+            leads = response.json()['items']
             
             for lead in leads:
                 if lead.get('reports'):
@@ -166,7 +166,7 @@ def test_report_access(report_id):
     """Tester l'accès au rapport"""
     logger.info(f"🔍 Test 7: Accès au rapport {report_id}")
     try:
-        response = requests.get(f"{API_BASE}/reports/{report_id}", timeout=15)
+        response = requests.get(f"{API_BASE}/reports/{report_id}", params={'include': 'all'}, timeout=15)
         if response.status_code == 200:
             report = response.json()
             logger.info("✅ Rapport accessible")
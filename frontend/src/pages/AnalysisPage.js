@@ -58,7 +58,43 @@ const AnalysisPage = () => {
       }
     };
 
-    pollJobStatus();
+    // Flux SSE de progression ; repli sur le polling si le flux n'est pas disponible
+    let stopped = false;
+    const events = typeof EventSource !== 'undefined'
+      ? new EventSource(`${API}/jobs/${jobId}/events`)
+      : null;
+
+    if (events) {
+      events.addEventListener('progress', (event) => {
+        const data = JSON.parse(event.data);
+        setJob(data);
+        setLoading(false);
+
+        if (data.status === 'completed' || data.status === 'failed') {
+          events.close();
+          if (data.status === 'completed' && data.reportId) {
+            setTimeout(() => {
+              navigate(`/report/${data.reportId}`);
+            }, 2000);
+          }
+        }
+      });
+      events.onerror = () => {
+        events.close();
+        if (!stopped) {
+          pollJobStatus();
+        }
+      };
+    } else {
+      pollJobStatus();
+    }
+
+    return () => {
+      stopped = true;
+      if (events) {
+        events.close();
+      }
+    };
   }, [jobId, navigate]);
 
   if (loading) {
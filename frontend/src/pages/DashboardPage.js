@@ -11,24 +11,32 @@ const API = `${BACKEND_URL}/api`;
 const DashboardPage = () => {
   const navigate = useNavigate();
   const [leads, setLeads] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  useEffect(() => {
-    const fetchLeads = async () => {
-      try {
-        const response = await axios.get(`${API}/leads`);
-        setLeads(response.data);
-        setLoading(false);
-      } catch (error) {
-        console.error('Error fetching leads:', error);
-        toast.error('Erreur lors du chargement des données');
-        setLoading(false);
-      }
-    };
+  // Listing paginé par curseur (50 leads par page, du plus récent au plus ancien)
+  const fetchLeads = async (cursor = null) => {
+    try {
+      const response = await axios.get(`${API}/leads`, { params: cursor ? { cursor } : {} });
+      setLeads((previous) => (cursor ? [...previous, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.nextCursor);
+    } catch (error) {
+      console.error('Error fetching leads:', error);
+      toast.error('Erreur lors du chargement des données');
+    }
+  };
 
-    fetchLeads();
+  useEffect(() => {
+    fetchLeads().finally(() => setLoading(false));
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchLeads(nextCursor);
+    setLoadingMore(false);
+  };
+
   const getStatusIcon = (status) => {
     if (status === 'completed') return <CheckCircle2 className="w-5 h-5 text-green-600" />;
     if (status === 'failed') return <XCircle className="w-5 h-5 text-red-600" />;
@@ -164,6 +172,13 @@ const DashboardPage = () => {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <div className="text-center mt-6">
+                  <Button variant="outline" onClick={loadMore} disabled={loadingMore} data-testid="load-more-leads-btn">
+                    {loadingMore ? 'Chargement...' : 'Charger plus'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </div>
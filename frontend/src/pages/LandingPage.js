@@ -38,8 +38,10 @@ const LandingPage = () => {
       const leadId = response.data.id;
       
       // Get the analysis job
-      const jobsResponse = await axios.get(`${API}/leads`);
-      const lead = jobsResponse.data.find(l => l.id === leadId);
+      const jobsResponse = await axios.get(`${API}/leads`, {
+        params: { email: response.data.email, limit: 5 }
+      });
+      const lead = jobsResponse.data.items.find(l => l.id === leadId);
       
       if (lead && lead.latestJob) {
         toast.success('Analyse lancée avec succès!');
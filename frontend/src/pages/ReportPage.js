@@ -20,9 +20,18 @@ const ReportPage = () => {
   useEffect(() => {
     const fetchReport = async () => {
       try {
+        // Résumé léger d'abord (scores, recommandations), puis les sections volumineuses
         const response = await axios.get(`${API}/reports/${reportId}`);
         setReport(response.data);
         setLoading(false);
+
+        const sections = response.data.sections;
+        if (sections === undefined || sections.length > 0) {
+          const sectionsResponse = await axios.get(`${API}/reports/${reportId}`, {
+            params: { fields: 'id', include: sections ? sections.join(',') : 'all' }
+          });
+          setReport((current) => ({ ...current, ...sectionsResponse.data }));
+        }
       } catch (error) {
         console.error('Error fetching report:', error);
         toast.error('Erreur lors du chargement du rapport');
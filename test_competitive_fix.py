@@ -2,6 +2,7 @@
 """
 Script de test pour valider le fix des URLs de compétiteurs
 """
+import asyncio
 import sys
 sys.path.append('/app/backend')
 
@@ -28,7 +29,7 @@ def test_url_validation():
     ]
     
     for url in test_urls:
-        validated = ci._validate_url(url)
+        validated = asyncio.run(ci._validate_url(url))
         status = "✅" if validated else "❌"
         url_str = str(url) if url is not None else "None"
         validated_str = str(validated) if validated is not None else "None"
@@ -23,7 +23,7 @@ def test_report_modules():
     try:
         # Essayer de récupérer le rapport via l'API (avec timeout court)
         try:
-            response = requests.get(f"{API_BASE}/reports/{REPORT_ID}", timeout=5)
+            response = requests.get(f"{API_BASE}/reports/{REPORT_ID}", params={'include': 'all'}, timeout=5)
             if response.status_code == 200:
                 report = response.json()
                 logger.info("✅ Rapport récupéré via API")
@@ -2,11 +2,22 @@
 """
 Test de validation améliorée des URLs avec vérification DNS et disponibilité
 """
+import asyncio
 import sys
 sys.path.append('/app/backend')
 
+import httpx
+
 from competitive_intelligence import CompetitiveIntelligence
 
+
+async def validate_all(ci, urls, check_reachable):
+    """Valide les URLs (HEAD via un client partagé si check_reachable)"""
+    if not check_reachable:
+        return [await ci._validate_url(url) for url in urls]
+    async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
+        return [await ci._validate_url(url, client) for url in urls]
+
 def test_validation_improved():
     """Test de validation complète"""
     print("🧪 TEST DE VALIDATION AMÉLIORÉE DES URLs")
@@ -28,8 +39,8 @@ def test_validation_improved():
     
     print("Test 1: Validation simple (structure + DNS)")
     print("-" * 70)
-    for url, should_exist, desc in test_cases:
-        result = ci._validate_url(url, check_reachable=False)
+    results = asyncio.run(validate_all(ci, [url for url, _, _ in test_cases], check_reachable=False))
+    for (url, should_exist, desc), result in zip(test_cases, results):
         status = "✅" if (result is not None) == should_exist else "❌"
         exists = "EXISTS" if result is not None else "NOT FOUND"
         print(f"{status} {url:45} → {exists:10} | {desc}")
@@ -37,8 +48,8 @@ def test_validation_improved():
     print()
     print("Test 2: Validation complète (structure + DNS + disponibilité)")
     print("-" * 70)
-    for url, should_exist, desc in test_cases:
-        result = ci._validate_url(url, check_reachable=True)
+    results = asyncio.run(validate_all(ci, [url for url, _, _ in test_cases], check_reachable=True))
+    for (url, should_exist, desc), result in zip(test_cases, results):
         status = "✅" if (result is not None) == should_exist else "⚠️ "
         exists = "REACHABLE" if result is not None else "NOT REACHABLE"
         print(f"{status} {url:45} → {exists:13} | {desc}")
@@ -0,0 +1,156 @@
+"""
+Collection MongoDB (Motor) en mémoire pour les tests des services adossés à Mongo
+"""
+import asyncio
+import copy
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int):
+        self.matched_count = matched_count
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class FakeCollection:
+    """Collection Motor en mémoire (sous-ensemble des opérateurs utilisés par les services)"""
+
+    def __init__(self, unique=None):
+        """
+        Args:
+            unique: Champ (ou tuple de champs) d'un index unique
+        """
+        self.unique = (unique,) if isinstance(unique, str) else unique
+        self.docs = []
+        self.reads = 0
+        self.writes = 0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def _matches(cls, doc, query):
+        for field, condition in query.items():
+            if field == '$or':
+                if not any(cls._matches(doc, sub) for sub in condition):
+                    return False
+            elif isinstance(condition, dict):
+                value = doc.get(field)
+                if value is None:
+                    return False
+                if '$lte' in condition and not value <= condition['$lte']:
+                    return False
+                if '$lt' in condition and not value < condition['$lt']:
+                    return False
+                if '$gte' in condition and not value >= condition['$gte']:
+                    return False
+                if '$in' in condition and value not in condition['$in']:
+                    return False
+            elif doc.get(field) != condition:
+                return False
+        return True
+
+    @staticmethod
+    def _apply(doc, update):
+        doc.update(update.get('$set', {}))
+        for field, amount in update.get('$inc', {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        # Sous-documents comparés champ par champ, comme en BSON
+        key = lambda value: tuple(value.values()) if isinstance(value, dict) else value
+        for field, value in update.get('$min', {}).items():
+            if field not in doc or key(value) < key(doc[field]):
+                doc[field] = value
+        for field, value in update.get('$max', {}).items():
+            if field not in doc or key(value) > key(doc[field]):
+                doc[field] = value
+        for field, values in update.get('$addToSet', {}).items():
+            items = doc.setdefault(field, [])
+            items.extend(v for v in values['$each'] if v not in items)
+
+    @staticmethod
+    def _project(doc, projection):
+        projection = projection or {}
+        included = [f for f, keep in projection.items() if keep and f != '_id']
+        fields = (included + ['_id']) if included else list(doc)
+        return {f: copy.deepcopy(doc[f]) for f in fields if f in doc and projection.get(f, 1)}
+
+    async def insert_one(self, doc):
+        if self.unique and any(all(d.get(f) == doc.get(f) for f in self.unique) for d in self.docs):
+            raise DuplicateKeyError(f"E11000 duplicate key: {[doc.get(f) for f in self.unique]}")
+        self.docs.append(dict(copy.deepcopy(doc), _id=len(self.docs)))
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            await self.insert_one(doc)
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        return next((self._project(d, projection) for d in self.docs if self._matches(d, query)), None)
+
+    async def find(self, query, projection=None):
+        self.reads += 1
+        for doc in [d for d in self.docs if self._matches(d, query)]:
+            yield self._project(doc, projection)
+
+    def watch(self, pipeline):
+        raise OperationFailure('The $changeStream stage is only supported on replica sets', code=40573)
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None, return_document=None):
+        async with self._lock:
+            await asyncio.sleep(0)  # Laisse les autres workers s'intercaler
+            candidates = [d for d in self.docs if self._matches(d, query)]
+            if sort:
+                candidates.sort(key=lambda d: d.get(sort[0][0]))
+            if not candidates:
+                return None
+            self._apply(candidates[0], update)
+            assert return_document == ReturnDocument.AFTER
+            return self._project(candidates[0], projection)
+
+    async def update_one(self, query, update, upsert=False):
+        self.writes += 1
+        for doc in self.docs:
+            if self._matches(doc, query):
+                self._apply(doc, update)
+                return UpdateResult(1)
+        if upsert:
+            doc = {field: value for field, value in query.items() if not isinstance(value, dict)}
+            self._apply(doc, update)
+            await self.insert_one(doc)
+        return UpdateResult(0)
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:  # UpdateOne uniquement
+            await self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    async def find_one_and_replace(self, query, replacement, projection=None, upsert=False,
+                                   return_document=ReturnDocument.BEFORE):
+        assert return_document == ReturnDocument.BEFORE
+        for index, doc in enumerate(self.docs):
+            if self._matches(doc, query):
+                self.docs[index] = dict(copy.deepcopy(replacement), _id=doc['_id'])
+                return self._project(doc, projection)
+        if upsert:
+            await self.insert_one(replacement)
+        return None
+
+    async def replace_one(self, query, replacement, upsert=False):
+        self.writes += 1
+        for index, doc in enumerate(self.docs):
+            if self._matches(doc, query):
+                self.docs[index] = dict(copy.deepcopy(replacement), _id=doc['_id'])
+                return UpdateResult(1)
+        if upsert:
+            await self.insert_one(replacement)
+        return UpdateResult(0)
+
+    async def delete_many(self, query):
+        self.writes += 1
+        kept = [d for d in self.docs if not self._matches(d, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs[:] = kept
+        return DeleteResult(deleted)
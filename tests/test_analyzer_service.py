@@ -0,0 +1,97 @@
+"""
+Tests du cache adressé par contenu de l'analyse Claude
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+sys.path.append('/app/backend')
+
+import pytest
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'test')
+
+from services import cache_service as cache_module
+from services.analyzer_service import AnalyzerService
+from services.cache_service import CacheService
+
+CRAWL = {
+    'base_url': 'https://acme.com',
+    'pages_crawled': 1,
+    'pages': [{
+        'url': 'https://acme.com',
+        'title': 'Acme',
+        'h1': ['Acme Assurance'],
+        'h2': ['FAQ'],
+        'paragraphs': ['Courtier en assurance à Montréal depuis 1990.'],
+        'json_ld': [],
+        'word_count': 7
+    }]
+}
+VISIBILITY = {'overall_visibility': 0.4, 'platform_scores': {'chatgpt': 0.5, 'claude': 0.3}, 'details': []}
+ANALYSIS = {'scores': {'global_score': 5.0}, 'recommendations': []}
+
+
+@pytest.fixture
+def analyzer(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_module, 'analysis_cache_service', CacheService(tmp_path, enabled_check=lambda: True))
+    service = AnalyzerService()
+    service.calls = 0
+
+    async def fake_call(prompt, retry_count):
+        service.calls += 1
+        return json.dumps(ANALYSIS)
+
+    monkeypatch.setattr(service, '_call_claude_with_retry', fake_call)
+    return service
+
+
+def with_page_text(text: str):
+    """Copie du crawl avec un contenu de page différent"""
+    crawl = json.loads(json.dumps(CRAWL))
+    crawl['pages'][0]['paragraphs'] = [text]
+    return crawl
+
+
+class TestAnalyzerCache:
+    """Tests pour la clé de cache de AnalyzerService.analyze_with_claude"""
+
+    def test_same_inputs_hit_the_cache(self, analyzer):
+        """Deux analyses identiques ne paient qu'un appel Claude"""
+        first = asyncio.run(analyzer.analyze_with_claude(CRAWL, VISIBILITY))
+        second = asyncio.run(analyzer.analyze_with_claude(CRAWL, VISIBILITY))
+
+        assert first == second == ANALYSIS
+        assert analyzer.calls == 1
+
+    def test_float_noise_does_not_miss(self, analyzer):
+        """Une variation de précision des taux de visibilité garde la même clé"""
+        noisy = dict(VISIBILITY, overall_visibility=0.4 + 1e-9)
+
+        asyncio.run(analyzer.analyze_with_claude(CRAWL, VISIBILITY))
+        asyncio.run(analyzer.analyze_with_claude(CRAWL, noisy))
+
+        assert analyzer.calls == 1
+
+    def test_content_change_misses_with_reason(self, analyzer, caplog):
+        """Un contenu modifié pour la même URL n'est pas servi depuis le cache, et la raison est journalisée"""
+        asyncio.run(analyzer.analyze_with_claude(CRAWL, VISIBILITY))
+
+        with caplog.at_level(logging.INFO, logger='services.analyzer_service'):
+            asyncio.run(analyzer.analyze_with_claude(with_page_text('Nouveau contenu du site.'), VISIBILITY))
+
+        assert analyzer.calls == 2
+        assert 'changed: content' in caplog.text
+
+    def test_key_covers_grid_version_and_model(self, analyzer, monkeypatch):
+        """La version de la grille et le modèle font partie de la clé"""
+        fingerprints = analyzer._cache_fingerprints(CRAWL, analyzer._prepare_pages_summary(CRAWL), VISIBILITY)
+        key = analyzer._cache_key(fingerprints)
+
+        analyzer.model = 'another-model'
+        assert analyzer._cache_key(analyzer._cache_fingerprints(CRAWL, analyzer._prepare_pages_summary(CRAWL), VISIBILITY)) != key
+
+        analyzer.model = AnalyzerService().model
+        monkeypatch.setattr('services.analyzer_service.SCORING_GRID_VERSION', '999')
+        assert analyzer._cache_key(analyzer._cache_fingerprints(CRAWL, analyzer._prepare_pages_summary(CRAWL), VISIBILITY)) != key
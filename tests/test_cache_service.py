@@ -0,0 +1,112 @@
+"""
+Tests du cache local indexé (SQLite WAL)
+"""
+import multiprocessing
+import os
+import time
+import sys
+sys.path.append('/app/backend')
+
+from services import cache_service as cache_module
+from services.cache_service import CacheService
+
+
+def write_entries(cache_dir: str, worker: int, count: int):
+    """Écrit des entrées depuis un processus séparé"""
+    cache = CacheService(cache_dir)
+    for i in range(count):
+        assert cache.set(f"worker {worker} key {i}", {'worker': worker, 'i': i})
+
+
+class TestCacheService:
+    """Tests pour CacheService"""
+
+    def test_roundtrip_and_delete(self, tmp_path):
+        """get/set/delete gardent l'API du cache fichier"""
+        cache = CacheService(tmp_path)
+        value = {'score': 7.5, 'texte': 'Montréal', 'items': [1, 2, 3]}
+
+        assert cache.get('analysis:acme') is None
+        assert cache.set('analysis:acme', value) is True
+        assert cache.get('analysis:acme') == value
+
+        assert cache.delete('analysis:acme') is True
+        assert cache.delete('analysis:acme') is False
+        assert cache.get('analysis:acme') is None
+
+    def test_values_are_compressed(self, tmp_path):
+        """Les valeurs sont stockées compressées"""
+        cache = CacheService(tmp_path)
+        cache.set('big', 'contenu répétitif ' * 1000)
+
+        stats = cache.get_cache_stats()
+        assert stats['total_entries'] == 1
+        assert stats['total_size_mb'] < 0.01
+
+    def test_ttl_is_checked_on_the_index(self, tmp_path):
+        """Une entrée plus vieille que max_age_hours est expirée et supprimée"""
+        cache = CacheService(tmp_path)
+        cache.set('old', 'value')
+        cache._connect().execute("UPDATE cache_entries SET created_at = ?", (time.time() - 3 * 3600,))
+
+        assert cache.get('old', max_age_hours=4) == 'value'
+        assert cache.get('old', max_age_hours=2) is None
+        assert cache.get_cache_stats()['total_entries'] == 0
+
+    def test_cleanup_expired(self, tmp_path):
+        """cleanup_expired ne supprime que les entrées expirées"""
+        cache = CacheService(tmp_path)
+        cache.set('old', 1)
+        cache._connect().execute("UPDATE cache_entries SET created_at = ?", (time.time() - 10 * 3600,))
+        cache.set('new', 2)
+
+        assert cache.cleanup_expired(max_age_hours=5) == 1
+        assert cache.get('new') == 2
+
+    def test_byte_budget_evicts_least_recently_used(self, tmp_path, monkeypatch):
+        """Au-delà du budget en octets, les entrées les moins récemment lues sont évincées"""
+        monkeypatch.setattr(cache_module, 'ACCESS_TOUCH_INTERVAL_SECONDS', 0)
+        cache = CacheService(tmp_path, max_bytes=6000)
+        # Valeurs peu compressibles (~1.7 Ko compressées) : trois tiennent dans le budget, pas quatre
+        values = {f"key {i}": os.urandom(1500).hex() for i in range(4)}
+
+        for key in ['key 0', 'key 1', 'key 2']:
+            cache.set(key, values[key])
+        time.sleep(0.01)
+        cache.get('key 0')  # key 0 devient la plus récemment utilisée
+
+        cache.set('key 3', values['key 3'])
+
+        assert cache.get_cache_stats()['total_entries'] == 3
+        assert cache.get('key 1') is None
+        assert cache.get('key 0') == values['key 0']
+        assert cache.get('key 2') == values['key 2']
+        assert cache.get('key 3') == values['key 3']
+
+    def test_clear_all(self, tmp_path):
+        """clear_all vide la base et remet les totaux à zéro"""
+        cache = CacheService(tmp_path)
+        for i in range(5):
+            cache.set(f"key {i}", i)
+
+        assert cache.clear_all() == 5
+        stats = cache.get_cache_stats()
+        assert stats['total_entries'] == 0
+        assert stats['total_size_mb'] == 0
+
+    def test_concurrent_writers_from_several_processes(self, tmp_path):
+        """Plusieurs processus workers écrivent dans la même base sans perte"""
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=write_entries, args=(str(tmp_path), worker, 50))
+            for worker in range(4)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(timeout=30)
+
+        assert all(process.exitcode == 0 for process in workers)
+        cache = CacheService(tmp_path)
+        assert cache.get_cache_stats()['total_entries'] == 200
+        assert cache.get('worker 3 key 49') == {'worker': 3, 'i': 49}
@@ -0,0 +1,201 @@
+"""
+Tests de CompetitiveIntelligence : base de profils de compétiteurs partagée entre les jobs,
+récupération concurrente des compétiteurs et de leurs pages
+"""
+import asyncio
+import time
+import sys
+sys.path.append('/app/backend')
+
+import httpx
+import pytest
+
+from competitive_intelligence import CompetitiveIntelligence
+from services.cache_service import CacheService
+from services.competitor_profile_store import CompetitorProfileStore, normalize_domain
+from services.crawler import CrawlLimits
+
+HOMEPAGE = """
+<html><head><title>Acme Assurance</title></head><body>
+<h1>Assurance auto</h1>
+<p>L'assurance auto est une protection obligatoire. 95% de nos clients sont satisfaits.</p>
+<a href="/guide-assurance">Guide</a>
+<a href="/faq">FAQ</a>
+</body></html>
+"""
+GUIDE = "<html><body><h1>Guide</h1><p>Comment choisir son assurance ? Il s'agit de comparer.</p></body></html>"
+VISIBILITY = {'details': [
+    {'platform': 'ChatGPT', 'answer': 'Acme.com est un bon choix'},
+    {'platform': 'Claude', 'answer': 'Je recommande acme.com'},
+]}
+
+
+async def resolve_ok(self, domain):
+    return True
+
+
+class FakeWeb:
+    """Réseau simulé : page d'accueil avec deux liens internes GEO, pages internes de guide"""
+
+    def __init__(self, latency: float = 0.0, failing: bool = False):
+        self.fetched = []
+        self.latency = latency
+        self.failing = failing
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.method == 'GET':
+            self.fetched.append(str(request.url))
+        await asyncio.sleep(self.latency)
+        if self.failing:
+            return httpx.Response(503)
+        return httpx.Response(200, html=HOMEPAGE if request.url.path == '/' else GUIDE)
+
+
+@pytest.fixture
+def fake_web(monkeypatch):
+    monkeypatch.setattr(CompetitiveIntelligence, '_resolve_domain', resolve_ok)
+    return FakeWeb()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CompetitorProfileStore(cache=CacheService(tmp_path, enabled_check=lambda: True), ttl_hours=1, max_age_hours=24)
+    yield store
+    store.wait_for_refreshes()
+
+
+def make_ci(web: FakeWeb, store: CompetitorProfileStore, **kwargs) -> CompetitiveIntelligence:
+    ci = CompetitiveIntelligence(profile_store=store, transport=httpx.MockTransport(web.handler), **kwargs)
+    ci.retry_delay = 0.01
+    return ci
+
+
+class TestCompetitorProfileStore:
+    """Tests pour la base de profils et son utilisation par CompetitiveIntelligence"""
+
+    def test_normalize_domain(self):
+        """URL, domaine nu, www et port donnent la même clé"""
+        assert normalize_domain('https://www.Acme.com:443/fr/') == 'acme.com'
+        assert normalize_domain('acme.com/contact') == 'acme.com'
+        assert normalize_domain('') == ''
+
+    def test_known_domain_is_a_lookup(self, fake_web, store):
+        """Un domaine déjà profilé n'est pas re-crawlé ; la visibilité du job est recalculée"""
+        first = make_ci(fake_web, store).analyze_single_competitor('https://acme.com', VISIBILITY)
+        pages_fetched = len(fake_web.fetched)
+
+        second = make_ci(fake_web, store).analyze_single_competitor('https://www.acme.com/', {'details': []})
+
+        assert pages_fetched == 3
+        assert len(fake_web.fetched) == pages_fetched
+        assert second['pages_analyzed'] == first['pages_analyzed']
+        assert second['aggregate'] == first['aggregate']
+        assert first['llm_visibility']['chatgpt'] == 1.0
+        assert second['llm_visibility']['overall'] == 0.0
+        assert second['geo_power_score'] < first['geo_power_score']
+
+    def test_analyze_competitors_skips_validation_for_known_domains(self, fake_web, store, monkeypatch):
+        """analyze_competitors ne vérifie pas DNS/HEAD pour un domaine connu"""
+        make_ci(fake_web, store).analyze_single_competitor('https://acme.com', VISIBILITY)
+
+        async def no_network(*args):
+            raise AssertionError('network check for a known domain')
+
+        monkeypatch.setattr(CompetitiveIntelligence, '_check_domain_exists', no_network)
+        monkeypatch.setattr(CompetitiveIntelligence, '_check_url_responds', no_network)
+        result = make_ci(fake_web, store).analyze_competitors(['https://acme.com'], VISIBILITY)
+
+        assert result['competitors_analyzed'] == 1
+
+    def test_stale_profile_is_served_then_refreshed(self, fake_web, store):
+        """Un profil périmé est servi immédiatement et rafraîchi en arrière-plan"""
+        make_ci(fake_web, store).analyze_single_competitor('https://acme.com', VISIBILITY)
+        stale = store.get('acme.com')
+        store.cache.set(store.make_key('acme.com'), dict(stale, fetched_at=time.time() - 2 * 3600))
+        fake_web.fetched.clear()
+
+        result = make_ci(fake_web, store).analyze_single_competitor('https://acme.com', VISIBILITY)
+        assert result['aggregate'] == stale['aggregate']
+
+        store.wait_for_refreshes()
+        assert len(fake_web.fetched) == 3
+        assert store.is_fresh(store.get('acme.com'))
+
+    def test_failed_analysis_is_not_stored(self, fake_web, store):
+        """Une analyse en erreur n'est pas conservée"""
+        fake_web.failing = True
+
+        result = make_ci(fake_web, store).analyze_single_competitor('https://acme.com', VISIBILITY)
+
+        assert result.get('error')
+        assert store.get('acme.com') is None
+
+
+class TestConcurrentFetching:
+    """Tests pour la récupération concurrente des compétiteurs et de leurs pages"""
+
+    def test_competitors_and_pages_are_fetched_concurrently(self, fake_web, store):
+        """L'étape dure le temps du compétiteur le plus lent, pas la somme"""
+        fake_web.latency = 0.1
+        store.enabled = False
+        urls = [f'https://competitor{i}.com' for i in range(5)]
+
+        start = time.perf_counter()
+        result = make_ci(fake_web, store).analyze_competitors(urls, VISIBILITY)
+        elapsed = time.perf_counter() - start
+
+        # Séquentiel : 5 × (HEAD + accueil + 2 pages internes) × 0.1s = 2s
+        # Concurrent : HEAD, puis accueil, puis pages internes en parallèle = 0.3s
+        assert result['competitors_analyzed'] == 5
+        assert result['pages_analyzed'] == 15
+        assert [a['main_url'] for a in result['analyses']] == [f'{url}/' for url in urls]
+        assert elapsed < 1.0
+
+    def test_host_limit_is_respected(self, fake_web, store):
+        """Les pages d'un même hôte respectent la concurrence par hôte"""
+        in_flight = {'now': 0, 'max': 0}
+        original_handler = fake_web.handler
+
+        async def counting_handler(request):
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            try:
+                return await original_handler(request)
+            finally:
+                in_flight['now'] -= 1
+
+        fake_web.handler = counting_handler
+        fake_web.latency = 0.05
+        store.enabled = False
+
+        result = make_ci(fake_web, store, limits=CrawlLimits(global_concurrency=10, host_concurrency=1)).analyze_single_competitor(
+            'https://acme.com', VISIBILITY
+        )
+
+        assert len(result['pages_analyzed']) == 3
+        assert in_flight['max'] == 1
+
+    def test_retries_use_non_blocking_backoff(self, fake_web, store):
+        """Une page en erreur est retentée ; l'attente ne bloque pas les autres compétiteurs"""
+        attempts = []
+        original_handler = fake_web.handler
+
+        async def flaky_handler(request):
+            if request.url.host == 'flaky.com' and request.method == 'GET':
+                attempts.append(str(request.url))
+                if len(attempts) == 1:
+                    return httpx.Response(503)
+            return await original_handler(request)
+
+        fake_web.handler = flaky_handler
+        store.enabled = False
+        ci = make_ci(fake_web, store)
+        ci.retry_delay = 0.3
+
+        start = time.perf_counter()
+        result = ci.analyze_competitors(['https://flaky.com', 'https://steady.com'], VISIBILITY)
+        elapsed = time.perf_counter() - start
+
+        assert result['competitors_analyzed'] == 2
+        assert attempts[:2] == ['https://flaky.com/', 'https://flaky.com/']
+        assert elapsed < 0.6
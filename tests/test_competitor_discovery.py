@@ -2,13 +2,29 @@
 Tests complets pour le système de découverte de compétiteurs
 Version 2 - Tests sans connexion internet (mocked)
 """
+import asyncio
+import socket
+import threading
+import time
+import httpx
 import pytest
 import sys
 sys.path.append('/app/backend')
 
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import patch, MagicMock
+import config
+from services import search_providers as search_module
+from services.visibility_scheduler import AsyncRateLimiter
 from utils.competitor_extractor import CompetitorExtractor
+from services.cache_service import CacheService
 from services.competitor_discovery import CompetitorDiscovery
+from services.search_providers import (
+    DuckDuckGoProvider,
+    FixtureSearchProvider,
+    GoogleScrapeProvider,
+    SearchProvider,
+    WebSearchService
+)
 
 
 class TestCompetitorExtractor:
@@ -183,32 +199,20 @@ class TestCompetitorDiscovery:
         assert 'the' not in keywords
         assert 'and' not in keywords
     
-    @patch('services.competitor_discovery.requests.head')
-    @patch('services.competitor_discovery.socket.gethostbyname')
-    def test_check_url_exists(self, mock_dns, mock_head):
-        """Test validation existence URL"""
+    @patch('socket.getaddrinfo')
+    def test_resolve_host(self, mock_dns):
+        """Test validation DNS (résolution non bloquante)"""
         cd = CompetitorDiscovery()
         
         # Mock DNS success
-        mock_dns.return_value = '1.2.3.4'
-        
-        # Mock HEAD success
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_head.return_value = mock_response
-        
-        assert cd._check_url_exists('https://validsite.com') is True
-        
-        # Mock HEAD fail
-        mock_response.status_code = 404
-        assert cd._check_url_exists('https://notfound.com') is False
+        mock_dns.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('1.2.3.4', 0))]
+        assert asyncio.run(cd._resolve_host('https://validsite.com')) is True
         
         # Mock DNS fail
-        mock_dns.side_effect = Exception("DNS error")
-        assert cd._check_url_exists('https://invaliddomain.com') is False
+        mock_dns.side_effect = socket.gaierror("DNS error")
+        assert asyncio.run(cd._resolve_host('https://invaliddomain.com')) is False
     
-    @patch('services.competitor_discovery.requests.get')
-    def test_analyze_competitor_homepage(self, mock_get):
+    def test_analyze_competitor_homepage(self):
         """Test analyse de page d'accueil compétiteur"""
         cd = CompetitorDiscovery()
         
@@ -227,12 +231,16 @@ class TestCompetitorDiscovery:
         </html>
         """
         
-        mock_response = Mock()
-        mock_response.content = mock_html.encode('utf-8')
-        mock_response.raise_for_status = Mock()
-        mock_get.return_value = mock_response
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == 'notfound.com':
+                return httpx.Response(404)
+            return httpx.Response(200, html=mock_html)
+        
+        async def analyze(url):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await cd._analyze_competitor_homepage(client, url)
         
-        result = cd._analyze_competitor_homepage('https://competitor.com')
+        result = asyncio.run(analyze('https://competitor.com'))
         
         assert result is not None
         assert 'title' in result
@@ -241,6 +249,9 @@ class TestCompetitorDiscovery:
         assert len(result['h1']) > 0
         assert len(result['h2']) > 0
         assert len(result['keywords']) > 0
+        
+        # HTTP 404 => rejeté
+        assert asyncio.run(analyze('https://notfound.com')) is None
     
     def test_calculate_relevance_score(self):
         """Test calcul du score de pertinence"""
@@ -268,22 +279,13 @@ class TestCompetitorDiscovery:
         assert score > 0.5
         assert score <= 1.0
     
-    @patch('services.competitor_discovery.requests.get')
-    @patch('services.competitor_discovery.requests.head')
-    @patch('services.competitor_discovery.socket.gethostbyname')
-    def test_discover_real_competitors_integration(self, mock_dns, mock_head, mock_get):
+    @patch('socket.getaddrinfo')
+    def test_discover_real_competitors_integration(self, mock_dns, tmp_path):
         """Test intégration complète du pipeline"""
-        cd = CompetitorDiscovery()
-        
         # Mock DNS
-        mock_dns.return_value = '1.2.3.4'
+        mock_dns.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('1.2.3.4', 0))]
         
-        # Mock HEAD
-        mock_head_response = Mock()
-        mock_head_response.status_code = 200
-        mock_head.return_value = mock_head_response
-        
-        # Mock GET (pour Google search et homepage analysis)
+        # Mock HTTP (recherche Google et pages d'accueil via httpx)
         mock_html_search = """
         <html>
             <body>
@@ -300,16 +302,15 @@ class TestCompetitorDiscovery:
         </html>
         """
         
-        def mock_get_side_effect(url, *args, **kwargs):
-            mock_resp = Mock()
-            if 'google.com' in url:
-                mock_resp.content = mock_html_search.encode('utf-8')
-            else:
-                mock_resp.content = mock_html_homepage.encode('utf-8')
-            mock_resp.raise_for_status = Mock()
-            return mock_resp
-        
-        mock_get.side_effect = mock_get_side_effect
+        search_service = WebSearchService(
+            providers=[GoogleScrapeProvider()],
+            cache=CacheService(tmp_path),
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, html=mock_html_search))
+        )
+        cd = CompetitorDiscovery(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, html=mock_html_homepage)),
+            search_service=search_service
+        )
         
         # Test
         semantic_analysis = {
@@ -350,6 +351,180 @@ class TestCompetitorDiscovery:
             # Score entre 0 et 1
             assert 0 <= comp['score'] <= 1
 
+    
+    def test_validation_is_concurrent_with_deadline(self):
+        """Un candidat mort ne coûte que son échéance, les autres sont validés en parallèle"""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == 'dead.com':
+                await asyncio.sleep(10)
+            else:
+                await asyncio.sleep(0.1)
+            return httpx.Response(200, html='<html><head><title>Insurance Broker</title></head><body><h1>Life insurance</h1></body></html>')
+        
+        cd = CompetitorDiscovery(transport=httpx.MockTransport(handler))
+        cd.validation_deadline = 0.3
+        cd._resolve_host = lambda url: asyncio.sleep(0, result=True)
+        urls = ['https://dead.com'] + [f'https://competitor{i}.com' for i in range(6)]
+        
+        start = time.perf_counter()
+        result = cd._validate_and_score_competitors(
+            urls=urls,
+            our_url='https://mysite.com',
+            primary_industry='insurance',
+            offerings=['life insurance'],
+            url_sources={url: 'both' for url in urls}
+        )
+        elapsed = time.perf_counter() - start
+        
+        # Séquentiel : 10s + 6 × 0.1s
+        assert elapsed < 1.0
+        assert [c['homepage_url'] for c in result] == urls[1:]
+    
+    def test_validation_stops_after_enough_direct_competitors(self):
+        """Les validations restantes sont annulées une fois max_competitors directs confirmés"""
+        requested = []
+        
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requested.append(request.url.host)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, html='<html><head><title>Insurance Broker</title></head><body><h1>Life insurance</h1></body></html>')
+        
+        cd = CompetitorDiscovery(transport=httpx.MockTransport(handler))
+        cd.validation_concurrency = 2
+        cd._resolve_host = lambda url: asyncio.sleep(0, result=True)
+        urls = [f'https://competitor{i}.com' for i in range(10)]
+        
+        result = cd._validate_and_score_competitors(
+            urls=urls,
+            our_url='https://mysite.com',
+            primary_industry='insurance',
+            offerings=['life insurance'],
+            url_sources={url: 'both' for url in urls},
+            max_competitors=3
+        )
+        
+        assert len(result) >= 3
+        assert all(c['type'] == 'direct' for c in result)
+        assert len(requested) < len(urls)
+
+
+class TestWebSearchService:
+    """Tests pour la recherche web multi-fournisseurs (Stage 2)"""
+    
+    def test_parse_duckduckgo_redirect_links(self):
+        """Les liens de redirection DuckDuckGo sont décodés"""
+        html = b'<a href="//duckduckgo.com/l/?uddg=https%3A%2F%2Fcompetitor1.com%2F&rut=x">C1</a>'
+        assert DuckDuckGoProvider.parse_results(html) == ['https://competitor1.com/']
+    
+    def test_provider_without_search_is_rejected(self):
+        """Un fournisseur qui n'implémente pas search échoue à la construction"""
+        class IncompleteProvider(SearchProvider):
+            name = 'incomplete'
+
+        with pytest.raises(TypeError):
+            IncompleteProvider()
+    
+    def test_first_good_result_wins(self, tmp_path):
+        """Le premier fournisseur avec des résultats gagne, sans attendre les plus lents"""
+        query = 'assurance vie Québec'
+        service = WebSearchService(
+            providers=[
+                FixtureSearchProvider({query: []}, name='empty'),
+                FixtureSearchProvider({query: ['https://slow.com']}, latency=5, name='slow'),
+                FixtureSearchProvider({query: ['https://fast.com']}, latency=0.05, name='fast'),
+            ],
+            cache=CacheService(tmp_path)
+        )
+        
+        start = time.perf_counter()
+        results = asyncio.run(service.search_many([query]))
+        
+        assert time.perf_counter() - start < 1.0
+        assert results == {query: ['https://fast.com']}
+    
+    def test_queries_run_concurrently_and_are_cached(self, tmp_path):
+        """Les requêtes partent en parallèle ; une requête déjà faite est servie par le cache"""
+        queries = [f'requête {i}' for i in range(4)]
+        provider = FixtureSearchProvider({q: [f'https://competitor{i}.com'] for i, q in enumerate(queries)}, latency=0.2)
+        calls = []
+        original_search = provider.search
+        
+        async def counting_search(client, query, max_results=10):
+            calls.append(query)
+            return await original_search(client, query, max_results)
+        
+        provider.search = counting_search
+        service = WebSearchService(providers=[provider], cache=CacheService(tmp_path))
+        
+        start = time.perf_counter()
+        first = asyncio.run(service.search_many(queries))
+        elapsed = time.perf_counter() - start
+        
+        # Séquentiel : 4 × 0.2s
+        assert elapsed < 0.6
+        assert first['requête 3'] == ['https://competitor3.com']
+        
+        # Nouvelle boucle (nouveau job) : résultats servis par le cache, casse ignorée
+        second = asyncio.run(service.search_many(['REQUÊTE 3']))
+        assert second == {'REQUÊTE 3': ['https://competitor3.com']}
+        assert len(calls) == 4
+    
+    def test_failing_provider_does_not_break_search(self, tmp_path):
+        """Une erreur HTTP d'un fournisseur compte comme un résultat vide"""
+        service = WebSearchService(
+            providers=[GoogleScrapeProvider(), FixtureSearchProvider({'courtier': ['https://broker.com']}, latency=0.05)],
+            cache=CacheService(tmp_path),
+            transport=httpx.MockTransport(lambda request: httpx.Response(429))
+        )
+        
+        assert asyncio.run(service.search_many(['courtier'])) == {'courtier': ['https://broker.com']}
+
+    def test_rate_limit_is_shared_across_jobs(self, tmp_path):
+        """Des jobs concurrents (un asyncio.run par thread) partagent le seau du fournisseur"""
+        calls = []
+        provider = FixtureSearchProvider({f'requête {i}': ['https://competitor.com'] for i in range(9)})
+        original_search = provider.search
+
+        async def timed_search(client, query, max_results=10):
+            calls.append(time.perf_counter())
+            return await original_search(client, query, max_results)
+
+        provider.search = timed_search
+        service = WebSearchService(providers=[provider], cache=CacheService(tmp_path, enabled_check=lambda: False))
+        service._limiters['fixture'] = AsyncRateLimiter(600, burst=2)  # 10/s après une rafale de 2
+
+        jobs = [threading.Thread(target=lambda i=i: asyncio.run(service.search_many([f'requête {3 * i + j}' for j in range(3)])))
+                for i in range(3)]
+        start = time.perf_counter()
+        for job in jobs:
+            job.start()
+        for job in jobs:
+            job.join()
+
+        # 9 appels : 2 en rafale puis 7 espacés de 0.1s
+        assert len(calls) == 9
+        assert max(calls) - start >= 0.6
+
+    def test_search_cache_stays_on_in_production(self, tmp_path, monkeypatch):
+        """Le cache (fournisseur, requête) par défaut ne dépend pas du cache de dev"""
+        monkeypatch.setattr(config, 'ENVIRONMENT', 'production')
+        monkeypatch.setattr(search_module, 'COMPETITOR_SEARCH_CACHE_DIR', tmp_path)
+        calls = []
+        provider = FixtureSearchProvider({'courtier': ['https://broker.com']})
+        original_search = provider.search
+
+        async def counting_search(client, query, max_results=10):
+            calls.append(query)
+            return await original_search(client, query, max_results)
+
+        provider.search = counting_search
+        service = WebSearchService(providers=[provider])
+
+        assert not config.is_cache_enabled()
+        asyncio.run(service.search_many(['courtier']))
+        assert asyncio.run(service.search_many(['courtier'])) == {'courtier': ['https://broker.com']}
+        assert calls == ['courtier']
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
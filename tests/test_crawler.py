@@ -0,0 +1,164 @@
+"""
+Tests du crawler async (sans réseau : transport httpx simulé)
+"""
+import asyncio
+import threading
+import time
+import httpx
+import sys
+sys.path.append('/app/backend')
+
+from services.crawler import CrawlLimits, SharedSemaphore, WebCrawler
+
+
+def make_site(pages: int, latency: float = 0.0):
+    """Site simulé : la page d'accueil lie toutes les autres pages"""
+    requested = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        await asyncio.sleep(latency)
+
+        if request.url.path == '/':
+            links = ''.join(f'<a href="/page-{i}">Page {i}</a>' for i in range(1, pages))
+            body = f'<html><head><title>Accueil</title></head><body><h1>Acme</h1>{links}<a href="/doc.pdf">PDF</a></body></html>'
+        elif request.url.path.startswith('/page-'):
+            body = (
+                f'<html><head><title>{request.url.path}</title>'
+                '<meta name="description" content="Description"></head>'
+                '<body><h2>Section</h2><p>' + 'Contenu détaillé de la page de test. ' * 5 + '</p>'
+                '<script type="application/ld+json">{"@type": "Organization"}</script></body></html>'
+            )
+        else:
+            return httpx.Response(404)
+
+        return httpx.Response(200, html=body)
+
+    return httpx.MockTransport(handler), requested
+
+
+class TestWebCrawler:
+    """Tests pour WebCrawler"""
+
+    def test_crawl_is_concurrent(self):
+        """Un crawl de 10 pages ne paie pas 10 × (latence + délai de politesse)"""
+        transport, requested = make_site(10, latency=0.1)
+        crawler = WebCrawler(limits=CrawlLimits(global_concurrency=20, host_concurrency=10), transport=transport)
+        crawler.delay = 0.2
+
+        start = time.perf_counter()
+        result = asyncio.run(crawler.crawl_website('https://acme.com', max_pages=10))
+        elapsed = time.perf_counter() - start
+
+        assert result['pages_crawled'] == 10
+        assert '/doc.pdf' not in requested
+        # Séquentiel : 10 × 0.3s = 3s ; ici page d'accueil puis une vague parallèle
+        assert elapsed < 1.0
+
+    def test_page_shape_and_order(self):
+        """Les pages gardent le format attendu, la page d'accueil en premier"""
+        transport, _ = make_site(3)
+        crawler = WebCrawler(limits=CrawlLimits(), transport=transport)
+        crawler.delay = 0
+
+        result = asyncio.run(crawler.crawl_website('acme.com'))
+
+        assert result['base_url'] == 'https://acme.com'
+        assert result['pages'][0]['title'] == 'Accueil'
+        page = result['pages'][1]
+        assert set(page) == {'url', 'title', 'meta_description', 'h1', 'h2', 'h3', 'paragraphs', 'json_ld', 'faq', 'word_count'}
+        assert page['meta_description'] == 'Description'
+        assert page['json_ld'] == [{'@type': 'Organization'}]
+        assert page['word_count'] > 0
+
+    def test_host_concurrency_is_respected(self):
+        """Les requêtes simultanées vers un hôte ne dépassent pas la limite"""
+        active = 0
+        peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            links = ''.join(f'<a href="/p{i}">x</a>' for i in range(8))
+            return httpx.Response(200, html=f'<html><body>{links}</body></html>')
+
+        crawler = WebCrawler(limits=CrawlLimits(host_concurrency=2), transport=httpx.MockTransport(handler))
+        crawler.delay = 0
+
+        result = asyncio.run(crawler.crawl_website('https://acme.com', max_pages=9))
+
+        assert result['pages_crawled'] == 9
+        assert peak == 2
+
+    def test_limits_are_shared_across_event_loops(self):
+        """Des crawls lancés dans plusieurs threads (une boucle chacun) partagent les limites"""
+        lock = threading.Lock()
+        active = {'global': 0, 'acme.com': 0}
+        peak = {'global': 0, 'acme.com': 0}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            keys = ['global'] + (['acme.com'] if request.url.host == 'acme.com' else [])
+            with lock:
+                for key in keys:
+                    active[key] += 1
+                    peak[key] = max(peak[key], active[key])
+            await asyncio.sleep(0.03)
+            with lock:
+                for key in keys:
+                    active[key] -= 1
+            links = ''.join(f'<a href="/p{i}">x</a>' for i in range(6))
+            return httpx.Response(200, html=f'<html><body>{links}</body></html>')
+
+        limits = CrawlLimits(global_concurrency=2, host_concurrency=1)
+        results = []
+
+        def crawl(site):
+            crawler = WebCrawler(limits=limits, transport=httpx.MockTransport(handler))
+            crawler.delay = 0
+            results.append(asyncio.run(crawler.crawl_website(site, max_pages=5)))
+
+        threads = [threading.Thread(target=crawl, args=(site,))
+                   for site in ['https://acme.com', 'https://acme.com', 'https://beta.com', 'https://gamma.com']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [result['pages_crawled'] for result in results] == [5, 5, 5, 5]
+        assert peak['global'] == 2
+        assert peak['acme.com'] == 1
+
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        """Une attente annulée ne garde pas la place qui lui a été transmise"""
+        semaphore = SharedSemaphore(1)
+
+        async def run():
+            await semaphore.acquire()
+            waiter = asyncio.create_task(semaphore.acquire())
+            await asyncio.sleep(0)
+            semaphore.release()  # Place transmise à l'attente...
+            waiter.cancel()      # ... annulée avant d'avoir repris la main
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                pass
+            await asyncio.wait_for(semaphore.acquire(), timeout=1)
+
+        asyncio.run(run())
+
+    def test_failed_pages_are_skipped(self):
+        """Une page en erreur n'interrompt pas le crawl"""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == '/broken':
+                return httpx.Response(500)
+            return httpx.Response(200, html='<html><body><a href="/broken">x</a><a href="/ok">y</a></body></html>')
+
+        crawler = WebCrawler(limits=CrawlLimits(), transport=httpx.MockTransport(handler))
+        crawler.delay = 0
+
+        result = asyncio.run(crawler.crawl_website('https://acme.com'))
+
+        assert [page['url'] for page in result['pages']] == ['https://acme.com', 'https://acme.com/ok']
@@ -0,0 +1,126 @@
+"""
+Tests de l'historique des analyses (SQLite WAL, rapports compressés)
+"""
+import asyncio
+import json
+import sqlite3
+import sys
+sys.path.append('/app/backend')
+
+from database_manager import DatabaseManager
+
+
+def make_report(report_id, score, date, url='https://acme.com'):
+    return {
+        'id': report_id,
+        'url': url,
+        'createdAt': date,
+        'scores': {'global_score': score, 'structure': score - 1, 'eeat': score + 1},
+        'visibility_results': {'overall_visibility': 0.4, 'platform_scores': {'ChatGPT': 0.5, 'Claude': 0.3}},
+        'texte': 'Montréal ' * 50,
+    }
+
+
+class TestDatabaseManager:
+    """Tests pour DatabaseManager"""
+
+    def test_record_analysis_compares_with_previous(self, tmp_path):
+        """L'analyse courante est comparée à la précédente du même site, pas à elle-même"""
+        history = DatabaseManager(tmp_path / 'history.db')
+        history.save_analysis(make_report('r1', 7.0, '2026-01-01T10:00:00'))
+        history.save_analysis(make_report('other', 2.0, '2026-01-05T10:00:00', url='https://other.com'))
+
+        alerts = asyncio.run(history.record_analysis_async(make_report('r2', 5.5, '2026-02-01T10:00:00')))
+
+        assert [alert['type'] for alert in alerts] == ['CRITIQUE']
+        previous = history.get_previous_analysis('https://acme.com', exclude_id='r2')
+        assert previous['id'] == 'r1'
+        assert previous['scores']['eeat'] == 8.0
+        assert history.get_previous_analysis('https://acme.com')['id'] == 'r1'
+        history.close()
+
+    def test_rerun_does_not_duplicate_alerts(self, tmp_path):
+        """Une analyse ré-enregistrée (relance d'étape) retourne ses alertes sans les sauvegarder à nouveau"""
+        history = DatabaseManager(tmp_path / 'history.db')
+        history.save_analysis(make_report('r1', 7.0, '2026-01-01T10:00:00'))
+
+        first = history.record_analysis(make_report('r2', 5.5, '2026-02-01T10:00:00'))
+        rerun = history.record_analysis(make_report('r2', 5.5, '2026-02-01T10:05:00'))
+
+        assert first == rerun and len(first) == 1
+        assert history._connect().execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 1
+        assert history._connect().execute("SELECT COUNT(*) FROM analyses").fetchone()[0] == 2
+        history.close()
+
+    def test_payload_is_compressed(self, tmp_path):
+        """Le rapport est stocké compressé et relu intact"""
+        history = DatabaseManager(tmp_path / 'history.db')
+        report = make_report('r1', 7.0, '2026-01-01T10:00:00')
+        history.save_analysis(report)
+
+        conn = sqlite3.connect(tmp_path / 'history.db')
+        payload, data_json = conn.execute("SELECT payload, data_json FROM analyses").fetchone()
+        conn.close()
+
+        assert data_json is None
+        assert len(payload) < len(json.dumps(report))
+        assert history.get_analysis_data('r1') == report
+        history.close()
+
+    def test_legacy_database_is_migrated(self, tmp_path):
+        """Une base existante (data_json) gagne la colonne payload et l'index ; ses analyses restent lisibles"""
+        path = tmp_path / 'history.db'
+        legacy = make_report('old', 6.0, '2025-12-01T10:00:00')
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            CREATE TABLE analyses (
+                id TEXT PRIMARY KEY, site_url TEXT NOT NULL, date TEXT NOT NULL, global_score REAL,
+                structure_score REAL, info_density_score REAL, readability_score REAL, eeat_score REAL,
+                educational_score REAL, thematic_score REAL, ai_optimization_score REAL,
+                visibility_score REAL, overall_visibility REAL, data_json TEXT
+            )
+        """)
+        conn.execute("INSERT INTO analyses VALUES (?, ?, ?, 6, 5, 0, 0, 7, 0, 0, 0, 0, 0.4, ?)",
+                     ('old', legacy['url'], legacy['createdAt'], json.dumps(legacy)))
+        conn.commit()
+        conn.close()
+
+        history = DatabaseManager(path)
+        history.save_analysis(make_report('new', 7.5, '2026-01-01T10:00:00'))
+
+        assert history.get_analysis_data('old') == legacy
+        assert history.get_previous_analysis(legacy['url'], exclude_id='new')['id'] == 'old'
+        plan = history._connect().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM analyses WHERE site_url = ? ORDER BY date DESC LIMIT 1", ('x',)
+        ).fetchall()
+        assert 'idx_analyses_site_date' in str(plan)
+        history.close()
+
+    def test_save_many_in_batches(self, tmp_path):
+        """Import en masse par lots, dates d'origine conservées, ré-import idempotent"""
+        history = DatabaseManager(tmp_path / 'history.db', batch_size=3)
+        reports = [make_report(f'r{i}', 5.0 + i / 10, f'2026-01-{i + 1:02d}T10:00:00') for i in range(7)]
+
+        assert asyncio.run(history.save_many_async(reports)) == 7
+        assert history.save_many(reports[:2]) == 2
+
+        count = history._connect().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        assert count == 7
+        assert history.get_previous_analysis('https://acme.com')['date'] == '2026-01-06T10:00:00'
+        history.close()
+
+    def test_score_points_for_import(self, tmp_path):
+        """Points lus dans le rapport compressé, à défaut dans les colonnes (analyses sans rapport lisible)"""
+        history = DatabaseManager(tmp_path / 'history.db', batch_size=2)
+        history.save_many([make_report(f'r{i}', 5.0 + i, f'2026-06-0{i + 1}T09:00:00') for i in range(3)])
+        history._connect().execute("UPDATE analyses SET payload = x'00' WHERE id = 'r2'")
+
+        assert history.list_analysis_ids() == ['r0', 'r1']
+        assert history.list_analysis_ids('r1') == ['r2']
+        points = {point[0]: point for point in history.get_score_points(['r0', 'r2'])}
+
+        assert points['r0'][1:3] == ('https://acme.com', '2026-06-01T09:00:00')
+        assert points['r0'][3]['platform:claude'] == 0.3
+        assert points['r2'][3]['global_score'] == 7.0 and 'platform:claude' not in points['r2'][3]
+        assert history.get_score_points([]) == []
+        history.close()
@@ -0,0 +1,105 @@
+"""
+Tests de l'extracteur de caractéristiques HTML (une passe lxml)
+"""
+import sys
+sys.path.append('/app/backend')
+
+from utils.html_features import extract_page_features
+
+PAGE = '''<html><head>
+<meta charset="utf-8">
+<title> Acme Assurance </title>
+<meta name="Description" content=" Courtier à Montréal ">
+<script>var question = "ignored?";</script>
+<script type="application/ld+json">{"@type": "Organization"}</script>
+<script type="application/ld+json">{invalid</script>
+</head><body>
+<!-- commentaire -->Intro
+<h1>Acme <b>Assurance</b></h1>
+<p>TL;DR : nous couvrons 80% des besoins pour 3 millions de clients.</p>
+<h2>FAQ</h2>
+<h3>Quel est le prix?</h3>
+<p>Le prix dépend du profil.</p>
+<p>Comment choisir? Comparez les garanties</p>
+<p>Regardez les franchises et les exclusions.</p>
+<ul><li>Auto</li></ul><ol><li>Habitation</li></ol>
+<table><tr><td>$</td></tr></table>
+<a href="/contact">Contact</a><a href="https://other.com">Autre</a><a>Sans lien</a>
+</body></html>'''.encode('utf-8')
+
+
+class TestHtmlFeatures:
+    """Tests pour extract_page_features"""
+
+    def test_structure_is_extracted(self):
+        """Titre, meta, titres, paragraphes, liens, listes et tableaux"""
+        features = extract_page_features(PAGE)
+
+        assert features.title == 'Acme Assurance'
+        assert features.meta_description == 'Courtier à Montréal'
+        assert features.h1 == ['Acme Assurance']
+        assert features.h2 == ['FAQ']
+        assert features.h3 == ['Quel est le prix?']
+        assert len(features.paragraphs) == 4
+        assert features.links == ['/contact', 'https://other.com']
+        assert features.lists_count == 2
+        assert features.tables_count == 1
+
+    def test_json_ld_and_scripts(self):
+        """Les JSON-LD valides sont parsés, toutes les balises comptées, le JS exclu du texte"""
+        features = extract_page_features(PAGE)
+
+        assert features.json_ld == [{'@type': 'Organization'}]
+        assert features.json_ld_count == 2
+        assert 'ignored' not in features.text
+        assert 'Intro' in features.text
+
+    def test_markers_and_stats(self):
+        """Marqueurs TL;DR/FAQ, questions et statistiques détectés pendant le parcours"""
+        features = extract_page_features(PAGE)
+
+        assert features.has_tldr is True
+        assert features.has_faq is True
+        assert features.question_count == 2
+        # '%', '$' et '3 millions'
+        assert features.stats_count == 3
+        assert features.word_count == len(features.text.split())
+
+    def test_faq_pairs(self):
+        """Une question (titre ou paragraphe-question) est associée au paragraphe suivant"""
+        features = extract_page_features(PAGE)
+
+        assert features.faq_pairs == [
+            {'question': 'Quel est le prix?', 'answer': 'Le prix dépend du profil.'},
+            {'question': 'Comment choisir?', 'answer': 'Regardez les franchises et les exclusions.'}
+        ]
+
+    def test_empty_or_invalid_content(self):
+        """Un contenu vide donne des caractéristiques vides sans erreur"""
+        features = extract_page_features(b'')
+
+        assert features.title == ''
+        assert features.word_count == 0
+        assert features.links == []
+
+    def test_utf8_without_meta_charset(self):
+        """Une page UTF-8 sans <meta charset> n'est pas lue en Latin-1"""
+        page = '<html><head><title>Assurance Montréal</title></head><body><p>Été à Québec</p></body></html>'
+
+        features = extract_page_features(page.encode('utf-8'))
+
+        assert features.title == 'Assurance Montréal'
+        assert features.paragraphs == ['Été à Québec']
+
+    def test_http_charset_and_xml_declaration(self):
+        """Le charset de l'en-tête HTTP prime ; une déclaration XML n'empêche pas le parsing"""
+        page = '<?xml version="1.0" encoding="utf-8"?><html><head><title>Assurance Montréal</title></head></html>'
+
+        assert extract_page_features(page.encode('cp1252'), encoding='windows-1252').title == 'Assurance Montréal'
+        assert extract_page_features(page).title == 'Assurance Montréal'
+
+    def test_declared_legacy_charset(self):
+        """Une page Windows-1252 déclarée par <meta charset> reste lisible sans en-tête HTTP"""
+        page = '<html><head><meta charset="windows-1252"><title>Assurance Montréal</title></head></html>'
+
+        assert extract_page_features(page.encode('cp1252')).title == 'Assurance Montréal'
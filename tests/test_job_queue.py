@@ -0,0 +1,195 @@
+"""
+Tests de la file durable des jobs d'analyse (réclamation atomique, bail, reprises)
+"""
+import asyncio
+import copy
+import sys
+from datetime import datetime, timedelta, timezone
+sys.path.append('/app/backend')
+
+from services.job_events import JobEventHub, JobProgressWriter, apply_job_update
+from services.job_queue import JobQueue
+from tests.fake_mongo import FakeCollection
+
+
+def make_job(job_id: str, created: int = 0):
+    return {'id': job_id, 'createdAt': f'2026-01-01T00:00:{created:02d}+00:00', 'progress': 0}
+
+
+class TestJobQueue:
+    """Tests pour JobQueue"""
+
+    def test_concurrent_claims_never_share_a_job(self):
+        """Deux workers qui réclament en même temps obtiennent des jobs différents"""
+        async def scenario():
+            jobs = FakeCollection()
+            producer = JobQueue(jobs)
+            for i in range(5):
+                await producer.enqueue(make_job(f'job-{i}', created=i))
+
+            workers = [JobQueue(jobs, worker_id=f'w{i}') for i in range(3)]
+            claimed = await asyncio.gather(*(w.claim() for w in workers for _ in range(2)))
+            return [job['id'] for job in claimed if job]
+
+        claimed = asyncio.run(scenario())
+        assert sorted(claimed) == [f'job-{i}' for i in range(5)]
+
+    def test_expired_lease_is_reclaimed(self):
+        """Un job dont le worker a disparu est repris après expiration du bail"""
+        async def scenario():
+            jobs = FakeCollection()
+            crashed = JobQueue(jobs, worker_id='crashed', lease_seconds=60)
+            await crashed.enqueue(make_job('job-1'))
+            await crashed.claim()
+
+            other = JobQueue(jobs, worker_id='other')
+            before_expiry = await other.claim()
+            jobs.docs[0]['leaseExpiresAt'] = datetime.now(timezone.utc) - timedelta(seconds=1)
+            after_expiry = await other.claim()
+
+            heartbeat_ok = await crashed.heartbeat('job-1')
+            completed_by_crashed = await crashed.complete('job-1')
+            return before_expiry, after_expiry, heartbeat_ok, completed_by_crashed
+
+        before_expiry, after_expiry, heartbeat_ok, completed_by_crashed = asyncio.run(scenario())
+        assert before_expiry is None
+        assert after_expiry['workerId'] == 'other'
+        assert after_expiry['attempts'] == 2
+        assert heartbeat_ok is False
+        assert completed_by_crashed is False
+
+    def test_failures_are_retried_with_backoff_then_failed(self):
+        """Une erreur remet le job en file avec backoff, jusqu'à max_attempts"""
+        async def scenario():
+            jobs = FakeCollection()
+            queue = JobQueue(jobs, max_attempts=2, retry_delay_base=30)
+            await queue.enqueue(make_job('job-1'))
+
+            async def broken(job):
+                raise RuntimeError('crawl failed')
+
+            await queue.process(await queue.claim(), broken)
+            after_first = copy.deepcopy(jobs.docs[0])
+            not_yet_available = await queue.claim()
+
+            jobs.docs[0]['availableAt'] = datetime.now(timezone.utc)
+            await queue.process(await queue.claim(), broken)
+            return after_first, not_yet_available, jobs.docs[0]
+
+        after_first, not_yet_available, final = asyncio.run(scenario())
+        assert after_first['status'] == 'pending'
+        assert after_first['availableAt'] > datetime.now(timezone.utc) + timedelta(seconds=20)
+        assert not_yet_available is None
+        assert final['status'] == 'failed'
+        assert final['error'] == 'crawl failed'
+        assert final['workerId'] is None
+
+    def test_worker_heartbeats_and_completes_jobs(self):
+        """Le worker prolonge le bail des jobs longs et enregistre le résultat"""
+        async def scenario():
+            jobs = FakeCollection()
+            queue = JobQueue(jobs, lease_seconds=0.2, heartbeat_seconds=0.05, poll_interval=0.01)
+            for i in range(3):
+                await queue.enqueue(make_job(f'job-{i}', created=i))
+
+            async def handler(job):
+                await asyncio.sleep(0.3)  # Plus long que le bail : seul le heartbeat le protège
+                return {'reportId': f"report-{job['id']}"}
+
+            async def stop_when_done():
+                while any(d['status'] != 'completed' for d in jobs.docs):
+                    await asyncio.sleep(0.02)
+                queue.stop()
+
+            await asyncio.wait_for(asyncio.gather(queue.run_worker(handler, concurrency=2), stop_when_done()), 5)
+            return jobs.docs
+
+        docs = asyncio.run(scenario())
+        assert [d['reportId'] for d in docs] == ['report-job-0', 'report-job-1', 'report-job-2']
+        assert all(d['attempts'] == 1 and d['progress'] == 100 for d in docs)
+
+    def test_requeue_only_finished_jobs(self):
+        """Un opérateur peut relancer un job terminé, pas un job en cours"""
+        async def scenario():
+            jobs = FakeCollection()
+            queue = JobQueue(jobs)
+            await queue.enqueue(make_job('job-1'))
+            job = await queue.claim()
+            while_running = await queue.requeue('job-1')
+
+            await queue.complete('job-1', {'reportId': 'r1'})
+            after_completion = await queue.requeue('job-1')
+            return job, while_running, after_completion, await queue.claim()
+
+        job, while_running, after_completion, reclaimed = asyncio.run(scenario())
+        assert while_running is False
+        assert after_completion is True
+        assert reclaimed['id'] == 'job-1'
+        assert reclaimed['attempts'] == 1
+
+
+class TestJobEvents:
+    """Tests pour le flux de progression (JobEventHub) et les écritures regroupées"""
+
+    def test_change_stream_fields_are_applied(self):
+        """Les updatedFields d'un change stream (tableaux indexés) mettent à jour l'état diffusé"""
+        state = {'id': 'job-1', 'progress': 10, 'completedStages': ['crawl']}
+
+        updated = apply_job_update(state, {'progress': 30, 'completedStages.1': 'queries', 'stage_timings': {}})
+
+        assert updated == {'id': 'job-1', 'progress': 30, 'completedStages': ['crawl', 'queries']}
+        assert state['progress'] == 10
+
+    def test_progress_writes_are_coalesced(self):
+        """Des ticks rapprochés coûtent une écriture ; les abonnés locaux les voient tous"""
+        async def scenario():
+            jobs = FakeCollection()
+            await jobs.insert_one({'id': 'job-1', 'progress': 0, 'completedStages': []})
+            hub = JobEventHub(jobs, source='poll')
+            published = []
+            hub.publish = lambda job_id, fields: published.append(fields['progress'])
+
+            writer = JobProgressWriter(jobs, 'job-1', hub=hub, interval=0.05)
+            for i, stage in enumerate(['crawl', 'queries', 'schemas', 'crawl']):
+                writer.update({'progress': 10 * (i + 1)}, completed_stage=stage)
+            await asyncio.sleep(0.1)
+            writer.update({'progress': 90}, completed_stage='report')
+            await writer.close()
+            return jobs.docs[0], writer.writes, published
+
+        doc, writes, published = asyncio.run(scenario())
+        assert writes == 2
+        assert published == [10, 20, 30, 40, 90]
+        assert doc['progress'] == 90
+        assert doc['completedStages'] == ['crawl', 'queries', 'schemas', 'report']
+
+    def test_stream_until_terminal_status_with_batched_polling(self):
+        """Sans change streams, une seule requête par intervalle alimente tous les abonnés"""
+        async def scenario():
+            jobs = FakeCollection()
+            for job_id in ('job-1', 'job-2'):
+                await jobs.insert_one({'id': job_id, 'status': 'processing', 'progress': 10, 'stage_timings': {}})
+            hub = JobEventHub(jobs, poll_interval=0.02, keepalive=1)
+
+            async def watch(job_id):
+                return [state async for state in hub.stream(job_id)]
+
+            async def progress():
+                await asyncio.sleep(0.05)
+                hub.publish('job-1', {'progress': 50})  # Worker local, puis le même changement via Mongo
+                jobs.docs[0]['progress'] = 50
+                await asyncio.sleep(0.05)
+                for doc in jobs.docs:
+                    doc.update(status='completed', progress=100, reportId=f"report-{doc['id']}")
+
+            reads_before = jobs.reads
+            first, second, _ = await asyncio.wait_for(asyncio.gather(watch('job-1'), watch('job-2'), progress()), 5)
+            return first, second, jobs.reads - reads_before, hub
+
+        first, second, reads, hub = asyncio.run(scenario())
+        assert [s['progress'] for s in first] == [10, 50, 100]
+        assert first[-1] == {'id': 'job-1', 'status': 'completed', 'progress': 100, 'reportId': 'report-job-1'}
+        assert [s['status'] for s in second] == ['processing', 'completed']
+        assert hub.source == 'poll'
+        assert hub.subscriber_count() == 0
+        assert reads < 2 + 0.15 / 0.02 + 2  # 2 états initiaux + 1 requête groupée par intervalle
@@ -0,0 +1,83 @@
+"""
+Tests du listing des leads (agrégation $lookup, pagination par curseur) et des index MongoDB
+"""
+import sys
+sys.path.append('/app/backend')
+
+import pytest
+
+from services.db_indexes import INDEXES
+from services.leads_query import build_leads_pipeline, decode_cursor, encode_cursor, paginate
+
+
+def stage_names(pipeline):
+    return [next(iter(stage)) for stage in pipeline]
+
+
+class TestLeadsQuery:
+    """Tests pour build_leads_pipeline et paginate"""
+
+    def test_page_is_cut_before_lookups(self):
+        """Sans filtre de statut, seuls limit + 1 leads passent par les $lookup"""
+        pipeline = build_leads_pipeline(limit=20)
+
+        assert stage_names(pipeline) == ['$match', '$sort', '$limit', '$project', '$lookup', '$set', '$lookup']
+        assert pipeline[1]['$sort'] == {'createdAt': -1, 'id': -1}
+        assert pipeline[2]['$limit'] == 21
+        assert [stage['$lookup']['from'] for stage in pipeline if '$lookup' in stage] == ['analysis_jobs', 'reports']
+
+    def test_status_filter_applies_to_latest_job(self):
+        """Le filtre de statut porte sur le dernier job, avant la coupe de la page"""
+        pipeline = build_leads_pipeline(limit=10, status='failed')
+
+        assert stage_names(pipeline) == ['$match', '$sort', '$project', '$lookup', '$set', '$match', '$limit', '$lookup']
+        assert pipeline[5]['$match'] == {'latestJob.status': 'failed'}
+
+    def test_filters_and_cursor(self):
+        """Filtres serveur (URL échappée) et reprise strictement après le dernier lead"""
+        cursor = encode_cursor({'createdAt': '2026-03-01T10:00:00+00:00', 'id': 'lead-9'})
+
+        match = build_leads_pipeline(url='a.b?c', email='jo@acme.com', created_from='2026-01-01', cursor=cursor)[0]['$match']
+
+        assert match['email'] == 'jo@acme.com'
+        assert match['url'] == {'$regex': r'a\.b\?c', '$options': 'i'}
+        assert match['createdAt'] == {'$gte': '2026-01-01'}
+        assert match['$or'] == [
+            {'createdAt': {'$lt': '2026-03-01T10:00:00+00:00'}},
+            {'createdAt': '2026-03-01T10:00:00+00:00', 'id': {'$lt': 'lead-9'}},
+        ]
+
+    def test_created_to_date_includes_the_whole_day(self):
+        """created_to=YYYY-MM-DD garde les leads créés ce jour-là ; une date complète reste incluse telle quelle"""
+        day = build_leads_pipeline(created_from='2026-09-01', created_to='2026-09-30')[0]['$match']
+        instant = build_leads_pipeline(created_to='2026-10-01T09:00:00+00:00')[0]['$match']
+
+        assert day['createdAt'] == {'$gte': '2026-09-01', '$lt': '2026-10-01'}
+        assert '2026-09-30T23:59:59+00:00' < day['createdAt']['$lt']
+        assert instant['createdAt'] == {'$lte': '2026-10-01T09:00:00+00:00'}
+        for invalid in ('2026-13-01', 'hier', '01/10/2026'):
+            with pytest.raises(ValueError):
+                build_leads_pipeline(created_to=invalid)
+
+    def test_invalid_cursor_is_rejected(self):
+        with pytest.raises(ValueError):
+            decode_cursor('not-a-cursor')
+
+    def test_paginate_returns_next_cursor_only_when_more(self):
+        """Le lead supplémentaire indique une page suivante, il n'est pas renvoyé"""
+        leads = [{'createdAt': f'2026-01-0{i}', 'id': f'lead-{i}'} for i in (3, 2, 1)]
+
+        page = paginate(leads, limit=2)
+        last_page = paginate(leads[2:], limit=2)
+
+        assert [lead['id'] for lead in page['items']] == ['lead-3', 'lead-2']
+        assert decode_cursor(page['nextCursor']) == ('2026-01-02', 'lead-2')
+        assert last_page['nextCursor'] is None
+
+    def test_listing_and_lookups_are_indexed(self):
+        """Les champs du listing et des $lookup sont indexés"""
+        prefixes = {(collection, keys[0][0]) for collection, indexes in INDEXES.items() for keys, _ in indexes}
+
+        for required in [('leads', 'createdAt'), ('reports', 'id'), ('reports', 'leadId'),
+                         ('analysis_jobs', 'id'), ('analysis_jobs', 'leadId')]:
+            assert required in prefixes
@@ -0,0 +1,69 @@
+"""
+Tests de l'index inversé des mentions (automate multi-motifs)
+"""
+import random
+import re
+import sys
+sys.path.append('/app/backend')
+
+from utils.mention_index import MentionIndex, PatternAutomaton
+
+ANSWER = ("Pour l'assurance auto au Québec, Desjardins est souvent cité. "
+          "Intact Assurance et Desjardins offrent des rabais! Acme.com reste une option. "
+          "Consultez acme.com ou desjardins.com pour comparer.")
+
+
+def old_position(response: str, name: str) -> int:
+    """Implémentation précédente de la position (découpage en phrases)"""
+    for i, sentence in enumerate(re.split(r'[.!?]\s+', response), 1):
+        if name.lower() in sentence.lower():
+            return i
+    return -1
+
+
+class TestMentionIndex:
+    """Tests pour PatternAutomaton et MentionIndex"""
+
+    def test_automaton_reports_overlapping_patterns(self):
+        """Tous les motifs, y compris imbriqués, sont trouvés en une passe"""
+        automaton = PatternAutomaton(['he', 'she', 'his', 'hers'])
+        assert sorted(automaton.iter_matches('ushers')) == [(1, 'she'), (2, 'he'), (2, 'hers')]
+
+    def test_metrics_match_substring_scans(self):
+        """Mention, comptes, position et contexte identiques aux scans par sous-chaîne"""
+        names = ['Desjardins', 'Intact', 'acme.com', 'Absent']
+        index = MentionIndex({name.lower(): [name] for name in names})
+        index.add('doc', ANSWER)
+
+        for name in names:
+            assert index.mentioned('doc', name.lower()) == (name.lower() in ANSWER.lower())
+            assert index.count('doc', name.lower()) == ANSWER.lower().count(name.lower())
+            assert index.sentence_position('doc', name.lower()) == old_position(ANSWER, name)
+
+        assert index.count('doc', 'desjardins') == 3
+        assert index.context('doc', 'intact', chars=20).startswith('...ent cité. Intact Assurance')
+        assert index.context('doc', 'absent') == ''
+
+    def test_random_texts_match_str_semantics(self):
+        """Équivalence avec `in`, str.count et le découpage en phrases sur des textes aléatoires"""
+        rng = random.Random(7)
+        for _ in range(500):
+            text = ''.join(rng.choice('abAB. !?') for _ in range(rng.randint(0, 40)))
+            names = [''.join(rng.choice('ab. ') for _ in range(rng.randint(1, 3))) for _ in range(3)]
+            index = MentionIndex({name.lower(): [name] for name in names})
+            index.add(0, text)
+
+            for name in names:
+                assert index.count(0, name.lower()) == text.lower().count(name.lower())
+                assert index.sentence_position(0, name.lower()) == old_position(text, name)
+
+    def test_inverted_postings_and_aliases(self):
+        """Une entité peut avoir plusieurs alias ; les documents qui la mentionnent sont listés"""
+        index = MentionIndex({'desjardins': ['Desjardins', 'desjardins.com'], 'vide': ['']})
+        index.add(0, 'Rien à signaler')
+        index.add(1, ANSWER)
+        index.add(2, 'Voir DESJARDINS')
+
+        assert index.documents('desjardins') == [1, 2]
+        assert index.count(1, 'desjardins') == 4  # 3 × nom + 1 × domaine (chevauchant)
+        assert index.documents('vide') == []
@@ -0,0 +1,205 @@
+"""
+Tests de l'exécuteur de pipeline par graphe d'étapes
+"""
+import asyncio
+import threading
+import time
+import pytest
+import sys
+sys.path.append('/app/backend')
+
+from services.pipeline import ArtifactStore, Stage, StagePipeline
+
+
+class TestStagePipeline:
+    """Tests pour StagePipeline"""
+
+    def test_rejects_unknown_dependency(self):
+        """Une dépendance inconnue est refusée à la construction"""
+        with pytest.raises(ValueError):
+            StagePipeline([Stage('a', lambda ctx: 1, depends_on=['missing'])])
+
+    def test_rejects_cycle(self):
+        """Un cycle dans le graphe est refusé"""
+        with pytest.raises(ValueError):
+            StagePipeline([
+                Stage('a', lambda ctx: 1, depends_on=['b']),
+                Stage('b', lambda ctx: 2, depends_on=['a'])
+            ])
+
+    def test_results_flow_through_context(self):
+        """Chaque étape reçoit les résultats de ses dépendances"""
+        async def double(ctx):
+            return ctx['base'] * 2
+
+        pipeline = StagePipeline([
+            Stage('base', lambda ctx: ctx['seed'] + 1),
+            Stage('double', double, depends_on=['base']),
+            Stage('total', lambda ctx: ctx['base'] + ctx['double'], depends_on=['base', 'double'])
+        ])
+
+        results = asyncio.run(pipeline.run({'seed': 1}))
+
+        assert results['base'] == 2
+        assert results['double'] == 4
+        assert results['total'] == 6
+        assert set(pipeline.timings) == {'base', 'double', 'total'}
+
+    def test_independent_stages_run_concurrently(self):
+        """Les étapes sans dépendance mutuelle tournent en parallèle"""
+        def slow(ctx):
+            time.sleep(0.2)
+            return True
+
+        pipeline = StagePipeline([
+            Stage('root', lambda ctx: True),
+            Stage('a', slow, depends_on=['root']),
+            Stage('b', slow, depends_on=['root']),
+            Stage('c', slow, depends_on=['root'])
+        ])
+
+        start = time.perf_counter()
+        asyncio.run(pipeline.run())
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.5
+
+    def test_progress_follows_stage_weights(self):
+        """La progression est calculée à partir du poids des étapes terminées"""
+        updates = []
+
+        async def on_progress(name, progress, timings):
+            updates.append((name, progress))
+
+        pipeline = StagePipeline([
+            Stage('crawl', lambda ctx: None, weight=3),
+            Stage('report', lambda ctx: None, depends_on=['crawl'], weight=1)
+        ], progress_start=10, progress_end=90)
+
+        asyncio.run(pipeline.run(on_progress=on_progress))
+
+        assert updates == [('crawl', 70), ('report', 90)]
+
+    def test_failure_cancels_pipeline(self):
+        """L'échec d'une étape interrompt le pipeline et remonte l'erreur"""
+        executed = []
+
+        def failing(ctx):
+            raise RuntimeError("boom")
+
+        pipeline = StagePipeline([
+            Stage('a', failing),
+            Stage('b', lambda ctx: executed.append('b'), depends_on=['a'])
+        ])
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(pipeline.run())
+
+        assert executed == []
+        assert 'a' in pipeline.timings
+
+    def test_resume_from_checkpoints(self):
+        """Les étapes checkpointées sont restaurées, seules les étapes incomplètes tournent"""
+        executed = []
+        saved = {}
+
+        def stage(name, value):
+            def func(ctx):
+                executed.append(name)
+                return value
+            return func
+
+        async def on_result(name, result):
+            saved[name] = result
+
+        def restore_b(ctx, result):
+            ctx['side_effect'] = result
+
+        pipeline = StagePipeline([
+            Stage('a', stage('a', 1)),
+            Stage('b', stage('b', 2), depends_on=['a'], on_restore=restore_b),
+            Stage('c', lambda ctx: executed.append('c') or ctx['a'] + ctx['b'], depends_on=['b']),
+        ])
+        results = asyncio.run(pipeline.run(checkpoints={'a': 10, 'b': 20}, on_result=on_result))
+
+        assert executed == ['c']
+        assert pipeline.restored == ['a', 'b']
+        assert results['c'] == 30
+        assert results['side_effect'] == 20
+        assert saved == {'c': 30}
+
+    def test_rerun_stage_invalidates_dependents(self):
+        """Sans checkpoint pour une étape, elle et ses dépendantes sont ré-exécutées"""
+        pipeline = StagePipeline([
+            Stage('crawl', lambda ctx: None),
+            Stage('report', lambda ctx: None, depends_on=['crawl']),
+            Stage('word_report', lambda ctx: None, depends_on=['report']),
+            Stage('dashboard', lambda ctx: None, depends_on=['report']),
+        ])
+
+        checkpoints = {'crawl': 1, 'word_report': 3, 'dashboard': 4}
+        assert pipeline.restorable(checkpoints) == ['crawl']
+        assert pipeline.restorable(dict(checkpoints, report=2)) == ['crawl', 'report', 'dashboard', 'word_report']
+
+
+class TestArtifactStore:
+    """Tests pour ArtifactStore (mémoïsation par job)"""
+
+    def test_same_inputs_computed_once(self):
+        """Des entrées identiques (ordre des clés indifférent) réutilisent le résultat"""
+        store = ArtifactStore()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return ['https://competitor.com']
+
+        first = store.get_or_compute('competitor_discovery', {'url': 'a.com', 'urls': ['x']}, compute)
+        second = store.get_or_compute('competitor_discovery', {'urls': ['x'], 'url': 'a.com'}, compute)
+
+        assert first == second
+        assert len(calls) == 1
+        assert store.stats()['hits'] == 1
+
+    def test_different_inputs_or_names_recompute(self):
+        """Un nom ou des entrées différents produisent un nouvel artefact"""
+        store = ArtifactStore()
+
+        assert store.get_or_compute('a', {'x': 1}, lambda: 1) == 1
+        assert store.get_or_compute('a', {'x': 2}, lambda: 2) == 2
+        assert store.get_or_compute('b', {'x': 1}, lambda: 3) == 3
+
+    def test_concurrent_callers_share_in_flight_computation(self):
+        """Un calcul en cours dans un autre thread est attendu, pas relancé"""
+        store = ArtifactStore()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 42
+
+        threads = [
+            threading.Thread(target=lambda: results.append(store.get_or_compute('ci', ['x'], compute)))
+            for _ in range(3)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == [42, 42, 42]
+        assert len(calls) == 1
+
+    def test_failures_are_not_memoized(self):
+        """Un échec n'est pas conservé : l'appel suivant recalcule"""
+        store = ArtifactStore()
+
+        def failing():
+            raise RuntimeError("network")
+
+        with pytest.raises(RuntimeError):
+            store.get_or_compute('ci', ['x'], failing)
+
+        assert store.get_or_compute('ci', ['x'], lambda: 'ok') == 'ok'
@@ -0,0 +1,116 @@
+"""
+Tests du stockage des rapports : résumé léger + sections compressées jointes à la demande
+"""
+import asyncio
+import sys
+from datetime import datetime, timezone
+sys.path.append('/app/backend')
+
+from services.report_store import DETACHED_SECTIONS, ReportStore, parse_field_list
+from tests.fake_mongo import FakeCollection
+from utils.compression import pack_json, unpack_json
+
+REPORT = {
+    'id': 'report-1',
+    'leadId': 'lead-1',
+    'url': 'https://acme.com',
+    'scores': {'global_score': 6.5},
+    'recommendations': [{'title': 'Ajouter une FAQ'}],
+    'test_queries': ['assurance auto québec'] * 100,
+    'visibility_results': {
+        'overall_visibility': 0.2,
+        'details': [{'query': 'assurance auto québec', 'platform': 'CHATGPT', 'answer': 'Desjardins, Intact... ' * 25}] * 500
+    },
+    'competitive_intelligence': {'competitors_analyzed': 3},
+    'schemas': {'Organization': {'@type': 'Organization'}},
+    'generated_articles': None,
+}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestReportStore:
+    """Tests pour ReportStore"""
+
+    def test_bulky_sections_are_stored_apart(self):
+        """Le document principal ne contient que le résumé et la liste des sections"""
+        reports, sections = FakeCollection(), FakeCollection()
+        store = ReportStore(reports, sections)
+
+        summary = run(store.insert(REPORT))
+
+        assert set(summary) == {'id', 'leadId', 'url', 'scores', 'recommendations', 'sections'}
+        assert summary['sections'] == ['visibility_results', 'test_queries', 'competitive_intelligence', 'schemas']
+        assert not set(DETACHED_SECTIONS) & set(reports.docs[0])
+        assert {doc['section'] for doc in sections.docs} == set(summary['sections'])
+        visibility = next(doc for doc in sections.docs if doc['section'] == 'visibility_results')
+        assert visibility['size'] < len(str(REPORT['visibility_results'])) // 20
+        assert 'visibility_results' in REPORT  # Le rapport fourni n'est pas modifié
+
+    def test_reinsert_replaces_report_and_sections(self):
+        """Un rapport ré-enregistré sous le même id (relance) remplace l'ancien sans laisser de sections orphelines"""
+        reports, sections = FakeCollection(), FakeCollection()
+        store = ReportStore(reports, sections)
+        run(store.insert(REPORT))
+
+        rerun = dict(REPORT, scores={'global_score': 7.0}, schemas=None)
+        run(store.insert(rerun))
+
+        assert len(reports.docs) == 1
+        assert reports.docs[0]['scores'] == {'global_score': 7.0}
+        assert 'schemas' not in {doc['section'] for doc in sections.docs}
+        assert len(sections.docs) == len(reports.docs[0]['sections']) == 3
+
+    def test_get_summary_fields_and_includes(self):
+        """Résumé par défaut, sections jointes via include, projection via fields"""
+        store = ReportStore(FakeCollection(), FakeCollection())
+        run(store.insert(REPORT))
+
+        summary = run(store.get('report-1'))
+        with_sections = run(store.get('report-1', include=['visibility_results', 'schemas']))
+        only_scores = run(store.get('report-1', fields=['scores', 'competitive_intelligence']))
+        everything = run(store.get('report-1', include=['all']))
+
+        assert 'visibility_results' not in summary and summary['scores'] == REPORT['scores']
+        assert with_sections['visibility_results'] == REPORT['visibility_results']
+        assert with_sections['schemas'] == REPORT['schemas']
+        assert 'competitive_intelligence' not in with_sections
+        assert set(only_scores) == {'id', 'sections', 'scores', 'competitive_intelligence'}
+        assert everything['test_queries'] == REPORT['test_queries']
+        assert run(store.get('missing')) is None
+
+    def test_reports_stored_inline_before_the_split(self):
+        """Un rapport existant (sections dans le document) se lit de la même façon"""
+        reports = FakeCollection()
+        run(reports.insert_one(dict(REPORT)))
+        store = ReportStore(reports, FakeCollection())
+
+        summary = run(store.get('report-1'))
+        with_sections = run(store.get('report-1', include=parse_field_list('visibility_results, schemas')))
+
+        assert 'visibility_results' not in summary and '_id' not in summary
+        assert with_sections['visibility_results'] == REPORT['visibility_results']
+        assert with_sections['schemas'] == REPORT['schemas']
+
+
+class TestCompression:
+    """Tests pour l'encodage des checkpoints d'étapes et sections de rapports"""
+
+    def test_encoding_roundtrip_is_compressed(self):
+        """Résultat d'étape restauré à l'identique (hors _id Mongo), compressé"""
+        report = {
+            '_id': object(),
+            'id': 'report-1',
+            'createdAt': datetime(2026, 1, 1, tzinfo=timezone.utc),
+            'pages': [{'content': 'Assurance auto au Québec. ' * 200}]
+        }
+
+        blob = pack_json(report)
+        restored = unpack_json(blob)
+
+        assert '_id' not in restored
+        assert restored['createdAt'] == '2026-01-01 00:00:00+00:00'
+        assert restored['pages'] == report['pages']
+        assert len(blob) < len(report['pages'][0]['content']) // 10
@@ -0,0 +1,110 @@
+"""
+Tests des séries de scores (MongoDB) et agrégats jour / semaine / mois
+"""
+import asyncio
+import sys
+sys.path.append('/app/backend')
+
+import pytest
+
+from database_manager import DatabaseManager
+from services.score_history_store import ScoreHistoryStore
+from services.score_trends import extract_metrics, period_bounds
+from tests.fake_mongo import FakeCollection
+from tests.test_database_manager import make_report
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_store():
+    return ScoreHistoryStore(FakeCollection(unique='analysisId'), FakeCollection())
+
+
+class TestScoreTrends:
+    """Tests des séries de scores et agrégats jour / semaine / mois"""
+
+    def test_period_bounds_and_metrics(self):
+        """Semaines ISO (lundi), mois calendaires ; métriques par critère et par plateforme"""
+        assert period_bounds('2026-01-01T10:00:00+00:00', 'week') == ('2025-12-29', '2026-01-05')
+        assert period_bounds('2026-12-15', 'month') == ('2026-12-01', '2027-01-01')
+        with pytest.raises(ValueError):
+            period_bounds('2026-01-01', 'year')
+
+        metrics = extract_metrics(make_report('r1', 7.0, '2026-01-01'))
+        assert metrics == {'global_score': 7.0, 'structure': 6.0, 'eeat': 8.0, 'overall_visibility': 0.4,
+                           'platform:chatgpt': 0.5, 'platform:claude': 0.3}
+
+    def test_rollups_are_maintained_on_insert(self):
+        """Agrégats incrémentaux ; une analyse ré-enregistrée (autre date) n'est pas comptée deux fois"""
+        store = make_store()
+
+        async def scenario():
+            for report in [
+                make_report('r1', 6.0, '2026-03-02T09:00:00'),
+                make_report('r2', 8.0, '2026-03-04T09:00:00'),
+                make_report('r3', 7.0, '2026-03-03T09:00:00'),
+                make_report('r4', 5.0, '2026-04-01T09:00:00'),
+            ]:
+                assert await store.record_report(report)
+            weekly = await store.get_trends(['https://acme.com'], 'week', metrics=['global_score'])
+
+            assert not await store.record_report(make_report('r2', 9.0, '2026-04-02T09:00:00'))
+            monthly = await store.get_trends(['https://acme.com'], 'month', metrics=['global_score', 'platform:chatgpt'])
+            return weekly, monthly
+
+        weekly, monthly = run(scenario())
+
+        points = weekly['sites']['https://acme.com']['global_score']
+        assert [p['period'] for p in points] == ['2026-03-02', '2026-03-30']
+        assert points[0] == {'period': '2026-03-02', 'avg': 7.0, 'min': 6.0, 'max': 8.0, 'last': 8.0, 'count': 3}
+        series = monthly['sites']['https://acme.com']
+        assert [(p['period'], p['count'], p['max'], p['last']) for p in series['global_score']] == [
+            ('2026-03-01', 2, 7.0, 7.0), ('2026-04-01', 2, 9.0, 9.0)
+        ]
+        assert series['platform:chatgpt'][0]['avg'] == 0.5
+
+    def test_portfolio_trends_in_one_read(self):
+        """Portefeuille : séries par site et agrégat pondéré par nombre d'analyses"""
+        store = make_store()
+
+        async def scenario():
+            await store.record_report(make_report('a1', 6.0, '2026-05-04T09:00:00', url='https://a.com'))
+            await store.record_report(make_report('a2', 8.0, '2026-05-05T09:00:00', url='https://a.com'))
+            await store.record_report(make_report('b1', 3.0, '2026-05-06T09:00:00', url='https://b.com'))
+            await store.record_report(make_report('c1', 9.0, '2026-05-06T09:00:00', url='https://c.com'))
+            return await store.get_trends(
+                ['https://a.com', 'https://b.com'], granularity='week', metrics=['global_score'],
+                start='2026-05-06', end='2026-05-31'
+            )
+
+        trends = run(scenario())
+
+        assert set(trends['sites']) == {'https://a.com', 'https://b.com'}
+        assert trends['portfolio']['global_score'] == [
+            {'period': '2026-05-04', 'avg': 17.0 / 3, 'min': 3.0, 'max': 8.0, 'count': 3, 'sites': 2}
+        ]
+        with pytest.raises(ValueError):
+            run(store.get_trends(granularity='quarter'))
+
+    def test_workers_import_local_history_once(self, tmp_path):
+        """Analyses d'un historique local importées une seule fois, même par deux workers démarrés ensemble"""
+        history = DatabaseManager(tmp_path / 'history.db', batch_size=2)
+        history.save_many([make_report(f'r{i}', 5.0 + i, f'2026-06-0{i + 1}T09:00:00') for i in range(5)])
+        store = make_store()
+
+        async def scenario():
+            await store.record_report(make_report('r1', 6.0, '2026-06-02T09:00:00'))
+            imported = await asyncio.gather(store.import_history(history), store.import_history(history))
+            return imported, await store.import_history(history)
+
+        imported, again = run(scenario())
+
+        assert sum(imported) == 4 and again == 0
+        monthly = run(store.get_trends(granularity='month', metrics=['platform:claude', 'global_score']))
+        series = monthly['sites']['https://acme.com']
+        assert series['global_score'][0]['count'] == 5
+        assert series['global_score'][0]['last'] == 9.0
+        assert series['platform:claude'][0]['avg'] == 0.3
+        history.close()
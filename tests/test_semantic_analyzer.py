@@ -0,0 +1,137 @@
+"""
+Tests de SemanticAnalyzer : mémoïsation et concurrence des sous-analyses
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import sys
+sys.path.append('/app/backend')
+
+import pytest
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'test')
+
+import semantic_analyzer
+from semantic_analyzer import SemanticAnalyzer
+from services import cache_service as cache_module
+from services.cache_service import CacheService
+
+PARAGRAPHS = [
+    "Nous offrons de l'assurance auto et habitation aux familles de Montréal depuis 1990.",
+    "Notre équipe de courtiers compare les assureurs pour trouver la meilleure assurance auto.",
+    "L'assurance habitation protège votre maison contre le feu, le vol et les dégâts d'eau.",
+    "Les familles de Montréal nous confient leur assurance vie et leur assurance habitation.",
+    "Nos courtiers en assurance auto vous accompagnent lors de chaque réclamation.",
+    "Comparez les assureurs et économisez sur votre assurance habitation dès aujourd'hui.",
+]
+CRAWL = {
+    'base_url': 'https://acme.com',
+    'pages': [{'url': 'https://acme.com', 'title': 'Acme | Courtier', 'meta_description': '', 'paragraphs': PARAGRAPHS}]
+}
+
+
+class FakeMessages:
+    """Client Anthropic simulé : répond selon le type de prompt"""
+
+    def __init__(self, latency: float = 0.0):
+        self.calls = []
+        self.latency = latency
+
+    async def create(self, model, max_tokens, temperature, messages):
+        prompt = messages[0]['content']
+        self.calls.append(prompt)
+        await asyncio.sleep(self.latency)
+
+        if 'Industrie principale' in prompt:
+            text = json.dumps({'primary_industry': 'financial_services', 'company_type': 'courtier', 'business_model': 'B2C', 'confidence': 0.9})
+        elif 'offres commerciales' in prompt:
+            text = json.dumps({'offerings': [{'name': 'Assurance auto'}]})
+        elif 'pain points' in prompt:
+            text = json.dumps({'problems_solved': [{'problem': 'Primes trop élevées'}]})
+        else:
+            count = len(re.findall(r'^\d+\. ', prompt, re.MULTILINE))
+            text = json.dumps({'labels': [f"Thème {i}" for i in range(count)]})
+
+        content = type('Content', (), {'text': text})()
+        return type('Message', (), {'content': [content]})()
+
+
+@pytest.fixture
+def fake_claude(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_module, 'analysis_cache_service', CacheService(tmp_path, enabled_check=lambda: True))
+    messages = FakeMessages()
+    monkeypatch.setattr(semantic_analyzer, 'AsyncAnthropic', lambda **kwargs: type('Client', (), {'messages': messages})())
+    return messages
+
+
+class TestSemanticAnalyzerMemoization:
+    """Tests pour la mémoïsation par hash du texte consommé"""
+
+    def test_unchanged_site_makes_no_claude_call(self, fake_claude):
+        """Une ré-analyse du même contenu ne refait aucun appel Claude"""
+        first = SemanticAnalyzer().analyze_site(CRAWL)
+        calls_first_run = len(fake_claude.calls)
+
+        second = SemanticAnalyzer().analyze_site(CRAWL)
+
+        assert calls_first_run >= 3
+        assert len(fake_claude.calls) == calls_first_run
+        assert second == first
+        assert second['industry_classification']['primary_industry'] == 'financial_services'
+        assert len(second['entities']['problems_solved']) == 15
+
+    def test_changed_text_only_reruns_affected_steps(self, fake_claude):
+        """Seules les sous-analyses dont la tranche de texte a changé sont relancées"""
+        SemanticAnalyzer().analyze_site(CRAWL)
+        fake_claude.calls.clear()
+
+        # Le meta description n'entre que dans l'échantillon de détection d'industrie
+        changed = {'base_url': CRAWL['base_url'], 'pages': [dict(CRAWL['pages'][0], meta_description='Nouveau')]}
+        SemanticAnalyzer().analyze_site(changed)
+
+        assert len(fake_claude.calls) == 1
+        assert 'Industrie principale' in fake_claude.calls[0]
+
+    def test_unparsable_response_is_not_cached(self, fake_claude, monkeypatch):
+        """Une réponse invalide passe par le fallback et n'est pas mise en cache"""
+        original_create = fake_claude.create
+
+        async def invalid_create(**kwargs):
+            return type('Message', (), {'content': [type('Content', (), {'text': 'pas du JSON'})()]})()
+
+        monkeypatch.setattr(fake_claude, 'create', invalid_create)
+        result = asyncio.run(SemanticAnalyzer()._detect_industry(CRAWL))
+        assert 'confidence' in result
+
+        monkeypatch.setattr(fake_claude, 'create', original_create)
+        result = asyncio.run(SemanticAnalyzer()._detect_industry(CRAWL))
+        assert result['primary_industry'] == 'financial_services'
+
+
+class TestSemanticAnalyzerConcurrency:
+    """Tests pour l'exécution concurrente des sous-analyses"""
+
+    def test_independent_calls_overlap(self, fake_claude):
+        """Seule la chaîne industrie → offerings est séquentielle"""
+        fake_claude.latency = 0.2
+
+        start = time.perf_counter()
+        result = SemanticAnalyzer().analyze_site(CRAWL)
+        elapsed = time.perf_counter() - start
+
+        # Séquentiel : 4 appels × 0.2s ; concurrent : industrie puis offerings
+        assert len(fake_claude.calls) == 4
+        assert elapsed < 0.7
+        assert result['entities']['offerings'] == [{'name': 'Assurance auto'}]
+
+    def test_topics_are_labeled_in_one_call(self, fake_claude):
+        """Tous les topics LDA sont labélisés en un seul appel"""
+        result = SemanticAnalyzer().analyze_site(CRAWL)
+
+        label_calls = [prompt for prompt in fake_claude.calls if 'Pour CHAQUE thème' in prompt]
+        assert len(label_calls) == 1
+        assert len(result['topics']) >= 1
+        assert all(topic['label'].startswith('Thème') for topic in result['topics'])
+        assert all('top_words' not in topic for topic in result['topics'])
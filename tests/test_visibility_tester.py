@@ -0,0 +1,317 @@
+"""
+Tests du moteur async de tests de visibilité (V2)
+Sans appel réseau : les appels aux plateformes sont simulés
+"""
+import asyncio
+import json
+import re
+import time
+from types import SimpleNamespace
+import pytest
+import sys
+sys.path.append('/app/backend')
+
+import config
+from visibility_tester_v2 import VisibilityTesterV2
+from services import llm_response_cache as llm_cache_module
+from services.cache_service import CacheService
+from services.llm_response_cache import LLMResponseCache, normalize_query
+from services.visibility_scheduler import (
+    AsyncRateLimiter,
+    VisibilityBudget,
+    categorize_queries,
+    interleave_by_category
+)
+
+BREAKDOWN = {'non_branded': 80, 'semi_branded': 15, 'branded': 5}
+GENERATED_QUERIES = (
+    [f"nb {i}" for i in range(80)] + [f"sb {i}" for i in range(15)] + [f"b {i}" for i in range(5)]
+)
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    return LLMResponseCache(CacheService(tmp_path, max_entries=100), enabled=True)
+
+
+@pytest.fixture
+def tester(monkeypatch, response_cache):
+    monkeypatch.setenv('ANTHROPIC_API_KEY', 'test')
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    return VisibilityTesterV2(
+        concurrency={'openai': 2, 'anthropic': 2, 'google': 2, 'perplexity': 2},
+        rate_limits={'openai': 60000, 'anthropic': 60000, 'google': 60000, 'perplexity': 60000},
+        response_cache=response_cache
+    )
+
+
+class TestVisibilityTesterV2:
+    """Tests pour VisibilityTesterV2"""
+
+    def test_runs_queries_and_platforms_concurrently(self, tester):
+        """Les tests requête×plateforme tournent en parallèle dans la limite par fournisseur"""
+        active = {}
+        peak = {}
+
+        async def fake_call(platform, query):
+            provider = tester.PLATFORM_PROVIDERS[platform]
+            active[provider] = active.get(provider, 0) + 1
+            peak[provider] = max(peak.get(provider, 0), active[provider])
+            await asyncio.sleep(0.05)
+            active[provider] -= 1
+            return f"Acme est recommandé pour {query}"
+
+        tester._call_platform = fake_call
+
+        start = time.perf_counter()
+        tester.test_all_queries_detailed(['q1', 'q2', 'q3', 'q4'], 'https://acme.com', 'Acme')
+        elapsed = time.perf_counter() - start
+
+        # 4 requêtes × 5 plateformes = 20 appels de 50ms ; google (8 appels, limite 2) borne la durée
+        assert elapsed < 0.5
+        assert all(count <= 2 for count in peak.values())
+        assert max(peak.values()) == 2
+
+    def test_output_shape_preserved(self, tester):
+        """Les résultats sont regroupés par requête dans l'ordre, avec le résumé habituel"""
+        async def fake_call(platform, query):
+            return "Acme est excellent" if platform == 'claude' else "Aucune mention"
+
+        tester._call_platform = fake_call
+
+        results = tester.test_all_queries_detailed(['q1', 'q2'], 'https://acme.com', 'Acme')
+
+        assert [q['query'] for q in results['queries']] == ['q1', 'q2']
+        assert set(results['queries'][0]['platforms']) == {'chatgpt', 'claude', 'perplexity', 'gemini', 'google_ai'}
+        assert results['summary']['by_platform']['claude'] == 1.0
+        assert results['summary']['by_platform']['chatgpt'] == 0.0
+        assert results['summary']['global_visibility'] == pytest.approx(0.2)
+        assert 'query_type_analysis' in results
+        assert 'competitive_analysis' in results
+
+    def test_platform_failure_is_isolated(self, tester):
+        """L'échec d'une plateforme n'empêche pas les autres tests"""
+        async def fake_call(platform, query):
+            if platform == 'perplexity':
+                raise RuntimeError("API down")
+            return "Acme"
+
+        tester._call_platform = fake_call
+
+        results = tester.test_all_queries_detailed(['q1'], 'https://acme.com', 'Acme')
+        platforms = results['queries'][0]['platforms']
+
+        assert platforms['perplexity']['mentioned'] is False
+        assert platforms['chatgpt']['mentioned'] is True
+
+    def test_full_mode_tests_all_generated_queries(self, tester):
+        """Le mode 'full' teste les 100 requêtes générées, pas seulement 10"""
+        async def fake_call(platform, query):
+            return "Aucune mention"
+
+        tester._call_platform = fake_call
+
+        results = tester.test_all_queries_detailed(GENERATED_QUERIES, 'https://acme.com', 'Acme', mode='full', breakdown=BREAKDOWN)
+
+        assert results['summary']['queries_tested'] == 100
+        assert results['summary']['tested_by_category'] == BREAKDOWN
+
+    def test_budget_exhaustion_keeps_mix_representative(self, tester):
+        """Quand le budget s'épuise, les requêtes testées gardent les proportions 80/15/5"""
+        async def fake_call(platform, query):
+            return "Aucune mention"
+
+        tester._call_platform = fake_call
+        budget = VisibilityBudget(max_calls=200, max_tokens=10_000_000)
+
+        results = asyncio.run(tester.test_all_queries_detailed_async(
+            GENERATED_QUERIES, 'https://acme.com', 'Acme', mode='full', breakdown=BREAKDOWN, budget=budget
+        ))
+
+        summary = results['summary']
+        tested = summary['queries_tested']
+        by_category = summary['tested_by_category']
+        assert 20 <= tested < 100
+        assert summary['queries_skipped'] == 100 - tested
+        assert abs(by_category['non_branded'] - 0.80 * tested) <= 1
+        assert abs(by_category['semi_branded'] - 0.15 * tested) <= 1
+        assert abs(by_category['branded'] - 0.05 * tested) <= 1
+        assert summary['budget']['calls_used'] <= 200
+
+    def test_pessimistic_reservations_do_not_stop_the_run(self, tester):
+        """Un refus dû aux seules réservations en cours attend leur règlement au lieu d'arrêter le run"""
+        async def fake_call(platform, query):
+            await asyncio.sleep(0.01)
+            return "Aucune mention"
+
+        tester._call_platform = fake_call
+        # Estimation de 2000 tokens/appel : deux requêtes réservées à la fois ; consommation réelle bien moindre
+        budget = VisibilityBudget(max_calls=1000, max_tokens=25_000, estimated_tokens_per_call=2000)
+        queries = [f'requête {i}' for i in range(10)]
+
+        results = asyncio.run(tester.test_all_queries_detailed_async(
+            queries, 'https://acme.com', 'Acme', budget=budget
+        ))
+
+        assert results['summary']['queries_tested'] == 10
+        assert budget.tokens_used <= 25_000
+
+    def test_repeated_queries_are_served_from_cache(self, tester):
+        """Une requête déjà sondée (même normalisée) n'appelle plus la plateforme"""
+        calls = []
+
+        async def fake_call(platform, query):
+            calls.append((platform, query))
+            return "Acme est excellent"
+
+        tester._call_platform = fake_call
+
+        tester.test_all_queries_detailed(['meilleur courtier Montréal'], 'https://acme.com', 'Acme')
+        results = tester.test_all_queries_detailed(['  Meilleur  courtier montréal ?'], 'https://acme.com', 'Acme')
+
+        # google_ai partage l'appel gemini ; perplexity (recherche web en direct) n'est jamais caché
+        assert len(calls) == 5
+        assert [platform for platform, _ in calls].count('perplexity') == 2
+        assert results['summary']['response_cache'] == {'hits': 3, 'misses': 0}
+        assert results['queries'][0]['platforms']['claude']['mentioned'] is True
+
+    def test_competitors_extracted_in_one_batched_call(self, tester):
+        """Les réponses d'une requête sont extraites en un appel, les textes identiques une seule fois"""
+        shared = "Gemini recommande CompetitorX et CompetitorY pour ce besoin précis au Québec."
+        extraction_prompts = []
+
+        async def fake_call(platform, query):
+            if platform in ('gemini', 'google_ai'):
+                return shared
+            return f"Sur {platform}, on recommande Competitor-{platform} pour ce besoin au Québec."
+
+        class FakeMessages:
+            async def create(self, **kwargs):
+                prompt = kwargs['messages'][0]['content']
+                extraction_prompts.append(prompt)
+                blocks = re.findall(r'<reponse id="(r\d+)">\n(.*?)\n</reponse>', prompt, re.S)
+                payload = {
+                    answer_id: [{'name': next(w for w in text.split() if w.startswith('Competitor'))}]
+                    for answer_id, text in blocks
+                }
+                return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(payload))])
+
+        tester._call_platform = fake_call
+        tester.anthropic_client = SimpleNamespace(messages=FakeMessages())
+
+        results = tester.test_all_queries_detailed(['q1'], 'https://acme.com', 'Acme')
+        platforms = results['queries'][0]['platforms']
+
+        assert len(extraction_prompts) == 1
+        assert extraction_prompts[0].count('<reponse id=') == 4
+        assert platforms['chatgpt']['competitors_mentioned'] == [{'name': 'Competitor-chatgpt'}]
+        assert platforms['gemini']['competitors_mentioned'] == platforms['google_ai']['competitors_mentioned']
+        assert platforms['gemini']['competitors_mentioned'] == [{'name': 'CompetitorX'}]
+
+    def test_identical_backend_requests_share_one_call(self, tester):
+        """gemini et google_ai (même modèle, mêmes paramètres) partagent un seul appel"""
+        calls = []
+
+        async def fake_call(platform, query):
+            calls.append(platform)
+            return "Acme"
+
+        tester._call_platform = fake_call
+
+        results = tester.test_all_queries_detailed(['q1'], 'https://acme.com', 'Acme')
+        platforms = results['queries'][0]['platforms']
+
+        assert VisibilityTesterV2.backend_platform('google_ai') == 'gemini'
+        assert sorted(calls) == ['chatgpt', 'claude', 'gemini', 'perplexity']
+        assert platforms['google_ai']['full_response'] == platforms['gemini']['full_response']
+        assert platforms['google_ai']['mentioned'] is True
+
+
+class TestLLMResponseCache:
+    """Tests pour le cache des réponses LLM"""
+
+    def test_key_depends_on_platform_model_and_params(self):
+        """La clé change avec la plateforme, le modèle ou les paramètres, pas avec la casse"""
+        key = LLMResponseCache.make_key('claude', 'm1', 'Prix assurance', {'temperature': 0})
+
+        assert key == LLMResponseCache.make_key('claude', 'm1', 'prix  assurance?', {'temperature': 0})
+        assert key != LLMResponseCache.make_key('chatgpt', 'm1', 'Prix assurance', {'temperature': 0})
+        assert key != LLMResponseCache.make_key('claude', 'm2', 'Prix assurance', {'temperature': 0})
+        assert key != LLMResponseCache.make_key('claude', 'm1', 'Prix assurance', {'temperature': 0.7})
+
+    def test_normalize_query(self):
+        """La normalisation ignore casse, espaces multiples et ponctuation finale"""
+        assert normalize_query('  Meilleur   Courtier Montréal ?') == 'meilleur courtier montréal'
+
+    def test_empty_responses_are_not_cached(self, response_cache):
+        """Une réponse vide (erreur d'API) n'est pas mise en cache"""
+        assert response_cache.set('claude', 'm', 'q', {}, '') is False
+        assert response_cache.get('claude', 'm', 'q', {}) is None
+
+    def test_default_cache_stays_on_in_production(self, tmp_path, monkeypatch):
+        """Le cache par défaut ne dépend pas du cache de dev, désactivé en production"""
+        monkeypatch.setattr(config, 'ENVIRONMENT', 'production')
+        monkeypatch.setattr(llm_cache_module, 'LLM_RESPONSE_CACHE_DIR', tmp_path)
+
+        cache = LLMResponseCache()
+
+        assert not config.is_cache_enabled()
+        assert cache.set('claude', 'm', 'Prix assurance', {'temperature': 0}, 'Réponse') is True
+        assert cache.get('claude', 'm', 'prix assurance', {'temperature': 0}) == 'Réponse'
+
+    def test_store_size_is_capped(self, tmp_path):
+        """Le cache élague les entrées les plus anciennes au-delà de max_entries"""
+        cache = CacheService(tmp_path, max_entries=10)
+
+        for i in range(25):
+            cache.set(f"key {i}", f"value {i}")
+
+        assert cache.get_cache_stats()['total_entries'] <= 10
+        assert cache.get('key 24') == 'value 24'
+
+
+class TestVisibilityScheduler:
+    """Tests pour l'ordonnancement des requêtes (mix, budget, débit)"""
+
+    def test_interleave_keeps_every_prefix_representative(self):
+        """Chaque préfixe de l'ordre entrelacé respecte approximativement le mix 80/15/5"""
+        ordered = interleave_by_category(categorize_queries(GENERATED_QUERIES, BREAKDOWN))
+
+        assert sorted(q for q, _ in ordered) == sorted(GENERATED_QUERIES)
+        for size in (10, 20, 50):
+            prefix = [category for _, category in ordered[:size]]
+            assert abs(prefix.count('non_branded') - 0.80 * size) <= 1
+            assert abs(prefix.count('semi_branded') - 0.15 * size) <= 1
+            assert abs(prefix.count('branded') - 0.05 * size) <= 1
+
+    def test_queries_without_breakdown_keep_order(self):
+        """Sans breakdown, l'ordre d'origine est conservé"""
+        ordered = interleave_by_category(categorize_queries(['a', 'b', 'c']))
+
+        assert [q for q, _ in ordered] == ['a', 'b', 'c']
+
+    def test_budget_refuses_reservation_beyond_limits(self):
+        """Une réservation qui dépasse le budget d'appels ou de tokens est refusée"""
+        budget = VisibilityBudget(max_calls=10, max_tokens=5000, estimated_tokens_per_call=400)
+
+        reservation = budget.try_reserve(10)
+        assert reservation is not None
+        assert budget.try_reserve(1) is None
+
+        budget.release(reservation)
+        assert budget.try_reserve(13) is None  # 13 × 400 tokens > 5000
+
+    def test_rate_limiter_spaces_calls_after_burst(self):
+        """Au-delà de la rafale, les appels sont espacés selon le débit"""
+        limiter_rate = 600  # 10/s
+
+        async def run():
+            limiter = AsyncRateLimiter(limiter_rate, burst=2)
+            start = time.perf_counter()
+            for _ in range(4):
+                await limiter.acquire()
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(run())
+
+        assert 0.15 <= elapsed < 0.5